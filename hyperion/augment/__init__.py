@@ -6,3 +6,4 @@
 from .speech_augment import SpeechAugment
 from .noise_augment import NoiseAugment
 from .reverb_augment import ReverbAugment
+from .audio_bank import AudioBank
@@ -0,0 +1,229 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import os
+import logging
+
+import numpy as np
+import h5py
+
+
+class AudioBank(object):
+    """Bank of signals, e.g., noises or RIRs, concatenated in a single flat array.
+
+       The bank can be saved to an h5 file with the signals in a contiguous
+       dataset. When loading, the dataset is memory mapped read-only,
+       so all the processes of a node, e.g., the data loader workers,
+       share the same physical copy of the signals in the page cache.
+
+    Attributes:
+      keys: Signal ids.
+      data: Flat float32 array with all the signals concatenated.
+      offsets: Start of each signal in data, offsets[-1] is len(data).
+      stats: Dictionary of arrays with precomputed values per signal.
+      attrs: Dictionary with the options used to build the bank.
+    """
+    def __init__(self, keys, data, offsets, stats=None, attrs=None):
+        self.keys = np.asarray(keys)
+        self.data = data
+        self.offsets = offsets
+        self.stats = {} if stats is None else stats
+        self.attrs = {} if attrs is None else attrs
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i+1]]
+
+
+
+    @staticmethod
+    def _read_signals(keys, read_func, proc_func):
+        for key in keys:
+            x = np.ravel(read_func(key))
+            stats = {}
+            if proc_func is not None:
+                x, stats = proc_func(x)
+            yield x.astype('float32', copy=False), stats
+
+
+
+    @staticmethod
+    def _stack_stats(stats):
+        if len(stats) == 0:
+            return {}
+        return dict((k, np.array([s[k] for s in stats])) for k in stats[0])
+
+
+
+    @classmethod
+    def build(cls, keys, read_func, proc_func=None, attrs=None):
+        """Builds the bank in memory.
+
+        Args:
+          keys: Signal ids.
+          read_func: Function that reads the signal of a key.
+          proc_func: Optional function that takes a signal and returns
+                     the signal to store in the bank and a dictionary
+                     of precomputed values, e.g., normalized RIR and its delay.
+          attrs: Dictionary with the options used to build the bank.
+
+        Returns:
+          AudioBank object.
+        """
+        signals = []
+        stats = []
+        for x, stats_i in cls._read_signals(keys, read_func, proc_func):
+            signals.append(x)
+            stats.append(stats_i)
+
+        offsets = np.zeros((len(signals)+1,), dtype=np.int64)
+        offsets[1:] = np.cumsum([len(x) for x in signals])
+        data = np.concatenate(signals) if len(signals) > 0 else np.zeros((0,), dtype='float32')
+        return cls(keys, data, offsets, cls._stack_stats(stats), attrs)
+
+
+
+    @classmethod
+    def build_file(cls, file_path, keys, read_func, proc_func=None, attrs=None,
+                   block_size=2**24):
+        """Builds the bank and saves it to h5 file without
+           keeping all the signals in memory.
+           The file is written with a temporary name and renamed at the end,
+           so other processes never see a partial bank.
+
+        Args:
+          file_path: Output h5 file path.
+          keys: Signal ids.
+          read_func: Function that reads the signal of a key.
+          proc_func: Optional function that takes a signal and returns
+                     the signal to store in the bank and a dictionary
+                     of precomputed values.
+          attrs: Dictionary with the options used to build the bank.
+          block_size: Number of samples per block when copying the signals
+                      to the h5 file.
+        """
+        file_dir = os.path.dirname(file_path)
+        if file_dir != '' and not os.path.isdir(file_dir):
+            os.makedirs(file_dir, exist_ok=True)
+
+        tmp_path = '%s.tmp%d' % (file_path, os.getpid())
+        raw_path = tmp_path + '.raw'
+        stats = []
+        lengths = []
+        with open(raw_path, 'wb') as f:
+            for x, stats_i in cls._read_signals(keys, read_func, proc_func):
+                x.tofile(f)
+                lengths.append(len(x))
+                stats.append(stats_i)
+
+        offsets = np.zeros((len(lengths)+1,), dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        num_samples = int(offsets[-1])
+        try:
+            with h5py.File(tmp_path, 'w') as f:
+                f.create_dataset('keys', data=np.asarray(keys, dtype='S'))
+                f.create_dataset('offsets', data=offsets)
+                for k, v in cls._stack_stats(stats).items():
+                    f.create_dataset('stats/' + k, data=v)
+                if attrs is not None:
+                    for k, v in attrs.items():
+                        f.attrs[k] = v
+
+                # contiguous and uncompressed, so it can be memory mapped
+                dset = f.create_dataset('data', shape=(num_samples,), dtype='float32')
+                if num_samples > 0:
+                    raw = np.memmap(raw_path, dtype='float32', mode='r')
+                    for first in range(0, num_samples, block_size):
+                        last = min(first + block_size, num_samples)
+                        dset[first:last] = raw[first:last]
+                    del raw
+
+            os.replace(tmp_path, file_path)
+        finally:
+            os.remove(raw_path)
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+
+        logging.info('saved bank with %d signals and %d samples to %s' % (
+            len(lengths), num_samples, file_path))
+
+
+
+    @classmethod
+    def load(cls, file_path, mmap=True):
+        """Loads the bank from h5 file.
+
+        Args:
+          file_path: h5 file path.
+          mmap: If True, the signals are memory mapped instead of read.
+
+        Returns:
+          AudioBank object.
+        """
+        with h5py.File(file_path, 'r') as f:
+            keys = np.asarray(f['keys']).astype('U')
+            offsets = np.asarray(f['offsets'], dtype=np.int64)
+            stats = {}
+            if 'stats' in f:
+                for k in f['stats']:
+                    stats[k] = np.asarray(f['stats'][k])
+            attrs = dict(f.attrs)
+            dset = f['data']
+            data_offset = dset.id.get_offset()
+            if not mmap or data_offset is None or dset.shape[0] == 0:
+                data = np.asarray(dset, dtype='float32')
+                mmap = False
+            else:
+                num_samples = dset.shape[0]
+
+        if mmap:
+            data = np.memmap(file_path, dtype='float32', mode='r',
+                             offset=data_offset, shape=(num_samples,))
+
+        return cls(keys, data, offsets, stats, attrs)
+
+
+
+    @classmethod
+    def create(cls, file_path, create_reader, proc_func=None, attrs=None):
+        """Loads the bank from h5 file or builds it if the file doesn't exist.
+           The first process that needs the bank builds it, the others
+           just memory map it.
+
+        Args:
+          file_path: h5 file path, if None, the bank is built in memory.
+          create_reader: Function that returns the signal ids and a function
+                         to read the signal of a key. It is only called when
+                         the bank needs to be built.
+          proc_func: Optional function that takes a signal and returns
+                     the signal to store in the bank and a dictionary
+                     of precomputed values.
+          attrs: Dictionary with the options used to build the bank,
+                 they need to match the ones of the file.
+
+        Returns:
+          AudioBank object.
+        """
+        if file_path is None:
+            keys, read_func = create_reader()
+            return cls.build(keys, read_func, proc_func, attrs)
+
+        if not os.path.isfile(file_path):
+            logging.info('building bank %s' % (file_path))
+            keys, read_func = create_reader()
+            cls.build_file(file_path, keys, read_func, proc_func, attrs)
+
+        bank = cls.load(file_path)
+        if attrs is not None:
+            for k, v in attrs.items():
+                if k not in bank.attrs or bank.attrs[k] != v:
+                    raise ValueError(
+                        'bank %s was built with %s=%s != %s' % (
+                            file_path, k, bank.attrs.get(k), v))
+        return bank
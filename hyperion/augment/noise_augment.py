@@ -13,6 +13,7 @@ import numpy as np
 
 from ..hyp_defs import float_cpu
 from ..io import RandomAccessAudioReader as AR
+from .audio_bank import AudioBank
 
 
 class SingleNoiseAugment(object):
@@ -25,16 +26,29 @@ class SingleNoiseAugment(object):
                   to the noise wav files.
       min_snr: mininimum SNR(dB) to sample from.
       max_snr: maximum SNR(dB) to sample from.
+      bank_path: h5 file with the noise bank shared by all processes,
+                 if it doesn't exist, it is created from noise_path (optional).
       rng:     Random number generator returned by 
                np.random.RandomState (optional)
     """
-    def __init__(self, noise_type, noise_path, min_snr, max_snr, rng=None):
+    def __init__(self, noise_type, noise_path, min_snr, max_snr, bank_path=None, rng=None):
         logging.info('init noise_augment with noise={} noise_path={} snr={}-{}'.format(
             noise_type, noise_path, min_snr, max_snr))
 
         self.noise_type = noise_type
-        self.r = AR(noise_path)
-        self.noise_keys = self.r.keys
+        if bank_path is None:
+            self.r = AR(noise_path)
+            self.bank = None
+            self.noise_keys = self.r.keys
+        else:
+            def create_reader():
+                r = AR(noise_path)
+                return r.keys, lambda key: r.read([key])[0][0]
+
+            self.r = None
+            self.bank = AudioBank.create(bank_path, create_reader)
+            self.noise_keys = self.bank.keys
+
         self.min_snr = min_snr
         self.max_snr = max_snr
         self.cache = None
@@ -79,9 +93,14 @@ class SingleNoiseAugment(object):
         while noise is None or noise.shape[0] < num_samples:
             with self.lock:
                 noise_idx = self.rng.randint(len(self.noise_keys))
-                key = self.noise_keys[noise_idx]
-                noise_k, fs_k = self.r.read([key])
-                noise_k = noise_k[0]
+                if self.bank is None:
+                    key = self.noise_keys[noise_idx]
+                    noise_k, fs_k = self.r.read([key])
+                    noise_k = noise_k[0]
+
+            if self.bank is not None:
+                # view of the shared bank, no read and no copy
+                noise_k = self.bank[noise_idx]
             
             if noise is None:
                 need_samples = min(x.shape[0], noise_k.shape[0])
@@ -116,9 +135,9 @@ class NoiseAugment(object):
       noise_prob: probability of adding noise
       noise_types: dictionary of options with one entry per noise-type,
                   Each entry is also a dictiory with the following entries:
-                  weight, max_snr, min_snr, noise_path. The weight parameter
-                  is proportional to how often we want to sample a given noise 
-                  type.
+                  weight, max_snr, min_snr, noise_path and, optionally, bank_path.
+                  The weight parameter is proportional to how often we want
+                  to sample a given noise type.
       rng:     Random number generator returned by 
                np.random.RandomState (optional)
     """
@@ -134,7 +153,8 @@ class NoiseAugment(object):
         count = 0
         for key, opts in noise_types.items():
             self.weights[count] = opts['weight']
-            aug = SingleNoiseAugment(key, opts['noise_path'], opts['min_snr'], opts['max_snr'], rng=rng)
+            aug = SingleNoiseAugment(key, opts['noise_path'], opts['min_snr'], opts['max_snr'],
+                                     bank_path=opts.get('bank_path'), rng=rng)
             augmenters.append(aug)
             count += 1
 
@@ -190,6 +210,33 @@ class NoiseAugment(object):
         return x, info
 
 
+    def forward_batch(self, x):
+        """Adds noise to a batch of signals of the same length.
+
+        Args:
+          x: Signals (batch_size x num_samples).
+
+        Returns:
+          Noisy signals (batch_size x num_samples).
+          List of aug_info dictionaries for each signal.
+        """
+        batch_size = x.shape[0]
+        with self.lock:
+            p = self.rng.random_sample(size=(batch_size,))
+            noise_idx = self.rng.choice(len(self.weights), size=(batch_size,), p=self.weights)
+
+        y = x.copy()
+        info = []
+        for i in range(batch_size):
+            if p[i] > self.noise_prob:
+                info.append({'noise_type': None, 'snr': 100})
+                continue
+            y[i], info_i = self.augmenters[noise_idx[i]](x[i])
+            info.append(info_i)
+
+        return y, info
+
+
     def __call__(self, x):
         return self.forward(x)
         
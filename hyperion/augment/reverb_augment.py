@@ -10,12 +10,15 @@ import multiprocessing
 import yaml
 from copy import deepcopy
 from enum import Enum
+from collections import OrderedDict
 
 import numpy as np
 from scipy import signal
+from scipy import fft as sp_fft
 
 from ..hyp_defs import float_cpu
 from ..io import RandomAccessDataReaderFactory as DRF
+from .audio_bank import AudioBank
 
 class RIRNormType(Enum):
     """normalization type to apply to RIR"""
@@ -37,25 +40,23 @@ class SingleReverbAugment(object):
                   this delay will happen if the maximum of the RIR is not in 
                   its first sample.
       preload_rirs: if True all RIRS are loaded into RAM
+      bank_path: h5 file with the RIR bank shared by all processes,
+                 if it doesn't exist, it is created from rir_path (optional).
+                 It implies preload_rirs.
+      spectra_cache_size: max. size in MB of the cache of RIR spectra
+                          used by forward_batch, the least recently used
+                          spectra are discarded when it is full.
       rng:     Random number generator returned by 
                np.random.RandomState (optional)
     """
 
     def __init__(self, rir_type, rir_path, rir_norm=None, comp_delay=True, 
-                 preload_rirs=True, rng=None):
+                 preload_rirs=True, bank_path=None, spectra_cache_size=32,
+                 rng=None):
         self.rir_type = rir_type
         logging.info(('init reverb_augment with RIR={} rir_path={} '
                       'rir_norm={} comp_delay={}').format(
                           rir_type, rir_path, rir_norm, comp_delay))
-        self.r = DRF.create(rir_path)
-        #logging.info('init reverb_augment with RIR={} read RIR lengths'.format(rir_type))
-        self.rir_keys = self.r.keys
-        self.preload_rirs = preload_rirs
-        if preload_rirs:
-            self.rirs = self.r.read(self.rir_keys)
-            self.r.close()
-        else:
-            self.rirs = None
 
         if rir_norm is None:
             self.rir_norm = RIRNormType.NONE
@@ -65,6 +66,28 @@ class SingleReverbAugment(object):
             self.rir_norm = RIRNormType.ENERGY
         
         self.comp_delay = comp_delay
+        self.preload_rirs = preload_rirs or bank_path is not None
+        if self.preload_rirs:
+            # the bank keeps the normalized RIRs with their delay and max.
+            def create_reader():
+                r = DRF.create(rir_path)
+                return r.keys, lambda key: r.read([key])[0]
+
+            self.r = None
+            self.rirs = AudioBank.create(
+                bank_path, create_reader, proc_func=self._proc_rir,
+                attrs={'rir_norm': self.rir_norm.name})
+            self.rir_keys = self.rirs.keys
+        else:
+            self.r = DRF.create(rir_path)
+            self.rirs = None
+            self.rir_keys = self.r.keys
+
+        # LRU cache of RIR spectra for the last FFT size used by forward_batch
+        self.spectra_cache_size = spectra_cache_size
+        self._rir_spectra = OrderedDict()
+        self._rir_spectra_nfft = 0
+        self._rir_spectra_bytes = 0
 
         self.lock = multiprocessing.Lock()
         if rng is None:
@@ -87,6 +110,31 @@ class SingleReverbAugment(object):
         return SingleReverbAugment._power(x) - SingleReverbAugment._power(n)
 
 
+    @staticmethod
+    def sdr_batch(x, y, scale, delay):
+        """Computes the SDR of each row of a batch.
+           If y has less than num_samples + delay samples, the SDR is computed
+           on the samples of x that are in y.
+
+        Args:
+          x: Clean signals (batch_size x num_samples).
+          y: Distorted signals (batch_size x num_samples_y).
+          scale: Scale of the clean signal in y for each row.
+          delay: Delay of the clean signal in y for each row.
+
+        Returns:
+          SDR(dB) for each row.
+        """
+        sdr = np.zeros((x.shape[0],), dtype=float_cpu())
+        for i in range(x.shape[0]):
+            n_i = min(x.shape[1], y.shape[1] - delay[i])
+            x_i = scale[i] * x[i,:n_i]
+            e_i = y[i,delay[i]:delay[i]+n_i] - x_i
+            sdr[i] = 10 * (np.log10(np.dot(x_i, x_i) + 1e-5) -
+                           np.log10(np.dot(e_i, e_i) + 1e-5))
+        return sdr
+
+
     def _norm_rir(self, h):
         if self.rir_norm == RIRNormType.NONE:
             return h
@@ -96,6 +144,12 @@ class SingleReverbAugment(object):
 
         return h / np.sum(h**2)
 
+
+    def _proc_rir(self, h):
+        h = self._norm_rir(h).astype('float32', copy=False)
+        h_delay = np.argmax(np.abs(h))
+        return h, {'delay': h_delay, 'max': h[h_delay]}
+
     
     def forward(self, x):
         num_samples = x.shape[0]
@@ -104,13 +158,15 @@ class SingleReverbAugment(object):
 
         if self.preload_rirs:
             h = self.rirs[rir_idx]
+            h_delay = self.rirs.stats['delay'][rir_idx]
+            h_max = self.rirs.stats['max'][rir_idx]
         else:
             key = self.rir_keys[rir_idx]
             h = self.r.read([key])[0]
+            h, h_stats = self._proc_rir(h)
+            h_delay = h_stats['delay']
+            h_max = h_stats['max']
 
-        h = self._norm_rir(h)
-        h_delay = np.argmax(np.abs(h))
-        h_max =  h[h_delay]
         y = signal.fftconvolve(x, h)
         if self.comp_delay:
             y = y[h_delay:num_samples+h_delay]
@@ -125,6 +181,107 @@ class SingleReverbAugment(object):
         return y, info
 
 
+    def _get_rir_spectra(self, rir_idx, nfft, rirs=None):
+        """Returns the RIR spectra for a FFT size, the spectra of
+           preloaded RIRs are cached and reused while the FFT size doesn't change.
+           The cache keeps the most recently used spectra up to
+           spectra_cache_size MB.
+           If RIRs are not preloaded, rirs contains the processed RIRs
+           of the batch.
+        """
+        if nfft != self._rir_spectra_nfft:
+            self._rir_spectra.clear()
+            self._rir_spectra_nfft = nfft
+            self._rir_spectra_bytes = 0
+
+        H = np.zeros((len(rir_idx), nfft//2+1), dtype='complex64')
+        h_delay = np.zeros((len(rir_idx),), dtype=np.int64)
+        h_max = np.zeros((len(rir_idx),), dtype=float_cpu())
+        for i, r in enumerate(rir_idx):
+            if self.preload_rirs:
+                H[i] = self._get_cached_rir_spectrum(r, nfft)
+                h_delay[i] = self.rirs.stats['delay'][r]
+                h_max[i] = self.rirs.stats['max'][r]
+            else:
+                h, h_stats = rirs[i]
+                H[i] = sp_fft.rfft(h, nfft)
+                h_delay[i] = h_stats['delay']
+                h_max[i] = h_stats['max']
+
+        return H, h_delay, h_max
+
+
+
+    def _get_cached_rir_spectrum(self, r, nfft):
+        """Returns the spectrum of a preloaded RIR from the LRU cache."""
+        H = self._rir_spectra.get(r)
+        if H is not None:
+            self._rir_spectra.move_to_end(r)
+            return H
+
+        H = sp_fft.rfft(self.rirs[r], nfft).astype('complex64', copy=False)
+        max_bytes = self.spectra_cache_size * 2**20
+        if H.nbytes > max_bytes:
+            return H
+
+        while self._rir_spectra_bytes + H.nbytes > max_bytes:
+            _, H_old = self._rir_spectra.popitem(last=False)
+            self._rir_spectra_bytes -= H_old.nbytes
+
+        self._rir_spectra[r] = H
+        self._rir_spectra_bytes += H.nbytes
+        return H
+
+
+
+    def forward_batch(self, x):
+        """Reverberates a batch of signals of the same length with
+           one batched real FFT.
+
+        Args:
+          x: Signals (batch_size x num_samples).
+
+        Returns:
+          Reverberated signals (batch_size x num_samples).
+            If comp_delay is False, the samples after num_samples are
+            discarded, so the tail of the RIR delay is lost.
+          List of aug_info dictionaries for each signal.
+        """
+        batch_size, num_samples = x.shape
+        with self.lock:
+            rir_idx = self.rng.randint(len(self.rir_keys), size=(batch_size,))
+
+        if self.preload_rirs:
+            rirs = None
+            rir_length = np.max(np.diff(self.rirs.offsets))
+        else:
+            rirs = [self._proc_rir(self.r.read([self.rir_keys[r]])[0])
+                    for r in rir_idx]
+            rir_length = np.max([len(h) for h, _ in rirs])
+
+        # the FFT size only depends on the chunk and max. RIR lengths,
+        # so the RIR spectra are reused between batches
+        nfft = sp_fft.next_fast_len(num_samples + rir_length - 1, True)
+        H, h_delay, h_max = self._get_rir_spectra(rir_idx, nfft, rirs)
+        X = sp_fft.rfft(x, nfft, axis=-1)
+        X *= H
+        y_full = sp_fft.irfft(X, nfft, axis=-1)
+        srr = self.sdr_batch(x, y_full, h_max, h_delay)
+        if self.comp_delay:
+            y = np.zeros_like(x)
+            for i in range(batch_size):
+                y[i] = y_full[i,h_delay[i]:h_delay[i]+num_samples]
+            h_delay[:] = 0
+        else:
+            y = y_full[:,:num_samples]
+
+        info = [{'rir_type': self.rir_type, 'srr': srr[i],
+                 'h_max': h_max[i], 'h_delay': h_delay[i]}
+                for i in range(batch_size)]
+        return y, info
+
+
+
     def __call__(self, x):
         return self.forward(x)
 
@@ -139,7 +296,8 @@ class ReverbAugment(object):
       reverb_prob: probability of adding reverberation
       rir_types: dictionary of options with one entry per RIR-type,
                   Each entry is also a dictiory with the following entries:
-                  weight, rir_norm, comp_delay, rir_path. The weight parameter
+                  weight, rir_norm, comp_delay, rir_path and, optionally,
+                  preload_rirs, bank_path and spectra_cache_size. The weight parameter
                   is proportional to how often we want to sample a given RIR 
                   type.
       max_reverb_context: number of samples required as left context 
@@ -157,7 +315,8 @@ class ReverbAugment(object):
         augmenters = []
         self.weights = np.zeros((len(rir_types),))
         count = 0
-        val_opts = ('rir_path', 'rir_norm', 'comp_delay', 'preload_rirs')
+        val_opts = ('rir_path', 'rir_norm', 'comp_delay', 'preload_rirs', 'bank_path',
+                    'spectra_cache_size')
         for key, opts in rir_types.items():
             self.weights[count] = opts['weight']
             
@@ -214,6 +373,11 @@ class ReverbAugment(object):
         return SingleReverbAugment.sdr(x, y, scale, delay)
 
 
+    @staticmethod
+    def sdr_batch(x, y, scale, delay):
+        return SingleReverbAugment.sdr_batch(x, y, scale, delay)
+
+
     def forward(self, x):
 
         # decide whether to add reverb or not
@@ -234,6 +398,37 @@ class ReverbAugment(object):
         return x, info
 
 
+    def forward_batch(self, x):
+        """Reverberates a batch of signals of the same length.
+           The signals with the same RIR type are reverberated together.
+
+        Args:
+          x: Signals (batch_size x num_samples).
+
+        Returns:
+          Reverberated signals (batch_size x num_samples).
+          List of aug_info dictionaries for each signal.
+        """
+        batch_size = x.shape[0]
+        with self.lock:
+            p = self.rng.random_sample(size=(batch_size,))
+            rir_type_idx = self.rng.choice(len(self.weights), size=(batch_size,), p=self.weights)
+
+        y = x.copy()
+        info = [{'rir_type': None, 'srr': 100, 'h_max': 1, 'h_delay': 0}
+                for i in range(batch_size)]
+        rir_type_idx[p > self.reverb_prob] = -1
+        for k in range(len(self.augmenters)):
+            idx = (rir_type_idx == k).nonzero()[0]
+            if len(idx) == 0:
+                continue
+            y[idx], info_k = self.augmenters[k].forward_batch(x[idx])
+            for i, info_i in zip(idx, info_k):
+                info[i] = info_i
+
+        return y, info
+
+
     def __call__(self, x):
         return self.forward(x)
         
@@ -94,6 +94,50 @@ class SpeechAugment(object):
         return x, info
 
 
+    def forward_batch(self, x):
+        """Augments a batch of signals of the same length, e.g.,
+           the random chunks of a training minibatch.
+           Reverberation is computed with one batched FFT.
+
+        Args:
+          x: Signals (batch_size x num_samples).
+
+        Returns:
+          Augmented signals (batch_size x num_samples).
+          List of aug_info dictionaries for each signal.
+        """
+        batch_size = x.shape[0]
+        x_clean = x
+        if self.reverb_aug is not None:
+            x, reverb_info = self.reverb_aug.forward_batch(x)
+        else:
+            reverb_info = [{'rir_type': None, 'srr': 100, 
+                            'h_max': 1, 'h_delay': 0} for i in range(batch_size)]
+
+        if self.noise_aug is not None:
+            x, noise_info = self.noise_aug.forward_batch(x)
+        else:
+            noise_info = [{'noise_type': None, 'snr': 100} for i in range(batch_size)]
+
+        info = [{'reverb': reverb_info[i], 'noise': noise_info[i]}
+                for i in range(batch_size)]
+        if self.noise_aug is None:
+            for info_i in info:
+                info_i['sdr'] = info_i['reverb']['srr']
+        elif self.reverb_aug is None:
+            for info_i in info:
+                info_i['sdr'] = info_i['noise']['snr']
+        else:
+            # we calculate SNR(dB) of the combined reverb + noise
+            scale = [info_i['h_max'] for info_i in reverb_info]
+            delay = [info_i['h_delay'] for info_i in reverb_info]
+            sdr = ReverbAugment.sdr_batch(x_clean, x, scale, delay)
+            for i, info_i in enumerate(info):
+                info_i['sdr'] = sdr[i]
+
+        return x, info
+
+
     def __call__(self, x):
         return self.forward(x)
         
@@ -20,7 +20,7 @@ from hyperion.utils.kaldi_matrix import compression_methods
 from hyperion.utils import Utt2Info
 from hyperion.io import DataWriterFactory as DWF
 from hyperion.io import SequentialDataReaderFactory as DRF
-from hyperion.io import RandomAccessDataReaderFactory as RDRF
+from hyperion.io import VADReaderFactory as VRF
 from hyperion.feats import MeanVarianceNorm as MVN
 from hyperion.feats import FrameSelector as FSel
 
@@ -50,7 +50,7 @@ def process_feats(input_spec, output_spec, vad_spec, write_num_frames_spec,
                         part_idx=part_idx, num_parts=num_parts) as reader:
             if vad_spec is not None:
                 logging.info('opening VAD stream: %s' % (vad_spec))
-                v_reader = RDRF.create(vad_spec, path_prefix=vad_path_prefix, scp_sep=scp_sep)
+                v_reader = VRF.create(vad_spec, path_prefix=vad_path_prefix, scp_sep=scp_sep)
     
             while not reader.eof():
                 key, data = reader.read(1)
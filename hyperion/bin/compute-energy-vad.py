@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 """
  Copyright 2018 Jesus Villalba (Johns Hopkins University)
- Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0) 
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
 """
 import sys
 import os
@@ -14,44 +14,109 @@ import numpy as np
 from hyperion.hyp_defs import config_logger
 from hyperion.io import SequentialAudioReader as AR
 from hyperion.io import DataWriterFactory as DWF
+from hyperion.io import PackedBinVADWriter as PBVW
+from hyperion.io.rw_specifiers import WSpecifier
+from hyperion.utils.process_pool import OrderedProcessPool
 from hyperion.feats import EnergyVAD
 
-def compute_vad(input_path, output_path, write_num_frames, **kwargs):
+
+def init_worker(worker_id, vad_args):
+    return EnergyVAD(**vad_args)
+
+
+def compute_vad_batch(vad, batch):
+    """Computes the VAD of a batch of utterances.
+
+    Returns:
+      keys, list of binary VADs and elapsed time in ms.
+    """
+    keys, x = batch
+    t1 = time.time()
+    y = vad.compute_batch(x)
+    dt = (time.time() - t1)*1000
+    return keys, y, dt
+
+
+def read_batches(reader, batch_size):
+    keys = []
+    x = []
+    for key, x_i, fs in reader:
+        keys.append(key)
+        x.append(x_i)
+        if len(keys) == batch_size:
+            yield keys, x
+            keys = []
+            x = []
+
+    if len(keys) > 0:
+        yield keys, x
+
+
+def create_writer(output_path, packed_output, vad_args):
+    if not packed_output:
+        return DWF.create(output_path, scp_sep=' ')
+
+    file_path = WSpecifier.create(output_path).archive
+    return PBVW(file_path, frame_length=vad_args.get('frame_length', 25),
+                frame_shift=vad_args.get('frame_shift', 10),
+                snip_edges=vad_args.get('snip_edges', True))
+
+
+def compute_vad(input_path, output_path, write_num_frames,
+                batch_size, num_workers, queue_size, packed_output, **kwargs):
 
     vad_args = EnergyVAD.filter_args(**kwargs)
     vad = EnergyVAD(**vad_args)
-    
+
     input_args = AR.filter_args(**kwargs)
     reader = AR(input_path, **input_args)
 
-    writer = DWF.create(output_path, scp_sep=' ')
+    writer = create_writer(output_path, packed_output, vad_args)
 
     if write_num_frames is not None:
         f_num_frames = open(write_num_frames, 'w')
 
-    for data in reader:
-        key, x, fs = data
-        logging.info('Extracting VAD for %s' % (key))
-        t1 = time.time()
-        y = vad.compute(x)
-        dt = (time.time() - t1)*1000
-        rtf = vad.frame_shift*y.shape[0]/dt
-        num_speech_frames = np.sum(y)
-        prob_speech = num_speech_frames / y.shape[0] * 100
-        logging.info('Extracted VAD for %s detected %d/%d (%f %%) speech frames, elapsed-time=%.2f ms. real-time-factor=%.2f' %
-                     (key, num_speech_frames, y.shape[0], prob_speech, dt, rtf))
-        writer.write([key], [y])
+    batches = read_batches(reader, batch_size)
+    if num_workers > 1:
+        pool = OrderedProcessPool(
+            num_workers, compute_vad_batch, init_fn=init_worker,
+            init_args=(vad_args,), queue_size=queue_size)
+        results = pool.imap(batches)
+    else:
+        results = (compute_vad_batch(vad, batch) for batch in batches)
+
+    t0 = time.time()
+    num_utts = 0
+    num_frames = 0
+    for keys, y, dt in results:
+        num_frames_b = np.sum([len(y_i) for y_i in y])
+        num_speech_frames = np.sum([np.sum(y_i) for y_i in y])
+        prob_speech = num_speech_frames / max(num_frames_b, 1) * 100
+        rtf = vad.frame_shift*num_frames_b/max(dt, 1e-3)
+        logging.info('Extracted VAD for %d utts from %s to %s detected %d/%d (%f %%) speech frames, '
+                     'elapsed-time=%.2f ms. real-time-factor=%.2f' %
+                     (len(keys), keys[0], keys[-1], num_speech_frames, num_frames_b,
+                      prob_speech, dt, rtf))
+        writer.write(keys, y)
         if write_num_frames is not None:
-            f_num_frames.write('%s %d\n' % (key, y.shape[0]))
+            for key, y_i in zip(keys, y):
+                f_num_frames.write('%s %d\n' % (key, y_i.shape[0]))
+        num_utts += len(keys)
+        num_frames += num_frames_b
 
-        vad.reset()
-    
+    writer.close()
     if write_num_frames is not None:
         f_num_frames.close()
 
+    elapsed_time = time.time() - t0
+    audio_time = vad.frame_shift*num_frames/1000
+    logging.info('Extracted VAD for %d utts num-frames=%d audio-time=%.2f s elapsed-time=%.2f s. '
+                 'real-time-factor=%.2f' %
+                 (num_utts, num_frames, audio_time, elapsed_time, audio_time/elapsed_time))
+
 
 if __name__ == "__main__":
-    
+
     parser=argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         fromfile_prefix_chars='@',
@@ -63,12 +128,21 @@ if __name__ == "__main__":
 
     AR.add_argparse_args(parser)
     EnergyVAD.add_argparse_args(parser)
+    parser.add_argument('--batch-size', dest='batch_size', default=64, type=int,
+                        help='Number of utterances processed per call')
+    parser.add_argument('--num-workers', dest='num_workers', default=1, type=int,
+                        help='Number of worker processes to compute the VAD')
+    parser.add_argument('--queue-size', dest='queue_size', default=16, type=int,
+                        help='Max. number of batches waiting to be processed by the workers')
+    parser.add_argument('--packed-output', dest='packed_output', default=False, action='store_true',
+                        help=('Writes the VAD into a single h5 file with 8 frames per byte, '
+                              'instead of one dataset per utterance'))
     parser.add_argument('-v', '--verbose', dest='verbose', default=1, choices=[0, 1, 2, 3], type=int,
                         help='Verbose level')
     args=parser.parse_args()
     config_logger(args.verbose)
     del args.verbose
     logging.debug(args)
-    
+
     compute_vad(**vars(args))
-    
+
@@ -19,11 +19,31 @@ from hyperion.io import SequentialAudioReader as AR
 from hyperion.io import SequentialDataReaderFactory as DRF
 from hyperion.io import DataWriterFactory as DWF
 from hyperion.io import compression_methods
+from hyperion.io.shard_utils import (init_shard_worker, close_shard_worker,
+                                     compute_shard_feats, merge_shard_scps)
+from hyperion.utils.process_pool import OrderedProcessPool
 from hyperion.feats import MFCC
 
+
+def compute_mfcc(mfcc, x):
+    y = mfcc.compute(x)
+    mfcc.reset()
+    return y
+
+
+def read_utts(reader, is_wave):
+    for data in reader:
+        if is_wave:
+            key, x, fs = data
+        else:
+            key, x = data
+        yield key, x
+
+
 def compute_mfcc_feats(input_path, output_path,
                        compress, compression_method, 
-                       write_num_frames, **kwargs):
+                       write_num_frames, num_workers, queue_size,
+                       output_shards, **kwargs):
 
     mfcc_args = MFCC.filter_args(**kwargs)
     mfcc = MFCC(**mfcc_args)
@@ -35,34 +55,63 @@ def compute_mfcc_feats(input_path, output_path,
         input_args = DRF.filter_args(**kwargs)
         reader = DRF.create(input_path, **input_args)
 
-    writer = DWF.create(output_path, scp_sep=' ',
-                        compress=compress,
-                        compression_method=compression_method)
+    writer_args = {'compress': compress, 'compression_method': compression_method}
+    writer = None
+    if not (output_shards and num_workers > 1):
+        writer = DWF.create(output_path, scp_sep=' ', **writer_args)
 
     if write_num_frames is not None:
         f_num_frames = open(write_num_frames, 'w')
-    
-    for data in reader:
-        if mfcc.input_step == 'wave':
-            key, x, fs = data
-        else:
-            key, x = data
-        logging.info('Extracting MFCC for %s' % (key))
-        t1 = time.time()
-        y = mfcc.compute(x)
-        dt = (time.time() - t1)*1000
-        rtf = mfcc.frame_shift*y.shape[0]/dt
+
+    utts = read_utts(reader, mfcc.input_step == 'wave')
+    if num_workers > 1:
+        shard_path = output_path if output_shards else None
+        pool = OrderedProcessPool(
+            num_workers, compute_shard_feats, init_fn=init_shard_worker, 
+            init_args=(MFCC, mfcc_args, compute_mfcc, shard_path, writer_args),
+            finalize_fn=close_shard_worker, queue_size=queue_size)
+        results = pool.imap(utts)
+    else:
+        pool = None
+        state = (mfcc, compute_mfcc, None)
+        results = (compute_shard_feats(state, data) for data in utts)
+
+    t0 = time.time()
+    keys = []
+    num_frames = 0
+    write_time = 0
+    for key, num_frames_i, dt, y in results:
+        rtf = mfcc.frame_shift*num_frames_i/dt
         logging.info('Extracted MFCC for %s num-frames=%d elapsed-time=%.2f ms. real-time-factor=%.2f' %
-                     (key, y.shape[0], dt, rtf))
-        writer.write([key], [y])
+                     (key, num_frames_i, dt, rtf))
+        t1 = time.time()
+        if y is not None:
+            writer.write([key], [y])
         
         if write_num_frames is not None:
-            f_num_frames.write('%s %d\n' % (key, y.shape[0]))
+            f_num_frames.write('%s %d\n' % (key, num_frames_i))
+        write_time += time.time() - t1
+        keys.append(key)
+        num_frames += num_frames_i
+
+    if writer is not None:
+        writer.close()
 
-        mfcc.reset()
-            
     if write_num_frames is not None:
         f_num_frames.close()
+
+    if writer is None:
+        merge_shard_scps(output_path, num_workers, keys)
+
+    elapsed_time = time.time() - t0
+    audio_time = mfcc.frame_shift*num_frames/1000
+    if pool is not None:
+        logging.info('read-time=%.2f s compute-time=%.2f s (summed over %d workers) write-time=%.2f s' %
+                     (pool.read_time, pool.compute_time, num_workers, write_time))
+    logging.info('Extracted MFCC for %d utts num-frames=%d audio-time=%.2f s elapsed-time=%.2f s. '
+                 'utts/s=%.2f real-time-factor=%.2f' %
+                 (len(keys), num_frames, audio_time, elapsed_time,
+                  len(keys)/elapsed_time, audio_time/elapsed_time))
     
 
 if __name__ == "__main__":
@@ -82,6 +131,13 @@ if __name__ == "__main__":
     parser.add_argument('--compress', dest='compress', default=False, action='store_true', help='Compress the features')
     parser.add_argument('--compression-method', dest='compression_method', default='auto',
                         choices=compression_methods, help='Compression method')
+    parser.add_argument('--num-workers', dest='num_workers', default=1, type=int,
+                        help='Number of worker processes to compute the features')
+    parser.add_argument('--queue-size', dest='queue_size', default=16, type=int,
+                        help='Max. number of utterances waiting to be processed by the workers')
+    parser.add_argument('--output-shards', dest='output_shards', default=False, action='store_true',
+                        help=('Each worker writes its own output archive and the scp files '
+                              'are merged at the end, instead of writing in the main process'))
     parser.add_argument('-v', '--verbose', dest='verbose', default=1, choices=[0, 1, 2, 3], type=int,
                         help='Verbose level')
     args=parser.parse_args()
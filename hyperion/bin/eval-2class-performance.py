@@ -2,9 +2,8 @@
 """
  Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
-"""
-"""
-Evals EER, DCF, DET
+
+ Evals EER, DCF, DET
 """
 from __future__ import absolute_import
 from __future__ import print_function
@@ -22,9 +21,10 @@ import numpy as np
 from hyperion.hyp_defs import config_logger
 from hyperion.utils.trial_scores import TrialScores
 from hyperion.utils.trial_key import TrialKey
-from hyperion.metrics import compute_eer
+from hyperion.metrics import fast_eval_dcf_eer
+from hyperion.metrics.score_histogram import ScoreHistogram
 
-def eval_2class_performance(score_file, key_file, output_path):
+def eval_2class_performance(score_file, key_file, output_path, p_tar=[0.01]):
 
     scr = TrialScores.load(score_file)
     key = TrialKey.load(key_file)
@@ -34,13 +34,61 @@ def eval_2class_performance(score_file, key_file, output_path):
         os.makedirs(output_dir, exist_ok=True)
     
     tar, non = scr.get_tar_non(key)
-    eer = compute_eer(tar, non)
+    # fast_eval_dcf_eer needs the priors in ascending order
+    p_tar = np.sort(p_tar)
+    min_dcf, act_dcf, eer, _ = fast_eval_dcf_eer(tar, non, p_tar)
 
     output_file=output_path + '.res'
     with open(output_file, 'w') as f:
-        f.write('EER %.4f\nNTAR %d\nNNON %d\n'
-                % (eer, len(tar), len(non)))
-    
+        f.write('EER %.4f\n' % (eer))
+        for i, p in enumerate(p_tar):
+            f.write('MIN-DCF-%g %.4f\nACT-DCF-%g %.4f\n'
+                    % (p, min_dcf[i], p, act_dcf[i]))
+        f.write('NTAR %d\nNNON %d\n' % (len(tar), len(non)))
+
+
+
+def eval_2class_performance_streaming(
+        score_files, key_files, output_path, merge_hist_files=None, 
+        save_hist_file=None, chunk_size=1000000, p_tar=[0.01], **kwargs):
+    """Evals EER and DCF from score histograms accumulated by chunks
+       without loading all the scores. The metrics are written along
+       with the bounds of their binning error.
+    """
+    hist_args = ScoreHistogram.filter_args(prefix='hist', **kwargs)
+    hist = ScoreHistogram(**hist_args)
+    for score_file, key_file in zip(score_files, key_files):
+        if os.path.splitext(score_file)[1] in ['.h5', '.hdf5']:
+            logging.info('accumulating scores from %s' % score_file)
+            hist.accumulate_trials(
+                TrialScores.load(score_file), TrialKey.load(key_file))
+        else:
+            hist.accumulate_txt(score_file, key_file, chunk_size)
+
+    if merge_hist_files is not None:
+        for hist_file in merge_hist_files:
+            logging.info('merging score histogram %s' % hist_file)
+            hist.merge(ScoreHistogram.load(hist_file))
+
+    if save_hist_file is not None:
+        hist.save(save_hist_file)
+
+    output_dir = os.path.dirname(output_path)
+    if not(os.path.isdir(output_dir)):
+        os.makedirs(output_dir, exist_ok=True)
+
+    min_dcf, min_dcf_err, act_dcf, act_dcf_err, eer, eer_err = hist.eval_dcf_eer(
+        np.asarray(p_tar))
+    output_file=output_path + '.res'
+    with open(output_file, 'w') as f:
+        f.write('EER %.4f\nEER-ERR %.4f\n' % (eer, eer_err))
+        for i, p in enumerate(p_tar):
+            f.write('MIN-DCF-%g %.4f\nMIN-DCF-ERR-%g %.4f\n'
+                    'ACT-DCF-%g %.4f\nACT-DCF-ERR-%g %.4f\n'
+                    % (p, min_dcf[i], p, min_dcf_err[i],
+                       p, act_dcf[i], p, act_dcf_err[i]))
+        f.write('NTAR %d\nNNON %d\n' % (hist.num_tar, hist.num_non))
+
     
 if __name__ == "__main__":
 
@@ -49,14 +97,40 @@ if __name__ == "__main__":
         fromfile_prefix_chars='@',
         description='Evals EER, DCF, DET')
 
-    parser.add_argument('--score-file', dest='score_file', required=True)
-    parser.add_argument('--key-file', dest='key_file', required=True)
+    parser.add_argument('--score-file', dest='score_file', required=True, nargs='+',
+                        help=('score files, in streaming mode it can be a list of '
+                              'score files of different shards of the trial list'))
+    parser.add_argument('--key-file', dest='key_file', required=True, nargs='+',
+                        help='key files, one for each score file')
     parser.add_argument('--output-path', dest='output_path', required=True)
+    parser.add_argument('--p-tar', dest='p_tar', default=[0.01], type=float, nargs='+',
+                        help='target priors of the DCF')
+    parser.add_argument('--streaming', default=False, action='store_true',
+                        help=('computes the EER from score histograms '
+                              'without loading all the scores in memory'))
+    parser.add_argument('--chunk-size', default=1000000, type=int,
+                        help='number of trials read at once from text score files in streaming mode')
+    parser.add_argument('--merge-hist-files', default=None, nargs='+',
+                        help='score histograms of other shards to merge in streaming mode')
+    parser.add_argument('--save-hist-file', default=None,
+                        help='file to save the score histogram in streaming mode')
+    ScoreHistogram.add_argparse_args(parser, prefix='hist')
     parser.add_argument('-v', '--verbose', dest='verbose', default=1, choices=[0, 1, 2, 3], type=int)
 
     args = parser.parse_args()
     config_logger(args.verbose)
     del args.verbose
     logging.debug(args)
-    
-    eval_2class_performance(**vars(args))
+
+    args = vars(args)
+    score_files = args.pop('score_file')
+    key_files = args.pop('key_file')
+    streaming = args.pop('streaming')
+    assert len(score_files) == len(key_files), (
+        'number of score and key files must be the same')
+    if streaming:
+        eval_2class_performance_streaming(score_files, key_files, **args)
+    else:
+        assert len(score_files) == 1, 'multiple score files need --streaming'
+        eval_2class_performance(score_files[0], key_files[0], args['output_path'],
+                                args['p_tar'])
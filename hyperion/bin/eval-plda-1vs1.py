@@ -14,6 +14,7 @@ from six.moves import xrange
 import sys
 import os
 import argparse
+import os.path as path
 import time
 import logging
 
@@ -22,9 +23,11 @@ import numpy as np
 from hyperion.hyp_defs import set_float_cpu, float_cpu, config_logger
 from hyperion.utils.trial_ndx import TrialNdx
 from hyperion.utils.trial_scores import TrialScores
+from hyperion.utils.list_utils import ismember
 from hyperion.helpers import TrialDataReader as TDR
 from hyperion.helpers import PLDAFactory as F
 from hyperion.transforms import TransformList
+from hyperion.pdfs import PLDABlockScorer
 
 
 
@@ -42,17 +45,37 @@ def eval_plda(iv_file, ndx_file, enroll_file, test_file,
     x_e, x_t, enroll, ndx = tdr.read()
 
     model = F.load_plda(plda_type, model_file)
+    scorer_args = PLDABlockScorer.filter_args(**kwargs)
+    scorer = PLDABlockScorer(model, **scorer_args)
+
+    # align the trial mask with the enrollment vectors,
+    # the mask is only skipped when the ndx contains all the trials
+    if np.all(ndx.trial_mask):
+        trial_mask = None
+    else:
+        f, loc = ismember(enroll, ndx.model_set)
+        if not np.all(f):
+            raise ValueError('%d enrollment models not found in ndx model_set'
+                             % (np.sum(np.logical_not(f))))
+        trial_mask = ndx.trial_mask[loc]
     
     t1 = time.time()
-    scores = model.llr_1vs1(x_e, x_t)
+    file_base, file_ext = path.splitext(score_file)
+    if file_ext == '.h5' or file_ext == '.hdf5':
+        s = scorer.score(x_e, x_t, enroll, ndx.seg_set, trial_mask)
+        if trial_mask is not None:
+            # SparseTrialScores can't be saved to h5
+            s = TrialScores(s.model_set, s.seg_set, s.scores.toarray(),
+                            s.score_mask.toarray())
+        s.save(score_file)
+        num_trials = np.sum(s.score_mask)
+    else:
+        num_trials = scorer.score_to_file(
+            x_e, x_t, enroll, ndx.seg_set, score_file, trial_mask)
     
     dt = time.time() - t1
-    num_trials = x_e.shape[0] * x_t.shape[0]
     logging.info('Elapsed time: %.2f s. Elapsed time per trial: %.2f ms.'
-          % (dt, dt/num_trials*1000))
-
-    s = TrialScores(enroll, ndx.seg_set, scores)
-    s.save(score_file)
+          % (dt, dt/max(num_trials, 1)*1000))
 
     
 if __name__ == "__main__":
@@ -70,6 +93,7 @@ if __name__ == "__main__":
 
     TDR.add_argparse_args(parser)
     F.add_argparse_eval_args(parser)
+    PLDABlockScorer.add_argparse_args(parser)
     parser.add_argument('--score-file', dest='score_file', required=True)
     parser.add_argument('-v', '--verbose', dest='verbose', default=1,
                         choices=[0, 1, 2, 3], type=int)
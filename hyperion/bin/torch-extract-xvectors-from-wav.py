@@ -9,6 +9,8 @@ import os
 import argparse
 import time
 import logging
+import threading
+import queue
 
 import numpy as np
 import pandas as pd
@@ -28,11 +30,145 @@ from hyperion.torch.layers import AudioFeatsFactory as AFF
 from hyperion.torch.layers import MeanVarianceNorm as MVN
 
 
+def _read_utts(reader, v_reader, feat_extractor, mvn, augmenter, num_augs,
+               random_utt_length, min_utt_length, max_utt_length,
+               rng, device, out_queue):
+    """Reads the audio, applies augmentation, computes features and VAD,
+       and puts the features of each utterance in out_queue.
+       It runs in a background thread to overlap I/O and feature extraction
+       with the x-vector extraction.
+    """
+    try:
+        with torch.no_grad():
+            while not reader.eof():
+                t1 = time.time()
+                key, x0, fs = reader.read(1)
+                if len(key) == 0:
+                    break
+
+                x0 = x0[0]
+                key0 = key[0]
+                t2 = time.time()
+
+                logging.info('processing utt %s' % (key0))
+                for aug_id in range(num_augs):
+                    t3 = time.time()
+                    aug_df_row = None
+                    if augmenter is None:
+                        x = x0
+                        key = key0
+                    else:
+                        x, aug_info = augmenter(x0)
+                        key = '%s-aug-%02d' % (key0, aug_id)
+                        aug_df_row = {'key_aug': key, 'key_orig': key0,
+                                      'noise_type': aug_info['noise']['noise_type'],
+                                      'snr': aug_info['noise']['snr'],
+                                      'rir_type': aug_info['reverb']['rir_type'],
+                                      'srr': aug_info['reverb']['srr'],
+                                      'sdr': aug_info['sdr']}
+
+                    t4 = time.time()
+                    x = torch.tensor(
+                        x[None,:], dtype=torch.get_default_dtype()).to(
+                            device)
+
+                    x = feat_extractor(x)
+                    if mvn is not None:
+                        x = mvn(x)
+
+                    t5 = time.time()
+                    tot_frames = x.shape[1]
+                    if v_reader is not None:
+                        vad = v_reader.read(
+                            key0, num_frames=tot_frames)[0]
+                        vad = torch.tensor(vad, dtype=torch.bool).to(device)
+                        x = x[:,vad]
+
+                    logging.info(
+                        'utt %s detected %d/%d (%.2f %%) speech frames' % (
+                            key, x.shape[1], tot_frames, 
+                            x.shape[1]/tot_frames*100))
+                
+                    if random_utt_length:
+                        utt_length = rng.randint(
+                            low=min_utt_length, high=max_utt_length+1)
+                        if utt_length < x.shape[1]:
+                            first_frame = rng.randint(
+                                low=0, high=x.shape[1]-utt_length)
+                            x = x[:,first_frame:first_frame+utt_length]
+                            logging.info(
+                                'extract-random-utt %s of length=%d first-frame=%d' % (
+                                    key, x.shape[1], first_frame))
+
+                    t6 = time.time()
+                    utt = {'key': key, 'x': x[0], 'aug_df_row': aug_df_row,
+                           'dur': x0.shape[0]/fs[0], 
+                           'read_time': t2 - t1 if aug_id == 0 else 0,
+                           'aug_time': t4 - t3, 'feat_time': t5 - t4,
+                           'vad_time': t6 - t5}
+                    out_queue.put(utt)
+    except Exception as e:
+        out_queue.put(e)
+        return
+
+    out_queue.put(None)
+
+
+
+def _extract_embed_bucket(utts, model, batch_size, chunk_length, embed_layer):
+    """Extracts the x-vectors of a bucket of utterances, sorting them by 
+       length and forwarding them in batches padded to the longest 
+       utterance of the batch.
+    """
+    lengths = np.array([utt['x'].shape[0] for utt in utts], dtype=np.int64)
+    order = np.argsort(lengths, kind='stable')
+    for first in range(0, len(utts), batch_size):
+        t1 = time.time()
+        batch = [utts[i] for i in order[first:first+batch_size]
+                 if lengths[i] > 0]
+        if len(batch) > 0:
+            with torch.no_grad():
+                x_lengths = torch.as_tensor(
+                    [utt['x'].shape[0] for utt in batch], dtype=torch.long)
+                max_length = int(x_lengths.max())
+                if len(batch) == 1 or int(x_lengths.min()) == max_length:
+                    x = torch.stack([utt['x'] for utt in batch], dim=0)
+                    x_lengths = None
+                else:
+                    x = batch[0]['x'].new_zeros(
+                        (len(batch), max_length, batch[0]['x'].shape[-1]))
+                    for i, utt in enumerate(batch):
+                        x[i, :utt['x'].shape[0]] = utt['x']
+
+                x = x.transpose(1,2).contiguous()
+                if x_lengths is None:
+                    y = model.extract_embed(
+                        x, chunk_length=chunk_length, 
+                        embed_layer=embed_layer)
+                else:
+                    y = model.extract_embed(
+                        x, chunk_length=chunk_length, 
+                        embed_layer=embed_layer, x_lengths=x_lengths)
+                y = y.cpu().numpy()
+
+            for i, utt in enumerate(batch):
+                utt['y'] = y[i]
+
+        embed_time = (time.time() - t1)/len(order[first:first+batch_size])
+        for i in order[first:first+batch_size]:
+            utt = utts[i]
+            utt['embed_time'] = embed_time
+            if lengths[i] == 0:
+                utt['y'] = np.zeros((model.embed_dim,), dtype=float_cpu())
+
+
+
 def extract_xvectors(input_spec, output_spec, vad_spec, write_num_frames_spec,
                      scp_sep, vad_path_prefix, 
                      model_path, chunk_length, embed_layer, 
                      random_utt_length, min_utt_length, max_utt_length,
                      aug_cfg, num_augs, aug_info_path,
+                     batch_size, bucket_size, prefetch_size,
                      use_gpu, **kwargs):
 
     set_float_cpu('float32')
@@ -75,6 +211,7 @@ def extract_xvectors(input_spec, output_spec, vad_spec, write_num_frames_spec,
         augmenter = None
         num_augs = 1
 
+    bucket_size = max(bucket_size, batch_size)
     ar_args = AR.filter_args(**kwargs)
     logging.info('opening output stream: %s' % (output_spec))
     with DWF.create(output_spec, scp_sep=scp_sep) as writer:
@@ -82,98 +219,63 @@ def extract_xvectors(input_spec, output_spec, vad_spec, write_num_frames_spec,
         logging.info('opening input stream: {} with args={}'.format(input_spec, ar_args))
         with AR(input_spec, **ar_args) as reader:
 
+            v_reader = None
             if vad_spec is not None:
                 logging.info('opening VAD stream: %s' % (vad_spec))
                 v_reader = VRF.create(vad_spec, path_prefix=vad_path_prefix, 
                                       scp_sep=scp_sep)
-    
-            while not reader.eof():
-                t1 = time.time()
-                key, x0, fs = reader.read(1)
-                if len(key) == 0:
-                    break
 
-                x0 = x0[0]
-                key0 = key[0]
-                t2 = time.time()
-
-                logging.info('processing utt %s' % (key0))
-                for aug_id in range(num_augs):
-                    t3 = time.time()
-                    if augmenter is None:
-                        x = x0
-                        key = key0
-                    else:
-                        x, aug_info = augmenter(x0)
-                        key = '%s-aug-%02d' % (key0, aug_id)
-                        aug_df_row = {'key_aug': key, 'key_orig': key0,
-                                      'noise_type': aug_info['noise']['noise_type'],
-                                      'snr': aug_info['noise']['snr'],
-                                      'rir_type': aug_info['reverb']['rir_type'],
-                                      'srr': aug_info['reverb']['srr'],
-                                      'sdr': aug_info['sdr']}
-
-                        aug_df.append(pd.DataFrame(aug_df_row, index=[0]))
-
-                    t4 = time.time()
-                    with torch.no_grad():
-                        x = torch.tensor(
-                            x[None,:], dtype=torch.get_default_dtype()).to(
-                            device)
+            utt_queue = queue.Queue(maxsize=prefetch_size)
+            read_thread = threading.Thread(
+                target=_read_utts, 
+                args=(reader, v_reader, feat_extractor, mvn, augmenter, num_augs,
+                      random_utt_length, min_utt_length, max_utt_length,
+                      rng, device, utt_queue),
+                daemon=True)
+            read_thread.start()
+
+            eof = False
+            while not eof:
+                utts = []
+                while len(utts) < bucket_size:
+                    utt = utt_queue.get()
+                    if isinstance(utt, Exception):
+                        raise utt
+                    if utt is None:
+                        eof = True
+                        break
+                    utts.append(utt)
+
+                if len(utts) == 0:
+                    break
 
-                        x = feat_extractor(x)
-                        if mvn is not None:
-                            x = mvn(x)
-
-                        t5 = time.time()
-                        tot_frames = x.shape[1]
-                        if vad_spec is not None:
-                            vad = v_reader.read(
-                                key0, num_frames=tot_frames)[0]
-                            vad = torch.tensor(vad, dtype=torch.bool).to(device)
-                            x = x[:,vad]
-
-                        logging.info(
-                            'utt %s detected %d/%d (%.2f %%) speech frames' % (
-                                key, x.shape[1], tot_frames, 
-                                x.shape[1]/tot_frames*100))
-                
-                        if random_utt_length:
-                            utt_length = rng.randint(
-                                low=min_utt_length, high=max_utt_length+1)
-                            if utt_length < x.shape[1]:
-                                first_frame = rng.randint(
-                                    low=0, high=x.shape[1]-utt_length)
-                                x = x[:,first_frame:first_frame+utt_length]
-                                logging.info(
-                                    'extract-random-utt %s of length=%d first-frame=%d' % (
-                                        key, x.shape[1], first_frame))
-
-                        t6 = time.time()
-                        if x.shape[1] == 0:
-                            y = np.zeros((model.embed_dim,), dtype=float_cpu())
-                        else:
-                            x = x.transpose(1,2).contiguous()
-                            y = model.extract_embed(
-                                x, chunk_length=chunk_length, 
-                                embed_layer=embed_layer).cpu().numpy()[0]
+                _extract_embed_bucket(
+                    utts, model, batch_size, chunk_length, embed_layer)
 
+                for utt in utts:
                     t7 = time.time()
-                    writer.write([key], [y])
+                    key = utt['key']
+                    writer.write([key], [utt['y']])
                     if write_num_frames_spec is not None:
                         keys.append(key)
-                        info.append(str(x.shape[1]))
+                        info.append(str(utt['x'].shape[0]))
+                    if utt['aug_df_row'] is not None:
+                        aug_df.append(pd.DataFrame(utt['aug_df_row'], index=[0]))
 
                     t8 = time.time()
-                    read_time = t2 - t1
-                    tot_time = read_time + t8-t3
+                    tot_time = (utt['read_time'] + utt['aug_time'] + 
+                                utt['feat_time'] + utt['vad_time'] + 
+                                utt['embed_time'] + t8 - t7)
                     logging.info((
                         'utt %s total-time=%.3f read-time=%.3f '
                         'aug-time=%.3f feat-time=%.3f '
                         'vad-time=%.3f embed-time=%.3f write-time=%.3f '
                         'rt-factor=%.2f') % (
-                            key, tot_time, read_time, t4-t3, t5-t4, 
-                            t6-t5, t7-t6, t8-t7, x0.shape[0]/fs[0]/tot_time))
+                            key, tot_time, utt['read_time'], utt['aug_time'], 
+                            utt['feat_time'], utt['vad_time'], utt['embed_time'], 
+                            t8-t7, utt['dur']/tot_time))
+
+            read_thread.join()
 
     if write_num_frames_spec is not None:
         logging.info('writing num-frames to %s' % (write_num_frames_spec))
@@ -230,6 +332,16 @@ if __name__ == "__main__":
     parser.add_argument('--max-utt-length', type=int, default=12000, 
                         help=('maximum utterance length when using random utt length'))
 
+    parser.add_argument('--batch-size', type=int, default=1, 
+                        help=('number of utterances in each forward pass '
+                              'of the x-vector network'))
+    parser.add_argument('--bucket-size', type=int, default=64, 
+                        help=('number of utterances that are sorted by length '
+                              'to create batches with similar lengths'))
+    parser.add_argument('--prefetch-size', type=int, default=128, 
+                        help=('maximum number of utterances read and '
+                              'preprocessed ahead of the x-vector extraction'))
+
     parser.add_argument('--output', dest='output_spec', required=True)
     parser.add_argument('--use-gpu', default=False, action='store_true',
                         help='extract xvectors in gpu')
@@ -25,7 +25,7 @@ from hyperion.transforms import TransformList, NDA, NSbSw
 
 
 def train_nda(iv_file, train_list, preproc_file,
-              nda_dim, K, alpha, 
+              nda_dim, K, alpha, block_size,
               name, save_tlist, append_tlist, output_path, **kwargs):
 
     
@@ -40,7 +40,7 @@ def train_nda(iv_file, train_list, preproc_file,
 
     t1 = time.time()
 
-    s_mat = NSbSw(K=K, alpha=alpha)
+    s_mat = NSbSw(K=K, alpha=alpha, block_size=block_size)
     s_mat.fit(x, class_ids)
 
     model = NDA(name=name)
@@ -50,7 +50,7 @@ def train_nda(iv_file, train_list, preproc_file,
     
     x = model.predict(x)
 
-    s_mat = NSbSw()
+    s_mat = NSbSw(block_size=block_size)
     s_mat.fit(x, class_ids)
     logging.debug(s_mat.Sb[:4,:4])
     logging.debug(s_mat.Sw[:4,:4])
@@ -86,6 +86,10 @@ if __name__ == "__main__":
                         default=10)
     parser.add_argument('--alpha', dest='alpha', type=float,
                         default=1)
+    parser.add_argument('--block-size', dest='block_size', type=int,
+                        default=2**22,
+                        help=('max. number of elements of the intermediate '
+                              'tensors used to compute the kNN stats'))
 
     parser.add_argument('--no-save-tlist', dest='save_tlist',
                         default=True, action='store_false')
@@ -15,6 +15,7 @@ from scipy.special import gammaln
 from ..hyp_defs import float_cpu
 from ..hyp_model import HypModel
 from ..utils.math import int2onehot, logdet_pdmat, invert_pdmat, softmax
+from ..utils.class_stats import ClassStats
 
 
 
@@ -172,14 +173,26 @@ class LinearGBE(HypModel):
                 self.num_classes = p_theta.shape[-1]
         
         if class_ids is not None:
-            p_theta = int2onehot(class_ids, self.num_classes)
+            N = ClassStats.count(class_ids, self.num_classes, sample_weight)
+        else:
+            if sample_weight is not None:
+                p_theta = sample_weight[:, None]*p_theta
+                sample_weight = None
+            N = np.sum(p_theta, axis=0)
+
+        if self.update_W and do_map:
+            nu0 = self.prior.nu
+        else:
+            nu0 = 0
 
-        if sample_weight is not None:
-            p_theta = sample_weight[:, None]*p_theta
-      
-        N = np.sum(p_theta, axis=0)
+        class_weights = None
+        if self.update_W and self.balance_class_weight:
+            class_weights = 1/(N+nu0/self.num_classes)
 
-        F = np.dot(p_theta.T, x)
+        stats = ClassStats.compute(
+            x, class_ids, p_theta, sample_weight=sample_weight,
+            num_classes=self.num_classes, class_weights=class_weights)
+        F = stats.F
 
         if self.update_mu:
             xbar = F/N[:,None]
@@ -196,7 +209,6 @@ class LinearGBE(HypModel):
             
         if self.update_W:
             if do_map:
-                nu0 = self.prior.nu
                 S0 = invert_pdmat(self.prior.W, return_inv=True)[-1]
                 if self.balance_class_weight:
                     alpha_W = (N/(N+nu0/self.num_classes))[:, None]
@@ -204,21 +216,17 @@ class LinearGBE(HypModel):
                 else:
                     S = nu0*S0
             else:
-                nu0 = 0
                 S = np.zeros((x.shape[1], x.shape[1]), dtype=float_cpu())
-                
-            for k in xrange(self.num_classes):
-                delta = x - xbar[k]
-                S_k = np.dot(p_theta[:, k]*delta.T, delta)
-                if do_map and self.update_mu:
-                    mu_delta = xbar[k] - self.prior.mu[k]
-                    S_k += N[k]*(1-alpha_mu[k])*np.outer(mu_delta, mu_delta)
 
-                if self.balance_class_weight:
-                    S_k /= (N[k]+nu0/self.num_classes)
+            # sum_k w_k sum_n p_nk (x_n - xbar_k)(x_n - xbar_k)'
+            S += stats.within_class_scatter(None if self.update_mu else xbar)
+            if do_map and self.update_mu:
+                mu_delta = xbar - self.prior.mu
+                w = N*(1-alpha_mu[:, 0])
+                if class_weights is not None:
+                    w = w*class_weights
+                S += np.dot(w*mu_delta.T, mu_delta)
 
-                S += S_k
-                
             if self.balance_class_weight:
                 S /= self.num_classes
             else:
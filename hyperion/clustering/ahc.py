@@ -8,7 +8,6 @@ import h5py
 from copy import copy
 
 from scipy.cluster.hierarchy import linkage
-from sklearn.metrics import homogeneity_score, completeness_score
 
 from ..hyp_defs import float_cpu
 from ..hyp_model import HypModel
@@ -55,6 +54,37 @@ class AHC(HypModel):
 
 
         
+    def _get_roots(self, num_merges):
+        """Finds the cluster of each segment after the first num_merges
+           merges of the dendrogram.
+
+           Each node points to the node where it is merged and the
+           roots are found by pointer jumping, so it takes O(N log(depth)).
+
+        Args:
+          num_merges: number of merges.
+
+        Returns:
+          Index of the dendrogram node containing each segment.
+        """
+        N = self.Z.shape[0] + 1
+        parent = np.arange(N + num_merges, dtype=int)
+        children = self.Z[:num_merges, :2].astype(int)
+        merged = np.arange(N, N + num_merges, dtype=int)
+        parent[children[:,0]] = merged
+        parent[children[:,1]] = merged
+
+        root = parent
+        while True:
+            next_root = root[root]
+            if np.all(next_root == root):
+                break
+            root = next_root
+
+        return root[:N]
+
+
+
     def get_flat_clusters_from_num_clusters(self, num_clusters):
         N = self.Z.shape[0] + 1
         num_clusters = min(N, num_clusters)
@@ -62,13 +92,7 @@ class AHC(HypModel):
         if self.flat_clusters is not None:
             return self.flat_clusters[p_idx]
 
-        flat_clusters = np.arange(N, dtype=int)
-        for i in range(p_idx):
-            segm_idx = np.logical_or(flat_clusters==self.Z[i,0],
-                                     flat_clusters==self.Z[i,1])
-            flat_clusters[segm_idx] = N + i
-
-        _, flat_clusters = np.unique(flat_clusters, return_inverse=True)
+        _, flat_clusters = np.unique(self._get_roots(p_idx), return_inverse=True)
         return flat_clusters
 
     
@@ -83,34 +107,89 @@ class AHC(HypModel):
 
     
 
-    def compute_flat_clusters():
+    def compute_flat_clusters(self):
+        """Computes the flat clusters for all the number of merges.
+           It needs N x N memory, for single cuts use get_flat_clusters.
+        """
         N = self.Z.shape[0]+1
         flat_clusters = np.zeros((N,N), dtype=int)
-        flat_clusters[0] = np.arange(N, dtype=int)
+        roots = np.arange(N, dtype=int)
+        flat_clusters[0] = roots
         for i in range(N-1):
-            flat_clusters[i+1] = flat_clusters[i]
-            segm_idx = np.logical_or(flat_clusters[i]==self.Z[i,0],
-                                     flat_clusters[i]==self.Z[i,1])
-            flat_clusters[i+1][segm_idx] = N + i
+            segm_idx = np.logical_or(roots==self.Z[i,0], roots==self.Z[i,1])
+            roots[segm_idx] = N + i
+            _, flat_clusters[i+1] = np.unique(roots, return_inverse=True)
 
-        for i in range(1,N):
-            _, flat_clusters[i] = np.unique(flat_clusters, return_inverse=True)
         self.flat_clusters = flat_clusters
 
 
 
+    @staticmethod
+    def _xlogx(x):
+        return x*np.log(x) if x > 0 else 0
+
+
+
     def evaluate_impurity_det(self, labels_true):
-        if self.flat_clusters is None:
-            self.compute_flat_clusters()
+        """Computes cluster and class impurities for all the
+           number of merges of the dendrogram.
 
+           The contingency table between clusters and classes is updated
+           at each merge, moving the classes of the smaller cluster
+           into the larger one, so all the levels take O(N log N).
+
+        Args:
+          labels_true: true class of each segment.
+
+        Returns:
+          Cluster impurity (1-homogeneity) for each number of merges.
+          Class impurity (1-completeness) for each number of merges.
+        """
         # homogeneity: each cluster contains only members of a single class. (cluster purity)
         # completeness: all members of a given class are assigned to the same cluster. (class purity)
-        N = self.flat_clusters.shape[0]
+        # with mutual information: MI = H(C) - H(C|K) = H(K) - H(K|C)
+        #   homogeneity = MI/H(C),  completeness = MI/H(K)
+        # and N*MI = sum_kc f(n_kc) - sum_k f(n_k) - sum_c f(n_c) + f(N), with f(x) = x log(x) 
+        f = self._xlogx
+        N = self.Z.shape[0] + 1
+        _, labels_true = np.unique(labels_true, return_inverse=True)
+        class_counts = np.bincount(labels_true)
+        s_c = np.sum([f(n) for n in class_counts])
+        # the entropies are exactly 0 with one class or one cluster,
+        # computing them with the sums leaves rounding residues
+        h_c = np.log(N) - s_c/N if len(class_counts) > 1 else 0
+
+        # contingency table rows of the current clusters
+        counts = [{c: 1} for c in labels_true] + [None]*(N-1)
+        sizes = np.ones((2*N-1,), dtype=int)
+        s_kc = 0
+        s_k = 0
+
         h = np.zeros((N,), dtype=float_cpu())
         c = np.zeros((N,), dtype=float_cpu())
-        for i in range(self.flat_clusters.shape[0]):
-            h[i] = homogeneity_score(labels_true, self.flat_clusters[i])
-            c[i] = completeness_score(labels_true, self.flat_clusters[i])
+        for i in range(N):
+            if i > 0:
+                a, b = int(self.Z[i-1,0]), int(self.Z[i-1,1])
+                if sizes[a] < sizes[b]:
+                    a, b = b, a
+                counts_a = counts[a]
+                for cls, n_b in counts[b].items():
+                    n_a = counts_a.get(cls, 0)
+                    s_kc += f(n_a + n_b) - f(n_a) - f(n_b)
+                    counts_a[cls] = n_a + n_b
+                n = sizes[a] + sizes[b]
+                s_k += f(n) - f(sizes[a]) - f(sizes[b])
+                sizes[N+i-1] = n
+                counts[N+i-1] = counts_a
+                counts[a] = counts[b] = None
+                
+            h_k = np.log(N) - s_k/N if i < N-1 else 0
+            if h_k == 0 or h_c == 0:
+                mi = 0
+            else:
+                mi = max((s_kc - s_k - s_c + f(N))/N, 0)
+            h[i] = mi/h_c if h_c > 0 else 1
+            c[i] = mi/h_k if h_k > 0 else 1
 
         return 1-h, 1-c
     
@@ -5,7 +5,6 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
-from six.moves import xrange
 
 import sys
 import logging
@@ -17,19 +16,49 @@ from ..hyp_model import HypModel
 
 
 class KMeans(HypModel):
+    """K-Means clustering.
 
-    def __init__(self, num_clusters, mu=None, rtol=0.001, **kwargs):
+       Distances to the centroids are computed with matrix products
+       by chunks of samples, the seeds are chosen with k-means++ and
+       the centroids are updated with bincount.
+
+    Attributes:
+      num_clusters: Number of clusters.
+      mu: Centroids (num_clusters x x_dim).
+      rtol: Relative tolerance of the loss to stop training.
+      seed: Seed of the random generator for k-means++ seeding.
+      chunk_size: Number of samples per chunk when computing distances.
+      max_seed_samples: Max. number of samples, randomly selected,
+                        used to choose the seeds.
+    """
+    def __init__(self, num_clusters, mu=None, rtol=0.001, seed=1024,
+                 chunk_size=10000, max_seed_samples=100000, **kwargs):
         super(KMeans, self).__init__(**kwargs)
         self.num_clusters = num_clusters
         self.mu = mu
         self.rtol = rtol
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.max_seed_samples = max_seed_samples
+        self._rng = np.random.RandomState(seed=seed)
+        self._counts = None
 
 
     def fit(self, x, epochs=100):
+        """Trains the centroids with Lloyd's algorithm.
+
+        Args:
+          x: Data matrix (num_samples x x_dim).
+          epochs: Max. number of epochs.
+
+        Returns:
+          Loss (mean squared error) for each epoch.
+          Cluster index of each sample.
+        """
         loss = np.zeros((epochs,), dtype=float_cpu())
         self.mu = self._choose_seeds(x)
         cluster_index, err2 = self.predict(x)
-        for epoch in xrange(epochs):
+        for epoch in range(epochs):
             self.mu = self._compute_centroids(x, cluster_index)
             cluster_index, err2 = self.predict(x)
             loss[epoch] = np.mean(err2)
@@ -42,35 +71,150 @@ class KMeans(HypModel):
         return loss, cluster_index
 
 
-    
+
+    def fit_generator(self, generator, train_steps, epochs=10):
+        """Trains the centroids with mini-batch k-means, reading the data
+           by batches from a generator, so the full data doesn't need
+           to be in memory. If the centroids are not initialized,
+           the seeds are chosen from the first batch.
+
+        Args:
+          generator: Generator that returns data matrices
+                     (batch_size x x_dim).
+          train_steps: Number of batches per epoch.
+          epochs: Max. number of epochs.
+
+        Returns:
+          Loss (mean squared error) for each epoch.
+        """
+        loss = np.zeros((epochs,), dtype=float_cpu())
+        for epoch in range(epochs):
+            err2_acc = 0
+            num_samples = 0
+            for step in range(train_steps):
+                x = next(generator)
+                err2_acc += self.partial_fit(x)
+                num_samples += x.shape[0]
+
+            loss[epoch] = err2_acc/num_samples
+            logging.info('epoch: %d/%d loss: %f' % (epoch+1, epochs, loss[epoch]))
+            if epoch > 0:
+                delta = np.abs(loss[epoch-1]-loss[epoch])/loss[epoch-1]
+                if delta < self.rtol:
+                    loss = loss[:epoch+1]
+                    break
+
+        return loss
+
+
+
+    def partial_fit(self, x):
+        """Updates the centroids with a batch of data.
+           Each centroid moves towards the mean of its samples in the batch
+           with learning rate equal to the fraction of its samples seen
+           so far that are in the batch.
+
+        Args:
+          x: Data matrix (batch_size x x_dim).
+
+        Returns:
+          Sum of squared errors of the batch before the update.
+        """
+        if self._counts is None:
+            if self.mu is None:
+                self.mu = self._choose_seeds(x)
+            self._counts = np.zeros((self.num_clusters,), dtype=float_cpu())
+
+        index, err2 = self.predict(x)
+        N, F = self._compute_stats(x, index)
+        self._counts += N
+        nz = N > 0
+        eta = N[nz]/self._counts[nz]
+        self.mu[nz] += eta[:,None]*(F[nz]/N[nz,None] - self.mu[nz])
+        return np.sum(err2)
+
+
+
     def _choose_seeds(self, x):
+        """Chooses the initial centroids with k-means++, each new seed is
+           sampled with probability proportional to the squared distance
+           to the closest seed chosen before.
+        """
+        num_samples = x.shape[0]
+        if num_samples < self.num_clusters:
+            raise ValueError('num_samples=%d < num_clusters=%d' % (
+                num_samples, self.num_clusters))
+
+        if self.max_seed_samples is not None and num_samples > self.max_seed_samples:
+            index = self._rng.choice(num_samples, self.max_seed_samples, replace=False)
+            x = x[np.sort(index)]
+            num_samples = self.max_seed_samples
+
         mu = np.zeros((self.num_clusters, x.shape[-1]), dtype=float_cpu())
-        mu[0] = x[0]
-        for i in xrange(1, self.num_clusters):
-            d = np.zeros((x.shape[0],), dtype=float_cpu())
-            for j in xrange(i):
-                d += np.sum(np.square(x-mu[j]), axis=-1)
-            index = np.argmax(d)
+        x2 = np.sum(np.square(x), axis=-1)
+        dist2 = lambda mu_i: np.maximum(x2 - 2*np.dot(x, mu_i) + np.dot(mu_i, mu_i), 0)
+        mu[0] = x[self._rng.randint(num_samples)]
+        d2 = dist2(mu[0])
+        for i in range(1, self.num_clusters):
+            d2_sum = np.sum(d2)
+            if d2_sum > 0:
+                cum_d2 = np.cumsum(d2)
+                index = np.searchsorted(cum_d2, self._rng.rand()*cum_d2[-1],
+                                        side='right')
+                index = min(index, num_samples-1)
+            else:
+                # all samples are on top of the seeds
+                index = self._rng.randint(num_samples)
             mu[i] = x[index]
+            d2 = np.minimum(d2, dist2(mu[i]))
         return mu
 
 
-    
+
+    def _compute_stats(self, x, index):
+        """Computes number of samples and sum of samples of each cluster."""
+        N = np.bincount(index, minlength=self.num_clusters).astype(float_cpu())
+        F = np.zeros((self.num_clusters, x.shape[-1]), dtype=float_cpu())
+        for d in range(x.shape[-1]):
+            F[:,d] = np.bincount(index, weights=x[:,d], minlength=self.num_clusters)
+        return N, F
+
+
+
     def _compute_centroids(self, x, index):
-        mu = np.zeros((self.num_clusters, x.shape[-1]), dtype=float_cpu())
-        for k in xrange(self.num_clusters):
-            r = index == k
-            if np.sum(r)>0:
-                mu[k] = np.mean(x[index==k], axis=0)
+        """Computes the centroids, the empty clusters keep the
+           previous centroids.
+        """
+        N, F = self._compute_stats(x, index)
+        mu = self.mu.copy()
+        nz = N > 0
+        mu[nz] = F[nz]/N[nz,None]
         return mu
 
 
+
     def predict(self, x):
-        err2 = np.zeros((x.shape[0], self.num_clusters), dtype=float_cpu())
-        for k in xrange(self.num_clusters):
-            err2[:,k] = np.sum(np.square(x-self.mu[k]), axis=-1)
-
-        index = np.argmin(err2, axis=-1)
-        return index, err2[np.arange(x.shape[0]),index]
-        
-        
+        """Computes the closest centroid to each sample.
+
+        Args:
+          x: Data matrix (num_samples x x_dim).
+
+        Returns:
+          Cluster index of each sample.
+          Squared distance to the closest centroid.
+        """
+        num_samples = x.shape[0]
+        index = np.zeros((num_samples,), dtype=int)
+        err2 = np.zeros((num_samples,), dtype=float_cpu())
+        mu2 = np.sum(np.square(self.mu), axis=-1)
+        for first in range(0, num_samples, self.chunk_size):
+            last = min(first + self.chunk_size, num_samples)
+            x_i = x[first:last]
+            # ||x-mu||^2 = ||x||^2 - 2 x mu' + ||mu||^2
+            d2 = mu2 - 2*np.dot(x_i, self.mu.T)
+            index_i = np.argmin(d2, axis=-1)
+            err2_i = d2[np.arange(last-first), index_i] + np.sum(np.square(x_i), axis=-1)
+            index[first:last] = index_i
+            err2[first:last] = np.maximum(err2_i, 0)
+
+        return index, err2
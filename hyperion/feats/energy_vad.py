@@ -9,7 +9,7 @@ from scipy.signal import lfilter
 
 from ..hyp_defs import float_cpu
 from ..utils.misc import str2bool
-from .stft import st_logE
+from .stft import st_logE, st_logE_batch
 
 
 class EnergyVAD(object):
@@ -62,6 +62,75 @@ class EnergyVAD(object):
         self._dc_zi = np.array([0], dtype=float_cpu())
 
 
+    def _pad_dither(self, x):
+        """Pads the wave when snip_edges is False and adds dither."""
+        if not self.snip_edges:
+            num_frames = int(np.round(len(x)/self._shift))
+            len_x = (num_frames-1)*self._shift + self._length
+            dlen_x = len_x - len(x)
+            dlen1_x = int(np.floor((self._length-self._shift)/2))
+            dlen2_x = int(dlen_x - dlen1_x)
+            x = np.pad(x, (dlen1_x, dlen2_x), mode='reflect')
+
+        if self.dither > 0:
+            n = self.dither*np.random.RandomState(
+                seed=len(x)).randn(len(x)).astype(float_cpu(), copy=False)
+            x = x + n
+
+        return x
+
+
+
+    def _smooth_vad(self, vad, offsets):
+        """Smooths the VAD of a batch of utterances concatenated in one vector.
+           The speech frames in the window of each frame are counted with
+           cumulative sums, the windows are truncated at the utterance boundaries.
+
+           Args:
+             vad: Concatenated binary VAD of all the utterances.
+             offsets: Frame where each utterance starts, with the total
+                      number of frames appended at the end.
+
+           Returns:
+             Concatenated smoothed binary VAD.
+        """
+        context = self.vad_frames_context
+        if context == 0:
+            return vad
+
+        num_frames = np.diff(offsets)
+        utt_idx = np.repeat(np.arange(len(num_frames)), num_frames)
+        first = offsets[:-1][utt_idx]
+        last = offsets[1:][utt_idx] - 1
+        # short utterances use a smaller window that fits in the utterance
+        context = np.minimum(context, (num_frames - 1)//2)[utt_idx]
+
+        idx = np.arange(len(vad))
+        win_first = np.maximum(idx - context, first)
+        win_last = np.minimum(idx + context, last)
+        cum_vad = np.zeros((len(vad)+1,), dtype=np.int64)
+        np.cumsum(vad, out=cum_vad[1:])
+        num_count = (cum_vad[win_last+1] - cum_vad[win_first]).astype('float32')
+        den_count = (win_last - win_first + 1).astype('float32')
+        return num_count/den_count > self.vad_proportion_threshold
+
+
+
+    def _logE_to_vad(self, logE, offsets):
+        """Computes the VAD of a batch of utterances from their
+           concatenated log-energies.
+        """
+        num_frames = np.diff(offsets)
+        e_mean = np.zeros((len(num_frames),), dtype=float_cpu())
+        nz = num_frames > 0
+        if np.any(nz):
+            e_mean[nz] = np.add.reduceat(logE, offsets[:-1][nz])/num_frames[nz]
+        e_thr = self.vad_energy_threshold + self.vad_energy_mean_scale * e_mean
+        vad = logE > np.repeat(e_thr, num_frames)
+        return self._smooth_vad(vad, offsets)
+
+
+
     def compute(self, x, return_loge=False):
         """ Evaluates the VAD.
 
@@ -75,22 +144,7 @@ class EnergyVAD(object):
 
         if x.ndim==1:
             # Input is wave
-            if self.snip_edges:
-                num_frames = int(np.floor((len(x) - self._length + self._shift)/self._shift))
-            else:
-                num_frames = int(np.round(len(x)/self._shift))
-                len_x = (num_frames-1)*self._shift + self._length
-                dlen_x = len_x - len(x)
-                dlen1_x = int(np.floor((self._length-self._shift)/2))
-                dlen2_x = int(dlen_x - dlen1_x)
-                x = np.pad(x, (dlen1_x, dlen2_x), mode='reflect')
-
-            # add dither
-            if self.dither > 0:
-                n = self.dither*np.random.RandomState(
-                    seed=len(x)).randn(len(x)).astype(float_cpu(), copy=False)
-                x = x + n
-                
+            x = self._pad_dither(x)
             x, self._dc_zi = lfilter(self._dc_b, self._dc_a, x, zi=self._dc_zi)
 
             # Compute raw energy
@@ -101,34 +155,52 @@ class EnergyVAD(object):
         else:
             raise Exception('Wrong input dimension ndim=%d' % x.ndim)
             
+        vad = self._logE_to_vad(logE, np.array([0, len(logE)]))
+        if return_loge:
+            return vad, logE
+        return vad
 
-        # compute VAD from logE
-        #print(np.mean(logE))
-        e_thr = self.vad_energy_threshold + self.vad_energy_mean_scale * np.mean(logE)
-        #print(e_thr)
-        #print(logE)
-        vad = (logE > e_thr)
 
-        context = self.vad_frames_context
-        if context == 0:
-            return vad
- 
-        window = 2 * context + 1
-        if len(vad) < window:
-            context = int(len(vad)-1/2)
-            window = 2 * context + 1
 
-        if window == 1:
-            return vad
+    def compute_batch(self, x, return_loge=False):
+        """ Evaluates the VAD of a batch of utterances.
+            It gives the same result as calling compute and reset
+            for each utterance. The DC filter runs on all the waves
+            at once and the VAD is computed and smoothed on the
+            concatenated log-energies.
 
-        h = np.ones((window,), dtype='float32')
-        num_count = np.convolve(vad.astype('float32'), h, 'same')
-        den_count_boundary = np.arange(context+1, window, dtype='float32')
-        num_count[:context] /= den_count_boundary
-        num_count[-context:] /= den_count_boundary[::-1]
-        num_count[context:-context] /= window
-        
-        vad = num_count > self.vad_proportion_threshold
+            Args:
+              x:               List of waves or list of feature
+                               matrices with log-e in the first coeff.
+              return_loge:     If true, it also returns the log-energy.
+
+            Returns:
+              List of binary VADs.
+        """
+        if len(x) == 0:
+            return ([], []) if return_loge else []
+
+        if x[0].ndim == 1:
+            x = [self._pad_dither(x_i) for x_i in x]
+            lengths = [len(x_i) for x_i in x]
+            # waves padded at the end, the filter is causal so
+            # the padding doesn't change the output of each wave
+            xx = np.zeros((len(x), max(lengths)), dtype=float_cpu())
+            for i, x_i in enumerate(x):
+                xx[i,:lengths[i]] = x_i
+            xx = lfilter(self._dc_b, self._dc_a, xx, axis=-1)
+            logE = st_logE_batch([xx[i,:l] for i, l in enumerate(lengths)],
+                                 self._length, self._shift)
+        else:
+            logE = [x_i[:,0] for x_i in x]
+
+        offsets = np.zeros((len(logE)+1,), dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in logE])
+        logE = np.concatenate(logE)
+        vad = self._logE_to_vad(logE, offsets)
+        vad = np.split(vad, offsets[1:-1])
+        if return_loge:
+            return vad, np.split(logE, offsets[1:-1])
         return vad
     
 
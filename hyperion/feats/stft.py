@@ -5,27 +5,105 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
-from six.moves import xrange
 
 import logging
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 
 from ..hyp_defs import float_cpu
 
+
+def get_num_frames(num_samples, frame_length, frame_shift):
+    """Returns the number of complete frames in a signal."""
+    num_frames = int(np.floor((num_samples - frame_length + frame_shift)/frame_shift))
+    return max(num_frames, 0)
+
+
+
+def frame_signal(x, frame_length, frame_shift):
+    """Splits a signal into overlapping frames without copying it.
+
+       Args:
+         x: wave signal.
+         frame_length: frame length in samples.
+         frame_shift: frame shift in samples.
+
+       Returns:
+         Read-only strided view of x with shape (num_frames, frame_length).
+    """
+    x = np.ascontiguousarray(x)
+    num_frames = get_num_frames(len(x), frame_length, frame_shift)
+    return as_strided(x, shape=(num_frames, frame_length),
+                      strides=(frame_shift*x.strides[0], x.strides[0]),
+                      writeable=False)
+
+
+
+def _frame_batch(x, frame_length, frame_shift, window):
+    """Frames and windows a list of signals.
+
+       Returns:
+         Matrix with the frames of all the signals.
+         Frame index where each signal starts, with the total number of frames
+         appended at the end.
+    """
+    frames = [frame_signal(x_i, frame_length, frame_shift) for x_i in x]
+    offsets = np.cumsum([0] + [f.shape[0] for f in frames])
+    frames = np.concatenate(frames, axis=0)
+    if window is not None:
+        frames = frames * window
+    return frames, offsets
+
+
+
+def _overlap_add(xx, frame_length, frame_shift, window, dtype):
+    """Overlap-adds frames.
+
+       The frames are added in the same order as adding them one by one,
+       i.e., each sample adds the contributions of its frames from the first
+       to the last one. To do that, the output is divided into blocks of
+       frame_shift samples and, in each pass, one segment of frame_shift
+       samples of every frame is added to a non-overlapping block.
+
+       Args:
+         xx: frames (num_frames, >=frame_length).
+         frame_length: frame length in samples.
+         frame_shift: frame shift in samples.
+         window: synthesis window.
+         dtype: dtype of the output signal.
+
+       Returns:
+         Overlap-added signal.
+         Overlap-added window.
+    """
+    num_frames = xx.shape[0]
+    num_samples = (num_frames - 1)*frame_shift + frame_length
+    num_segs = int(np.ceil(frame_length/frame_shift))
+    num_blocks = num_frames - 1 + num_segs
+    x_overlap = np.zeros((num_blocks, frame_shift), dtype=dtype)
+    w_overlap = np.zeros((num_blocks, frame_shift), dtype=float_cpu())
+    for q in range(num_segs-1, -1, -1):
+        first = q*frame_shift
+        last = min(first + frame_shift, frame_length)
+        w = last - first
+        x_overlap[q:q+num_frames, :w] += xx[:, first:last]
+        w_overlap[q:q+num_frames, :w] += window[first:last]
+
+    x_overlap = x_overlap.ravel()[:num_samples]
+    w_overlap = w_overlap.ravel()[:num_samples]
+    return x_overlap, w_overlap
+
+
+
 def stft(x, frame_length, frame_shift, fft_length, window=None):
 
     if window is None:
         window = 1
-        
-    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
-    X = np.zeros((num_frames, fft_length), dtype='complex64')
-    j = 0
-    for i in xrange(num_frames):
-        X[i,:] = np.fft.fft(x[j:j+frame_length]*window, n=fft_length)
-        j += frame_shift
-            
-    return X
+
+    frames = frame_signal(x, frame_length, frame_shift) * window
+    return np.fft.fft(frames, n=fft_length, axis=-1).astype('complex64', copy=False)
+
 
 
 def istft(X, frame_length, frame_shift, window=None):
@@ -33,16 +111,9 @@ def istft(X, frame_length, frame_shift, window=None):
     if window is None:
         window = np.ones((frame_length,), dtype=float_cpu())
 
-    num_samples = (X.shape[0] - 1)*frame_shift + frame_length
-    x_overlap = np.zeros((num_samples,), dtype='complex64')
-    w_overlap = np.zeros((num_samples,), dtype=float_cpu())
-
     xx = np.fft.ifft(X, axis=-1)[:,:frame_length]
-    j = 0
-    for i in xrange(X.shape[0]):
-        x_overlap[j:j+frame_length] += xx[i]
-        w_overlap[j:j+frame_length] += window
-        j += frame_shift
+    x_overlap, w_overlap = _overlap_add(
+        xx, frame_length, frame_shift, window, 'complex64')
 
     w_overlap[w_overlap==0] = 1
     iw = 1/w_overlap
@@ -57,15 +128,30 @@ def strft(x, frame_length, frame_shift, fft_length, window=None):
 
     if window is None:
         window = 1
-        
-    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
-    X = np.zeros((num_frames, int(fft_length/2+1)), dtype='complex64')
-    j = 0
-    for i in xrange(num_frames):
-        X[i,:] = np.fft.rfft(x[j:j+frame_length]*window, n=fft_length)
-        j += frame_shift
-            
-    return X
+
+    frames = frame_signal(x, frame_length, frame_shift) * window
+    return np.fft.rfft(frames, n=fft_length, axis=-1).astype('complex64', copy=False)
+
+
+
+def strft_batch(x, frame_length, frame_shift, fft_length, window=None):
+    """Computes the short-time real FFT of a list of signals
+       with a single FFT call.
+
+       Args:
+         x: list of wave signals.
+         frame_length: frame length in samples.
+         frame_shift: frame shift in samples.
+         fft_length: FFT length.
+         window: analysis window.
+
+       Returns:
+         List of short-time FFT matrices, the same as calling strft
+         for each signal.
+    """
+    frames, offsets = _frame_batch(x, frame_length, frame_shift, window)
+    X = np.fft.rfft(frames, n=fft_length, axis=-1).astype('complex64', copy=False)
+    return np.split(X, offsets[1:-1], axis=0)
 
 
 
@@ -74,16 +160,9 @@ def istrft(X, frame_length, frame_shift, window=None):
     if window is None:
         window = np.ones((frame_length,), dtype=float_cpu())
 
-    num_samples = (X.shape[0] - 1)*frame_shift + frame_length
-    x_overlap = np.zeros((num_samples,), dtype=float_cpu())
-    w_overlap = np.zeros((num_samples,), dtype=float_cpu())
-
     xx = np.fft.irfft(X, axis=-1)[:,:frame_length]
-    j = 0
-    for i in xrange(X.shape[0]):
-        x_overlap[j:j+frame_length] += xx[i]
-        w_overlap[j:j+frame_length] += window
-        j += frame_shift
+    x_overlap, w_overlap = _overlap_add(
+        xx, frame_length, frame_shift, window, float_cpu())
 
     w_overlap[w_overlap==0] = 1
     iw = 1/w_overlap
@@ -102,14 +181,24 @@ def st_logE(x, frame_length, frame_shift):
        Returns:
          Log-energy
      """
-        
-    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
-        
     x2 = x**2
-    e = np.zeros((num_frames,), dtype=float_cpu())
-    j = 0
-    for i in xrange(num_frames):
-        e[i] = np.sum(x2[j:j+frame_length])
-        j += frame_shift
-            
-    return np.log(e+1e-15)
+    e = np.sum(frame_signal(x2, frame_length, frame_shift), axis=-1)
+    return np.log(e.astype(float_cpu(), copy=False)+1e-15)
+
+
+
+def st_logE_batch(x, frame_length, frame_shift):
+    """Computes log-energy of a list of signals.
+
+       Args:
+         x: list of wave signals
+
+       Returns:
+         List of log-energy vectors, the same as calling st_logE
+         for each signal.
+     """
+    x2 = [x_i**2 for x_i in x]
+    frames, offsets = _frame_batch(x2, frame_length, frame_shift, None)
+    e = np.sum(frames, axis=-1)
+    logE = np.log(e.astype(float_cpu(), copy=False)+1e-15)
+    return np.split(logE, offsets[1:-1])
@@ -13,6 +13,8 @@ from .copy_feats import CopyFeats
 
 from .bin_vad_reader import BinVADReader
 from .segment_vad_reader import SegmentVADReader
+from .packed_bin_vad_reader import PackedBinVADReader
+from .packed_bin_vad_writer import PackedBinVADWriter
 from .vad_rw_factory import VADReaderFactory
 
 from .audio_reader import *
@@ -25,6 +27,7 @@ from .hyp_data_reader import *
 from .hyp_data_writer import *
 from .h5_merger import *
 from .kaldi_data_reader import *
+from .script_index import ScriptIndex
 
 
 
@@ -8,6 +8,7 @@
 #from six import string_types
 
 import sys
+import struct
 import numpy as np
 # import h5py
 #import threading
@@ -18,6 +19,8 @@ from ..utils.scp_list import SCPList
 from ..utils.kaldi_matrix import KaldiMatrix, KaldiCompressedMatrix
 from ..utils.kaldi_io_funcs import is_token, read_token, peek, init_kaldi_input_stream
 from .data_reader import SequentialDataReader, RandomAccessDataReader
+from .rw_specifiers import ArchiveType
+from .script_index import ScriptIndex
 
 
 class SequentialArkDataReader(SequentialDataReader):
@@ -292,19 +295,29 @@ class SequentialArkScriptDataReader(SequentialArkDataReader):
                      part part_idx, where part_idx=1,...,num_parts.
            num_parts: Number of parts to split the input data.
            split_by_key: If True, all the elements with the same key go to the same part.
+           use_index: If True, it loads the shapes of the matrices from an index 
+                      file next to the scp file, the index is created if it doesn't exist
+                      or it is outdated.
     """
     
-    def __init__(self, file_path, path_prefix=None, scp_sep=' ', **kwargs):
+    def __init__(self, file_path, path_prefix=None, scp_sep=' ',
+                 use_index=False, **kwargs):
         super(SequentialArkScriptDataReader, self).__init__(
             file_path, permissive=False, **kwargs)
         self.scp = SCPList.load(self.file_path, sep=scp_sep)
 
+        if path_prefix is not None:
+            self.scp.add_prefix_to_filepath(path_prefix)
+
+        self.index = None
+        if use_index:
+            self.index = ScriptIndex.load_or_create(
+                self.file_path, self.scp, ArchiveType.ARK,
+                self.part_idx, self.num_parts, self.split_by_key)
+
         if self.num_parts > 1:
             self.scp = self.scp.split(self.part_idx, self.num_parts,
                                       group_by_key=self.split_by_key)
-        
-        if path_prefix is not None:
-            self.scp.add_prefix_to_filepath(path_prefix)
             
         self.cur_item = 0
         
@@ -353,10 +366,13 @@ class SequentialArkScriptDataReader(SequentialArkDataReader):
 
             row_offset_i, num_rows_i = self._combine_ranges(range_spec, 0, 0)
 
-            self._open_archive(file_path, offset)
-            binary = init_kaldi_input_stream(self.f)
-            shape_i = KaldiMatrix.read_shape(
-                self.f, binary, sequential_mode=True)
+            if self.index is not None:
+                shape_i = self.index.get_shape(self.cur_item)
+            else:
+                self._open_archive(file_path, offset)
+                binary = init_kaldi_input_stream(self.f)
+                shape_i = KaldiMatrix.read_shape(
+                    self.f, binary, sequential_mode=True)
 
             shape_i = self._apply_range_to_shape(
                 shape_i, row_offset_i, num_rows_i)
@@ -453,10 +469,18 @@ class RandomAccessArkDataReader(RandomAccessDataReader):
            permissive: If True, if the data that we want to read is not in the file 
                        it returns an empty matrix, if False it raises an exception.
            scp_sep: Separator for scp files (default ' ').
+           use_mmap: If True, the Ark files are memory mapped and uncompressed 
+                     binary matrices are returned as read-only views of the mapped 
+                     file without locking. Compressed and text matrices are 
+                     read as usual.
+           use_index: If True, it loads the shapes and locations of the matrices 
+                      from an index file next to the scp file, the index is created 
+                      if it doesn't exist or it is outdated.
     """
         
     def __init__(self, file_path, path_prefix=None,
-                 transform=None, permissive=False, scp_sep=' '):
+                 transform=None, permissive=False, scp_sep=' ',
+                 use_mmap=False, use_index=False):
         super(RandomAccessArkDataReader, self).__init__(
             file_path, transform, permissive)
         
@@ -464,12 +488,18 @@ class RandomAccessArkDataReader(RandomAccessDataReader):
         if path_prefix is not None:
             self.scp.add_prefix_to_filepath(path_prefix)
 
-        archives, archive_idx = np.unique(
-            self.scp.file_path, return_inverse=True)
+        archives, archive_idx = self.scp.get_unique_file_paths()
         self.archives = archives
         self.archive_idx = archive_idx
         self.f = [None] * len(self.archives)
         self.locks = [ threading.Lock() for i in range(len(self.archives)) ]
+        self.use_mmap = use_mmap
+        self._mmaps = [None] * len(self.archives)
+        self._mmap_info = {}
+        self.index = None
+        if use_index:
+            self.index = ScriptIndex.load_or_create(
+                self.file_path, self.scp, ArchiveType.ARK)
 
 
     @property
@@ -483,6 +513,125 @@ class RandomAccessArkDataReader(RandomAccessDataReader):
             if f is not None:
                 f.close()
         self.f = [None] * len(self.f)
+        # mapped files are released when the arrays pointing to them are deleted
+        self._mmaps = [None] * len(self._mmaps)
+        self._mmap_info = {}
+
+
+
+    def _open_mmap(self, archive_idx):
+        """Memory maps the Ark file if it is not already mapped.
+
+        Args:
+          archive_idx: Integer index of the Ark file.
+
+        Returns:
+          uint8 numpy memmap with the content of the file.
+        """
+        mm = self._mmaps[archive_idx]
+        if mm is None:
+            mm = np.memmap(self.archives[archive_idx], dtype=np.uint8, mode='r')
+            self._mmaps[archive_idx] = mm
+        return mm
+
+
+
+    @staticmethod
+    def _read_mmap_int32(mm, pos):
+        """Reads binary Kaldi Int32 from memory mapped file."""
+        size = int(mm[pos])
+        assert size == 4, 'Wrong size %d' % size
+        return struct.unpack('<i', mm[pos+1:pos+5].tobytes())[0]
+
+
+    
+    def _get_mmap_info(self, key_idx, offset):
+        """Parses the header of a feature matrix/vector in the memory
+           mapped Ark file. The header is parsed only the first 
+           time that the matrix is accessed.
+
+        Args:
+          key_idx: Integer position of the feature matrix in the scp file.
+          offset: Byte where we can find the feature matrix in the Ark file.
+
+        Returns:
+          Tuple with archive index, byte where the matrix data starts, 
+          dtype and shape or None if the matrix is compressed or in text format.
+        """
+        if key_idx in self._mmap_info:
+            return self._mmap_info[key_idx]
+
+        archive_idx = self.archive_idx[key_idx]
+        if self.index is not None:
+            info = None
+            if (self.index.compression[key_idx] == 0 and
+                self.index.offset[key_idx] >= 0):
+                info = (archive_idx, self.index.offset[key_idx],
+                        np.dtype(self.index.dtype[key_idx].decode()),
+                        self.index.get_shape(key_idx))
+            self._mmap_info[key_idx] = info
+            return info
+
+        mm = self._open_mmap(archive_idx)
+        pos = offset
+        info = None
+        token = mm[pos+2:pos+5].tobytes()
+        if (mm[pos:pos+2].tobytes() == b'\0B' and
+            token in (b'FM ', b'FV ', b'DM ', b'DV ')):
+            dtype = np.float32 if token[0:1] == b'F' else np.float64
+            pos += 5
+            if token[1:2] == b'M':
+                num_rows = self._read_mmap_int32(mm, pos)
+                pos += 5
+                num_cols = self._read_mmap_int32(mm, pos)
+                pos += 5
+                shape = (num_rows, num_cols)
+            else:
+                num_cols = self._read_mmap_int32(mm, pos)
+                pos += 5
+                shape = (num_cols,)
+            info = (archive_idx, pos, dtype, shape)
+
+        self._mmap_info[key_idx] = info
+        return info
+
+
+
+    def _read_mmap(self, key_idx, offset, row_offset=0, num_rows=0):
+        """Reads feature matrix/vector as a view of the memory mapped Ark file.
+
+        Args:
+          key_idx: Integer position of the feature matrix in the scp file.
+          offset: Byte where we can find the feature matrix in the Ark file.
+          row_offset: First row to read.
+          num_rows: Num. of rows to read, if 0 if read all the rows.
+
+        Returns:
+          Read-only numpy array or None if the matrix cannot be 
+          memory mapped.
+        """
+        info = self._get_mmap_info(key_idx, offset)
+        if info is None:
+            return None
+
+        archive_idx, pos, dtype, shape = info
+        if len(shape) == 2:
+            total_rows, num_cols = shape
+            assert row_offset <= total_rows, (
+                'row_offset (%d) > num_rows (%d)' %
+                (row_offset, total_rows))
+            total_rows -= row_offset
+            if num_rows == 0:
+                num_rows = total_rows
+            else:
+                assert num_rows <= total_rows, (
+                    'requested rows (%d) > available rows (%d)' %
+                    (num_rows, total_rows))
+            pos += row_offset*num_cols*np.dtype(dtype).itemsize
+            shape = (num_rows, num_cols)
+
+        return np.ndarray(shape, dtype=dtype,
+                          buffer=self._open_mmap(archive_idx), offset=pos)
 
 
 
@@ -582,13 +731,22 @@ class RandomAccessArkDataReader(RandomAccessDataReader):
 
             row_offset_i, num_rows_i = self._combine_ranges(
                 range_spec, 0, 0)
-            
-            f, lock = self._open_archive(index)
-            with lock:
-                f.seek(offset, 0)
-                binary = init_kaldi_input_stream(f)
-                shape_i = KaldiMatrix.read_shape(
-                    f, binary, sequential_mode=False)
+
+            info = None
+            if self.use_mmap:
+                info = self._get_mmap_info(index, offset)
+
+            if self.index is not None:
+                shape_i = self.index.get_shape(index)
+            elif info is not None:
+                shape_i = info[3]
+            else:
+                f, lock = self._open_archive(index)
+                with lock:
+                    f.seek(offset, 0)
+                    binary = init_kaldi_input_stream(f)
+                    shape_i = KaldiMatrix.read_shape(
+                        f, binary, sequential_mode=False)
 
             shape_i = self._apply_range_to_shape(
                 shape_i, row_offset_i, num_rows_i)
@@ -650,14 +808,20 @@ class RandomAccessArkDataReader(RandomAccessDataReader):
             num_rows_i = num_rows[i] if num_rows_is_list else num_rows
             row_offset_i, num_rows_i = self._combine_ranges(
                 range_spec, row_offset_i, num_rows_i)
-            
-            f, lock = self._open_archive(index)
-            with lock:
-                f.seek(offset, 0)
-                binary = init_kaldi_input_stream(f)
-                data_i = KaldiMatrix.read(
-                    f, binary, row_offset_i, num_rows_i,
-                    sequential_mode=False).to_ndarray()
+
+            data_i = None
+            if self.use_mmap:
+                data_i = self._read_mmap(
+                    index, offset, row_offset_i, num_rows_i)
+
+            if data_i is None:
+                f, lock = self._open_archive(index)
+                with lock:
+                    f.seek(offset, 0)
+                    binary = init_kaldi_input_stream(f)
+                    data_i = KaldiMatrix.read(
+                        f, binary, row_offset_i, num_rows_i,
+                        sequential_mode=False).to_ndarray()
 
             assert num_rows_i == 0 or data_i.shape[0] == num_rows_i
 
@@ -85,7 +85,7 @@ class DataWriterFactory(object):
 class SequentialDataReaderFactory(object):
 
     @staticmethod
-    def create(rspecifier, path_prefix=None, scp_sep=' ', **kwargs):
+    def create(rspecifier, path_prefix=None, scp_sep=' ', use_index=False, **kwargs):
         
         if isinstance(rspecifier, str):
             rspecifier = RSpecifier.create(rspecifier)
@@ -98,10 +98,10 @@ class SequentialDataReaderFactory(object):
         else:
             if rspecifier.archive_type == ArchiveType.H5:
                 return SH5SDR(rspecifier.script, path_prefix,
-                              scp_sep=scp_sep, **kwargs)
+                              scp_sep=scp_sep, use_index=use_index, **kwargs)
             else:
                 return SASDR(rspecifier.script, path_prefix,
-                             scp_sep=scp_sep, **kwargs)
+                             scp_sep=scp_sep, use_index=use_index, **kwargs)
 
 
 
@@ -111,7 +111,7 @@ class SequentialDataReaderFactory(object):
             p = ''
         else:
             p = prefix + '_'
-        valid_args = ('scp_sep', 'path_prefix', 'part_idx', 'num_parts')
+        valid_args = ('scp_sep', 'path_prefix', 'part_idx', 'num_parts', 'use_index')
         return dict((k, kwargs[p+k])
                     for k in valid_args if p+k in kwargs)
 
@@ -130,6 +130,9 @@ class SequentialDataReaderFactory(object):
                             help=('scp file field separator'))
         parser.add_argument(p1+'path-prefix', dest=(p2+'path_prefix'), default=None,
                             help=('scp file_path prefix'))
+        parser.add_argument(p1+'use-index', dest=(p2+'use_index'), default=False,
+                            action='store_true',
+                            help=('reads shapes from index file next to the scp file'))
         try:
             parser.add_argument(p1+'part-idx', dest=(p2+'part_idx'), type=int, default=1,
                                 help=('splits the list of files in num-parts and process part_idx'))
@@ -143,7 +146,8 @@ class SequentialDataReaderFactory(object):
 class RandomAccessDataReaderFactory(object):
 
     @staticmethod
-    def create(rspecifier, path_prefix=None, transform=None, scp_sep=' '):
+    def create(rspecifier, path_prefix=None, transform=None, scp_sep=' ',
+               use_mmap=False, use_index=False):
         if isinstance(rspecifier, str):
             rspecifier = RSpecifier.create(rspecifier)
         logging.debug(rspecifier.__dict__)
@@ -161,12 +165,13 @@ class RandomAccessDataReaderFactory(object):
                 return RH5SDR(rspecifier.archive, path_prefix,
                               transform=transform,
                               permissive=rspecifier.permissive,
-                              scp_sep=scp_sep)
+                              scp_sep=scp_sep, use_index=use_index)
             else:
                 return RADR(rspecifier.script, path_prefix,
                             transform=transform,
                             permissive=rspecifier.permissive,
-                            scp_sep=scp_sep)
+                            scp_sep=scp_sep, use_mmap=use_mmap,
+                            use_index=use_index)
 
 
     @staticmethod
@@ -175,7 +180,7 @@ class RandomAccessDataReaderFactory(object):
             p = ''
         else:
             p = prefix + '_'
-        valid_args = ('scp_sep', 'path_prefix')
+        valid_args = ('scp_sep', 'path_prefix', 'use_mmap', 'use_index')
         return dict((k, kwargs[p+k])
                     for k in valid_args if p+k in kwargs)
 
@@ -194,5 +199,11 @@ class RandomAccessDataReaderFactory(object):
                             help=('scp file field separator'))
         parser.add_argument(p1+'path-prefix', dest=(p2+'path_prefix'), default=None,
                             help=('scp file_path prefix'))
+        parser.add_argument(p1+'use-mmap', dest=(p2+'use_mmap'), default=False,
+                            action='store_true',
+                            help=('memory maps Ark files for random access'))
+        parser.add_argument(p1+'use-index', dest=(p2+'use_index'), default=False,
+                            action='store_true',
+                            help=('reads shapes from index file next to the scp file'))
 
 
@@ -12,6 +12,7 @@ import time
 import numpy as np
 import h5py
 import threading
+from multiprocessing.pool import ThreadPool
 
 from ..hyp_defs import float_cpu
 from ..utils.list_utils import split_list, split_list_group_by_key
@@ -19,6 +20,8 @@ from ..utils.scp_list import SCPList
 from ..utils.kaldi_matrix import KaldiMatrix, KaldiCompressedMatrix
 from ..utils.kaldi_io_funcs import is_token
 from .data_reader import SequentialDataReader, RandomAccessDataReader
+from .rw_specifiers import ArchiveType
+from .script_index import ScriptIndex
 
 
 
@@ -59,10 +62,24 @@ def _read_h5_data(dset, row_offset=0, num_rows=0, transform=None):
     if transform is not None:
         data = transform.predict(data)
     return data
-    
 
 
 
+def _get_h5_dset_offset(dset):
+    """Auxiliary function to get the byte position of a hdf5 dataset in the file.
+
+    Args:
+      dset: hdf5 dataset.
+
+    Returns:
+      Byte offset of the dataset or -1 if the dataset is chunked or compact,
+      i.e., it is not stored in a single block of the file.
+    """
+    offset = dset.id.get_offset()
+    return -1 if offset is None else offset
+    
+
+
 
 class SequentialH5DataReader(SequentialDataReader):
     """Abstract base class to read hdf5 feature files in
@@ -300,18 +317,29 @@ class SequentialH5ScriptDataReader(SequentialH5DataReader):
                      part part_idx, where part_idx=1,...,num_parts.
            num_parts: Number of parts to split the input data.
            split_by_key: If True, all the elements with the same key go to the same part.
+           use_index: If True, it loads the shapes of the matrices from an index 
+                      file next to the scp file, the index is created if it doesn't exist
+                      or it is outdated.
     """
 
-    def __init__(self, file_path, path_prefix=None, scp_sep=' ', **kwargs):
+    def __init__(self, file_path, path_prefix=None, scp_sep=' ',
+                 use_index=False, **kwargs):
         super().__init__(
             file_path, permissive=False,  **kwargs)
                       
         self.scp = SCPList.load(self.file_path, sep=scp_sep)
+        if path_prefix is not None:
+            self.scp.add_prefix_to_filepath(path_prefix)
+
+        self.index = None
+        if use_index:
+            self.index = ScriptIndex.load_or_create(
+                self.file_path, self.scp, ArchiveType.H5,
+                self.part_idx, self.num_parts, self.split_by_key)
+
         if self.num_parts > 1:
             self.scp = self.scp.split(self.part_idx, self.num_parts,
                                       group_by_key=self.split_by_key)
-        if path_prefix is not None:
-            self.scp.add_prefix_to_filepath(path_prefix)
             
 
     @property
@@ -359,9 +387,13 @@ class SequentialH5ScriptDataReader(SequentialH5DataReader):
 
             row_offset_i, num_rows_i = self._combine_ranges(range_spec, 0, 0)
 
-            self._open_archive(file_path)
-
-            shape_i = self.f[key].shape
+            if self.index is not None:
+                shape_i = self.index.get_shape(self.cur_item)
+                if shape_i is None:
+                    raise Exception('Key %s not found' % key)
+            else:
+                self._open_archive(file_path)
+                shape_i = self.f[key].shape
             shape_i = self._apply_range_to_shape(
                 shape_i, row_offset_i, num_rows_i)
                     
@@ -640,9 +672,13 @@ class RandomAccessH5ScriptDataReader(RandomAccessH5DataReader):
            permissive: If True, if the data that we want to read is not in the file 
                        it returns an empty matrix, if False it raises an exception.
            scp_sep: Separator for scp files (default ' ').
+           use_index: If True, it loads the shapes of the matrices from an index 
+                      file next to the scp file, the index is created if it doesn't exist
+                      or it is outdated.
     """
     
-    def __init__(self, file_path, path_prefix=None, scp_sep=' ', **kwargs):
+    def __init__(self, file_path, path_prefix=None, scp_sep=' ',
+                 use_index=False, **kwargs):
         super().__init__(
             file_path, **kwargs)
         
@@ -650,8 +686,12 @@ class RandomAccessH5ScriptDataReader(RandomAccessH5DataReader):
         if path_prefix is not None:
             self.scp.add_prefix_to_filepath(path_prefix)
 
-        archives, archive_idx = np.unique(
-            self.scp.file_path, return_inverse=True)
+        self.index = None
+        if use_index:
+            self.index = ScriptIndex.load_or_create(
+                self.file_path, self.scp, ArchiveType.H5)
+
+        archives, archive_idx = self.scp.get_unique_file_paths()
         self.archives = archives
         self.archive_idx = archive_idx
         self.f = [None] * len(self.archives)
@@ -722,16 +762,20 @@ class RandomAccessH5ScriptDataReader(RandomAccessH5DataReader):
             row_offset_i, num_rows_i = self._combine_ranges(
                 range_spec, 0, 0)
 
-            f, lock = self._open_archive(index)
-            if not (key in f):
+            if self.index is not None:
+                shape_i = self.index.get_shape(index)
+            else:
+                f, lock = self._open_archive(index)
+                with lock:
+                    shape_i = f[key].shape if key in f else None
+
+            if shape_i is None:
                 if self.permissive:
                     shapes.append((0,))
                     continue
                 else:
                     raise Exception('Key %s not found' % key)
 
-            with lock:
-                shape_i = f[key].shape
             shape_i = self._apply_range_to_shape(
                 shape_i, row_offset_i, num_rows_i)
             #print('%s %d %.2f' % (key,time.time()-t1, len(shapes)/len(keys)*100.))
@@ -745,8 +789,72 @@ class RandomAccessH5ScriptDataReader(RandomAccessH5DataReader):
 
     
 
-    def read(self, keys, squeeze=False, row_offset=0, num_rows=0):
+    def _get_archive_dsets(self, keys, index, key_pos):
+        """Gets the hdf5 datasets of recordings stored in the same hdf5 file
+           and sorts them by their position in the file.
+
+        Args:
+          keys: List of recording names.
+          index: Numpy array with the positions of the keys in the scp file.
+          key_pos: Positions in keys of the recordings stored in the same file.
+
+        Returns:
+          List of tuples (position in keys, hdf5 dataset) sorted by 
+          the dataset offset in the file. 
+        """
+        f, lock = self._open_archive(index[key_pos[0]])
+        dsets = []
+        with lock:
+            for i in key_pos:
+                key = keys[i]
+                if not (key in f):
+                    if self.permissive:
+                        continue
+                    else:
+                        raise Exception('Key %s not found' % key)
+
+                dset_i = f[key]
+                dsets.append((_get_h5_dset_offset(dset_i), i, dset_i))
+
+        dsets.sort(key=lambda x: x[:2])
+        return [(i, dset_i) for _, i, dset_i in dsets]
+
+
+    
+    def _read_archive_dsets(self, archive_idx, dsets, row_offset, num_rows, data, out):
+        """Reads the hdf5 datasets of recordings stored in the same hdf5 file.
+
+        Args:
+          archive_idx: Index of the hdf5 file.
+          dsets: List of tuples (position in keys, hdf5 dataset).
+          row_offset: Numpy array with the first row to read from each feature matrix.
+          num_rows: Numpy array with the number of rows to read from each feature matrix.
+          data: List where the feature matrices are returned when out is None.
+          out: Preallocated numpy array where the feature matrices are written or None.
+        """
+        with self.locks[archive_idx]:
+            for i, dset_i in dsets:
+                if (out is not None and self.transform is None and
+                    not ('data_format' in dset_i.attrs)):
+                    # hdf5 converts the data type while reading into the output array
+                    first_row = row_offset[i]
+                    last_row = None if num_rows[i] == 0 else first_row + num_rows[i]
+                    dset_i.read_direct(out[i], source_sel=np.s_[first_row:last_row])
+                    continue
+
+                data_i = _read_h5_data(dset_i, row_offset[i], num_rows[i], self.transform)
+                if out is None:
+                    data[i] = data_i
+                else:
+                    out[i] = data_i
+
+
+
+    def read(self, keys, squeeze=False, row_offset=0, num_rows=0, num_threads=1):
         """Reads the feature matrices/vectors for the recordings in keys.
+
+        The recordings are grouped by hdf5 file and read in the order 
+        they are stored in the file. 
         
         Args:
           keys: List of recording names from which we want to retrieve the 
@@ -759,6 +867,7 @@ class RandomAccessH5ScriptDataReader(RandomAccessH5DataReader):
           num_rows: List of integers or numpy array of with the 
                     number of rows to read from each feature matrix.
                     If 0 it reads all the rows.
+          num_threads: Number of threads reading different hdf5 files in parallel.
 
         Returns:
           data: List of feature matrices/vectors or 3D/2D numpy array.
@@ -775,40 +884,87 @@ class RandomAccessH5ScriptDataReader(RandomAccessH5DataReader):
         if num_rows_is_list:
             assert len(num_rows) == len(keys)
 
-        data = []
+        num_keys = len(keys)
+        index = np.zeros((num_keys,), dtype=np.int64)
+        archive_idx = np.full((num_keys,), -1, dtype=np.int64)
+        row_offset_ = np.zeros((num_keys,), dtype=np.int64)
+        num_rows_ = np.zeros((num_keys,), dtype=np.int64)
         for i,key in enumerate(keys):
             
             if not (key in self.scp):
                 if self.permissive:
-                    data.append(np.array([], dtype=float_cpu()))
                     continue
                 else:
                     raise Exception('Key %s not found' % key)
 
-            index = self.scp.get_index(key)
-            _, file_path, offset, range_spec = self.scp[index]
+            index[i] = self.scp.get_index(key)
+            _, file_path, offset, range_spec = self.scp[index[i]]
+            archive_idx[i] = self.archive_idx[index[i]]
 
             row_offset_i = row_offset[i] if row_offset_is_list else row_offset
             num_rows_i = num_rows[i] if num_rows_is_list else num_rows
-            row_offset_i, num_rows_i = self._combine_ranges(
+            row_offset_[i], num_rows_[i] = self._combine_ranges(
                 range_spec, row_offset_i, num_rows_i)
 
-            f, lock = self._open_archive(index)
-            with lock:
-                if not (key in f):
-                    if self.permissive:
-                        data.append(np.array([], dtype=float_cpu()))
-                        continue
-                    else:
-                        raise Exception('Key %s not found' % key)
-
-                dset_i = f[key]
-                data_i = _read_h5_data(dset_i, row_offset_i, num_rows_i, self.transform)
+        # groups the recordings by hdf5 file
+        order = np.argsort(archive_idx, kind='stable')
+        order = order[archive_idx[order] >= 0]
+        group_archives, group_start = np.unique(
+            archive_idx[order], return_index=True)
+        groups = np.split(order, group_start[1:]) if len(order) > 0 else []
+        dsets = [self._get_archive_dsets(keys, index, g) for g in groups]
+
+        out = None
+        if squeeze and self.transform is None:
+            out = self._alloc_squeeze_out(num_keys, dsets, row_offset_, num_rows_)
+
+        data = [np.array([], dtype=float_cpu())] * num_keys
+        args = [(a, d, row_offset_, num_rows_, data, out)
+                for a, d in zip(group_archives, dsets)]
+        if num_threads > 1 and len(args) > 1:
+            with ThreadPool(num_threads) as pool:
+                pool.starmap(self._read_archive_dsets, args)
+        else:
+            for a in args:
+                self._read_archive_dsets(*a)
 
-            data.append(data_i)
+        if out is not None:
+            return out
 
+        for i in range(num_keys):
+            assert num_rows_[i] == 0 or len(data[i]) == 0 or data[i].shape[0] == num_rows_[i]
+            
         if squeeze:
             data = self._squeeze(data, self.permissive)
             
         return data
-            
+
+
+
+    def _alloc_squeeze_out(self, num_keys, dsets, row_offset, num_rows):
+        """Allocates the numpy array returned by read when squeeze=True.
+
+        Args:
+          num_keys: Number of recordings to read.
+          dsets: List of lists of tuples (position in keys, hdf5 dataset).
+          row_offset: Numpy array with the first row to read from each feature matrix.
+          num_rows: Numpy array with the number of rows to read from each feature matrix.
+
+        Returns:
+          Numpy array filled with zeros, recordings not found 
+          in permissive mode remain zero.
+        """
+        shape = None
+        for dsets_a in dsets:
+            for i, dset_i in dsets_a:
+                shape_i = self._apply_range_to_shape(
+                    dset_i.shape, row_offset[i], num_rows[i])
+                if shape is None:
+                    shape = shape_i
+                assert shape == shape_i, (
+                    'cannot squeeze matrices with shapes %s and %s' % (
+                        str(shape), str(shape_i)))
+
+        if shape is None:
+            return None
+        return np.zeros((num_keys,) + shape, dtype=float_cpu())
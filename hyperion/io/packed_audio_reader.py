@@ -410,8 +410,7 @@ class RandomAccessPackedAudioReader(PackedAudioReader):
     def __init__(self, file_path, segments_path=None, wav_scale=2**15-1):
         super().__init__(file_path, segments_path, wav_scale)
 
-        archives, archive_idx = np.unique(
-            self.scp.file_path, return_inverse=True)
+        archives, archive_idx = self.scp.get_unique_file_paths()
         self.archives = archives
         self.archive_idx = archive_idx
         self.f = [None] * len(self.archives)
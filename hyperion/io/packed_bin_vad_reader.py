@@ -0,0 +1,138 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import logging
+
+import numpy as np
+import h5py
+
+from ..utils.vad_utils import bin_vad_to_timestamps
+from .vad_reader import VADReader
+from .data_reader import DataReader
+
+
+class PackedBinVADReader(VADReader):
+    """Class to read binary VADs packed 8 frames per byte
+       written by PackedBinVADWriter.
+
+    Attributes:
+      file_path: h5 file path.
+      permissive: If True, if the VAD that we want to read is not in the file
+                  it returns an empty vector, if False it raises an exception.
+      frame_length: frame-length (ms) used to compute the VAD.
+      frame_shift: frame-shift (ms) used to compute the VAD.
+      snip_edges: snip-edges used to compute the VAD.
+
+      The frame configuration stored in the file by the writer takes
+      precedence over frame_length, frame_shift and snip_edges.
+    """
+    def __init__(self, file_path, permissive=False,
+                 frame_length=25, frame_shift=10, snip_edges=False):
+        super().__init__(file_path, permissive)
+        self.f = h5py.File(file_path, 'r')
+        self.keys = np.asarray(self.f['keys']).astype('U')
+        self.num_frames = np.asarray(self.f['num_frames'], dtype=np.int64)
+        self.byte_offsets = np.asarray(self.f['byte_offsets'], dtype=np.int64)
+        self._key2idx = dict((k, i) for i, k in enumerate(self.keys))
+        self.frame_length = self._get_frame_attr('frame_length', frame_length)
+        self.frame_shift = self._get_frame_attr('frame_shift', frame_shift)
+        self.snip_edges = bool(self._get_frame_attr('snip_edges', snip_edges))
+
+
+    def _get_frame_attr(self, name, value):
+        """Returns the frame config. value stored in the file attributes,
+           or value if the file does not have it."""
+        if name not in self.f.attrs:
+            return value
+        file_value = self.f.attrs[name].item()
+        if file_value != value:
+            logging.warning('%s=%s in %s overrides %s=%s' % (
+                name, file_value, self.file_path, name, value))
+        return file_value
+
+
+    @staticmethod
+    def is_packed_bin_vad(file_path):
+        """Returns True if file_path is a packed binary VAD h5 file."""
+        try:
+            with h5py.File(file_path, 'r') as f:
+                return 'packed_bin_vad' in f.attrs
+        except (IOError, OSError):
+            return False
+
+
+    def close(self):
+        """Closes input file."""
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+    def _get_index(self, keys):
+        index = []
+        for key in keys:
+            if key in self._key2idx:
+                index.append(self._key2idx[key])
+            elif self.permissive:
+                index.append(-1)
+            else:
+                raise Exception('Key %s not found' % key)
+        return index
+
+
+    def _read_vad(self, index):
+        if index < 0:
+            return np.zeros((0,), dtype=bool)
+        packed = self.f['data'][self.byte_offsets[index]:self.byte_offsets[index+1]]
+        return np.unpackbits(packed, count=self.num_frames[index]).astype(bool)
+
+
+    def read_num_frames(self, keys):
+        return np.array([self.num_frames[i] if i >= 0 else 0
+                         for i in self._get_index(keys)], dtype=np.int64)
+
+
+    def read(self, keys, squeeze=False, offset=0, num_frames=0,
+             frame_length=None, frame_shift=None, snip_edges=None,
+             signal_lengths=None):
+
+        if isinstance(keys, str):
+            keys = [keys]
+
+        # the frame config. of the VAD is stored in the file,
+        # only check it when it is given explicitly
+        assert frame_length is None or frame_length == self.frame_length
+        assert frame_shift is None or frame_shift == self.frame_shift
+        assert snip_edges is None or snip_edges == self.snip_edges
+
+        offset_is_list, num_frames_is_list = self._assert_offsets_num_frames(
+            keys, offset, num_frames)
+
+        output_vad = []
+        for i, index in enumerate(self._get_index(keys)):
+            vad_i = self._read_vad(index)
+            offset_i = offset[i] if offset_is_list else offset
+            num_frames_i = num_frames[i] if num_frames_is_list else num_frames
+            vad_i = self._get_bin_vad_slice(vad_i, offset_i, num_frames_i)
+            output_vad.append(vad_i)
+
+        if squeeze:
+            output_vad = DataReader._squeeze(output_vad, self.permissive)
+
+        return output_vad
+
+
+    def read_timestamps(self, keys, merge_tol=0.001):
+        if isinstance(keys, str):
+            keys = [keys]
+
+        ts = []
+        for index in self._get_index(keys):
+            vad_i = self._read_vad(index)
+            ts_i = bin_vad_to_timestamps(
+                vad_i, self.frame_length/1000, self.frame_shift/1000,
+                self.snip_edges, merge_tol)
+            ts.append(ts_i)
+
+        return ts
@@ -0,0 +1,96 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+
+import numpy as np
+import h5py
+
+
+class PackedBinVADWriter(object):
+    """Class to write binary VADs packed 8 frames per byte
+       into a single hdf5 file.
+
+       The VADs of all the utterances are concatenated in one uint8 dataset,
+       each utterance starts at a byte boundary. The keys, number of frames
+       and byte offsets of the utterances are written when closing the file.
+
+    Attributes:
+      file_path: output h5 file path.
+      frame_length: frame-length (ms) used to compute the VAD.
+      frame_shift: frame-shift (ms) used to compute the VAD.
+      snip_edges: snip-edges used to compute the VAD.
+    """
+    def __init__(self, file_path, frame_length=25, frame_shift=10, snip_edges=False):
+        self.file_path = file_path
+        file_dir = os.path.dirname(file_path)
+        if file_dir != '' and not os.path.isdir(file_dir):
+            os.makedirs(file_dir, exist_ok=True)
+
+        self.f = h5py.File(file_path, 'w')
+        self.f.attrs['packed_bin_vad'] = True
+        self.f.attrs['frame_length'] = frame_length
+        self.f.attrs['frame_shift'] = frame_shift
+        self.f.attrs['snip_edges'] = snip_edges
+        self._data = self.f.create_dataset(
+            'data', shape=(0,), maxshape=(None,), dtype='uint8', chunks=(2**16,))
+        self._keys = []
+        self._num_frames = []
+        self._num_bytes = []
+
+
+    def __enter__(self):
+        """Function required when entering contructions of type
+
+           with PackedBinVADWriter('./vad.h5') as f:
+              f.write(key, data)
+        """
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Function required when exiting from contructions of type
+
+           with PackedBinVADWriter('./vad.h5') as f:
+              f.write(key, data)
+        """
+        self.close()
+
+
+    def close(self):
+        """Writes the index of the utterances and closes the file."""
+        if self.f is None:
+            return
+
+        byte_offsets = np.zeros((len(self._num_bytes)+1,), dtype=np.int64)
+        byte_offsets[1:] = np.cumsum(self._num_bytes)
+        self.f.create_dataset('keys', data=np.asarray(self._keys, dtype='S'))
+        self.f.create_dataset('num_frames', data=np.asarray(self._num_frames, dtype=np.int64))
+        self.f.create_dataset('byte_offsets', data=byte_offsets)
+        self.f.close()
+        self.f = None
+
+
+    def write(self, keys, data):
+        """Writes binary VADs.
+
+        Args:
+          keys: List of utterance ids.
+          data: List of binary VAD vectors.
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+            data = [data]
+
+        packed = [np.packbits(np.asarray(vad_i, dtype=bool)) for vad_i in data]
+        self._keys += list(keys)
+        self._num_frames += [len(vad_i) for vad_i in data]
+        self._num_bytes += [len(p) for p in packed]
+
+        if len(packed) == 0:
+            return
+        packed = np.concatenate(packed)
+        first = self._data.shape[0]
+        self._data.resize((first + len(packed),))
+        self._data[first:] = packed
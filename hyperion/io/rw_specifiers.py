@@ -9,6 +9,7 @@
 #from __future__ import division
 #from six.moves import xrange
 
+import os
 import re
 from enum import Enum
 
@@ -226,6 +227,34 @@ class WSpecifier(object):
                              % (len(fields), wspecifier))
 
 
+
+    @staticmethod
+    def _get_shard_path(file_path, shard):
+        if file_path is None:
+            return None
+        file_base, file_ext = os.path.splitext(file_path)
+        return '%s.%d%s' % (file_base, shard, file_ext)
+
+
+
+    def get_shard(self, shard):
+        """Returns a write specifier for a shard of the output,
+           e.g. for shard 2, ark,scp:file.ark,file.scp
+           becomes ark,scp:file.2.ark,file.2.scp.
+
+        Args:
+          shard: Shard index.
+
+        Returns:
+          WSpecifier object.
+        """
+        return WSpecifier(self.spec_type,
+                          self._get_shard_path(self.archive, shard),
+                          self._get_shard_path(self.script, shard),
+                          self.archive_type, self.binary, self.flush,
+                          self.permissive)
+
+
         
     def __eq__(self, other):
         """Equal operator."""
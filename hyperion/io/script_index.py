@@ -0,0 +1,387 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+ Class to store the location and shape of the matrices indexed by a scp file.
+"""
+
+import os
+import struct
+import logging
+
+import numpy as np
+import h5py
+
+from ..utils.list_utils import split_list, split_list_group_by_key
+from ..utils.kaldi_matrix import KaldiMatrix
+from ..utils.kaldi_io_funcs import read_token, read_int32, peek, init_kaldi_input_stream
+from .rw_specifiers import ArchiveType
+
+
+_compression_tokens = {'CM': 1, 'CM2': 2, 'CM3': 3, 'CM4': 4}
+
+
+def _get_file_stats(file_path):
+    """Returns the size and modification time in ns of a file."""
+    st = os.stat(file_path)
+    return st.st_size, st.st_mtime_ns
+
+
+
+def _read_ark_header(f):
+    """Reads the header of the matrix/vector in the current position
+       of an Ark file.
+
+    Args:
+      f: Python file object pointing to the binary marker of the matrix.
+
+    Returns:
+      Byte offset where the matrix data starts, -1 for text matrices.
+      String with numpy dtype of the data, empty for compressed and text matrices.
+      Tuple with the shape.
+      Compression format: 0 for uncompressed, 1-4 for Kaldi CM, CM2, CM3 and CM4.
+    """
+    binary = init_kaldi_input_stream(f)
+    if not binary:
+        shape = KaldiMatrix.read_shape(f, binary, sequential_mode=False)
+        return -1, '', shape, 0
+
+    if peek(f, binary) == b'C':
+        token = read_token(f, binary)
+        if not (token in _compression_tokens):
+            raise ValueError('Unexpected token %s' % token)
+        num_rows, num_cols = struct.unpack('<ffii', f.read(16))[-2:]
+        return f.tell(), '', (num_rows, num_cols), _compression_tokens[token]
+
+    token = read_token(f, binary)
+    if token[0] == 'F':
+        dtype = '<f4'
+    elif token[0] == 'D':
+        dtype = '<f8'
+    else:
+        raise ValueError('Wrong token %s ' % token)
+
+    if token[1] == 'M':
+        num_rows = read_int32(f, binary)
+        num_cols = read_int32(f, binary)
+        shape = (num_rows, num_cols)
+    elif token[1] == 'V':
+        shape = (read_int32(f, binary),)
+    else:
+        raise ValueError('Wrong token %s ' % token)
+
+    return f.tell(), dtype, shape, 0
+
+
+
+class ScriptIndex(object):
+    """Class to store the location, data type and shape of the feature
+       matrices/vectors in the Ark or hdf5 files indexed by a scp file.
+
+       The index has one entry per line of the scp file. It can be saved
+       next to the scp file and loaded again as long as the scp file and the
+       archives have not been modified, so shapes can be obtained
+       without reading the archives.
+
+    Attributes:
+      archives: numpy array with the unique archive paths.
+      archive_idx: index in archives of each scp entry.
+      offset: Byte where the matrix data starts in the Ark file or
+              offset of the hdf5 dataset, -1 if unknown.
+      dtype: numpy dtype string of the stored data, empty for text and
+             compressed Ark matrices.
+      num_rows: number of rows of each matrix, -1 for vectors.
+      num_cols: number of columns of each matrix, -1 if the matrix was
+                not found in the archive.
+      compression: 0 for uncompressed data, Kaldi compression format otherwise.
+      archive_stats: int64 numpy array (num_archives, 2) with size and
+                     modification time of the archives.
+      scp_stats: int64 numpy array (2,) with size and modification time of the
+                 scp file.
+    """
+
+    def __init__(self, archives, archive_idx, offset, dtype, num_rows, num_cols,
+                 compression, archive_stats=None, scp_stats=None):
+        self.archives = np.asarray(archives, dtype=str)
+        self.archive_idx = np.asarray(archive_idx, dtype=np.int32)
+        self.offset = np.asarray(offset, dtype=np.int64)
+        self.dtype = np.asarray(dtype, dtype='S3')
+        self.num_rows = np.asarray(num_rows, dtype=np.int64)
+        self.num_cols = np.asarray(num_cols, dtype=np.int64)
+        self.compression = np.asarray(compression, dtype=np.uint8)
+        self.archive_stats = archive_stats
+        self.scp_stats = scp_stats
+
+
+
+    def __len__(self):
+        """Returns the number of entries in the index."""
+        return len(self.archive_idx)
+
+
+
+    def get_shape(self, index):
+        """Returns the shape of the matrix in position index of the scp file
+           or None if the matrix was not found in the archive.
+        """
+        num_cols = self.num_cols[index]
+        if num_cols < 0:
+            return None
+        num_rows = self.num_rows[index]
+        if num_rows < 0:
+            return (int(num_cols),)
+        return (int(num_rows), int(num_cols))
+
+
+
+    @staticmethod
+    def get_index_path(scp_path):
+        """Returns the path of the index file for a given scp file."""
+        return scp_path + '.idx'
+
+
+
+    def save(self, file_path):
+        """Saves the index to binary file. The index is written to a temporary
+           file that is renamed when it is complete, so other processes never
+           read a partially written index.
+
+        Args:
+          file_path: File to write the index.
+        """
+        tmp_path = '%s.%d.tmp' % (file_path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, archives=self.archives, archive_idx=self.archive_idx,
+                         offset=self.offset, dtype=self.dtype,
+                         num_rows=self.num_rows, num_cols=self.num_cols,
+                         compression=self.compression,
+                         archive_stats=self.archive_stats,
+                         scp_stats=self.scp_stats)
+            os.replace(tmp_path, file_path)
+        except:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+
+    @classmethod
+    def load(cls, file_path):
+        """Loads the index from binary file.
+
+        Args:
+          file_path: File to read the index.
+
+        Returns:
+          ScriptIndex object.
+        """
+        with open(file_path, 'rb') as f:
+            d = np.load(f)
+            return cls(d['archives'], d['archive_idx'], d['offset'],
+                       d['dtype'], d['num_rows'], d['num_cols'],
+                       d['compression'], d['archive_stats'], d['scp_stats'])
+
+
+
+    def is_valid(self, scp_path, archives):
+        """Checks if the index is up to date, i.e., the scp file and the archives
+           have the same size and modification time as when the index was created.
+
+        Args:
+          scp_path: scp file path.
+          archives: Unique archive paths referenced by the scp file.
+
+        Returns:
+          True if the index is up to date.
+        """
+        if self.scp_stats is None or self.archive_stats is None:
+            return False
+        if not np.all(self.scp_stats == _get_file_stats(scp_path)):
+            return False
+        if (len(archives) != len(self.archives) or
+            np.any(np.asarray(archives) != self.archives)):
+            return False
+        for i, archive in enumerate(archives):
+            if not os.path.isfile(archive):
+                return False
+            if not np.all(self.archive_stats[i] == _get_file_stats(archive)):
+                return False
+        return True
+
+
+
+    @staticmethod
+    def _read_ark_entries(archive, offset):
+        """Reads the headers of the matrices of an Ark file."""
+        n = len(offset)
+        data_offset = np.zeros((n,), dtype=np.int64)
+        dtype = [''] * n
+        num_rows = np.zeros((n,), dtype=np.int64)
+        num_cols = np.zeros((n,), dtype=np.int64)
+        compression = np.zeros((n,), dtype=np.uint8)
+        with open(archive, 'rb') as f:
+            for i in np.argsort(offset, kind='stable'):
+                f.seek(offset[i], 0)
+                data_offset[i], dtype[i], shape_i, compression[i] = _read_ark_header(f)
+                num_rows[i] = shape_i[0] if len(shape_i) == 2 else -1
+                num_cols[i] = shape_i[-1]
+        return data_offset, dtype, num_rows, num_cols, compression
+
+
+
+    @staticmethod
+    def _read_h5_entries(archive, keys):
+        """Reads the location and shapes of the datasets of a hdf5 file."""
+        n = len(keys)
+        data_offset = np.full((n,), -1, dtype=np.int64)
+        dtype = [''] * n
+        num_rows = np.full((n,), -1, dtype=np.int64)
+        num_cols = np.full((n,), -1, dtype=np.int64)
+        compression = np.zeros((n,), dtype=np.uint8)
+        with h5py.File(archive, 'r') as f:
+            for i, key in enumerate(keys):
+                if not (key in f):
+                    continue
+                dset = f[key]
+                offset_i = dset.id.get_offset()
+                if offset_i is not None:
+                    data_offset[i] = offset_i
+                dtype[i] = dset.dtype.str
+                shape_i = dset.shape
+                if len(shape_i) == 2:
+                    num_rows[i] = shape_i[0]
+                num_cols[i] = shape_i[-1]
+                if 'data_format' in dset.attrs:
+                    compression[i] = dset.attrs['data_format']
+        return data_offset, dtype, num_rows, num_cols, compression
+
+
+
+    @classmethod
+    def create(cls, scp, archive_type=ArchiveType.ARK, scp_path=None):
+        """Creates the index reading the headers of the matrices in the archives.
+
+        Args:
+          scp: SCPList object.
+          archive_type: ArchiveType.ARK or ArchiveType.H5.
+          scp_path: Path of the scp file, needed to validate the index later.
+
+        Returns:
+          ScriptIndex object.
+        """
+        archives, archive_idx = scp.get_unique_file_paths()
+        n = len(scp)
+        offset = np.full((n,), -1, dtype=np.int64)
+        dtype = np.zeros((n,), dtype='S3')
+        num_rows = np.full((n,), -1, dtype=np.int64)
+        num_cols = np.full((n,), -1, dtype=np.int64)
+        compression = np.zeros((n,), dtype=np.uint8)
+        archive_stats = np.zeros((len(archives), 2), dtype=np.int64)
+
+        order = np.argsort(archive_idx, kind='stable')
+        group_start = np.unique(archive_idx[order], return_index=True)[1]
+        groups = np.split(order, group_start[1:]) if n > 0 else []
+        for i, idx in enumerate(groups):
+            archive = archives[i]
+            archive_stats[i] = _get_file_stats(archive)
+            if archive_type == ArchiveType.H5:
+                entries = cls._read_h5_entries(archive, scp.key[idx])
+            else:
+                entries = cls._read_ark_entries(archive, scp.offset[idx])
+            offset[idx], dtype[idx], num_rows[idx], num_cols[idx], compression[idx] = entries
+
+        scp_stats = None
+        if scp_path is not None:
+            scp_stats = np.array(_get_file_stats(scp_path), dtype=np.int64)
+        return cls(archives, archive_idx, offset, dtype, num_rows, num_cols,
+                   compression, archive_stats, scp_stats)
+
+
+
+    @classmethod
+    def load_or_create(cls, scp_path, scp, archive_type=ArchiveType.ARK,
+                       part_idx=1, num_parts=1, group_by_key=True):
+        """Loads the index stored next to the scp file if it is up to date,
+           otherwise, creates the index and tries to save it next to the scp file.
+
+           When reading a part of the scp file (num_parts > 1), the index
+           is only created for the entries of that part and it is not saved,
+           so jobs processing different parts don't read all the archives
+           nor write the same index file.
+
+        Args:
+          scp_path: scp file path.
+          scp: SCPList object loaded from scp_path.
+          archive_type: ArchiveType.ARK or ArchiveType.H5.
+          part_idx: Part of the scp file to index from 1 to num_parts.
+          num_parts: Number of parts to split the scp file.
+          group_by_key: If True, all the lines with the same key
+                        go to the same part.
+
+        Returns:
+          ScriptIndex object with the entries of part part_idx of the scp file.
+        """
+        index_path = cls.get_index_path(scp_path)
+        archives, _ = scp.get_unique_file_paths()
+        if os.path.isfile(index_path):
+            try:
+                index = cls.load(index_path)
+                if len(index) == len(scp) and index.is_valid(scp_path, archives):
+                    if num_parts > 1:
+                        index = index.split(part_idx, num_parts, scp.key,
+                                            group_by_key=group_by_key)
+                    return index
+            except Exception as e:
+                logging.warning('cannot load index %s: %s' % (index_path, str(e)))
+
+        if num_parts > 1:
+            scp = scp.split(part_idx, num_parts, group_by_key=group_by_key)
+            return cls.create(scp, archive_type, scp_path)
+
+        logging.info('creating index %s' % index_path)
+        index = cls.create(scp, archive_type, scp_path)
+        try:
+            index.save(index_path)
+        except OSError as e:
+            logging.warning('cannot save index %s: %s' % (index_path, str(e)))
+        return index
+
+
+
+    def filter_index(self, index):
+        """Returns a sub-index with the given scp entries.
+
+        Args:
+          index: Positions of the entries to keep.
+
+        Returns:
+          ScriptIndex object.
+        """
+        return ScriptIndex(self.archives, self.archive_idx[index],
+                           self.offset[index], self.dtype[index],
+                           self.num_rows[index], self.num_cols[index],
+                           self.compression[index], self.archive_stats,
+                           self.scp_stats)
+
+
+
+    def split(self, idx, num_parts, key, group_by_key=True):
+        """Splits the index in the same way that SCPList.split
+           splits the scp file.
+
+        Args:
+          idx: Part to return from 1 to num_parts.
+          num_parts: Number of parts to split the list.
+          key: Keys of the scp file.
+          group_by_key: If True, all the lines with the same key
+                        go to the same part.
+
+        Returns:
+          ScriptIndex object.
+        """
+        if group_by_key:
+            _, index = split_list_group_by_key(key, idx, num_parts)
+        else:
+            _, index = split_list(key, idx, num_parts)
+        return self.filter_index(index)
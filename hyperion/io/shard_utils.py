@@ -0,0 +1,97 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+ Functions to run feature extractors in the workers of an OrderedProcessPool,
+ where each worker can write its own output shard.
+"""
+
+import time
+import logging
+
+from ..utils.scp_list import SCPList
+from ..utils.list_utils import ismember
+from .rw_specifiers import WSpecifier
+from .data_rw_factory import DataWriterFactory as DWF
+
+
+def init_shard_worker(worker_id, create_fn, create_args, compute_fn,
+                      output_path=None, writer_args={}):
+    """Creates the feature extractor of a worker and,
+       in sharded mode, its output writer.
+
+    Args:
+      worker_id: Worker index starting at 0.
+      create_fn: Function create_fn(**create_args) that returns the extractor.
+      create_args: Arguments of create_fn.
+      compute_fn: Function compute_fn(extractor, x) that returns the
+                  features of one utterance as numpy array.
+      output_path: Write specifier of the full output, the worker writes to
+                   its shard worker_id+1. If None, features are returned
+                   to the main process.
+      writer_args: Extra arguments of the data writer.
+
+    Returns:
+      Worker state to be passed to compute_shard_feats.
+    """
+    extractor = create_fn(**create_args)
+    writer = None
+    if output_path is not None:
+        wspecifier = WSpecifier.create(output_path).get_shard(worker_id+1)
+        writer = DWF.create(wspecifier, scp_sep=' ', **writer_args)
+    return extractor, compute_fn, writer
+
+
+
+def close_shard_worker(state):
+    """Closes the output writer of a worker."""
+    writer = state[2]
+    if writer is not None:
+        writer.close()
+
+
+
+def compute_shard_feats(state, data):
+    """Computes the features of one utterance.
+
+    Args:
+      state: Worker state returned by init_shard_worker.
+      data: Tuple (key, x, ...) with the utterance.
+
+    Returns:
+      key, number of frames, elapsed time in ms and
+      feature matrix or None if the worker writes it to its shard.
+    """
+    extractor, compute_fn, writer = state
+    key, x = data[:2]
+    t1 = time.time()
+    y = compute_fn(extractor, x)
+    dt = (time.time() - t1)*1000
+    if writer is not None:
+        writer.write([key], [y])
+        return key, y.shape[0], dt, None
+
+    return key, y.shape[0], dt, y
+
+
+
+def merge_shard_scps(output_path, num_shards, keys):
+    """Merges the scp files of the output shards into the scp
+       of output_path sorted in input order.
+
+    Args:
+      output_path: Write specifier of the full output.
+      num_shards: Number of shards.
+      keys: Utterance keys in input order.
+    """
+    wspecifier = WSpecifier.create(output_path)
+    if wspecifier.script is None:
+        logging.info('no scp in %s, output is split into %d shards' % (
+            output_path, num_shards))
+        return
+
+    scps = [SCPList.load(wspecifier.get_shard(i+1).script) for i in range(num_shards)]
+    scp = SCPList.merge([s for s in scps if len(s) > 0])
+    _, idx = ismember(keys, scp.key)
+    scp.filter_index(idx).save(wspecifier.script)
+    logging.info('merged %d shard scps into %s' % (num_shards, wspecifier.script))
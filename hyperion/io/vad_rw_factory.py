@@ -8,6 +8,7 @@ import logging
 from .rw_specifiers import ArchiveType, WSpecifier, RSpecifier, WSpecType, RSpecType
 from .bin_vad_reader import BinVADReader as BVR
 from .segment_vad_reader import SegmentVADReader as SVR
+from .packed_bin_vad_reader import PackedBinVADReader as PBVR
 
 
 class VADReaderFactory(object):
@@ -20,6 +21,11 @@ class VADReaderFactory(object):
             rspecifier = RSpecifier.create(rspecifier)
         logging.debug(rspecifier.__dict__)
         if rspecifier.spec_type ==  RSpecType.ARCHIVE:
+            if (rspecifier.archive_type == ArchiveType.H5 and
+                PBVR.is_packed_bin_vad(rspecifier.archive)):
+                return PBVR(rspecifier.archive, permissive=rspecifier.permissive,
+                            frame_length=frame_length, frame_shift=frame_shift,
+                            snip_edges=snip_edges)
             if (rspecifier.archive_type == ArchiveType.H5 or 
                 rspecifier.archive_type == ArchiveType.ARK):
                 return BVR(rspecifier, path_prefix, scp_sep,
@@ -10,7 +10,7 @@ from six.moves import xrange
 import numpy as np
 
 from ..utils.math import neglogsigmoid
-from .utils import opt_loglr
+from .utils import sort_trial_labels, pav_labels
 
 def compute_cllr(tar, non):
     """ CLLR: Measure of goodness of log-likelihood-ratio detection output. This measure          ps both:        
@@ -25,12 +25,50 @@ def compute_cllr(tar, non):
 
     """
     c1 = np.mean(neglogsigmoid(tar))/np.log(2)
-    c2 = np.mean(neglogsigmoid(non))/np.log(2)
+    c2 = np.mean(neglogsigmoid(-non))/np.log(2)
 
     return (c1 + c2)/2
 
 
 def compute_min_cllr(tar, non):
+    """ Computes minimum CLLR, i.e., CLLR after optimal calibration
+        of the scores with PAV.
 
-    tar_llr, non_llr = opt_loglr(tar, non, 'raw')
-    return compute_cllr(tar_llr,non_llr)
+    Args:
+      tar: Scores of target trials.
+      non: Scores of non-target trials.
+    
+    Returns:
+      Minimum CLLR
+    """
+    labels, _ = sort_trial_labels(tar, non)
+    num_tar, width = pav_labels(labels)
+    return pav2min_cllr(num_tar, width)
+
+
+
+def pav2min_cllr(num_tar, width):
+    """ Computes minimum CLLR from the PAV bins of the trial labels 
+        sorted by score, where all the trials in a bin get the 
+        same optimal log-likelihood ratio.
+
+    Args:
+      num_tar: Number of targets in each PAV bin, obtained with pav_labels.
+      width: Width of the PAV bins.
+    
+    Returns:
+      Minimum CLLR
+    """
+    num_non = width - num_tar
+    ntar = np.sum(num_tar)
+    nnon = np.sum(num_non)
+    with np.errstate(divide='ignore'):
+        llr = np.log(num_tar) - np.log(num_non) - np.log(ntar/nnon)
+
+    # bins without targets (non-targets) don't contribute to c1 (c2)
+    f = num_tar > 0
+    c1 = np.sum(num_tar[f]*neglogsigmoid(llr[f]))/ntar/np.log(2)
+    f = num_non > 0
+    c2 = np.sum(num_non[f]*neglogsigmoid(-llr[f]))/nnon/np.log(2)
+
+    return (c1 + c2)/2
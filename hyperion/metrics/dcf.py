@@ -5,11 +5,11 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
-from six.moves import xrange
 
 import numpy as np
 
-from .roc import compute_rocch, rocch2eer
+from .utils import sort_trial_labels
+from .roc import compute_rocch, labels2rocch, rocch2eer
 
 def compute_dcf(p_miss, p_fa, prior, normalize=True):
     """Computes detection cost function
@@ -85,6 +85,16 @@ def compute_act_dcf(tar, non, prior, normalize=True):
       Vector of P_miss corresponding to each act DCF.
       Vector of P_fa corresponding to each act DCF.
     """
+    tar = np.sort(tar, kind='mergesort')
+    non = np.sort(non, kind='mergesort')
+    return _compute_act_dcf_sorted(tar, non, prior, normalize)
+
+
+
+def _compute_act_dcf_sorted(tar, non, prior, normalize=True):
+    """Computes actual DCF from target and non-target scores
+       sorted in ascending order.
+    """
     prior = np.asarray(prior)
 
     if prior.ndim == 1:
@@ -92,40 +102,15 @@ def compute_act_dcf(tar, non, prior, normalize=True):
     else:
         prior = prior[None]
         
-    num_priors = len(prior)
-
     ntar = len(tar)
     nnon = len(non)
     
     #thresholds
     t = - np.log(prior) + np.log(1-prior)
 
-    ttar = np.concatenate((t, tar))
-    ii = np.argsort(ttar, kind='mergesort')
-    r = np.zeros((num_priors + ntar), dtype='int32')
-    r[ii] = np.arange(1, num_priors + ntar + 1)
-    r = r[:num_priors]
-    n_miss = r - np.arange(num_priors, 0, -1)
-
-    
-    tnon = np.concatenate((t, non))
-    ii = np.argsort(tnon, kind='mergesort')
-    r = np.zeros((num_priors + nnon), dtype='int32')
-    r[ii] = np.arange(1, num_priors + nnon + 1)
-    r = r[:num_priors]
-    n_fa = nnon - r + np.arange(num_priors, 0, -1)
-
-    # n_miss2 = np.zeros((num_priors,), dtype='int32')
-    # n_fa2 = np.zeros((num_priors,), dtype='int32')
-    
-    # for i in xrange(len(t)):
-    #     n_miss2[i] = np.sum(tar<t[i])
-    #     n_fa2[i] = np.sum(non>t[i])
-
-    # assert np.all(n_miss2 == n_miss)
-    # assert np.all(n_fa2 == n_fa) 
-    # print(n_miss)
-    # print(n_fa)
+    # miss: tar < t, false alarm: non >= t
+    n_miss = np.searchsorted(tar, t, side='left')
+    n_fa = nnon - np.searchsorted(non, t, side='left')
 
     p_miss = n_miss/ntar
     p_fa = n_fa/nnon
@@ -157,7 +142,9 @@ def fast_eval_dcf_eer(tar, non, prior, normalize_dcf=True):
       PREBP value
     """
     
-    p_miss, p_fa = compute_rocch(tar, non)
+    # sort the trials only once for ROCCH and actual DCF
+    labels, sort_idx = sort_trial_labels(tar, non)
+    p_miss, p_fa = labels2rocch(labels)
     eer = rocch2eer(p_miss, p_fa)
 
     N_miss = p_miss * len(tar)
@@ -167,7 +154,9 @@ def fast_eval_dcf_eer(tar, non, prior, normalize_dcf=True):
     dcf = compute_dcf(p_miss, p_fa, prior, normalize_dcf)
     min_dcf = np.min(dcf, axis=-1)
 
-    act_dcf, _, _ = compute_act_dcf(tar, non, prior, normalize_dcf)
+    scores = np.concatenate((np.ravel(tar), np.ravel(non)))[sort_idx]
+    act_dcf, _, _ = _compute_act_dcf_sorted(
+        scores[labels], scores[~labels], prior, normalize_dcf)
 
     return min_dcf, act_dcf, eer, prbep
 
@@ -8,10 +8,9 @@ from __future__ import division
 from six.moves import xrange
 
 import numpy as np
-import scipy.linalg as sla
 import matplotlib.pyplot as plt
 
-from .utils import pavx
+from .utils import sort_trial_labels, pav_labels
 
 
 def  compute_roc(true_scores, false_scores):
@@ -70,43 +69,55 @@ def compute_rocch(tar_scores, non_scores):
     assert(isinstance(tar_scores, np.ndarray))
     assert(isinstance(non_scores, np.ndarray))
     
-    Nt = len(tar_scores)
-    Nn = len(non_scores)
-    N = Nt+Nn
-    scores = np.hstack((tar_scores.ravel(), non_scores.ravel()))
-    #ideal, but non-monotonic posterior
-    Pideal = np.hstack((np.ones((Nt,)), np.zeros((Nn,))))
-                    
     #It is important here that scores that are the same (i.e. already in order) should NOT be swapped.
     #MATLAB's sort algorithm has this property.
-    perturb = np.argsort(scores, kind='mergesort')
-                    
-    Pideal = Pideal[perturb]
-    Popt, width, _ = pavx(Pideal) 
-
-    nbins = len(width)
-    p_miss = np.zeros((nbins+1,))
-    p_fa = np.zeros((nbins+1,))
-
-    #threshold leftmost: accept eveything, miss nothing
-    #0 scores to left of threshold
-    left = 0 
-    fa = Nn
-    miss = 0
-
-    for i in xrange(nbins):
-        p_miss[i] = miss/Nt
-        p_fa[i] = fa/Nn
-        left = left + width[i]
-        miss = np.sum(Pideal[:left])
-        fa = N - left - np.sum(Pideal[left:])
-
-    p_miss[nbins] = miss/Nt
-    p_fa[nbins] = fa/Nn
+    labels, _ = sort_trial_labels(tar_scores, non_scores)
+    return labels2rocch(labels)
 
+
+
+def labels2rocch(labels):
+    """ Computes ROCCH from the trial labels sorted by score.
+
+    Args:
+      labels: Boolean labels (True for targets) sorted by score, 
+              e.g., obtained with sort_trial_labels.
+
+    Returns:
+       pmiss and pfa contain the coordinates of the vertices of the
+       ROC Convex Hull.
+    """
+    num_tar, width = pav_labels(labels)
+    return pav2rocch(num_tar, width)
+
+
+
+def pav2rocch(num_tar, width):
+    """ Computes ROCCH from the PAV bins of the sorted trial labels.
+
+    Args:
+      num_tar: Number of targets in each PAV bin, obtained with pav_labels.
+      width: Width of the PAV bins.
+
+    Returns:
+       pmiss and pfa contain the coordinates of the vertices of the
+       ROC Convex Hull.
+    """
+    Nt = np.sum(num_tar)
+    Nn = np.sum(width) - Nt
+
+    # threshold leftmost: accept eveything, miss nothing
+    # then move the threshold to the right of each PAV bin
+    miss = np.concatenate(([0], np.cumsum(num_tar)))
+    left = np.concatenate(([0], np.cumsum(width)))
+    fa = Nn - (left - miss)
+
+    p_miss = miss/Nt
+    p_fa = fa/Nn
     return p_miss, p_fa
 
 
+
 def rocch2eer(p_miss, p_fa):
     """Calculates the equal error rate (eer) from pmiss and pfa
        vectors.  
@@ -115,34 +126,25 @@ def rocch2eer(p_miss, p_fa):
        Use compute_rocch to convert target and non-target scores to pmiss and
        pfa values.
     """
-    eer = 0
-
     #p_miss and p_fa should be sorted
-    x = np.sort(p_miss, kind='mergesort')
-    assert(np.all(x == p_miss))
-    x = np.sort(p_fa, kind='mergesort')[::-1]
-    assert(np.all(x == p_fa))
-
-    _1_1 = np.array([1, -1])
-    _11 = np.array([[1], [1]])
-    for i in xrange(len(p_fa)-1):
-        xx = p_fa[i:i+2]
-        yy = p_miss[i:i+2]
-    
-        XY = np.vstack((xx, yy)).T
-        dd = np.dot(_1_1, XY)
-        if np.min(np.abs(dd))==0:
-            eerseg = 0
-        else:
-            #find line coefficieents seg s.t. seg'[xx(i)yy(i)] = 1, 
-            #when xx(i),yy(i) is on the line.
-            seg = sla.solve(XY,_11)
-            #candidate for EER, eer is highest candidate
-            eerseg = 1/(np.sum(seg)) 
-    
-        eer = np.maximum(eer, eerseg)
-        
-    return eer
+    assert np.all(np.diff(p_miss) >= 0)
+    assert np.all(np.diff(p_fa) <= 0)
+
+    x0 = p_fa[:-1]
+    x1 = p_fa[1:]
+    y0 = p_miss[:-1]
+    y1 = p_miss[1:]
+    # for each segment, find line coefficients seg s.t. 
+    # seg'[xx(i)yy(i)] = 1 when xx(i),yy(i) is on the line, 
+    # the candidate for EER is 1/sum(seg), eer is highest candidate.
+    # Horizontal and vertical segments give eer=0
+    valid = np.logical_and(x0 != x1, y0 != y1)
+    if not np.any(valid):
+        return 0
+
+    x0, x1, y0, y1 = x0[valid], x1[valid], y0[valid], y1[valid]
+    eerseg = (x0*y1 - x1*y0)/(x0 - x1 + y1 - y0)
+    return np.maximum(0, np.max(eerseg))
 
 
 
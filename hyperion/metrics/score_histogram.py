@@ -0,0 +1,332 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+import h5py
+
+from ..hyp_defs import float_cpu
+from .utils import _pav_blocks
+from .roc import pav2rocch, rocch2eer
+from .dcf import compute_dcf
+
+
+class ScoreHistogram(object):
+    """Histograms of target and non-target scores to evaluate detection
+       performance without keeping all the scores in memory.
+
+       The scores are accumulated chunk by chunk into fixed width bins
+       plus two bins for the scores out of [min_score, max_score).
+       Histograms of different shards of a trial list can be merged.
+
+       The operating points at the bin edges are exact, but the order of
+       the scores inside each bin is lost. The metrics are computed
+       from the ROC convex hull of the worst case, where the targets of each
+       bin are below the non-targets, and of the best case, where they are above.
+       The true value lies between both, so the metrics are returned as the
+       middle point plus/minus the error bound.
+       The error decreases with the bin width.
+
+    Attributes:
+      min_score: Lower limit of the first bin.
+      max_score: Upper limit of the last bin.
+      num_bins: Number of bins in [min_score, max_score).
+      tar_counts: Number of target scores in each bin.
+      non_counts: Number of non-target scores in each bin.
+    """
+    def __init__(self, min_score=-100, max_score=100, num_bins=200000,
+                 tar_counts=None, non_counts=None):
+        assert max_score > min_score
+        self.min_score = min_score
+        self.max_score = max_score
+        self.num_bins = num_bins
+        if tar_counts is None:
+            tar_counts = np.zeros((num_bins+2,), dtype=np.int64)
+        if non_counts is None:
+            non_counts = np.zeros((num_bins+2,), dtype=np.int64)
+        self.tar_counts = tar_counts
+        self.non_counts = non_counts
+
+
+    @property
+    def bin_width(self):
+        return (self.max_score - self.min_score)/self.num_bins
+
+
+    @property
+    def num_tar(self):
+        return np.sum(self.tar_counts)
+
+
+    @property
+    def num_non(self):
+        return np.sum(self.non_counts)
+
+
+
+    def _get_bins(self, x):
+        """Bin index of the scores, 0 and num_bins+1 for the scores
+           out of [min_score, max_score).
+        """
+        x = np.floor((np.asarray(x, dtype=float_cpu()) - self.min_score)/self.bin_width)
+        x = np.clip(x, -1, self.num_bins) + 1
+        return x.astype(np.int64)
+
+
+
+    def accumulate(self, tar, non):
+        """Adds target and non-target scores to the histograms.
+
+        Args:
+          tar: Target scores.
+          non: Non-target scores.
+        """
+        self.tar_counts += np.bincount(
+            self._get_bins(tar), minlength=self.num_bins+2)
+        self.non_counts += np.bincount(
+            self._get_bins(non), minlength=self.num_bins+2)
+
+
+
+    def accumulate_trials(self, scores, key):
+        """Adds the scores of the trials in a key.
+
+        Args:
+          scores: TrialScores object.
+          key: TrialKey object.
+        """
+        tar, non = scores.get_tar_non(key)
+        self.accumulate(tar, non)
+
+
+
+    def accumulate_txt(self, score_file, key_file, chunk_size=1000000):
+        """Adds the scores of a score file in text format reading it
+           by chunks. The trials in score and key files need to be in
+           the same order, e.g., when the score file was obtained by
+           scoring the trials of the key file.
+
+        Args:
+          score_file: Score file with lines "modelid segmentid score".
+          key_file: Key file with lines "modelid segmentid target/nontarget".
+          chunk_size: Number of trials per chunk.
+        """
+        read_args = dict(sep=r'\s+', header=None, usecols=[0,1,2],
+                         chunksize=chunk_size, na_filter=False,
+                         dtype={0: str, 1: str})
+        score_reader = pd.read_csv(score_file, **read_args)
+        key_reader = pd.read_csv(key_file, **read_args)
+        num_trials = 0
+        for scr, key in zip(score_reader, key_reader):
+            if not (len(scr) == len(key) and
+                    np.all(scr[0].values == key[0].values) and
+                    np.all(scr[1].values == key[1].values)):
+                raise ValueError(
+                    'trials in %s and %s after line %d are not in the same order' % (
+                        score_file, key_file, num_trials))
+
+            is_tar = (key[2] == 'target').values
+            s = scr[2].values.astype(float_cpu())
+            self.accumulate(s[is_tar], s[~is_tar])
+            num_trials += len(scr)
+
+        for reader in [score_reader, key_reader]:
+            if next(reader, None) is not None:
+                raise ValueError(
+                    '%s and %s have different number of trials' % (
+                        score_file, key_file))
+            reader.close()
+
+        logging.info('accumulated %d trials from %s' % (num_trials, score_file))
+
+
+
+    def merge(self, other):
+        """Adds the counts of another histogram with the same bins."""
+        assert (self.min_score == other.min_score and
+                self.max_score == other.max_score and
+                self.num_bins == other.num_bins), 'histogram bins do not match'
+        self.tar_counts += other.tar_counts
+        self.non_counts += other.non_counts
+
+
+
+    def save(self, file_path):
+        """Saves the histograms to h5 file.
+
+        Args:
+          file_path: h5 file path.
+        """
+        with h5py.File(file_path, 'w') as f:
+            f.create_dataset('tar_counts', data=self.tar_counts)
+            f.create_dataset('non_counts', data=self.non_counts)
+            f.attrs['min_score'] = self.min_score
+            f.attrs['max_score'] = self.max_score
+            f.attrs['num_bins'] = self.num_bins
+
+
+
+    @classmethod
+    def load(cls, file_path):
+        """Loads the histograms from h5 file.
+
+        Args:
+          file_path: h5 file path.
+
+        Returns:
+          ScoreHistogram object.
+        """
+        with h5py.File(file_path, 'r') as f:
+            tar_counts = np.asarray(f['tar_counts'], dtype=np.int64)
+            non_counts = np.asarray(f['non_counts'], dtype=np.int64)
+            min_score = float(f.attrs['min_score'])
+            max_score = float(f.attrs['max_score'])
+            num_bins = int(f.attrs['num_bins'])
+        return cls(min_score, max_score, num_bins, tar_counts, non_counts)
+
+
+
+    def compute_rocch(self, optimistic=False):
+        """ Computes the ROC convex hull from the histograms.
+
+        Args:
+          optimistic: If False, the targets of each bin are assumed
+                      below the non-targets, which gives the hull of the
+                      operating points at the bin edges.
+                      If True, they are assumed above the non-targets.
+
+        Returns:
+           pmiss and pfa contain the coordinates of the vertices of the
+           ROC Convex Hull.
+        """
+        # each bin is a run of targets and a run of non-targets
+        counts = np.stack((self.tar_counts, self.non_counts), axis=1)
+        labels = np.tile([1, 0], (len(counts), 1))
+        if optimistic:
+            counts = counts[:,::-1]
+            labels = labels[:,::-1]
+        counts = counts.ravel()
+        labels = labels.ravel()
+        f = counts > 0
+        num_tar, width = _pav_blocks(labels[f], counts[f])
+        return pav2rocch(np.round(num_tar).astype(np.int64), width)
+
+
+
+    def compute_eer(self):
+        """Computes equal error rate.
+
+        Returns:
+          EER
+          Max. error of the EER
+        """
+        eer_max = rocch2eer(*self.compute_rocch())
+        eer_min = rocch2eer(*self.compute_rocch(optimistic=True))
+        return (eer_max + eer_min)/2, (eer_max - eer_min)/2
+
+
+
+    def compute_min_dcf(self, prior, normalize=True):
+        """Computes minimum DCF.
+
+        Args:
+          prior: Target prior or vector of target priors.
+          normalize: if true, return normalized DCF, else unnormalized.
+
+        Returns:
+          Minimum DCF for each prior.
+          Max. error of the minimum DCF for each prior.
+        """
+        p_miss, p_fa = self.compute_rocch()
+        dcf_max = np.min(compute_dcf(p_miss, p_fa, prior, normalize), axis=-1)
+        p_miss, p_fa = self.compute_rocch(optimistic=True)
+        dcf_min = np.min(compute_dcf(p_miss, p_fa, prior, normalize), axis=-1)
+        return (dcf_max + dcf_min)/2, (dcf_max - dcf_min)/2
+
+
+
+    def compute_act_dcf(self, prior, normalize=True):
+        """Computes actual DCF assuming that scores are calibrated
+           log-likelihood ratios.
+
+        Args:
+          prior: Target prior or vector of target priors.
+          normalize: if true, return normalized DCF, else unnormalized.
+
+        Returns:
+          Actual DCF for each prior.
+          Max. error of the actual DCF for each prior.
+        """
+        prior = np.asarray(prior)
+        t = np.log(1-prior) - np.log(prior)
+        # scores in the bin of the threshold can be on either side
+        b = self._get_bins(t)
+        cum_tar = np.concatenate(([0], np.cumsum(self.tar_counts)))
+        cum_non = np.concatenate(([0], np.cumsum(self.non_counts)))
+        n_miss_min = cum_tar[b]
+        n_miss_max = cum_tar[b+1]
+        n_fa_min = self.num_non - cum_non[b+1]
+        n_fa_max = self.num_non - cum_non[b]
+
+        dcf_min = prior*n_miss_min/self.num_tar + (1-prior)*n_fa_min/self.num_non
+        dcf_max = prior*n_miss_max/self.num_tar + (1-prior)*n_fa_max/self.num_non
+        if normalize:
+            dcf_min /= np.minimum(prior, 1-prior)
+            dcf_max /= np.minimum(prior, 1-prior)
+        return (dcf_max + dcf_min)/2, (dcf_max - dcf_min)/2
+
+
+
+    def eval_dcf_eer(self, prior, normalize_dcf=True):
+        """Computes min. DCF, actual DCF and EER with their error bounds.
+
+        Args:
+          prior: Target prior or vector of target priors.
+          normalize_dcf: if true, return normalized DCF, else unnormalized.
+
+        Returns:
+          Min. DCF and its error bound for each prior.
+          Actual DCF and its error bound for each prior.
+          EER and its error bound.
+        """
+        min_dcf, min_dcf_err = self.compute_min_dcf(prior, normalize_dcf)
+        act_dcf, act_dcf_err = self.compute_act_dcf(prior, normalize_dcf)
+        eer, eer_err = self.compute_eer()
+        return min_dcf, min_dcf_err, act_dcf, act_dcf_err, eer, eer_err
+
+
+
+    @staticmethod
+    def filter_args(prefix=None, **kwargs):
+        if prefix is None:
+            p = ''
+        else:
+            p = prefix + '_'
+        valid_args = ('min_score', 'max_score', 'num_bins')
+        return dict((k, kwargs[p+k])
+                    for k in valid_args if p+k in kwargs)
+
+
+
+    @staticmethod
+    def add_argparse_args(parser, prefix=None):
+        if prefix is None:
+            p1 = '--'
+            p2 = ''
+        else:
+            p1 = '--' + prefix + '-'
+            p2 = prefix + '_'
+        parser.add_argument(p1+'min-score', dest=(p2+'min_score'),
+                            default=-100, type=float,
+                            help=('lower limit of the score histogram'))
+        parser.add_argument(p1+'max-score', dest=(p2+'max_score'),
+                            default=100, type=float,
+                            help=('upper limit of the score histogram'))
+        parser.add_argument(p1+'num-bins', dest=(p2+'num_bins'),
+                            default=200000, type=int,
+                            help=('number of bins of the score histogram, '
+                                  'the error of the metrics decreases with the bin width'))
@@ -0,0 +1,150 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from ..hyp_defs import float_cpu
+from .utils import pav_labels
+from .roc import pav2rocch, rocch2eer
+from .dcf import compute_dcf
+from .cllr import compute_cllr, pav2min_cllr
+
+
+class SubsetEvaluator(object):
+    """Computes EER, DCF and Cllr for many subsets of a pool of trials.
+
+       The scores of the pool are sorted only once. Each subset is
+       a selection of the sorted pool, so its ROCCH, actual DCF and Cllr
+       are obtained with counts over the sorted labels, without sorting again.
+       E.g., the pool can contain the original and the attacked scores of
+       every trial, and each subset selects one of the scores of each trial.
+
+    Attributes:
+      scores: Scores of the pool of trials.
+      labels: Boolean labels, True for target trials.
+      p_tar: Target prior or list of target priors.
+      num_threads: Number of threads to evaluate subsets in parallel.
+    """
+    def __init__(self, scores, labels, p_tar, num_threads=1):
+        scores = np.ravel(scores)
+        labels = np.ravel(labels).astype(bool)
+        assert len(scores) == len(labels)
+
+        # targets go before non-targets when scores are tied,
+        # as in sort_trial_labels
+        sort_idx = np.lexsort((~labels, scores))
+        self._scores = scores[sort_idx]
+        self._labels = labels[sort_idx]
+        self._rank = np.zeros((len(scores),), dtype=np.int64)
+        self._rank[sort_idx] = np.arange(len(scores))
+
+        self.p_tar = np.atleast_1d(np.asarray(p_tar, dtype=float_cpu()))
+        # actual decision thresholds: trials on the left are rejected
+        t = np.log(1-self.p_tar) - np.log(self.p_tar)
+        self._thr_pos = np.searchsorted(self._scores, t, side='left')
+        self.num_threads = num_threads
+
+
+    @property
+    def num_trials(self):
+        return len(self._scores)
+
+
+
+    def _sorted_mask(self, subset):
+        """Converts a subset of the pool into a mask over the sorted pool."""
+        mask = np.zeros((self.num_trials,), dtype=bool)
+        mask[self._rank[subset]] = True
+        return mask
+
+
+
+    def _act_dcf(self, tar_mask, non_mask, ntar, nnon):
+        n_miss = np.array([np.count_nonzero(tar_mask[:p]) for p in self._thr_pos])
+        n_fa = nnon - np.array([np.count_nonzero(non_mask[:p]) for p in self._thr_pos])
+        p_miss = n_miss/ntar
+        p_fa = n_fa/nnon
+        act_dcf = self.p_tar * p_miss + (1-self.p_tar)*p_fa
+        return act_dcf/np.minimum(self.p_tar, 1-self.p_tar)
+
+
+
+    def eval_subset(self, subset, return_cllr=False):
+        """Computes the metrics of a subset of trials.
+
+        Args:
+          subset: Boolean mask or indices of the trials of the pool
+                  in the subset.
+          return_cllr: If True, it also returns Cllr and min. Cllr.
+
+        Returns:
+          Vector of min DCF for each prior.
+          Vector of actual DCF for each prior.
+          EER
+          Cllr and min. Cllr, if return_cllr is True.
+        """
+        mask = self._sorted_mask(subset)
+        tar_mask = np.logical_and(mask, self._labels)
+        non_mask = np.logical_and(mask, ~self._labels)
+        ntar = np.count_nonzero(tar_mask)
+        nnon = np.count_nonzero(non_mask)
+
+        num_tar, width = pav_labels(self._labels[mask])
+        p_miss, p_fa = pav2rocch(num_tar, width)
+        eer = rocch2eer(p_miss, p_fa)
+        min_dcf = np.min(compute_dcf(p_miss, p_fa, self.p_tar), axis=-1)
+        act_dcf = self._act_dcf(tar_mask, non_mask, ntar, nnon)
+        if not return_cllr:
+            return min_dcf, act_dcf, eer
+
+        cllr = compute_cllr(self._scores[tar_mask], self._scores[non_mask])
+        min_cllr = pav2min_cllr(num_tar, width)
+        return min_dcf, act_dcf, eer, cllr, min_cllr
+
+
+
+    def eval_subsets(self, subsets, num_subsets=None, return_cllr=False):
+        """Computes the metrics of many subsets of trials.
+
+        Args:
+          subsets: List of boolean masks or indices of the trials in each subset,
+                   or function that returns the i-th subset, so the subsets
+                   are created on demand.
+          num_subsets: Number of subsets when subsets is a function.
+          return_cllr: If True, it also returns Cllr and min. Cllr.
+
+        Returns:
+          Matrix of min DCF (num_subsets x num_priors).
+          Matrix of actual DCF (num_subsets x num_priors).
+          Vector of EER.
+          Vectors of Cllr and min. Cllr, if return_cllr is True.
+        """
+        if callable(subsets):
+            get_subset = subsets
+        else:
+            get_subset = lambda i: subsets[i]
+            num_subsets = len(subsets)
+
+        eval_i = lambda i: self.eval_subset(get_subset(i), return_cllr)
+        if self.num_threads > 1:
+            with ThreadPool(self.num_threads) as pool:
+                results = pool.map(eval_i, range(num_subsets))
+        else:
+            results = [eval_i(i) for i in range(num_subsets)]
+
+        num_priors = len(self.p_tar)
+        num_metrics = 5 if return_cllr else 3
+        results = list(zip(*results)) if num_subsets > 0 else [[]]*num_metrics
+        min_dcf = np.reshape(results[0], (num_subsets, num_priors)).astype(float_cpu())
+        act_dcf = np.reshape(results[1], (num_subsets, num_priors)).astype(float_cpu())
+        eer = np.asarray(results[2], dtype=float_cpu())
+        if not return_cllr:
+            return min_dcf, act_dcf, eer
+
+        cllr = np.asarray(results[3], dtype=float_cpu())
+        min_cllr = np.asarray(results[4], dtype=float_cpu())
+        return min_dcf, act_dcf, eer, cllr, min_cllr
@@ -7,7 +7,6 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
-from six.moves import xrange
 
 import numpy as np
 
@@ -33,6 +32,108 @@ def effective_prior(p_tar, c_miss, c_fa):
 
 
 
+def sort_trial_labels(tar, non):
+    """Sorts target and non-target scores together in ascending order.
+       Equal scores keep their order, i.e., targets go before non-targets.
+
+    Args:
+      tar: target scores.
+      non: non-target scores.
+
+    Returns:
+      Boolean labels (True for targets) sorted by score.
+      Sorting index of the concatenation of tar and non.
+    """
+    scores = np.concatenate((np.ravel(tar), np.ravel(non)))
+    sort_idx = np.argsort(scores, kind='mergesort')
+    labels = sort_idx < len(tar)
+    return labels, sort_idx
+
+
+
+def _pav_stack(sums, widths):
+    """Pools the blocks with a stack, when a new block violates the
+       monotonicity with the last block, the blocks are merged until
+       the stack is nondecreasing again. Each block is pushed and popped
+       once at most, so it runs in linear time.
+
+    Args:
+      sums: Weighted sums of y in each block.
+      widths: Weights of each block.
+
+    Returns:
+      Weighted sums of y in each pooled block.
+      Weights of each pooled block.
+    """
+    stack_sums = []
+    stack_widths = []
+    for s, n in zip(sums.tolist(), widths.tolist()):
+        # pool while mean of last block >= mean of new block
+        while len(stack_sums) > 0 and stack_sums[-1]*n >= s*stack_widths[-1]:
+            s += stack_sums.pop()
+            n += stack_widths.pop()
+        stack_sums.append(s)
+        stack_widths.append(n)
+
+    return (np.array(stack_sums, dtype=sums.dtype),
+            np.array(stack_widths, dtype=widths.dtype))
+
+
+
+def _pav_blocks(y, w, min_merge_ratio=0.1):
+    """Runs PAV on values y with weights w.
+
+       In each round, every chain of adjacent blocks with nonincreasing
+       means is pooled at once with segment sums. The PAV solution doesn't
+       depend on the order in which adjacent violators are pooled, so
+       when a round pools less than min_merge_ratio of the blocks,
+       the remaining blocks are pooled with a linear-time stack
+       to avoid a quadratic number of rounds.
+
+    Returns:
+      Weighted sums of y in each block.
+      Weights of each block.
+    """
+    sums = y*w
+    widths = w
+    while len(sums) > 1:
+        viol = sums[:-1]*widths[1:] >= sums[1:]*widths[:-1]
+        num_viol = np.count_nonzero(viol)
+        if num_viol == 0:
+            return sums, widths
+        if num_viol < min_merge_ratio*len(sums):
+            return _pav_stack(sums, widths)
+        start = np.flatnonzero(np.concatenate(([True], ~viol)))
+        sums = np.add.reduceat(sums, start)
+        widths = np.add.reduceat(widths, start)
+
+    return sums, widths
+
+
+
+def pav_labels(labels):
+    """PAV on a vector of binary labels sorted by score,
+       as used to compute the ROCCH and the optimal log-LR mapping.
+
+    Args:
+      labels: Boolean or 0/1 labels (1 for targets) sorted by score.
+
+    Returns:
+      Number of targets in each PAV bin.
+      Width of PAV bins, from left to right.
+    """
+    labels = np.asarray(labels, dtype=bool)
+    n = len(labels)
+    assert n > 0
+    # runs of equal labels always end up in the same bin
+    run_start = np.flatnonzero(np.concatenate(([True], labels[1:] != labels[:-1])))
+    run_width = np.diff(np.append(run_start, n))
+    run_value = labels[run_start].astype(np.int64)
+    num_tar, width = _pav_blocks(run_value, run_width)
+    return num_tar.astype(np.int64), width
+
+
+
 def pavx(y):
     """PAV: Pool Adjacent Violators algorithm. Non-paramtetric optimization subject to monotonicity.
 
@@ -41,6 +142,10 @@ def pavx(y):
         data vector y such that sum((y - ghat).^2) is minimal. 
         (Pool-adjacent-violators algorithm).
 
+       Runs of equal values are pooled beforehand, since they always end up
+       in the same bin, and the remaining runs are merged with vectorized
+       pooling rounds finished by a linear-time stack of bins.
+
        Author: This code is and adaptation from Bosaris Toolkit and 
                it is a simplified version of the 'IsoMeans.m' code made available 
                by Lutz Duembgen at:
@@ -60,82 +165,35 @@ def pavx(y):
 
     n = len(y)
     assert n>0
-    index = np.zeros(y.shape, dtype=int)
-    l = np.zeros(y.shape, dtype=int)
-    # An interval of indices is represented by its left endpoint 
-    # ("index") and its length "len" 
-    ghat = np.zeros_like(y)
-
-    ci = 0
-    index[ci] = 0
-    l[ci] = 1
-    ghat[ci] = y[0]
-    # ci is the number of the interval considered currently.
-    # ghat[ci] is the mean of y-values within this interval.
-    for j in xrange(1, n):
-        # a new index intervall, {j}, is created:
-        ci = ci+1
-        index[ci] = j
-        l[ci] = 1
-        ghat[ci] = y[j]
-        #while ci >= 1 and ghat[np.maximum(ci-1,0)] >= ghat[ci]:
-        while ci >= 1 and ghat[ci-1] >= ghat[ci]:
-            # "pool adjacent violators":
-            nw = l[ci-1] + l[ci]
-            ghat[ci-1] = ghat[ci-1] + (l[ci] / nw) * (
-                ghat[ci] - ghat[ci-1])
-            l[ci-1] = nw
-            ci = ci-1
-
-    
-    height = np.copy(ghat[:ci+1])
-    width = l[:ci+1]
-
-    # Now define ghat for all indices:
-    while n >= 1:
-        for j in xrange(index[ci], n):
-            ghat[j] = ghat[ci]
-
-        n = index[ci]
-        ci = ci-1
-
+    run_start = np.flatnonzero(np.concatenate(([True], y[1:] != y[:-1])))
+    run_width = np.diff(np.append(run_start, n))
+    sums, width = _pav_blocks(y[run_start], run_width)
+    height = (sums/width).astype(y.dtype, copy=False)
+    ghat = np.repeat(height, width)
     return ghat, width, height
 
 
 
-def opt_loglr(tar, non, method='laplace'):
-    """Non-parametric optimization of score to log-likelihood-ratio mapping. 
-    
-    Taken from Bosaris toolkit.
-          Niko Brummer and Johan du Preez, Application-Independent Evaluation of Speaker Detection, Computer Speech and Language, 2005
+def _opt_loglr_sorted(labels, ntar, nnon, method='laplace'):
+    """Optimal log-LR of each trial sorted by score.
 
     Args:
-      tar: target scores.
-      non: non-target scores.
-      method: laplace(default, avoids inf log-LR)/raw
-    
+      labels: Boolean labels (True for targets) sorted by score.
+      ntar: number of targets.
+      nnon: number of non-targets.
+      method: laplace/raw
+
     Returns:
-       Calibrated tar and non-tar log-LR
+      Calibrated log-LR of the sorted trials.
     """
-    ntar = len(tar)
-    nnon = len(non)
-    n = ntar+nnon
-
-    scores = np.concatenate((tar, non))
-    p_ideal = np.zeros((n,), dtype=float_cpu())
-    p_ideal[:ntar] = 1
-
-    sort_idx = np.argsort(scores, kind='mergesort')
-    # print(scores)
-    # print(sort_idx)
-    p_ideal = p_ideal[sort_idx]
-
+    n = ntar + nnon
     if method == 'laplace':
         # The extra targets and non-targets at scores of -inf and +inf effectively 
         # implement Laplace's rule of succession to avoid log LRs of infinite magnitudes. 
-        p_ideal = np.concatenate(([1,0], p_ideal, [1,0]))
+        labels = np.concatenate(([True, False], labels, [True, False]))
 
-    p_opt,_,_ = pavx(p_ideal)
+    num_tar, width = pav_labels(labels)
+    p_opt = np.repeat(num_tar/width, width)
 
     if method == 'laplace':
         p_opt = p_opt[2:-2]
@@ -145,13 +203,35 @@ def opt_loglr(tar, non, method='laplace'):
     # it makes no difference to the optimizing LR mapping. 
     # (A synthetic prior DOES change Popt: The posterior log-odds changes by an additive term. But this 
     # this cancels again when converting to log LR. )
-    # print(p_opt)
-    post_log_odds = np.log(p_opt) - np.log(1-p_opt)
+    with np.errstate(divide='ignore'):
+        post_log_odds = np.log(p_opt) - np.log(1-p_opt)
     prior_log_odds = np.log(ntar/nnon)
     llr = post_log_odds - prior_log_odds
     llr += 1e-6 * np.arange(n)/n
+    return llr
+
+
+
+def opt_loglr(tar, non, method='laplace'):
+    """Non-parametric optimization of score to log-likelihood-ratio mapping. 
+    
+    Taken from Bosaris toolkit.
+          Niko Brummer and Johan du Preez, Application-Independent Evaluation of Speaker Detection, Computer Speech and Language, 2005
+
+    Args:
+      tar: target scores.
+      non: non-target scores.
+      method: laplace(default, avoids inf log-LR)/raw
+    
+    Returns:
+       Calibrated tar and non-tar log-LR
+    """
+    ntar = len(tar)
+    nnon = len(non)
 
-    llr[sort_idx] = llr
+    labels, sort_idx = sort_trial_labels(tar, non)
+    llr = np.zeros((ntar+nnon,), dtype=float_cpu())
+    llr[sort_idx] = _opt_loglr_sorted(labels, ntar, nnon, method)
     tar_llr = llr[:ntar]
     non_llr = llr[ntar:]
     
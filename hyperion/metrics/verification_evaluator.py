@@ -21,6 +21,7 @@ from ..utils import TrialKey, TrialScores
 from ..utils.trial_stats import TrialStats
 from .utils import effective_prior
 from .dcf import fast_eval_dcf_eer
+from .subset_evaluator import SubsetEvaluator
 
 class VerificationEvaluator(object):
     """Class computes performance metrics for verification problems.
@@ -207,11 +208,53 @@ class VerificationAdvAttackEvaluator(VerificationEvaluator):
         return self._last_stats_mat
 
 
+    def _get_attack_choice(self, stats, stat_bins, higher_better):
+        """Finds the attack that is used for each trial in each of the stats bins,
+           i.e., the worst attack (lowest SNR or highest Linf) that meets the 
+           bin criterion.
+
+        Args:
+           stats: Stats of the attacks (num_attacks x num_trials).
+           stat_bins: Bins sorted from best to worst.
+           higher_better: True for SNR, False for Linf, L2, ...
+
+        Returns:
+           Function that returns the attack index for each trial in the b-th bin,
+           -1 if no attack meets the criterion.
+        """
+        if higher_better:
+            stats = -stats
+            stat_bins = -stat_bins
+
+        # sort the attacks of each trial by increasing stat, 
+        # tied attacks in decreasing index order, so the last one 
+        # meeting the criterion is the first one in the original order
+        attack_idx = np.broadcast_to(
+            np.arange(self.num_attacks)[:,None], stats.shape)
+        order = np.lexsort((-attack_idx, stats), axis=0)
+        sorted_stats = np.take_along_axis(stats, order, axis=0)
+        trial_idx = np.arange(stats.shape[1])
+
+        def get_choice(b):
+            num_valid = np.sum(sorted_stats <= stat_bins[b], axis=0)
+            choice = order[np.maximum(num_valid - 1, 0), trial_idx]
+            choice[num_valid == 0] = -1
+            return choice
+
+        return get_choice
+
+
+
     def compute_dcf_eer_vs_stats(self, stat_name, stat_bins, 
                                  attacked_trials='all', higher_better=False, 
-                                 return_df=False):
+                                 return_df=False, num_threads=1):
         """
         Computes DCF/EER versus SNR/Linf/etc curves
+
+        The original and attack scores are pooled and sorted only once,
+        each bin selects one score per trial from the pool. 
+        When several attacks of a trial meet the bin criterion, the
+        worst one (lowest SNR, highest Linf) is used.
         
         Args:
            stat_name: stat name for x-axis matching pandas DataFrame column name.
@@ -221,6 +264,7 @@ class VerificationAdvAttackEvaluator(VerificationEvaluator):
            higher_better: Indicates if the stat_name (x-axis) is better if is high. 
                           True for SNR, false for Linf,L2,...
            return_df: if True, it returns the result in a pandas DataFrame object.
+           num_threads: number of threads to evaluate the bins in parallel.
 
         Returns:
            stat_bins, min_dcf, act_dcf, eer arrays or pandas DataFrame
@@ -229,54 +273,41 @@ class VerificationAdvAttackEvaluator(VerificationEvaluator):
         # sort stats bins from best to worse
         stat_bins = self._sort_stats_bins(stat_bins, higher_better)
 
+        # trials to evaluate
+        trial_mask = np.logical_and(
+            self.scores.score_mask, np.logical_or(self.key.tar, self.key.non))
+        labels = self.key.tar[trial_mask]
+        num_trials = len(labels)
+
         if attacked_trials == 'all':
-            mask = np.logical_or(self.key.tar, self.key.non)
+            mask = np.ones_like(labels)
         elif attacked_trials == 'tar':
-            mask = self.key.tar
+            mask = labels
         else:
-            mask = self.key.non
+            mask = np.logical_not(labels)
 
         # extract the stats and align with the score matrices
-        stats_mat = self._get_stats_mat(stat_name)
+        stats = self._get_stats_mat(stat_name)[:, trial_mask]
+        get_choice = self._get_attack_choice(stats, stat_bins, higher_better)
+
+        # pool with the original scores followed by the scores of each attack
+        pool_scores = np.concatenate(
+            (self.scores.scores[trial_mask][None], 
+             self.attack_scores[:, trial_mask]), axis=0)
+        pool_labels = np.tile(labels, self.num_attacks+1)
+        evaluator = SubsetEvaluator(
+            pool_scores, pool_labels, self.p_tar, num_threads=num_threads)
+
+        trial_idx = np.arange(num_trials)
+        def get_subset(b):
+            choice = get_choice(b)
+            choice[~mask] = -1
+            logging.info('bin %d %s=%f num_attacked_trials=%d' % (
+                b, stat_name, stat_bins[b], np.sum(choice >= 0)))
+            return (choice + 1)*num_trials + trial_idx
 
         num_bins = len(stat_bins)
-        eer = np.zeros((num_bins,), dtype=float_cpu())
-        min_dcf = np.zeros((num_bins, len(self.p_tar)), dtype=float_cpu())
-        act_dcf = np.zeros((num_bins, len(self.p_tar)), dtype=float_cpu())
-
-        if higher_better:
-            cmp_func = lambda x,y: np.logical_and(np.greater_equal(x,y), mask)
-            sort_func = lambda x: np.argmin(x)
-        else:
-            cmp_func = lambda x,y: np.logical_and(np.less_equal(x,y), mask)
-            sort_func = lambda x: np.argmax(x)
-
-        scores_attack = copy.deepcopy(self.scores)
-        print(np.max(stats_mat, axis=(1,2)))
-        for b in range(num_bins):
-            # we initialize the score matrix with non-attack scores
-            scores = copy.copy(self.scores.scores)
-            #find attack scores that meet the bin criteria
-            score_mask = cmp_func(stats_mat, stat_bins[b])
-            print(b,np.sum(score_mask, axis=(1,2)))
-            
-            if self.num_attacks == 1:
-                scores[score_mask[0]] = self.attack_scores[score_mask]
-            else:
-                for i in range(scores.shape[0]):
-                    for j in range(scores.shape[1]):
-                        mask_ij = score_mask[:,i,j]
-                        if np.any(mask_ij):
-                            k = sort_func(stats_mat[mask_ij, i, j])
-                            scores[i,j] = self.attack_scores[k, i, j]
-
-            scores_attack.scores = scores
-            tar, non = scores_attack.get_tar_non(self.key)
-            min_dcf_b, act_dcf_b, eer_b, _ = fast_eval_dcf_eer(
-                tar, non, self.p_tar)
-            eer[b] = eer_b
-            min_dcf[b] = min_dcf_b
-            act_dcf[b] = act_dcf_b
+        min_dcf, act_dcf, eer = evaluator.eval_subsets(get_subset, num_bins)
 
         if not return_df:
             return stat_bins, min_dcf, act_dcf, eer
@@ -8,6 +8,8 @@ from .plda_base import PLDABase
 from .frplda import FRPLDA
 from .splda import SPLDA
 from .plda import PLDA
+from .plda_block_scorer import PLDABlockScorer
+from .plda_scoring_index import PLDAScoringIndex
 
 
 
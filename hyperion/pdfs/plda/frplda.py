@@ -263,8 +263,16 @@ class FRPLDA(PLDABase):
 
 
 
-    def llr_1vs1(self, x1, x2):
-
+    def llr_1vs1_project_params(self):
+        """Computes the parameters of the projection used by
+           llr_1vs1_project, so the 1vs1 LLR between two vectors
+           is llr(x1, x2) = dot(g1, g2) + q1 + q2, with
+             g = x A_tar + c_tar,
+             q = 0.5*(|g|^2 - |x A_non + c_non|^2) + q0.
+
+        Returns:
+          A_tar, c_tar, A_non, c_non, q0
+        """
         assert self.is_init
         
         Lnon = self.B + self.W
@@ -279,29 +287,18 @@ class FRPLDA(PLDABase):
             right_inv=True, return_logdet=True)[:2]
         logLtar = 2*logcholLtar
 
-        WF1 = np.dot(x1, self.W)
-        WF2 = np.dot(x2, self.W)
-        Bmu = np.dot(self.mu, self.B)
-
-        gamma_non_1 = mult_icholLnon(WF1+Bmu)
-        gamma_non_2 = mult_icholLnon(WF2+Bmu)
+        Bmu = np.dot(self.mu, self.B)[None, :]
 
-        Qnon_1 = np.sum(gamma_non_1*gamma_non_1, axis=1)[:, None]
-        Qnon_2 = np.sum(gamma_non_2*gamma_non_2, axis=1)
+        A_non = mult_icholLnon(self.W)
+        c_non = mult_icholLnon(Bmu)[0]
 
-        gamma_tar_1 = mult_icholLtar(WF1+0.5*Bmu)
-        gamma_tar_2 = mult_icholLtar(WF2+0.5*Bmu)
+        A_tar = mult_icholLtar(self.W)
+        c_tar = mult_icholLtar(0.5*Bmu)[0]
 
-        Qtar_1 = np.sum(gamma_tar_1*gamma_tar_1, axis=1)[:, None]
-        Qtar_2 = np.sum(gamma_tar_2*gamma_tar_2, axis=1)
-
-        scores = 2*np.dot(gamma_tar_1, gamma_tar_2.T)
-        scores += (Qtar_1-Qnon_1+Qtar_2-Qnon_2)
-        scores += (2*logLnon-logLtar
+        q0 = 0.25*(2*logLnon-logLtar
                    -logdet_pdmat(self.B)
-                   +np.inner(np.dot(self.mu, self.B), self.mu))
-        scores *= 0.5
-        return scores
+                   +np.inner(Bmu[0], self.mu))
+        return A_tar, c_tar, A_non, c_non, q0
                 
 
     
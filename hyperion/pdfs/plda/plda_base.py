@@ -4,10 +4,12 @@
 """
 
 import numpy as np
+import scipy.linalg as la
 
 from abc import ABCMeta, abstractmethod
 
 from ...hyp_defs import float_cpu
+from ...utils.class_stats import ClassStats
 from ..core.pdf import PDF
 from ...transforms import LNorm
 
@@ -39,9 +41,6 @@ class PLDABase(PDF):
             x_val=None, class_ids_val=None, ptheta_val=None, sample_weight_val=None,
             epochs=20, ml_md='ml+md', md_epochs=None):
 
-        use_ml = False if ml_md == 'md' else True
-        use_md = False if ml_md == 'ml' else True
-        
         assert(not(class_ids is  None and ptheta is None))
         if class_ids is None:
             D = self.compute_stats_soft(x, ptheta)
@@ -55,8 +54,29 @@ class PLDABase(PDF):
                 D_val = self.compute_stats_soft(x_val, ptheta_val)
             else:
                 D_val = self.compute_stats_hard(x_val, class_ids_val)
+        else:
+            D_val = None
+
+        return self.fit_stats(D, D_val, epochs=epochs, ml_md=ml_md,
+                              md_epochs=md_epochs)
+
 
 
+    def fit_stats(self, D, D_val=None, epochs=20, ml_md='ml+md', md_epochs=None):
+        """Trains the model from sufficient statistics (N, F, S),
+           e.g., computed by chunks with ClassStats when the training
+           vectors don't fit in memory.
+
+        Args:
+          D: tuple of training stats (N, F, S).
+          D_val: tuple of validation stats (N, F, S).
+          epochs: number of EM iterations.
+          ml_md: 'ml', 'md' or 'ml+md' M-step types.
+          md_epochs: epochs where the MD step is done.
+        """
+        use_ml = False if ml_md == 'md' else True
+        use_md = False if ml_md == 'ml' else True
+
         if not self.is_init:
             self.initialize(D)
 
@@ -67,7 +87,7 @@ class PLDABase(PDF):
             
             stats=self.Estep(D)
             elbo[epoch]=self.elbo(stats)
-            if x_val is not None:
+            if D_val is not None:
                 stats_val=self.Estep(D_val)
                 elbo_val[epoch]=self.elbo(stats_val)
 
@@ -77,7 +97,7 @@ class PLDABase(PDF):
                 self.MstepMD(stats)
 
         elbo_norm= elbo/np.sum(D[0])
-        if x_val is None:
+        if D_val is None:
             return elbo, elbo_norm
         else:
             elbo_val_norm = elbo_val/np.sum(D_val[0])
@@ -100,14 +120,179 @@ class PLDABase(PDF):
 
     
     @abstractmethod
-    def llr_1vs1(self, x1, x2):
+    def llr_1vs1_project_params(self):
         pass
 
+
+
+    def llr_1vs1_project(self, x):
+        """Projects the vectors such as the 1vs1 LLR between two vectors
+           is llr(x1, x2) = dot(g1, g2) + q1 + q2.
+
+        Args:
+          x: vectors (num_vectors x x_dim).
+
+        Returns:
+          Projected vectors g (num_vectors x g_dim).
+          Offsets q (num_vectors,).
+        """
+        return self.llr_1vs1_project_from_params(
+            x, *self.llr_1vs1_project_params())
+
+
+
+    @staticmethod
+    def llr_1vs1_project_from_params(x, A_tar, c_tar, A_non, c_non, q0):
+        """Projects the vectors using the parameters returned by
+           llr_1vs1_project_params.
+
+        Returns:
+          Projected vectors g = x A_tar + c_tar.
+          Offsets q = 0.5*(|g|^2 - |x A_non + c_non|^2) + q0.
+        """
+        g = np.dot(x, A_tar)
+        g += c_tar
+        g_non = np.dot(x, A_non)
+        g_non += c_non
+        q = 0.5*(np.einsum('ij,ij->i', g, g) -
+                 np.einsum('ij,ij->i', g_non, g_non)) + q0
+        return g, q
+
+
+    
+    def llr_1vs1(self, x1, x2):
+        """Computes the LLR between all the pairs of vectors in x1 and x2.
+
+        Args:
+          x1: vectors (num_vectors1 x x_dim).
+          x2: vectors (num_vectors2 x x_dim).
+
+        Returns:
+          Scores matrix (num_vectors1 x num_vectors2).
+        """
+        g1, q1 = self.llr_1vs1_project(x1)
+        g2, q2 = self.llr_1vs1_project(x2)
+        scores = np.dot(g1, g2.T)
+        scores += q1[:, None]
+        scores += q2
+        return scores
+
     
     @abstractmethod
     def llr_NvsM_book(self, D1, D2):
         pass
 
+
+
+    @staticmethod
+    def compute_py_g_x_eig(gamma, N, VWV, return_cov=False,
+                           return_logpy_0=False, return_acc=False):
+        """Computes the posterior of the speaker factors for all the classes
+           at once. With the eigendecomposition VWV = Q diag(lambda) Q',
+           (I + N_i VWV)^{-1} = Q diag(1/(1 + N_i lambda)) Q', so any vector
+           of counts (integer or fractional) only needs diagonal rescalings.
+
+        Args:
+          gamma: V W (F_i - N_i mu) (num_classes x y_dim).
+          N: zero order statistics (num_classes,).
+          VWV: V W V' (y_dim x y_dim).
+          return_cov: If True, it also returns the covariances of y.
+          return_logpy_0: If True, it also returns log p(y=0|x).
+          return_acc: If True, it also returns the accumulators
+                      Ry = sum_i N_i Sigma_y_i and Py = sum_i Sigma_y_i.
+
+        Returns:
+          Posterior means y, and optionally Sigma_y, logpy, Ry, Py.
+        """
+        lam, Q = la.eigh(VWV)
+        L = 1 + N[:, None]*lam
+        iL = 1/L
+        gQ = np.dot(gamma, Q)
+        y = np.dot(gQ*iL, Q.T)
+
+        if not(return_cov or return_logpy_0 or return_acc):
+            return y
+
+        r = [y]
+        if return_cov:
+            r += [np.einsum('ik,jk,mk->mij', Q, Q, iL)]
+        if return_logpy_0:
+            y_dim = VWV.shape[0]
+            logpy = 0.5*(np.sum(np.log(L), axis=-1)
+                         - np.sum(gQ*gQ*iL, axis=-1)
+                         - y_dim*np.log(2*np.pi))
+            r += [logpy]
+        if return_acc:
+            Ry = np.dot(Q*np.dot(N, iL), Q.T)
+            Py = np.dot(Q*np.sum(iL, axis=0), Q.T)
+            r += [Ry, Py]
+        return tuple(r)
+
+
+
+    @staticmethod
+    def llr_NvsM_book_eig(N1, VWF1, N2, VWF2, VWV, block_size=2**22):
+        """Computes the LLR between all the pairs of classes in two books
+           of statistics. With the eigendecomposition
+           VWV = Q diag(lambda) Q', all the Cholesky factorizations of
+           I + N VWV are replaced by diagonal rescalings.
+
+           Rows with the same count are scored with matrix products.
+           When both sides have mostly different (e.g. fractional) counts,
+           the scores are computed in blocks of rows with at most
+           block_size elements per intermediate tensor.
+
+        Args:
+          N1: zero order stats of the first book (num_classes1,).
+          VWF1: V W (F1 - N1 mu) for the first book (num_classes1 x y_dim).
+          N2: zero order stats of the second book (num_classes2,).
+          VWF2: V W (F2 - N2 mu) for the second book (num_classes2 x y_dim).
+          VWV: V W V' (y_dim x y_dim).
+          block_size: max. number of elements of the intermediate tensors.
+
+        Returns:
+          Scores matrix (num_classes1 x num_classes2).
+        """
+        u1 = np.unique(N1)
+        u2 = np.unique(N2)
+        if len(u1) > len(u2):
+            return PLDABase.llr_NvsM_book_eig(
+                N2, VWF2, N1, VWF1, VWV, block_size).T
+
+        lam, Q = la.eigh(VWV)
+        h1 = np.dot(VWF1, Q)
+        h2 = np.dot(VWF2, Q)
+
+        L1 = 1 + N1[:, None]*lam
+        L2 = 1 + N2[:, None]*lam
+        # log|L_non| - Q_non of each side
+        q1 = np.sum(np.log(L1), axis=-1) - np.sum(h1*h1/L1, axis=-1)
+        q2 = np.sum(np.log(L2), axis=-1) - np.sum(h2*h2/L2, axis=-1)
+
+        scores = np.zeros((len(N1), len(N2)), dtype=float_cpu())
+        if 8*len(u1) <= len(N1):
+            for n1 in u1:
+                i = N1 == n1
+                iLtar = 1/(1 + (n1 + N2[:, None])*lam)
+                h1_i = h1[i]
+                # |h1 + h2|^2 weighted by iLtar
+                scores_i = 2*np.dot(h1_i, (h2*iLtar).T)
+                scores_i += np.dot(h1_i*h1_i, iLtar.T)
+                scores_i += np.sum(h2*h2*iLtar + np.log(iLtar), axis=-1)
+                scores[i] = scores_i
+        else:
+            num_rows = max(1, block_size//(len(N2)*len(lam)))
+            for first in range(0, len(N1), num_rows):
+                last = min(first + num_rows, len(N1))
+                iLtar = 1/(1 + (N1[first:last, None, None] + N2[:, None])*lam)
+                h = h1[first:last, None, :] + h2
+                scores[first:last] = np.sum(h*h*iLtar + np.log(iLtar), axis=-1)
+
+        scores += q1[:, None]
+        scores += q2
+        scores *= 0.5
+        return scores
+
     
 
     def fit_adapt_weighted_avg_model(
@@ -230,25 +415,8 @@ class PLDABase(PDF):
 
     @staticmethod
     def compute_stats_hard(x, class_ids, sample_weight=None, scale_factor=None):
-        x_dim = x.shape[1]
-        num_classes = np.max(class_ids)+1
-        N = np.zeros((num_classes,), dtype=float_cpu())
-        F = np.zeros((num_classes, x_dim), dtype=float_cpu())
-        if sample_weight is not None:
-            wx = sample_weight[:, None] * x
-        else:
-            wx = x
-
-        for i in range(num_classes):
-            idx = class_ids == i
-            if sample_weight is None:
-                N[i] = np.sum(idx).astype(float_cpu())
-                F[i] = np.sum(x[idx], axis=0)
-            else:
-                N[i] = np.sum(sample_weight[idx])
-                F[i] = np.sum(wx[idx], axis=0)
-            
-        S = np.dot(x.T, wx)
+        N, F, S = ClassStats.compute(
+            x, class_ids, sample_weight=sample_weight).get_stats()
         if scale_factor is not None:
             N *= scale_factor
             F *= scale_factor
@@ -0,0 +1,237 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+ Block-wise PLDA scoring of large trial lists.
+"""
+
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import scipy.sparse as sparse
+
+from ...hyp_defs import float_cpu
+from ...utils.trial_scores import TrialScores
+from ...utils.sparse_trial_scores import SparseTrialScores
+
+
+class PLDABlockScorer(object):
+    """Computes 1vs1 PLDA scores for large trial lists.
+
+       The enrollment and test vectors are projected with
+       PLDA.llr_1vs1_project, so the LLR of a trial is
+       dot(g_e, g_t) + q_e + q_t. The trial matrix is divided into
+       tiles of enroll_block_size x test_block_size. Only the trials
+       in the trial mask are computed: tiles without trials are skipped,
+       dense tiles are computed with a matrix product, and sparse tiles
+       only compute the dot products of the trials in the mask.
+       The blocks of test vectors are processed in a thread pool.
+
+    Attributes:
+      model: PLDA, SPLDA or FRPLDA model.
+      enroll_block_size: Number of enrollment vectors per tile.
+      test_block_size: Number of test vectors per tile.
+      num_threads: Number of threads to process test blocks in parallel.
+      min_block_density: Minimum ratio of trials in a tile to compute
+                         all the scores of the tile with a matrix product.
+    """
+
+    def __init__(self, model, enroll_block_size=4096, test_block_size=4096,
+                 num_threads=1, min_block_density=0.05):
+        self.model = model
+        self.enroll_block_size = enroll_block_size
+        self.test_block_size = test_block_size
+        self.num_threads = num_threads
+        self.min_block_density = min_block_density
+
+
+
+    @staticmethod
+    def _get_test_block_trials(trial_mask, first, last):
+        """Returns the enrollment and test indices of the trials
+           of a block of test vectors sorted by test index.
+        """
+        if sparse.issparse(trial_mask):
+            mask = trial_mask[:, first:last].tocoo()
+            nz = mask.data != 0
+            rows, cols = mask.row[nz], mask.col[nz]
+            idx = np.lexsort((rows, cols))
+            return rows[idx].astype(np.int64), cols[idx].astype(np.int64)
+
+        cols, rows = np.nonzero(trial_mask[:, first:last].T)
+        return rows, cols
+
+
+
+    def _score_test_block(self, g_e, q_e, x_t, trial_mask, first, last):
+        """Computes the scores of the trials of a block of test vectors.
+
+        Returns:
+          Enrollment indices, test indices and scores of the trials.
+        """
+        if trial_mask is None:
+            g_t, q_t = self.model.llr_1vs1_project(x_t[first:last])
+            scores = np.dot(g_t, g_e.T)
+            scores += q_t[:, None]
+            scores += q_e
+            cols, rows = np.divmod(
+                np.arange(scores.size, dtype=np.int64), len(g_e))
+            return rows, cols + first, scores.ravel()
+            
+        rows, cols = self._get_test_block_trials(trial_mask, first, last)
+        scores = np.zeros((len(rows),), dtype=float_cpu())
+        if len(rows) == 0:
+            return rows, cols + first, scores
+
+        g_t, q_t = self.model.llr_1vs1_project(x_t[first:last])
+        tile_size = self.enroll_block_size * (last - first)
+        tiles = rows // self.enroll_block_size
+        counts = np.bincount(tiles)
+        order = np.argsort(tiles, kind='stable')
+        tile_start = np.cumsum(counts) - counts
+        for tile in np.flatnonzero(counts):
+            idx = order[tile_start[tile]:tile_start[tile]+counts[tile]]
+            r = rows[idx]
+            c = cols[idx]
+            if counts[tile] >= self.min_block_density * tile_size:
+                r0 = tile * self.enroll_block_size
+                r1 = min(r0 + self.enroll_block_size, len(g_e))
+                scores_tile = np.dot(g_e[r0:r1], g_t.T)
+                scores[idx] = scores_tile[r - r0, c]
+            else:
+                scores[idx] = np.einsum('ij,ij->i', g_e[r], g_t[c])
+
+        scores += q_e[rows]
+        scores += q_t[cols]
+        return rows, cols + first, scores
+
+
+
+    def _score_blocks(self, x_e, x_t, trial_mask):
+        """Generator that returns the trials and scores of each test block
+           in order.
+        """
+        g_e, q_e = self.model.llr_1vs1_project(x_e)
+        num_tests = x_t.shape[0]
+        blocks = [(g_e, q_e, x_t, trial_mask, first,
+                   min(first + self.test_block_size, num_tests))
+                  for first in range(0, num_tests, self.test_block_size)]
+        if self.num_threads > 1:
+            pool = ThreadPool(self.num_threads)
+            try:
+                for r in pool.imap(lambda args: self._score_test_block(*args),
+                                   blocks):
+                    yield r
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for args in blocks:
+                yield self._score_test_block(*args)
+
+
+
+    def score(self, x_e, x_t, model_set, seg_set, trial_mask=None):
+        """Computes the scores of the trials.
+
+        Args:
+          x_e: enrollment vectors (num_models x x_dim).
+          x_t: test vectors (num_tests x x_dim).
+          model_set: model names.
+          seg_set: test segment names.
+          trial_mask: dense or scipy sparse boolean matrix
+                      (num_models x num_tests) with the trials to compute,
+                      if None, it computes all the trials.
+
+        Returns:
+          TrialScores object if trial_mask is None,
+          SparseTrialScores object otherwise.
+        """
+        if trial_mask is None:
+            scores = np.zeros((x_e.shape[0], x_t.shape[0]), dtype=float_cpu())
+            for rows, cols, scores_b in self._score_blocks(x_e, x_t, None):
+                scores[rows, cols] = scores_b
+            return TrialScores(model_set, seg_set, scores)
+
+        rows = []
+        cols = []
+        scores = []
+        for rows_b, cols_b, scores_b in self._score_blocks(x_e, x_t, trial_mask):
+            rows.append(rows_b)
+            cols.append(cols_b)
+            scores.append(scores_b)
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        scores = np.concatenate(scores)
+        shape = (x_e.shape[0], x_t.shape[0])
+        score_mask = sparse.csr_matrix(
+            (np.ones(len(rows), dtype='bool'), (rows, cols)), shape=shape)
+        scores = sparse.csr_matrix((scores, (rows, cols)), shape=shape)
+        return SparseTrialScores(model_set, seg_set, scores, score_mask)
+
+
+
+    def score_to_file(self, x_e, x_t, model_set, seg_set, file_path,
+                      trial_mask=None):
+        """Computes the scores of the trials and writes them to a text
+           file while they are computed, so the scores of all the trials
+           don't need to be kept in memory. The file has the same format
+           as TrialScores.save_txt.
+
+        Args:
+          x_e: enrollment vectors (num_models x x_dim).
+          x_t: test vectors (num_tests x x_dim).
+          model_set: model names.
+          seg_set: test segment names.
+          file_path: Output score file.
+          trial_mask: dense or scipy sparse boolean matrix
+                      (num_models x num_tests) with the trials to compute,
+                      if None, it computes all the trials.
+
+        Returns:
+          Number of trials scored.
+        """
+        num_trials = 0
+        with open(file_path, 'w') as f:
+            for rows, cols, scores in self._score_blocks(x_e, x_t, trial_mask):
+                f.writelines('%s %s %f\n' % (model_set[r], seg_set[c], s)
+                             for r, c, s in zip(rows, cols, scores))
+                num_trials += len(scores)
+        return num_trials
+
+
+
+    @staticmethod
+    def filter_args(prefix=None, **kwargs):
+        if prefix is None:
+            p = ''
+        else:
+            p = prefix + '_'
+        valid_args = ('enroll_block_size', 'test_block_size',
+                      'num_threads', 'min_block_density')
+        return dict((k, kwargs[p+k])
+                    for k in valid_args if p+k in kwargs)
+
+
+
+    @staticmethod
+    def add_argparse_args(parser, prefix=None):
+        if prefix is None:
+            p1 = '--'
+            p2 = ''
+        else:
+            p1 = '--' + prefix + '-'
+            p2 = prefix + '_'
+        parser.add_argument(p1+'enroll-block-size', dest=(p2+'enroll_block_size'),
+                            default=4096, type=int,
+                            help=('number of enrollment vectors per scoring block'))
+        parser.add_argument(p1+'test-block-size', dest=(p2+'test_block_size'),
+                            default=4096, type=int,
+                            help=('number of test vectors per scoring block'))
+        parser.add_argument(p1+'num-threads', dest=(p2+'num_threads'),
+                            default=1, type=int,
+                            help=('number of threads to score test blocks in parallel'))
+        parser.add_argument(p1+'min-block-density', dest=(p2+'min_block_density'),
+                            default=0.05, type=float,
+                            help=('minimum ratio of trials in a block to compute '
+                                  'all the scores of the block with a matrix product'))
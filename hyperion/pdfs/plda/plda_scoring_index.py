@@ -0,0 +1,247 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+ Persistent index of projected PLDA enrollment vectors.
+"""
+import os
+
+import numpy as np
+import h5py
+
+from ...hyp_defs import float_cpu, float_save
+from ...utils.trial_scores import TrialScores
+from .plda_base import PLDABase
+
+
+class PLDAScoringIndex(object):
+    """Stores the enrollment vectors projected with
+       PLDA.llr_1vs1_project and the parameters of that projection, so
+       the PLDA Cholesky factorizations are computed only once when the
+       index is created.
+
+       The 1vs1 LLR between enrollment e and test t is
+       dot(g_e, g_t) + q_e + q_t, so scoring a batch of test vectors
+       needs one projection and one matrix product. Enrollments can be
+       appended or removed without recomputing the rest of the index.
+
+    Attributes:
+      A_tar, c_tar, A_non, c_non, q0: projection parameters returned by
+                                      PLDA.llr_1vs1_project_params.
+      keys: enrollment ids.
+      g: projected enrollment vectors (num_enroll x g_dim).
+      q: enrollment offsets (num_enroll,).
+    """
+    def __init__(self, A_tar, c_tar, A_non, c_non, q0,
+                 keys=None, g=None, q=None):
+        self.A_tar = A_tar
+        self.c_tar = c_tar
+        self.A_non = A_non
+        self.c_non = c_non
+        self.q0 = q0
+
+        g_dim = A_tar.shape[1]
+        if keys is None:
+            keys = np.zeros((0,), dtype='U')
+            g = np.zeros((0, g_dim), dtype=float_cpu())
+            q = np.zeros((0,), dtype=float_cpu())
+
+        self._num_enroll = len(keys)
+        self._keys = np.asarray(keys)
+        self._g = g
+        self._q = q
+        self._key2idx = dict((k, i) for i, k in enumerate(self._keys))
+        assert len(self._key2idx) == len(self._keys), 'Repeated enrollment keys'
+
+
+
+    @classmethod
+    def create(cls, model, keys=None, x=None):
+        """Creates the index from a PLDA model.
+
+        Args:
+          model: PLDA, SPLDA or FRPLDA model.
+          keys: enrollment ids.
+          x: enrollment vectors (num_enroll x x_dim).
+        """
+        index = cls(*model.llr_1vs1_project_params())
+        if keys is not None:
+            index.append(keys, x)
+        return index
+
+
+
+    def __len__(self):
+        return self._num_enroll
+
+
+
+    @property
+    def keys(self):
+        return self._keys[:self._num_enroll]
+
+
+    @property
+    def g(self):
+        return self._g[:self._num_enroll]
+
+
+    @property
+    def q(self):
+        return self._q[:self._num_enroll]
+
+
+
+    def project(self, x):
+        """Projects vectors as PLDA.llr_1vs1_project.
+
+        Args:
+          x: vectors (num_vectors x x_dim).
+
+        Returns:
+          Projected vectors g (num_vectors x g_dim).
+          Offsets q (num_vectors,).
+        """
+        return PLDABase.llr_1vs1_project_from_params(
+            x, self.A_tar, self.c_tar, self.A_non, self.c_non, self.q0)
+
+
+
+    def append(self, keys, x):
+        """Adds enrollments to the index.
+
+        Args:
+          keys: enrollment ids.
+          x: enrollment vectors (num_vectors x x_dim).
+        """
+        keys = np.asarray(keys)
+        for key in keys:
+            if key in self._key2idx:
+                raise ValueError('Enrollment %s already in the index' % key)
+        if len(np.unique(keys)) != len(keys):
+            raise ValueError('Repeated enrollment keys')
+
+        g, q = self.project(x)
+        n = self._num_enroll
+        m = n + len(keys)
+        if m > len(self._keys):
+            # grows the buffers geometrically to amortize the copies
+            capacity = max(m, 2*len(self._keys))
+            self._keys = self._resize(self._keys, capacity, keys.dtype)
+            self._g = self._resize(self._g, capacity, g.dtype)
+            self._q = self._resize(self._q, capacity, q.dtype)
+        elif self._keys.dtype.itemsize < keys.dtype.itemsize:
+            self._keys = self._keys.astype(keys.dtype)
+
+        self._keys[n:m] = keys
+        self._g[n:m] = g
+        self._q[n:m] = q
+        for i, key in enumerate(keys):
+            self._key2idx[key] = n + i
+        self._num_enroll = m
+
+
+    def _resize(self, a, capacity, dtype):
+        dtype = np.promote_types(a.dtype, dtype)
+        b = np.zeros((capacity,) + a.shape[1:], dtype=dtype)
+        b[:self._num_enroll] = a[:self._num_enroll]
+        return b
+
+
+
+    def remove(self, keys):
+        """Removes enrollments from the index.
+
+        Args:
+          keys: enrollment ids.
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+        index = []
+        for key in keys:
+            if key not in self._key2idx:
+                raise ValueError('Enrollment %s not in the index' % key)
+            index.append(self._key2idx[key])
+
+        keep = np.ones((self._num_enroll,), dtype=bool)
+        keep[index] = False
+        m = np.sum(keep)
+        self._keys[:m] = self.keys[keep]
+        self._g[:m] = self.g[keep]
+        self._q[:m] = self.q[keep]
+        self._num_enroll = m
+        self._key2idx = dict((k, i) for i, k in enumerate(self.keys))
+
+
+
+    def score(self, x, enroll_keys=None):
+        """Computes the LLR between enrollments and test vectors.
+
+        Args:
+          x: test vectors (num_tests x x_dim).
+          enroll_keys: enrollment ids to score, if None, scores all
+                       the enrollments in the index.
+
+        Returns:
+          Scores matrix (num_enroll x num_tests).
+        """
+        g_e = self.g
+        q_e = self.q
+        if enroll_keys is not None:
+            index = [self._key2idx[k] for k in enroll_keys]
+            g_e = g_e[index]
+            q_e = q_e[index]
+
+        g_t, q_t = self.project(x)
+        scores = np.dot(g_e, g_t.T)
+        scores += q_e[:, None]
+        scores += q_t
+        return scores
+
+
+
+    def score_trials(self, x, seg_set, enroll_keys=None):
+        """Computes the LLR between enrollments and test vectors.
+
+        Args:
+          x: test vectors (num_tests x x_dim).
+          seg_set: test segment names.
+          enroll_keys: enrollment ids to score, if None, scores all
+                       the enrollments in the index.
+
+        Returns:
+          TrialScores object.
+        """
+        if enroll_keys is None:
+            enroll_keys = self.keys
+        scores = self.score(x, enroll_keys)
+        return TrialScores(np.asarray(enroll_keys), seg_set, scores)
+
+
+
+    def save(self, file_path):
+        """Saves the index to h5 file."""
+        file_dir = os.path.dirname(file_path)
+        if file_dir != '' and not os.path.isdir(file_dir):
+            os.makedirs(file_dir, exist_ok=True)
+
+        with h5py.File(file_path, 'w') as f:
+            for k in ['A_tar', 'c_tar', 'A_non', 'c_non', 'g', 'q']:
+                f.create_dataset(
+                    k, data=np.asarray(getattr(self, k)).astype(float_save(), copy=False))
+            f.attrs['q0'] = self.q0
+            f.create_dataset('keys', data=self.keys.astype('S'))
+
+
+
+    @classmethod
+    def load(cls, file_path):
+        """Loads the index from h5 file."""
+        with h5py.File(file_path, 'r') as f:
+            params = dict((k, np.asarray(f[k], dtype=float_cpu()))
+                          for k in ['A_tar', 'c_tar', 'A_non', 'c_non', 'g', 'q'])
+            keys = np.asarray(f['keys']).astype('U')
+            q0 = f.attrs['q0']
+
+        return cls(params['A_tar'], params['c_tar'], params['A_non'],
+                   params['c_non'], q0, keys, params['g'], params['q'])
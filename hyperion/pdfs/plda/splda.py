@@ -73,84 +73,12 @@ class SPLDA(PLDABase):
                        return_acc=False):
         N, F, S = D
         Fc = F - self.mu
-        
-        M = F.shape[0]
-        y_dim = self.y_dim
-
         WV = np.dot(self.W, self.V.T)
         VV = np.dot(self.V, WV)
-
-        compute_inv = return_cov or return_acc
-        return_tuple = compute_inv or return_logpy_0
-
-        N_is_int = False
-        if np.all(np.ceil(N) == N):
-            N_is_int = True
-
-        I = np.eye(y_dim, dtype=float_cpu())
         gamma = np.dot(Fc, WV)
-        if N_is_int:
-            iterator = np.unique(N)
-        else:
-            iterator = xrange(M)
-
-        y = np.zeros((M, y_dim), dtype=float_cpu())
-        if return_cov:
-            Sigma_y = np.zeros((M, y_dim, y_dim), dtype=float_cpu())
-        else:
-            Sigma_y = None
-            
-        if return_logpy_0:
-            logpy = - 0.5*y_dim*np.log(2*np.pi) * np.ones((M,), dtype=float_cpu())
-
-        if return_acc:
-            Py = np.zeros((y_dim, y_dim), dtype=float_cpu())
-            Ry = np.zeros((y_dim, y_dim), dtype=float_cpu())
-
-        for k in iterator:
-            if N_is_int:
-                i = (N == k).nonzero()[0]
-                N_i = k
-                M_i = len(i)
-            else:
-                i = k
-                N_i = N[k]
-                M_i = 1
-                
-            L_i = I + N_i*VV
-            r = invert_pdmat(L_i, right_inv=True,
-                             return_logdet=return_logpy_0,
-                             return_inv=compute_inv)
-
-            mult_iL = r[0]
-            if return_logpy_0:
-                logL = r[2]
-            if compute_inv:
-                iL = r[-1]
-            
-            y[i,:]=mult_iL(gamma[i,:])
-            
-            if return_cov:
-                Sigma_y[i,:,:]=iL
-
-            if return_logpy_0:
-                logpy[i] += 0.5*(logL - np.sum(y[i,:]*gamma[i,:], axis=-1))
-                
-            if return_acc:
-                Py += M_i*iL
-                Ry += N_i*M_i*iL
-
-        if not return_tuple:
-            return y
-        
-        r = [y]
-        if return_cov:
-            r += [Sigma_y]
-        if return_logpy_0:
-            r += [logpy]
-        if return_acc:
-            r += [Ry, Py]
-        return tuple(r)
+        return self.compute_py_g_x_eig(
+            gamma, N, VV, return_cov=return_cov,
+            return_logpy_0=return_logpy_0, return_acc=return_acc)
 
 
     def Estep(self, D):
@@ -274,8 +202,16 @@ class SPLDA(PLDABase):
     
 
     
-    def llr_1vs1(self, x1, x2):
-
+    def llr_1vs1_project_params(self):
+        """Computes the parameters of the projection used by
+           llr_1vs1_project, so the 1vs1 LLR between two vectors
+           is llr(x1, x2) = dot(g1, g2) + q1 + q2, with
+             g = x A_tar + c_tar,
+             q = 0.5*(|g|^2 - |x A_non + c_non|^2) + q0.
+
+        Returns:
+          A_tar, c_tar, A_non, c_non, q0
+        """
         WV = np.dot(self.W, self.V.T)
         VV = np.dot(self.V, WV)
         I = np.eye(self.y_dim, dtype=float_cpu())
@@ -292,26 +228,14 @@ class SPLDA(PLDABase):
             right_inv=True, return_logdet=True)[:2]
         logLtar = 2*logcholLtar
 
-        VWF1 = np.dot(x1-self.mu, WV)
-        VWF2 = np.dot(x2-self.mu, WV)
-
-        gamma_non_1 = mult_icholLnon(VWF1)
-        gamma_non_2 = mult_icholLnon(VWF2)
+        A_non = mult_icholLnon(WV)
+        c_non = -np.dot(self.mu, A_non)
 
-        Qnon_1 = np.sum(gamma_non_1*gamma_non_1, axis=1)[:, None]
-        Qnon_2 = np.sum(gamma_non_2*gamma_non_2, axis=1)
+        A_tar = mult_icholLtar(WV)
+        c_tar = -np.dot(self.mu, A_tar)
 
-        gamma_tar_1 = mult_icholLtar(VWF1)
-        gamma_tar_2 = mult_icholLtar(VWF2)
-
-        Qtar_1 = np.sum(gamma_tar_1*gamma_tar_1, axis=1)[:, None]
-        Qtar_2 = np.sum(gamma_tar_2*gamma_tar_2, axis=1)
-
-        scores = 2*np.dot(gamma_tar_1, gamma_tar_2.T)
-        scores += (Qtar_1-Qnon_1+Qtar_2-Qnon_2)
-        scores += (2*logLnon-logLtar)
-        scores *= 0.5
-        return scores
+        q0 = 0.25*(2*logLnon-logLtar)
+        return A_tar, c_tar, A_non, c_non, q0
                 
             
     def llr_NvsM_book(self, D1, D2):
@@ -320,57 +244,9 @@ class SPLDA(PLDABase):
 
         WV = np.dot(self.W, self.V.T)
         VV = np.dot(self.V, WV)
-        I = np.eye(self.y_dim, dtype=float_cpu())
-
-        F1 -= N1[:, None]*self.mu
-        F2 -= N2[:, None]*self.mu
-
-        scores = np.zeros((len(N1), len(N2)), dtype=float_cpu())
-        for N1_i in np.unique(N1):
-            for N2_j in np.unique(N2):
-                i = np.where(N1 == N1_i)[0]
-                j = np.where(N2 == N2_j)[0]
-
-                L1 = I + N1_i*VV
-                mult_icholL1, logcholL1 = invert_trimat(
-                    sla.cholesky(L1, lower=False, overwrite_a=True),
-                    right_inv=True, return_logdet=True)[:2]
-                logL1 = 2*logcholL1
-
-                L2 = I + N2_j*VV
-                mult_icholL2, logcholL2 = invert_trimat(
-                    sla.cholesky(L2, lower=False, overwrite_a=True),
-                    right_inv=True, return_logdet=True)[:2]
-                logL2 = 2*logcholL2
-
-                Ltar = I + (N1_i + N2_j)*VV
-                mult_icholLtar, logcholLtar = invert_trimat(
-                    sla.cholesky(Ltar, lower=False, overwrite_a=True),
-                    right_inv=True, return_logdet=True)[:2]
-                logLtar = 2*logcholLtar
-                
-                VWF1 = np.dot(F1[i,:], WV)
-                VWF2 = np.dot(F2[j,:], WV)
-                
-                gamma_non_1 = mult_icholL1(VWF1)
-                gamma_non_2 = mult_icholL2(VWF2)
-                
-                Qnon_1 = np.sum(gamma_non_1*gamma_non_1, axis=1)[:, None]
-                Qnon_2 = np.sum(gamma_non_2*gamma_non_2, axis=1)
-                
-                gamma_tar_1 = mult_icholLtar(VWF1)
-                gamma_tar_2 = mult_icholLtar(VWF2)
-                
-                Qtar_1 = np.sum(gamma_tar_1*gamma_tar_1, axis=1)[:, None]
-                Qtar_2 = np.sum(gamma_tar_2*gamma_tar_2, axis=1)
-                
-                scores_ij = 2*np.dot(gamma_tar_1, gamma_tar_2.T)
-                scores_ij += (Qtar_1 - Qnon_1 + Qtar_2 - Qnon_2)
-                scores_ij += (logL1 + logL2 - logLtar)
-                scores[np.ix_(i,j)] = scores_ij
-                
-        scores *= 0.5
-        return scores
+        VWF1 = np.dot(F1 - N1[:, None]*self.mu, WV)
+        VWF2 = np.dot(F2 - N2[:, None]*self.mu, WV)
+        return self.llr_NvsM_book_eig(N1, VWF1, N2, VWF2, VV)
                 
 
     def sample(self, num_classes, num_samples_per_class, rng=None, seed=1024):
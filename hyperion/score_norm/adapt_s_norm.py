@@ -6,9 +6,11 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
-from six.moves import xrange
+
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
+import scipy.sparse as sparse
 import h5py
 
 from .score_norm import ScoreNorm
@@ -16,16 +18,155 @@ from .score_norm import ScoreNorm
 
 class AdaptSNorm(ScoreNorm):
     """Class for adaptive S-Norm
+
+       For each test segment (enrollment), the Z-Norm (T-Norm) statistics
+       are computed from the nbest cohort segments closest to the
+       test segment (enrollment). The nbest cohorts are selected with
+       argpartition and the statistics are obtained as the product of a
+       sparse cohort selection matrix and the cohort scores,
+       by blocks of test segments (enrollments).
+
+    Attributes:
+      nbest: Number of cohort segments used to compute the statistics.
+      nbest_discard: Number of top cohort segments discarded.
+      block_size: Number of test segments or enrollments per block.
+      num_threads: Number of threads to process the blocks in parallel.
     """
-    def __init__(self, nbest=100, nbest_discard=0, **kwargs):
-        super(AdaptSNorm, self).__init__(*kwargs)
+    def __init__(self, nbest=100, nbest_discard=0, block_size=1024,
+                 num_threads=1, **kwargs):
+        super(AdaptSNorm, self).__init__(**kwargs)
         self.nbest = nbest
         self.nbest_discard = nbest_discard
+        self.block_size = block_size
+        self.num_threads = num_threads
+
+
+
+    def _select_cohort(self, scores, nbest):
+        """Selects the cohort segments closest to each row of scores.
+
+        Args:
+          scores: Scores between test segments or enrollments and
+                  cohort (num_rows x num_cohort).
+          nbest: Number of cohort segments to select.
+
+        Returns:
+          Sparse matrix (num_rows x num_cohort) with ones in the
+          selected cohort segments.
+        """
+        num_rows, num_coh = scores.shape
+        first = self.nbest_discard
+        last = first + nbest
+        if last < num_coh:
+            kth = [first, last-1] if first > 0 else last - 1
+            best_idx = np.argpartition(-scores, kth, axis=1)[:, first:last]
+        else:
+            best_idx = np.argpartition(-scores, first, axis=1)[:, first:]
+
+        indptr = np.arange(0, num_rows*nbest+1, nbest)
+        data = np.ones((num_rows*nbest,), dtype=scores.dtype)
+        return sparse.csr_matrix(
+            (data, best_idx.ravel(), indptr), shape=(num_rows, num_coh))
+
+
+
+    def _compute_stats(self, select, scores_coh, scores2_coh, mask_coh,
+                       shift, nbest):
+        """Computes mean and standard deviation of the selected cohort scores.
+
+        Args:
+          select: Sparse cohort selection matrix (num_rows x num_cohort).
+          scores_coh: Cohort scores centered by shift (num_cohort x num_cols).
+          scores2_coh: Squared centered cohort scores (num_cohort x num_cols).
+          mask_coh: Cohort score mask (num_cohort x num_cols) or None.
+          shift: Mean of the cohort scores of each column (num_cols,).
+          nbest: Number of selected cohort segments.
+
+        Returns:
+          Means and standard deviations (num_rows x num_cols).
+        """
+        mu = select.dot(scores_coh)/nbest
+        m2 = select.dot(scores2_coh)/nbest
+        if mask_coh is not None:
+            norm = select.dot(mask_coh)/nbest
+            mu /= norm
+            m2 /= norm
+        s = np.sqrt(np.maximum(m2 - mu**2, 0))
+        s = np.clip(s, a_min=self.std_floor, a_max=None)
+        mu += shift
+        return mu, s
+
+
+
+    def _norm_block(self, first, last, scores, scores_coh_query, scores_coh,
+                    scores2_coh, mask_coh, shift, nbest):
+        """Normalizes the scores of a block of rows."""
+        select = self._select_cohort(scores_coh_query[first:last], nbest)
+        mu, s = self._compute_stats(
+            select, scores_coh, scores2_coh, mask_coh, shift, nbest)
+        return ((scores[first:last] - mu)/s).astype(scores.dtype, copy=False)
+
+
+
+    def _norm(self, scores, scores_coh_query, scores_coh, mask_coh, nbest):
+        """Normalizes the rows of scores with the statistics of the nbest
+           cohort segments of each row.
+
+        Args:
+          scores: Scores to normalize (num_rows x num_cols).
+          scores_coh_query: Scores between the rows and the cohort
+                            (num_rows x num_cohort).
+          scores_coh: Scores between the cohort and the columns
+                      (num_cohort x num_cols), with the masked scores set to 0.
+          mask_coh: Mask of scores_coh or None.
+          nbest: Number of cohort segments.
+
+        Returns:
+          Normalized scores (num_rows x num_cols).
+        """
+        # the cohort scores are centered and accumulated in double
+        # precision to avoid cancellation errors in the variances
+        scores_coh = scores_coh.astype(np.float64)
+        if mask_coh is None:
+            shift = np.mean(scores_coh, axis=0)
+            scores_coh -= shift
+        else:
+            mask_coh = mask_coh.astype(np.float64)
+            shift = np.sum(scores_coh, axis=0)/np.maximum(
+                np.sum(mask_coh, axis=0), 1)
+            scores_coh -= shift
+            scores_coh *= mask_coh
+        scores2_coh = scores_coh**2
+        num_rows = scores.shape[0]
+        blocks = [(first, min(first + self.block_size, num_rows), scores,
+                   scores_coh_query, scores_coh, scores2_coh, mask_coh,
+                   shift, nbest)
+                  for first in range(0, num_rows, self.block_size)]
+        if self.num_threads > 1:
+            with ThreadPool(self.num_threads) as pool:
+                scores_norm = pool.starmap(self._norm_block, blocks)
+        else:
+            scores_norm = [self._norm_block(*args) for args in blocks]
+
+        if len(scores_norm) == 0:
+            return np.zeros_like(scores)
+        return np.concatenate(scores_norm, axis=0)
 
-        
 
-    def predict(self, scores, scores_coh_test, scores_enr_coh, mask_coh_test=None, mask_enr_coh=None):
 
+    def predict(self, scores, scores_coh_test, scores_enr_coh, mask_coh_test=None, mask_enr_coh=None):
+        """Normalizes the scores.
+
+        Args:
+          scores: Scores enrollment vs test (num_enroll x num_test).
+          scores_coh_test: Scores cohort vs test (num_cohort x num_test).
+          scores_enr_coh: Scores enrollment vs cohort (num_enroll x num_cohort).
+          mask_coh_test: Boolean mask of the valid cohort vs test scores.
+          mask_enr_coh: Boolean mask of the valid enrollment vs cohort scores.
+
+        Returns:
+          Normalized scores (num_enroll x num_test).
+        """
         assert scores_enr_coh.shape[1] == scores_coh_test.shape[0]
         assert self.nbest_discard < scores_enr_coh.shape[1]
         if self.nbest > scores_enr_coh.shape[1] - self.nbest_discard:
@@ -34,53 +175,17 @@ class AdaptSNorm(ScoreNorm):
             nbest = self.nbest
 
         if mask_coh_test is not None:
-            scores_coh_test[mask_coh_test == False] = 0
+            scores_coh_test = np.where(mask_coh_test, scores_coh_test, 0)
         if mask_enr_coh is not None:
-            scores_enr_coh[mask_enr_coh == False] = 0
-            
-        best_idx = np.flipud(np.argsort(scores_coh_test, axis=0))[self.nbest_discard:self.nbest_discard+nbest]
-        scores_z_norm = np.zeros_like(scores)
-        for i in xrange(scores.shape[1]):
-            best_idx_i = best_idx[:,i]
-                
-            mu_z = np.mean(scores_enr_coh[:, best_idx_i],
-                           axis=1, keepdims=True)
-
-            if mask_enr_coh is None:
-                s_z = np.std(scores_enr_coh[:, best_idx_i],
-                             axis=1, keepdims=True)
-            else:
-                norm = np.mean(mask_enr_coh[:, best_idx_i],
-                               axis=1, keepdims=True)
-                mu_z /= norm
-                s_z = np.sqrt(np.mean(scores_enr_coh[:, best_idx_i]**2,
-                                      axis=1, keepdims=True)/norm - mu_z**2)
-
-            s_z = np.clip(s_z, a_min=1e-5, a_max=None)
-            scores_z_norm[:,i] = (scores[:,i] - mu_z.T)/s_z.T
-
-
-        best_idx = np.fliplr(np.argsort(scores_enr_coh, axis=1))[:,self.nbest_discard:self.nbest_discard+nbest]
-        scores_t_norm = np.zeros_like(scores)
-        for i in xrange(scores.shape[0]):
-            best_idx_i = best_idx[i]
-                
-            mu_z = np.mean(scores_coh_test[best_idx_i,:],
-                           axis=0, keepdims=True)
-
-            if mask_coh_test is None:
-                s_z = np.std(scores_coh_test[best_idx_i,:],
-                             axis=0, keepdims=True)
-            else:
-                norm = np.mean(mask_coh_test[best_idx_i,:],
-                               axis=0, keepdims=True)
-                mu_z /= norm
-                s_z = np.sqrt(np.mean(scores_coh_test[best_idx_i,:]**2,
-                                      axis=0, keepdims=True)/norm - mu_z**2)
-
-            s_z = np.clip(s_z, a_min=1e-5, a_max=None)
-            scores_t_norm[i,:] = (scores[i,:] - mu_z)/s_z
-
-        
+            scores_enr_coh = np.where(mask_enr_coh, scores_enr_coh, 0)
+
+        # Z-Norm with the cohort segments closest to each test segment
+        scores_z_norm = self._norm(
+            scores.T, scores_coh_test.T, scores_enr_coh.T,
+            None if mask_enr_coh is None else mask_enr_coh.T, nbest).T
+
+        # T-Norm with the cohort segments closest to each enrollment
+        scores_t_norm = self._norm(
+            scores, scores_enr_coh, scores_coh_test, mask_coh_test, nbest)
+
         return (scores_z_norm + scores_t_norm)/np.sqrt(2)
-        
@@ -452,7 +452,7 @@ class LDEPool1d(_GlobalPool1d):
         llk = - self.prec**2 * dist + self.bias
         r = nnf.softmax(llk, dim=-1)
         if weights is not None:
-            r *= weights
+            r *= weights.view(weights.size(0), -1, 1)
 
         r = torch.unsqueeze(r, dim=-1)
         N = torch.sum(r, dim=1) + 1e-9
@@ -535,7 +535,7 @@ class ScaledDotProdAttV1Pool1d(_GlobalPool1d):
                 scores = scores.masked_fill(mask, 0.0)
                 self.attn = scores/(torch.sum(scores, dim=-1, keepdim=True) + 1e-9)
             else:
-                min_value = -1e200
+                min_value = torch.finfo(scores.dtype).min
                 scores = scores.masked_fill(mask, min_value)
                 self.attn = torch.softmax(scores, dim=-1).masked_fill(mask, 0.0)  # (batch, head, 1, time)
         else:
@@ -595,13 +595,20 @@ class GlobalChWiseAttMeanStdPool1d(_GlobalPool1d):
 
         x_inner = self.conv1(x)
         if self.use_global_context:
-            global_mus = self.stats_pool(x)
+            global_mus = self.stats_pool(x, weights=weights)
             x_inner = x_inner + self.lin_global(global_mus).unsqueeze(-1)
         attn = self.conv2(self.activation(self.norm_layer(x_inner)))
+        if weights is not None:
+            mask = self._standarize_weights(weights, x.dim()) == 0
         if self.bin_attn:
             atnn = nnf.sigmoid(attn + self.bias)
         else:
+            if weights is not None:
+                attn = attn.masked_fill(mask, torch.finfo(attn.dtype).min)
             attn = nnf.softmax(attn, dim=-1)
+
+        if weights is not None:
+            attn = attn.masked_fill(mask, 0.0)
         
         mus = self.stats_pool(x, weights=attn)
         return mus
@@ -38,11 +38,11 @@ def categorical_accuracy(input, target, weight=None, reduction='mean'):
             weight_mean = weight.mean()
 
         if reduction == 'sum':
-            return ok.sum().item()
+            return ok.sum()
 
         acc = ok.mean()/weight_mean
 
-    return acc.item()
+    return acc
 
 
 
@@ -81,11 +81,11 @@ def binary_accuracy(input, target, weight=None, reduction='mean', thr=0.5):
 
     
         if reduction == 'sum':
-            return ok.sum().item()
+            return ok.sum()
 
         acc = ok.mean()/weight_mean
 
-    return ok.item()
+    return acc
 
 
 
@@ -257,10 +257,46 @@ class XVector(TorchModel):
 
 
 
-    def extract_embed(self, x, chunk_length=0, embed_layer=None, detach_chunks=False):
+    def _get_pool_weights(self, x_lengths, in_length, out_length):
+        """Computes the pooling weights to discard the padded frames 
+           of the encoder output.
+
+        Args:
+          x_lengths: lengths of the input sequences, shape=(batch,)
+          in_length: length of the padded input sequences
+          out_length: length of the encoder output sequences
+
+        Returns:
+          Float tensor with shape=(batch, out_length), 1 for valid frames.
+        """
+        out_lengths = torch.ceil(
+            x_lengths.float() * out_length / in_length).long()
+        t = torch.arange(out_length, device=out_lengths.device)
+        return (t < out_lengths[:, None]).float()
+
+
+
+    def extract_embed(self, x, chunk_length=0, embed_layer=None, detach_chunks=False,
+                      x_lengths=None):
+        """Extracts the embeddings.
+
+        Args:
+          x: input features tensor with shape=(batch, in_feats, time)
+          chunk_length: number of frames of each forward pass of the encoder,
+                        if 0, the full sequence is used.
+          embed_layer: classifier layer to get the embedding from.
+          detach_chunks: detaches the encoder output of each chunk.
+          x_lengths: lengths of the sequences of a batch padded to the
+                     longest one, the padded frames are discarded in the
+                     pooling layer. If None, all frames are used.
+
+        Returns:
+          Embeddings tensor with shape=(batch, embed_dim)
+        """
         if embed_layer is None:
             embed_layer = self.embed_layer
 
+        in_length = x.size(-1)
         x = self._pre_enc(x)
         # if self.encoder_net.in_dim() == 4 and x.dim() == 3:
         #     x = x.view(x.size(0), 1, x.size(1), x.size(2))
@@ -277,7 +313,12 @@ class XVector(TorchModel):
 
         # if self.proj is not None:
         #     x = self.proj(x)
-        p = self.pool_net(x)
+        if x_lengths is None:
+            p = self.pool_net(x)
+        else:
+            weights = self._get_pool_weights(
+                x_lengths.to(x.device), in_length, x.size(-1))
+            p = self.pool_net(x, weights=weights)
         y = self.classif_net.extract_embed(p, embed_layer)
         return y
 
@@ -14,7 +14,7 @@ import torch.nn as nn
 import torch.cuda.amp as amp
 from torch.optim.swa_utils import AveragedModel, SWALR
 
-from ..utils import MetricAcc, TorchDataParallel
+from ..utils import MetricAcc, TorchDataParallel, DataPrefetcher
 from ..loggers import LoggerList, CSVLogger, ProgLogger
 
 
@@ -42,6 +42,11 @@ class TorchTrainer(object):
          swa_start: epoch to start doing swa
          swa_lr: SWA learning rate
          swa_anneal_epochs: SWA learning rate anneal epochs
+
+       The batches are prefetched to the device with DataPrefetcher and
+       the batch metrics are only transferred to the host every log_interval
+       batches, so the training loop doesn't synchronize with the GPU
+       in every batch.
     """
     def __init__(self, model, optimizer, loss, epochs=100, exp_path='./train', 
                  cur_epoch=0, grad_acc_steps=1,
@@ -58,6 +63,8 @@ class TorchTrainer(object):
         self.grad_acc_steps = grad_acc_steps
 
         self.exp_path = exp_path
+        self.log_interval = log_interval
+        self.data_prefetcher = None
         
         if loggers is None:
             self.loggers = self._default_loggers(log_interval)
@@ -147,6 +154,7 @@ class TorchTrainer(object):
                 self.lr_scheduler.on_epoch_begin(epoch, epoch_updates=epoch_updates)
             
             logs = self.train_epoch(train_data)
+            self._log_data_time()
             if val_data is not None:
                 val_logs = self.validation_epoch(val_data)
                 logs.update(val_logs)
@@ -178,6 +186,32 @@ class TorchTrainer(object):
             self.save_swa_model(logs)
                 
     
+    def prefetch(self, data_loader):
+        """Returns an iterator over the data loader that prefetches
+           the batches to the device.
+
+        Args:
+          data_loader: PyTorch data loader.
+        """
+        self.data_prefetcher = DataPrefetcher(data_loader, self.device)
+        return self.data_prefetcher
+
+
+    def _log_data_time(self):
+        """Logs the time that the last epoch spent waiting for data
+           and computing.
+        """
+        p = self.data_prefetcher
+        if p is None or p.total_time == 0:
+            return
+
+        logging.info('epoch: %d/%d data-wait-time: %.2fs compute-time: %.2fs '
+                     'data-wait: %.1f%%' % (
+                         self.cur_epoch+1, self.epochs, p.wait_time,
+                         p.compute_time, 100*p.wait_time/p.total_time))
+        self.data_prefetcher = None
+
+
     def set_train_mode(self):
         if self.train_mode == 'train':
             self.model.train()
@@ -193,15 +227,15 @@ class TorchTrainer(object):
         """
         metric_acc = MetricAcc()
         batch_metrics = ODict()
+        logs = ODict()
         self.set_train_mode()
-        for batch, (data, target) in enumerate(data_loader):
+        for batch, (data, target) in enumerate(self.prefetch(data_loader)):
             
             self.loggers.on_batch_begin(batch)
 
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
                 
-            data, target = data.to(self.device), target.to(self.device)
             batch_size = data.shape[0]
             
             with self.amp_autocast():
@@ -218,13 +252,14 @@ class TorchTrainer(object):
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
             
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            if (batch+1) % self.log_interval == 0:
+                logs = metric_acc.metrics
+                logs['lr'] = self._get_lr()
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
             #total_batches += 1
 
@@ -250,15 +285,15 @@ class TorchTrainer(object):
                 log_tag = 'val_'
                 self.model.eval()
                 
-            for batch, (data, target) in enumerate(data_loader):
-                data, target = data.to(self.device), target.to(self.device)
+            for batch, (data, target) in enumerate(
+                    DataPrefetcher(data_loader, self.device)):
                 batch_size = data.shape[0]
 
                 with self.amp_autocast():
                     output = self.model(data, **self.amp_args)
                     loss = self.loss(output, target)
 
-                batch_metrics['loss'] = loss.mean().item()
+                batch_metrics['loss'] = loss.mean()
                 for k, metric in self.metrics.items():
                     batch_metrics[k] = metric(output, target)
             
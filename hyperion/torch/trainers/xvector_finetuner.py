@@ -38,15 +38,15 @@ class XVectorFinetuner(XVectorTrainer):
 
         metric_acc = MetricAcc()
         batch_metrics = ODict()
+        logs = ODict()
         #self.model.train_mode(self.finetune_mode)
         self.model.eval()
-        for batch, (data, target) in enumerate(data_loader):
+        for batch, (data, target) in enumerate(self.prefetch(data_loader)):
             self.loggers.on_batch_begin(batch)
             
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
                 
-            data, target = data.to(self.device), target.to(self.device)
             batch_size = data.shape[0]
 
             output = self.model(data, target)
@@ -58,7 +58,7 @@ class XVectorFinetuner(XVectorTrainer):
                     self.lr_scheduler.on_opt_step()
                 self.optimizer.step()
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
             
@@ -87,8 +87,9 @@ class XVectorFinetuner(XVectorTrainer):
             #     #logging.info(str(torch.sum(torch.isnan(output))))
                 
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            if (batch+1) % self.log_interval == 0:
+                logs = metric_acc.metrics
+                logs['lr'] = self._get_lr()
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
             #total_batches +=1
 
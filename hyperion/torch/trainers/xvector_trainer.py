@@ -69,14 +69,14 @@ class XVectorTrainer(TorchTrainer):
 
         metric_acc = MetricAcc()
         batch_metrics = ODict()
+        logs = ODict()
         self.set_train_mode()
-        for batch, (data, target) in enumerate(data_loader):
+        for batch, (data, target) in enumerate(self.prefetch(data_loader)):
             self.loggers.on_batch_begin(batch)
 
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
                 
-            data, target = data.to(self.device), target.to(self.device)
             batch_size = data.shape[0]
 
             with self.amp_autocast():
@@ -93,13 +93,14 @@ class XVectorTrainer(TorchTrainer):
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
             
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            if (batch+1) % self.log_interval == 0:
+                logs = metric_acc.metrics
+                logs['lr'] = self._get_lr()
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
 
         logs = metric_acc.metrics
@@ -10,7 +10,7 @@ import logging
 import torch
 import torch.nn as nn
 
-from ..utils import MetricAcc, TorchDataParallel
+from ..utils import MetricAcc, TorchDataParallel, DataPrefetcher
 from .xvector_trainer import XVectorTrainer
 
 
@@ -74,15 +74,15 @@ class XVectorTrainerFromWav(XVectorTrainer):
 
         metric_acc = MetricAcc()
         batch_metrics = ODict()
+        logs = ODict()
         self.set_train_mode()
 
-        for batch, (data, target) in enumerate(data_loader):
+        for batch, (data, target) in enumerate(self.prefetch(data_loader)):
             self.loggers.on_batch_begin(batch)
             
             if batch % self.grad_acc_steps == 0:
                 self.optimizer.zero_grad()
                 
-            data, target = data.to(self.device), target.to(self.device)
             batch_size = data.shape[0]
             with torch.no_grad():
                 feats = self.feat_extractor(data)
@@ -101,13 +101,14 @@ class XVectorTrainerFromWav(XVectorTrainer):
                     self.lr_scheduler.on_opt_step()
                 self.update_model()
 
-            batch_metrics['loss'] = loss.item() * self.grad_acc_steps
+            batch_metrics['loss'] = loss.detach() * self.grad_acc_steps
             for k, metric in self.metrics.items():
                 batch_metrics[k] = metric(output, target)
             
             metric_acc.update(batch_metrics, batch_size)
-            logs = metric_acc.metrics
-            logs['lr'] = self._get_lr()
+            if (batch+1) % self.log_interval == 0:
+                logs = metric_acc.metrics
+                logs['lr'] = self._get_lr()
             self.loggers.on_batch_end(logs=logs, batch_size=batch_size)
 
         logs = metric_acc.metrics
@@ -131,8 +132,8 @@ class XVectorTrainerFromWav(XVectorTrainer):
                 log_tag = 'val_'
                 self.model.eval()
 
-            for batch, (data, target) in enumerate(data_loader):
-                data, target = data.to(self.device), target.to(self.device)
+            for batch, (data, target) in enumerate(
+                    DataPrefetcher(data_loader, self.device)):
                 batch_size = data.shape[0]
 
                 feats = self.feat_extractor(data)
@@ -140,7 +141,7 @@ class XVectorTrainerFromWav(XVectorTrainer):
                     output = self.model(feats, **self.amp_args)
                     loss = self.loss(output, target)
 
-                batch_metrics['loss'] = loss.mean().item()
+                batch_metrics['loss'] = loss.mean()
                 for k, metric in self.metrics.items():
                     batch_metrics[k] = metric(output, target)
             
@@ -0,0 +1,137 @@
+"""
+ Copyright 2019 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import time
+
+import torch
+
+
+class DataPrefetcher(object):
+    """Iterates over a data loader moving the batches to the device.
+
+       When the device is a GPU, the next batch is copied
+       from pinned memory to the device in a side CUDA stream while
+       the current batch is being processed. On CPU, the batches
+       are returned as they come from the data loader.
+       It measures the time spent waiting for the data loader.
+
+    Attributes:
+      data_loader: PyTorch data loader.
+      device: Device where the batches are copied, if None the batches are not moved.
+      pin_memory: If True, pins the host memory of the batches before
+                  copying them to the GPU.
+      wait_time: Time in seconds spent waiting for data in the last
+                 pass over the data loader.
+      total_time: Total time in seconds of the last pass over the data loader.
+    """
+    def __init__(self, data_loader, device=None, pin_memory=True):
+        self.data_loader = data_loader
+        self.device = None if device is None else torch.device(device)
+        self.pin_memory = pin_memory
+        self.wait_time = 0
+        self.total_time = 0
+
+
+    def __len__(self):
+        return len(self.data_loader)
+
+
+    @property
+    def use_cuda(self):
+        return (self.device is not None and self.device.type == 'cuda' and
+                torch.cuda.is_available())
+
+
+    @property
+    def compute_time(self):
+        """Time in seconds not spent waiting for data in the last pass."""
+        return self.total_time - self.wait_time
+
+
+    def _to_device(self, batch, pin_memory=False):
+        """Moves the tensors in the batch to the device."""
+        if torch.is_tensor(batch):
+            if pin_memory and not batch.is_pinned():
+                batch = batch.pin_memory()
+            return batch.to(self.device, non_blocking=pin_memory)
+
+        if isinstance(batch, (list, tuple)):
+            return type(batch)(self._to_device(b, pin_memory) for b in batch)
+
+        if isinstance(batch, dict):
+            return type(batch)((k, self._to_device(v, pin_memory))
+                               for k, v in batch.items())
+        return batch
+
+
+    @staticmethod
+    def _record_stream(batch, stream):
+        """Marks the tensors of the batch as used by stream,
+           so their memory is not reused before stream is done with them.
+        """
+        if torch.is_tensor(batch):
+            batch.record_stream(stream)
+        elif isinstance(batch, (list, tuple)):
+            for b in batch:
+                DataPrefetcher._record_stream(b, stream)
+        elif isinstance(batch, dict):
+            for b in batch.values():
+                DataPrefetcher._record_stream(b, stream)
+
+
+    def _iter_cpu(self):
+        t0 = time.time()
+        for batch in self.data_loader:
+            if self.device is not None:
+                batch = self._to_device(batch)
+            self.wait_time += time.time() - t0
+            yield batch
+            t0 = time.time()
+
+
+    def _preload(self, loader_iter, stream):
+        """Gets the next batch from the loader and starts its copy
+           to the device in the side stream.
+
+        Returns:
+          Batch on the device or None if the loader is exhausted.
+        """
+        t0 = time.time()
+        try:
+            batch = next(loader_iter)
+        except StopIteration:
+            self.wait_time += time.time() - t0
+            return None
+
+        with torch.cuda.stream(stream):
+            batch = self._to_device(batch, self.pin_memory)
+        self.wait_time += time.time() - t0
+        return batch
+
+
+    def _iter_cuda(self):
+        stream = torch.cuda.Stream(device=self.device)
+        cur_stream = torch.cuda.current_stream(self.device)
+        loader_iter = iter(self.data_loader)
+        next_batch = self._preload(loader_iter, stream)
+        while next_batch is not None:
+            cur_stream.wait_stream(stream)
+            batch = next_batch
+            self._record_stream(batch, cur_stream)
+            next_batch = self._preload(loader_iter, stream)
+            yield batch
+
+        torch.cuda.synchronize(self.device)
+
+
+    def __iter__(self):
+        self.wait_time = 0
+        self.total_time = 0
+        t0 = time.time()
+        batches = self._iter_cuda() if self.use_cuda else self._iter_cpu()
+        for batch in batches:
+            yield batch
+
+        self.total_time = time.time() - t0
@@ -8,21 +8,29 @@ from __future__ import division
 
 from collections import OrderedDict as ODict
 import numpy as np
+import torch
 
 
 class MetricAcc(object):
     """Class to accumulate metrics during an epoch.
+
+       Metrics given as torch tensors are not transferred to the host
+       in every update, which would synchronize with the device.
+       They are kept in a queue and accumulated when
+       the metrics are read.
     """
     def __init__(self):
         self.keys = None
         self.acc = None
         self.count = 0
+        self._pending = []
 
 
     def reset(self):
         """Resets the accumulators.
         """
         self.count = 0
+        self._pending = []
         if self.acc is not None:
             self.acc[:] = 0
             
@@ -44,13 +52,47 @@ class MetricAcc(object):
                num_samples: number of samples in current batch (batch_size)
         """
         if self.keys is None:
-            self.keys = metrics.keys()
+            self.keys = list(metrics.keys())
             self.acc = np.zeros((len(self.keys),))
 
+        values = [metrics[k] for k in self.keys]
+        if any(torch.is_tensor(v) for v in values):
+            values = [v.detach() if torch.is_tensor(v) else v for v in values]
+            self._pending.append((values, num_samples))
+            return
+
+        self._flush()
+        self._update(values, num_samples)
+
+
+
+    def _update(self, values, num_samples):
         self.count += num_samples
         r = num_samples/self.count
-        for i, k in enumerate(self.keys):
-            self.acc[i] += r * (metrics[k] - self.acc[i])
+        for i, v in enumerate(values):
+            self.acc[i] += r * (v - self.acc[i])
+
+
+
+    def _flush(self):
+        """Transfers the queued tensor metrics to the host at once
+           and accumulates them.
+        """
+        if len(self._pending) == 0:
+            return
+
+        tensors = [v for values, _ in self._pending
+                   for v in values if torch.is_tensor(v)]
+        device = tensors[0].device
+        host_values = iter(torch.stack(
+            [t.to(device=device, dtype=torch.float32).reshape(())
+             for t in tensors]).cpu().tolist())
+        for values, num_samples in self._pending:
+            values = [next(host_values) if torch.is_tensor(v) else v
+                      for v in values]
+            self._update(values, num_samples)
+
+        self._pending = []
 
 
 
@@ -58,6 +100,7 @@ class MetricAcc(object):
     def metrics(self):
         """ Returns metrics dictionary
         """
+        self._flush()
         logs = ODict()
         for i,k in enumerate(self.keys):
             logs[k] = self.acc[i]
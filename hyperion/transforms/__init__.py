@@ -5,7 +5,7 @@
 
 from .cent_whiten import CentWhiten
 from .lnorm import LNorm
-from .sb_sw import SbSw
+from .sb_sw import SbSw, NSbSw
 from .pca import PCA
 from .lda import LDA
 from .nda import NDA
@@ -13,6 +13,7 @@ from .nap import NAP
 from .mvn import MVN
 from .coral import CORAL
 from .gaussianizer import Gaussianizer
+from .affine import Affine
 from .skl_tsne import SklTSNE
 from .transform_list import TransformList
 
@@ -0,0 +1,70 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import numpy as np
+
+from ..hyp_model import HypModel
+
+
+class Affine(HypModel):
+    """Class to do an affine transformation y = x T + b optionally followed
+       by length normalization. TransformList.compile folds chains of
+       centering, whitening, PCA, LDA, NDA, ... into one Affine stage.
+
+    Attributes:
+      T: Projection matrix, if None, it is the identity.
+      b: Offset vector, if None, it is zero.
+      lnorm: If True, length normalization is applied after the
+             affine transformation.
+    """
+    def __init__(self, T=None, b=None, lnorm=False, **kwargs):
+        super().__init__(**kwargs)
+        self.T = T
+        self.b = b
+        self.lnorm = lnorm
+
+
+    @staticmethod
+    def length_norm(x):
+        """Length normalization in place."""
+        mx = np.sqrt(np.einsum('ij,ij->i', x, x)) + 1e-10
+        x *= (np.sqrt(x.shape[1])/mx)[:,None]
+        return x
+
+
+    def predict(self, x):
+        if self.T is None:
+            y = np.array(x, dtype=np.result_type(x, np.float32))
+        else:
+            y = np.dot(x, self.T)
+        if self.b is not None:
+            y += self.b
+        if self.lnorm:
+            self.length_norm(y)
+        return y
+
+
+
+    def get_config(self):
+        config = {'lnorm': self.lnorm}
+        base_config = super().get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+
+    def save_params(self, f):
+        params = {'T': self.T,
+                  'b': self.b}
+        self._save_params_from_dict(f, params)
+
+
+
+    @classmethod
+    def load_params(cls, f, config):
+        prefix = '' if config['name'] is None else config['name'] + '/'
+        param_list = [p for p in ['T', 'b'] if prefix + p in f]
+        params = cls._load_params_to_dict(f, config['name'], param_list)
+        return cls(T=params.get('T'), b=params.get('b'), lnorm=config['lnorm'],
+                   name=config['name'])
@@ -6,10 +6,11 @@ import numpy as np
 import h5py
 
 import scipy.linalg as la
-from sklearn.neighbors import BallTree
+import scipy.sparse as sparse
 
 from ..hyp_model import HypModel
 from ..hyp_defs import float_cpu
+from ..utils.class_stats import ClassStats
 
 class SbSw(HypModel):
     """Class to compute between and within class matrices
@@ -23,24 +24,40 @@ class SbSw(HypModel):
 
         
     def fit(self, x, class_ids, sample_weight=None, class_weights=None, normalize=True):
-        dim = x.shape[1]
+        stats = ClassStats.compute(
+            x, class_ids, class_weights=self.class_weights_from_ids(class_ids))
+        self.fit_stats(stats, normalize)
+
+
+
+    @staticmethod
+    def class_weights_from_ids(class_ids, num_classes=None):
+        """Returns the class weights 1/N_k needed to compute
+           the ClassStats used by fit_stats.
+        """
+        N = ClassStats.count(class_ids, num_classes)
+        return 1/np.maximum(N, 1)
+
+
+
+    def fit_stats(self, stats, normalize=True):
+        """Accumulates Sb and Sw from ClassStats computed with
+           class_weights=class_weights_from_ids(class_ids), e.g.,
+           by chunks when the vectors don't fit in memory.
+        """
+        dim = stats.x_dim
         if self.Sb is None:
             self.Sb = np.zeros((dim, dim))
             self.Sw = np.zeros((dim, dim))
             self.mu = np.zeros((dim,))
             self.num_classes = 0
 
-        u_ids = np.unique(class_ids)
-        self.num_classes += len(u_ids)
-
-        for i in u_ids:
-            idx = (class_ids==i)
-            N_i = np.sum(idx)
-            mu_i = np.mean(x[idx,:], axis=0)
-            self.mu += mu_i
-            x_i = x[idx, :] - mu_i
-            self.Sb += np.outer(mu_i, mu_i)
-            self.Sw += np.dot(x_i.T, x_i)/N_i
+        present = stats.N > 0
+        self.num_classes += np.sum(present)
+        mu = stats.mu[present]
+        self.mu += np.sum(mu, axis=0)
+        self.Sb += np.dot(mu.T, mu)
+        self.Sw += stats.within_class_scatter()
 
         if normalize:
             self.normalize()
@@ -91,55 +108,170 @@ class SbSw(HypModel):
 
         
 class NSbSw(SbSw):
+    """Class to compute the nearest-neighbors between and within class
+       matrices used by NDA.
 
-    def __init__(self, K=10, alpha=1, **kwargs):
+       The K nearest neighbors of every sample in every class are obtained
+       with matrix products (exact kNN) processing the classes in blocks,
+       and the scatter matrices are accumulated with matrix products.
+       The memory is bounded by block_size.
+
+    Attributes:
+      K: number of nearest neighbors.
+      alpha: exponent of the kNN distances in the between class weights.
+      block_size: max. number of elements of the intermediate tensors.
+    """
+    def __init__(self, K=10, alpha=1, block_size=2**22, **kwargs):
         super(NSbSw, self).__init__(**kwargs)
         self.K = K
         self.alpha = alpha
+        self.block_size = block_size
+
+
+
+    def _class_blocks(self, N):
+        """Splits the classes (sorted by id) in blocks with bounded
+           number of samples.
+        """
+        max_samples = max(int(np.sqrt(self.block_size)), np.max(N))
+        blocks = []
+        first = 0
+        count = 0
+        for j in range(len(N)):
+            if count + N[j] > max_samples and j > first:
+                blocks.append((first, j))
+                first = j
+                count = 0
+            count += N[j]
+        blocks.append((first, len(N)))
+        return blocks
+
+
+
+    def _knn(self, q, q2, x, x2, offsets, N, j0, j1, return_mean=True):
+        """Computes the distance to the K-th nearest neighbor and the mean
+           of the K nearest neighbors of the query vectors q in the
+           classes j0:j1.
+
+        Args:
+          q: query vectors (num_queries x x_dim).
+          q2: squared norms of q.
+          x: training vectors sorted by class.
+          x2: squared norms of x.
+          offsets: first sample of each class in x.
+          N: number of samples of each class.
+          j0, j1: first and last+1 classes of the block.
+          return_mean: if False, it only returns the distances.
+
+        Returns:
+          Distances to the K-th nearest neighbor (num_queries x num_classes_block).
+          Means of the K nearest neighbors (num_queries x num_classes_block x x_dim).
+        """
+        c0 = offsets[j0]
+        c1 = offsets[j1-1] + N[j1-1]
+        xc = x[c0:c1]
+        d2 = q2[:, None] + x2[c0:c1] - 2*np.dot(q, xc.T)
+        np.maximum(d2, 0, out=d2)
+
+        # pads the classes of the block to the same length
+        Nb = N[j0:j1]
+        max_N = max(np.max(Nb), self.K)
+        pad_idx = np.arange(max_N)
+        valid = pad_idx < Nb[:, None]
+        pad_idx = np.where(valid, offsets[j0:j1, None] - c0 + pad_idx, 0)
+        d2 = np.where(valid, d2[:, pad_idx], np.inf)
+
+        nn = np.argpartition(d2, self.K-1, axis=-1)[:, :, :self.K]
+        d2_nn = np.take_along_axis(d2, nn, axis=-1)
+        valid_nn = np.isfinite(d2_nn)
+        d_K = np.sqrt(np.max(np.where(valid_nn, d2_nn, 0), axis=-1))
+        if not return_mean:
+            return d_K
+
+        # means of the neighbors with a sparse selection matrix
+        num_q, num_b = d_K.shape
+        k = np.sum(valid_nn, axis=-1)
+        cols = np.take_along_axis(
+            np.broadcast_to(pad_idx, (num_q,) + pad_idx.shape), nn, axis=-1).ravel()
+        w = (valid_nn/k[:, :, None]).ravel()
+        rows = np.arange(0, len(cols)+1, self.K)
+        A = sparse.csr_matrix((w, cols, rows), shape=(num_q*num_b, c1-c0))
+        mu_nn = (A @ xc).reshape(num_q, num_b, -1)
+        return d_K, mu_nn
+
 
 
-        
     def fit(self, x, class_ids, sample_weight=None, class_weights=None, normalize=True):
+        x = np.asarray(x, dtype=float_cpu())
         dim = x.shape[1]
         self.Sb = np.zeros((dim, dim), dtype=float_cpu())
         self.Sw = np.zeros((dim, dim), dtype=float_cpu())
-        self.mu = np.zeros((dim,), dtype=float_cpu())
 
-        u_ids = np.unique(class_ids)
+        class_ids = np.asarray(class_ids)
+        idx = np.argsort(class_ids, kind='stable')
+        x = x[idx]
+        class_ids = class_ids[idx]
+        u_ids, offsets, N = np.unique(class_ids, return_index=True, return_counts=True)
         self.num_classes = np.max(u_ids)+1
+        # class index of each sample in u_ids
+        c = np.repeat(np.arange(len(u_ids)), N)
 
-        d = np.zeros((self.num_classes, x.shape[0]), dtype=float_cpu())
-        delta = np.zeros((self.num_classes,) + x.shape, dtype=float_cpu())
-        for i in u_ids:
-            idx_i = (class_ids==i)
-
-            mu_i = np.mean(x[idx_i,:], axis=0)
-            self.mu += mu_i
-
-            x_i = x[idx_i]
-            tree = BallTree(x_i)
-            d_i, NN_i = tree.query(x, k=self.K, dualtree=True, sort_results=True)
-            d[i] = d_i[:,-1]
-            for l in range(x.shape[0]):
-                delta[i,l] = x[l] - np.mean(x_i[NN_i[l]], axis=0)
-
-        d = d**self.alpha
-        for i in u_ids:
-            idx_i = (class_ids==i).nonzero()[0]
-            N_i = len(idx_i)
-            w_i = 0
-            Sb_i = np.zeros(self.Sb.shape, dtype=float_cpu())
-            
-            for j in range(self.num_classes):
-                w_ij = np.minimum(d[i], d[j])/(d[i]+d[j])
-                for l in idx_i:
-                    S = np.outer(delta[j,l], delta[j,l])
-                    if i==j:
-                        self.Sw += S/N_i
-                    else:
-                        Sb_i += w_ij[l]*S
-                        w_i += w_ij[l]
-            self.Sb += Sb_i/w_i
+        x2 = np.sum(x*x, axis=-1)
+        self.mu = np.sum(np.add.reduceat(x, offsets, axis=0)/N[:, None], axis=0)
+
+        blocks = self._class_blocks(N)
+
+        def query_blocks(q0, q1, j0, j1):
+            # number of queries so the tensors of the block fit in block_size
+            max_N = max(np.max(N[j0:j1]), self.K, dim)
+            num_q = max(1, self.block_size//((j1-j0)*max_N))
+            for first in range(q0, q1, num_q):
+                yield first, min(first + num_q, q1)
+
+        # distances to the K-th NN of the own class and Sw
+        d_own = np.zeros((x.shape[0],), dtype=float_cpu())
+        for j0, j1 in blocks:
+            q0 = offsets[j0]
+            q1 = offsets[j1-1] + N[j1-1]
+            for first, last in query_blocks(q0, q1, j0, j1):
+                d_K, mu_nn = self._knn(x[first:last], x2[first:last], x, x2,
+                                       offsets, N, j0, j1)
+                own = c[first:last] - j0
+                r = np.arange(last-first)
+                d_own[first:last] = d_K[r, own]
+                delta = x[first:last] - mu_nn[r, own]
+                self.Sw += np.dot((delta/N[c[first:last], None]).T, delta)
+
+        d_own = d_own**self.alpha
+
+        def between_class_weights(first, last, j0, j1, d_K):
+            # w_ij = min(d_i, d_j)/(d_i + d_j) for j != i
+            d_K = d_K**self.alpha
+            d_i = d_own[first:last, None]
+            w = np.minimum(d_i, d_K)/np.maximum(d_i + d_K, 1e-20)
+            w[np.arange(j0, j1) == c[first:last, None]] = 0
+            return w
+
+        # normalization of the weights of each class
+        w_i = np.zeros((len(u_ids),), dtype=float_cpu())
+        for j0, j1 in blocks:
+            for first, last in query_blocks(0, x.shape[0], j0, j1):
+                d_K = self._knn(x[first:last], x2[first:last], x, x2,
+                                offsets, N, j0, j1, return_mean=False)
+                w = between_class_weights(first, last, j0, j1, d_K)
+                w_i += np.bincount(c[first:last], weights=np.sum(w, axis=-1),
+                                   minlength=len(u_ids))
+        w_i = np.maximum(w_i, 1e-20)
+
+        # Sb
+        for j0, j1 in blocks:
+            for first, last in query_blocks(0, x.shape[0], j0, j1):
+                d_K, mu_nn = self._knn(x[first:last], x2[first:last], x, x2,
+                                       offsets, N, j0, j1)
+                w = between_class_weights(first, last, j0, j1, d_K)
+                w /= w_i[c[first:last], None]
+                delta = (x[first:last, None, :] - mu_nn).reshape(-1, dim)
+                self.Sb += np.dot((w.reshape(-1, 1)*delta).T, delta)
 
         if normalize:
             self.normalize()
@@ -154,6 +286,7 @@ class NSbSw(SbSw):
         
     def get_config(self):
         config = { 'K': self.K, 
-                   'alpha': self.alpha }
+                   'alpha': self.alpha,
+                   'block_size': self.block_size }
         base_config = super(NSbSw, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
@@ -5,7 +5,6 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
-from six.moves import xrange
 
 import logging
 
@@ -24,18 +23,25 @@ from .nda import NDA
 from .nap import NAP
 from .mvn import MVN
 from .gaussianizer import Gaussianizer
+from .affine import Affine
 
 
 
 class TransformList(HypModel):
     """Class to perform a list of transformations
+
+    Attributes:
+      transforms: list of transformations.
+      block_size: if not None, predict processes the input in blocks
+                  of block_size rows.
     """
     
-    def __init__(self, transforms, **kwargs):
+    def __init__(self, transforms, block_size=None, **kwargs):
         super(TransformList, self).__init__(**kwargs)
         if not isinstance(transforms, list):
             transforms = [transforms]
         self.transforms = transforms
+        self.block_size = block_size
         if transforms is not None:
             self.update_names()
 
@@ -46,11 +52,145 @@ class TransformList(HypModel):
             t.name = self.name + '/' + t.name
 
             
-    def predict(self, x):
+    def _predict(self, x):
         for t in self.transforms:
             x = t.predict(x)
         return x
 
+
+    def predict(self, x):
+        if self.block_size is None or x.shape[0] <= self.block_size:
+            return self._predict(x)
+
+        y = self._predict(x[:self.block_size])
+        out = np.empty((x.shape[0],) + y.shape[1:], dtype=y.dtype)
+        out[:self.block_size] = y
+        for first in range(self.block_size, x.shape[0], self.block_size):
+            last = min(first + self.block_size, x.shape[0])
+            out[first:last] = self._predict(x[first:last])
+        return out
+
+
+    @staticmethod
+    def _get_affine_params(t):
+        """Returns the parameters of transformation t written as
+           y = x T + b (+ length norm), or None if t is not affine.
+        """
+        if type(t) in (CentWhiten, LNorm):
+            T = t.T
+            if T is not None and T.ndim == 1:
+                T = np.diag(T)
+            b = None if t.mu is None else -t.mu
+            lnorm = type(t) == LNorm
+        elif type(t) in (PCA, LDA, NDA):
+            T = t.T
+            b = None if t.mu is None else -t.mu
+            lnorm = False
+        elif type(t) == MVN:
+            T = None if t.s is None else np.diag(1/t.s)
+            b = None if t.mu is None else -t.mu
+            lnorm = False
+        elif type(t) == NAP:
+            T = np.eye(t.U.shape[1]) - np.dot(t.U.T, t.U)
+            b = None
+            lnorm = False
+        elif type(t) == Affine:
+            return t.T, t.b, t.lnorm
+        else:
+            return None
+
+        if b is not None and T is not None:
+            b = np.dot(b, T)
+        return T, b, lnorm
+
+
+    @staticmethod
+    def _merge_affine(T1, b1, T2, b2):
+        """Returns T, b such that x T + b = (x T1 + b1) T2 + b2."""
+        if T1 is None:
+            T = T2
+        elif T2 is None:
+            T = T1
+        else:
+            T = np.dot(T1, T2)
+
+        if b1 is not None and T2 is not None:
+            b1 = np.dot(b1, T2)
+        if b1 is None:
+            b = b2
+        elif b2 is None:
+            b = b1
+        else:
+            b = b1 + b2
+        return T, b
+
+
+    @staticmethod
+    def _merge_is_cheaper(T1, T2):
+        if T1 is None or T2 is None:
+            return True
+        d, k = T1.shape
+        m = T2.shape[1]
+        return d*m <= d*k + k*m
+
+
+    def compile(self, block_size=None):
+        """Folds consecutive affine transformations (centering, whitening,
+           PCA, LDA, NDA, MVN, NAP and the affine part of LNorm) into single
+           Affine stages y = x T + b followed, when the chain ends in LNorm,
+           by an in-place length normalization.
+           Transformations that are not affine are kept as they are.
+
+        Args:
+          block_size: block size of the compiled transformation list.
+
+        Returns:
+          TransformList object equivalent to this one.
+        """
+        transforms = []
+        T = None
+        b = None
+        in_chain = False
+        for t in self.transforms:
+            params = self._get_affine_params(t)
+            if params is None:
+                if in_chain:
+                    transforms.append(Affine(T, b))
+                transforms.append(t)
+                T = None
+                b = None
+                in_chain = False
+                continue
+
+            T_t, b_t, lnorm = params
+            if in_chain and not self._merge_is_cheaper(T, T_t):
+                transforms.append(Affine(T, b))
+                T = None
+                b = None
+
+            T, b = self._merge_affine(T, b, T_t, b_t)
+            in_chain = True
+            if lnorm:
+                transforms.append(Affine(T, b, lnorm=True))
+                T = None
+                b = None
+                in_chain = False
+
+        if in_chain:
+            transforms.append(Affine(T, b))
+
+        num_affine = 0
+        for t in transforms:
+            if isinstance(t, Affine) and t.name is None:
+                t.name = 'affine%d' % num_affine
+                if self.name is not None:
+                    t.name = self.name + '/' + t.name
+                num_affine += 1
+
+        tl = TransformList(transforms, block_size=block_size)
+        tl.name = self.name
+        return tl
+
     
     def update_names(self):
         if self.name is not None:
@@ -60,8 +200,9 @@ class TransformList(HypModel):
     
     def get_config(self):
         config = super(TransformList, self).get_config()
+        config['block_size'] = self.block_size
         config_t = {}
-        for i in xrange(len(self.transforms)):
+        for i in range(len(self.transforms)):
             config_t[i] = self.transforms[i].get_config()
         config['transforms'] = config_t
         return config
@@ -76,11 +217,12 @@ class TransformList(HypModel):
     def load_params(cls, f, config):
         config_ts = config['transforms']
         transforms = []
-        for i in xrange(len(config_ts)):
+        for i in range(len(config_ts)):
             config_t = config_ts[str(i)]
             logging.debug(config_t)
             class_t = globals()[config_t['class_name']]
             t = class_t.load_params(f, config_t)
             transforms.append(t)
-        return cls(transforms, name=config['name'])
+        return cls(transforms, block_size=config.get('block_size'),
+                   name=config['name'])
             
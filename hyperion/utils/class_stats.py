@@ -0,0 +1,239 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+ Sufficient statistics of labeled vectors.
+"""
+
+import numpy as np
+
+from ..hyp_defs import float_cpu
+
+
+class ClassStats(object):
+    """Accumulates the sufficient statistics of vectors grouped by class:
+         N_k = sum_n w_n p_nk
+         F_k = sum_n w_n p_nk x_n
+         S = sum_k c_k sum_n w_n p_nk x_n x_n'
+       where w_n are the sample weights, p_nk the class assignments
+       (hard class ids or soft posteriors) and c_k optional class weights.
+
+       The stats are computed in one pass without loops over the classes:
+       hard class ids are sorted and the first order stats are obtained
+       with segment reductions, and S is computed with one matrix product
+       per chunk of data. Chunks of data can be accumulated one by one,
+       so the stats can be computed on datasets that don't fit in memory.
+
+       The stats are accumulated around a shift vector (the mean of the
+       first chunk) to reduce round-off errors when computing
+       scatter matrices.
+
+    Attributes:
+      num_classes: number of classes.
+      x_dim: vector dimension.
+      class_weights: weights c_k of the classes in S, if None, they are 1.
+    """
+    def __init__(self, num_classes, x_dim, class_weights=None):
+        self.num_classes = num_classes
+        self.x_dim = x_dim
+        self.class_weights = class_weights
+        self.shift = None
+        self._N = np.zeros((num_classes,), dtype=float_cpu())
+        self._F = np.zeros((num_classes, x_dim), dtype=float_cpu())
+        self._S = np.zeros((x_dim, x_dim), dtype=float_cpu())
+
+
+
+    @classmethod
+    def compute(cls, x, class_ids=None, p_theta=None, sample_weight=None,
+                num_classes=None, class_weights=None):
+        """Computes the stats of vectors in memory.
+
+        Args:
+          x: vectors (num_samples x x_dim).
+          class_ids: integer class ids (num_samples,).
+          p_theta: class posteriors (num_samples x num_classes),
+                   used if class_ids is None.
+          sample_weight: weights of the samples (num_samples,).
+          num_classes: number of classes, if None, it is max(class_ids)+1.
+          class_weights: weights of the classes in S.
+
+        Returns:
+          ClassStats object.
+        """
+        if num_classes is None:
+            num_classes = (np.max(class_ids)+1 if p_theta is None
+                           else p_theta.shape[1])
+        stats = cls(num_classes, x.shape[1], class_weights)
+        stats.accumulate(x, class_ids, p_theta, sample_weight)
+        return stats
+
+
+
+    @classmethod
+    def compute_from_generator(cls, generator, num_classes, x_dim,
+                               class_weights=None):
+        """Computes the stats of vectors read by chunks.
+
+        Args:
+          generator: iterable returning tuples (x, class_ids) or
+                     (x, class_ids, sample_weight) with a chunk of data.
+          num_classes: number of classes.
+          x_dim: vector dimension.
+          class_weights: weights of the classes in S.
+
+        Returns:
+          ClassStats object.
+        """
+        stats = cls(num_classes, x_dim, class_weights)
+        for data in generator:
+            sample_weight = data[2] if len(data) > 2 else None
+            stats.accumulate(data[0], data[1], sample_weight=sample_weight)
+        return stats
+
+
+
+    @staticmethod
+    def count(class_ids, num_classes=None, sample_weight=None):
+        """Computes the (weighted) number of samples per class."""
+        return np.bincount(class_ids, weights=sample_weight,
+                           minlength=0 if num_classes is None else num_classes).astype(
+                               float_cpu(), copy=False)
+
+
+
+    def accumulate(self, x, class_ids=None, p_theta=None, sample_weight=None):
+        """Accumulates the stats of a chunk of data.
+
+        Args:
+          x: vectors (num_samples x x_dim).
+          class_ids: integer class ids (num_samples,).
+          p_theta: class posteriors (num_samples x num_classes),
+                   used if class_ids is None.
+          sample_weight: weights of the samples (num_samples,).
+        """
+        assert class_ids is not None or p_theta is not None
+        if x.shape[0] == 0:
+            return
+
+        if self.shift is None:
+            self.shift = np.mean(x, axis=0)
+        x = x - self.shift
+
+        if class_ids is not None:
+            class_ids = np.asarray(class_ids)
+            self._N += self.count(class_ids, self.num_classes, sample_weight)
+            wx = x if sample_weight is None else sample_weight[:, None]*x
+            # first order stats with sorted segment reductions
+            idx = np.argsort(class_ids, kind='stable')
+            sorted_ids = class_ids[idx]
+            first = np.concatenate(
+                ([0], np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1))
+            self._F[sorted_ids[first]] += np.add.reduceat(wx[idx], first, axis=0)
+
+            if self.class_weights is None:
+                v = sample_weight
+            else:
+                v = self.class_weights[class_ids]
+                if sample_weight is not None:
+                    v = v*sample_weight
+        else:
+            if sample_weight is not None:
+                p_theta = sample_weight[:, None]*p_theta
+            self._N += np.sum(p_theta, axis=0)
+            self._F += np.dot(p_theta.T, x)
+            if self.class_weights is None:
+                v = np.sum(p_theta, axis=1)
+            else:
+                v = np.dot(p_theta, self.class_weights)
+
+        wx = x if v is None else v[:, None]*x
+        self._S += np.dot(x.T, wx)
+
+
+
+    def merge(self, other):
+        """Adds the stats of another ClassStats object."""
+        assert self.num_classes == other.num_classes
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift
+        # moves the stats of other to our shift
+        delta = other.shift - self.shift
+        N = other._N
+        F = other._F + np.outer(N, delta)
+        cw = other._get_class_weights()
+        g = np.dot(cw, other._F)
+        S = (other._S + np.outer(delta, g) + np.outer(g, delta) +
+             np.dot(cw, N)*np.outer(delta, delta))
+        self._N += N
+        self._F += F
+        self._S += S
+
+
+
+    def _get_class_weights(self):
+        if self.class_weights is None:
+            return np.ones((self.num_classes,), dtype=float_cpu())
+        return self.class_weights
+
+
+
+    @property
+    def N(self):
+        """Zero order stats (num_classes,)."""
+        return self._N
+
+
+    @property
+    def F(self):
+        """First order stats (num_classes x x_dim)."""
+        if self.shift is None:
+            return self._F
+        return self._F + np.outer(self._N, self.shift)
+
+
+    @property
+    def S(self):
+        """Second order stats sum_k c_k sum_n w_n p_nk x_n x_n'."""
+        if self.shift is None:
+            return self._S
+        cw = self._get_class_weights()
+        g = np.dot(cw, self._F)
+        Nw = np.dot(cw, self._N)
+        return (self._S + np.outer(self.shift, g) + np.outer(g, self.shift)
+                + Nw*np.outer(self.shift, self.shift))
+
+
+    @property
+    def mu(self):
+        """Class means (num_classes x x_dim)."""
+        N = np.maximum(self._N, 1e-20)[:, None]
+        return self.F/N
+
+
+
+    def within_class_scatter(self, mu=None):
+        """Computes the within class scatter matrix
+           sum_k c_k sum_n w_n p_nk (x_n - mu_k)(x_n - mu_k)'.
+
+        Args:
+          mu: class means, if None, the ones estimated from the stats are used.
+
+        Returns:
+          Scatter matrix (x_dim x x_dim).
+        """
+        cw = self._get_class_weights()
+        N = np.maximum(self._N, 1e-20)
+        Sw = self._S - np.dot((cw/N)*self._F.T, self._F)
+        if mu is not None:
+            delta = self.mu - mu
+            Sw += np.dot((cw*self._N)*delta.T, delta)
+        return Sw
+
+
+
+    def get_stats(self):
+        """Returns the stats as a tuple (N, F, S)."""
+        return self.N, self.F, self.S
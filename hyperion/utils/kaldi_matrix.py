@@ -483,13 +483,12 @@ class KaldiCompressedMatrix(object):
         M = cls()
         header = M._compute_global_header(mat, method)
         cols_header = bytes()
-        data = bytes()
         if M.data_format == 1 or M.data_format == 4:
-            for col in range(M.num_cols):
-                col_header, col_data = M._compress_column(mat[:,col])
-                cols_header += col_header
-                data += col_data
-
+            perc = M._compute_column_headers(mat)
+            cols_header = perc.tobytes()
+            p = M._uint16_to_float(cols_header).reshape(-1, 4)
+            # coded values are stored column by column
+            data = M._float_to_char(mat, p[:,0], p[:,1], p[:,2], p[:,3]).T.tobytes()
         elif M.data_format == 2:
             data = M._float_to_uint16(mat).tobytes()
         else:
@@ -528,137 +527,142 @@ class KaldiCompressedMatrix(object):
 
 
     
-    def _compute_column_header(self, v):
+    def _compute_column_headers(self, mat):
         """ Creates the column headers for the speech-feat compression.
 
         Args:
-          v: numpy array with the column to compress.
+          mat: numpy array with the matrix to compress.
 
         Returns:
-          Byte array with the header of the column containg the 0, 25, 75 and 100 percentile values.
+          uint16 numpy array of shape (num_cols, 4) with the 0, 25, 75 and 100 
+          percentile values of each column.
         """
         one = np.uint16(1)
         if self.num_rows >= 5:
             quarter_nr = int(self.num_rows/4)
-            v_sort = np.partition(v, (0, quarter_nr, 3*quarter_nr, -1))
-            perc_0 = min(self._float_to_uint16(v_sort[0])[0], np.uint16(65532))
-            perc_25 = min(max(self._float_to_uint16(v_sort[quarter_nr])[0], perc_0 + one), np.uint16(65533))
-            perc_75 = min(max(self._float_to_uint16(v_sort[3*quarter_nr])[0], perc_25 + one), np.uint16(65534))
-            perc_100 = max(self._float_to_uint16(v_sort[-1])[0], perc_75 + one)
+            kth = (0, quarter_nr, 3*quarter_nr, self.num_rows-1)
+            v_sort = np.partition(mat, kth, axis=0)[kth,:]
         else:
-            v_sort = np.sort(v)
-            perc_0 = min(self._float_to_uint16(v_sort[0])[0], np.uint16(65532))
-            if self.num_rows > 1:
-                perc_25 = min(max(self._float_to_uint16(v_sort[1])[0], perc_0 + one), np.uint16(65533))
-            else:
-                perc_25 = perc_0 + one
-            if self.num_rows > 2:
-                perc_75 = min(max(self._float_to_uint16(v_sort[2])[0], perc_25 + one), np.uint16(65534))
+            v_sort = np.sort(mat, axis=0)
+
+        q = self._float_to_uint16(v_sort).reshape(v_sort.shape)
+        perc = np.zeros((4, self.num_cols), dtype=np.uint16)
+        perc[0] = np.minimum(q[0], np.uint16(65532))
+        max_perc = (np.uint16(65533), np.uint16(65534), np.uint16(65535))
+        for i in range(1, 4):
+            if i < q.shape[0]:
+                perc[i] = np.minimum(
+                    np.maximum(q[i], perc[i-1] + one), max_perc[i-1])
             else:
-                perc_75 = perc_25 + one
+                perc[i] = perc[i-1] + one
 
-            if self.num_rows > 3:
-                perc_100 = max(self._float_to_uint16(v_sort[3])[0], perc_75 + one)
-            else:
-                perc_100 = perc_75 + one
-        return struct.pack('<HHHH', perc_0, perc_25, perc_75, perc_100)
+        return perc.T.copy()
 
 
-    
-    def _compress_column(self, v):
-        """ Compress column for the speech-feat compression.
+
+    @staticmethod
+    def _float_to_char(v, p0, p25, p75, p100):
+        """Codes the columns from float to bytes using the given percentiles.
 
         Args:
-          v: numpy array with the column to compress.
+          v: numpy array with the values to code.
+          p0, p25, p75, p100: percentiles, scalars or arrays with one value per column.
 
         Returns:
-          Byte array with the header of the column containg the 0, 25, 75 and 100 percentile values.
-          Byte array with the coded column.
+          uint8 numpy array with the coded values.
         """
-
-        col_header = self._compute_column_header(v)
-        p0, p25, p75, p100 = self._uint16_to_float(col_header)
-        return col_header, self._float_to_char(v, p0, p25, p75, p100).tobytes()
-
+        # values are coded in the precision of the input
+        dtype = v.dtype if v.dtype.kind == 'f' else float_cpu()
+        region = (v >= p25).astype(np.intp) + (v >= p75)
+        p_lo = np.choose(region, (p0, p25, p75)).astype(dtype, copy=False)
+        p_width = np.choose(
+            region, (p25 - p0, p75 - p25, p100 - p75)).astype(dtype, copy=False)
+        scale = np.array([64, 128, 63], dtype=np.int32)[region]
+        offset = np.array([0, 64, 192], dtype=np.int32)[region]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = (v - p_lo)/p_width
+            c = (f*scale.astype(dtype) + 0.5).astype(np.int32)
+        c = offset + np.clip(c, 0, scale)
+        return c.astype(np.uint8)
 
     
-    def _uncompress_column(self, col_header, col_data):
-        """ Compress column for the speech-feat compression.
+
+    @staticmethod
+    def _char_to_float(v, p0, p25, p75, p100):
+        """Decodes the columns from bytes to float using the given percentiles.
 
         Args:
-          col_header: Byte array with the header of the column containg the 0, 25, 75 and 100 percentile values.
-          col_data: Byte array with the coded column.
+          v: uint8 numpy array with the coded values.
+          p0, p25, p75, p100: percentiles, scalars or arrays with one value per column.
 
         Returns:
-          numpy array with the uncompressed column 
+          numpy array with the decoded values.
         """
-        p0, p25, p75, p100 = self._uint16_to_float(col_header)
-        return self._char_to_float(col_data, p0, p25, p75, p100)
-        
-    
+        v_in = v.astype(float_cpu())
+        region = (v > 64).astype(np.intp) + (v > 192)
+        p_lo = np.choose(region, (p0, p25, p75))
+        p_width = np.choose(region, (p25 - p0, p75 - p25, p100 - p75))
+        scale = np.array([64.0, 128.0, 63.0], dtype=float_cpu())[region]
+        offset = np.array([0, 64, 192], dtype=float_cpu())[region]
+        return p_lo + p_width*(v_in - offset)/scale
 
-    @staticmethod
-    def _float_to_char(v, p0, p25, p75, p100):
-        """Codes the column from float to bytes using the given percentiles"""
-        v_out = np.zeros(v.shape, dtype=np.int32)
-        idx = v < p25
-        f = (v[idx] - p0)/(p25-p0)
-        c = (f*64+0.5).astype(np.int32)
-        c[c<0] = 0
-        c[c>64] = 64
-        v_out[idx] = c
-        idx = np.logical_and(v >= p25, v < p75)
-        f = (v[idx] - p25)/(p75-p25)
-        c = 64 + (f*128+0.5).astype(np.int32)
-        c[c<64] = 64
-        c[c>192] = 192
-        v_out[idx] = c
-        idx = v >= p75
-        f = (v[idx] - p75)/(p100-p75)
-        c = 192 + (f*63+0.5).astype(np.int32)
-        c[c<192] = 192
-        c[c>255] = 255
-        v_out[idx] = c
-        return v_out.astype(np.uint8)
 
-    
 
-    @staticmethod
-    def _char_to_float(v, p0, p25, p75, p100):
-        """Decodes the column from bytes to float using the given percentiles"""
-        v_in = np.frombuffer(v, dtype=np.uint8).astype(float_cpu())
-        v_out = np.zeros(v_in.shape, dtype=float_cpu())
-        idx = v_in <= 64
-        v_out[idx] = p0 + (p25-p0)*v_in[idx]/64.0
-        idx = np.logical_and(v_in>64, v_in<=192)
-        v_out[idx] = p25 + (p75-p25)*(v_in[idx] - 64)/128.0
-        idx = v_in > 192
-        v_out[idx] = p75 + (p100-p75)*(v_in[idx] - 192)/63.0
-        return v_out
+    def _get_char_to_float_table(self):
+        """Computes the table to decode the 256 possible byte values
+           of all the columns at once for the speech-feat compression.
+
+        Returns:
+          numpy array of shape (256, num_cols).
+        """
+        data_offset = 20 + self.num_cols*8
+        p = self._uint16_to_float(self.data[20:data_offset]).reshape(-1, 4)
+        v = np.arange(256, dtype=np.uint8)[:, None]
+        return self._char_to_float(v, p[:,0], p[:,1], p[:,2], p[:,3])
 
 
     
-    def to_ndarray(self):
+    def to_ndarray(self, row_offset=0, num_rows=0):
         """Uncompresses matrix to numpy array.
+
+        Args:
+          row_offset: Uncompresses matrix starting from a given row instead of row 0.
+          num_rows: Num. of rows to uncompress, if 0 uncompress all the rows.
+
         Returns:
           numpy array with uncompressed matrix.
         """
+        total_rows = self.num_rows
+        assert row_offset <= total_rows, (
+            'row_offset (%d) > num_rows (%d)' %
+            (row_offset, total_rows))
+        if num_rows == 0:
+            num_rows = total_rows - row_offset
+        else:
+            assert num_rows <= total_rows - row_offset, (
+                'requested rows (%d) > available rows (%d)' %
+                (num_rows, total_rows - row_offset))
+        last_row = row_offset + num_rows
+            
         if self.data_format == 1 or self.data_format == 4:
-            mat = np.zeros((self.num_rows, self.num_cols), dtype=float_cpu())
-            header_offset = 20
-            data_offset = header_offset+self.num_cols*8
-            for i in range(self.num_cols):
-                mat[:,i] = self._uncompress_column(
-                    self.data[header_offset:header_offset+8],
-                    self.data[data_offset:data_offset+self.num_rows])
-                header_offset += 8
-                data_offset += self.num_rows
+            data_offset = 20 + self.num_cols*8
+            table = self._get_char_to_float_table()
+            data = np.frombuffer(
+                self.data, dtype=np.uint8, count=self.num_cols*total_rows,
+                offset=data_offset).reshape(self.num_cols, total_rows)
+            mat = np.take_along_axis(table, data[:, row_offset:last_row].T, axis=0)
         elif self.data_format == 2:
-            mat = np.reshape(self._uint16_to_float(self.data[20:]),
-                             (self.num_rows, self.num_cols)).astype(float_cpu(), copy=False)
+            row_size = 2*self.num_cols
+            mat = np.reshape(
+                self._uint16_to_float(
+                    self.data[20+row_offset*row_size:20+last_row*row_size]),
+                (num_rows, self.num_cols)).astype(float_cpu(), copy=False)
         else:
-            mat = np.reshape(self._uint8_to_float(self.data[20:]),
-                             (self.num_rows, self.num_cols)).astype(float_cpu(), copy=False)
+            row_size = self.num_cols
+            mat = np.reshape(
+                self._uint8_to_float(
+                    self.data[20+row_offset*row_size:20+last_row*row_size]),
+                (num_rows, self.num_cols)).astype(float_cpu(), copy=False)
 
         return mat
 
@@ -722,13 +726,11 @@ class KaldiCompressedMatrix(object):
                 else:
                     if data_format == 1:
                         col_header = f.read(bytes_col_header)
-                        data = bytes()
-                        for c in range(num_cols):
-                            if bytes_offset > 0:
-                                f.seek(bytes_offset, 1)
-                            data += f.read(bytes_col)
-                            if bytes_left > 0:
-                                f.seek(bytes_left, 1)
+                        total_bytes_col = bytes_offset + bytes_col + bytes_left
+                        data = np.frombuffer(
+                            f.read(num_cols*total_bytes_col), dtype=np.uint8).reshape(
+                                num_cols, total_bytes_col)
+                        data = data[:, bytes_offset:bytes_offset+bytes_col].tobytes()
                         data = header + col_header + data
                     elif data_format == 4:
                         col_header = f.read(bytes_col_header)
@@ -143,12 +143,7 @@ def split_list_group_by_key(a, idx, num_parts, key = None):
     n = float(ids.max()+1)
     idx_1 = int(np.floor((idx-1)*n/num_parts))
     idx_2 = int(np.floor(idx*n/num_parts))
-    loc = np.empty(len(a), dtype='int64')
-    k = 0
-    for i in range(idx_1, idx_2):
-        loc_i = (ids==i).nonzero()[0]
-        loc[k:k+len(loc_i)] = loc_i
-        k += len(loc_i)
-    loc = loc[:k]
+    loc = np.flatnonzero((ids >= idx_1) & (ids < idx_2))
+    loc = loc[np.argsort(ids[loc], kind='stable')]
     return a[loc], loc
 
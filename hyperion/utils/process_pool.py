@@ -0,0 +1,187 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+
+import time
+import queue
+import threading
+import traceback
+import multiprocessing
+
+
+def _worker_loop(worker_id, process_fn, init_fn, init_args, finalize_fn,
+                 in_queue, out_queue):
+    """Main loop of the worker processes of OrderedProcessPool.
+
+       It sends (index, result, error, elapsed_time) tuples through the
+       output queue and None when it finishes.
+    """
+    try:
+        state = None
+        if init_fn is not None:
+            state = init_fn(worker_id, *init_args)
+
+        while True:
+            task = in_queue.get()
+            if task is None:
+                break
+            idx, item = task
+            t1 = time.time()
+            result = process_fn(state, item)
+            out_queue.put((idx, result, None, time.time() - t1))
+
+        if finalize_fn is not None:
+            finalize_fn(state)
+    except Exception:
+        out_queue.put((-1, None, traceback.format_exc(), 0))
+
+    out_queue.put(None)
+
+
+
+class OrderedProcessPool(object):
+    """Processes a stream of items in a pool of worker processes and
+       returns the results in the same order as the input.
+
+       The items are read in a thread of the main process and sent to
+       the workers through a bounded queue. The number of items that have been
+       read but whose results have not been consumed yet is limited,
+       so a slow consumer or a slow item stops the reader
+       instead of filling the memory.
+
+    Attributes:
+      num_workers: Number of worker processes.
+      process_fn: Function process_fn(state, item) that returns the result
+                  for one item. It must be picklable.
+      init_fn: Optional function init_fn(worker_id, *init_args) called once
+               in each worker to create the state passed to process_fn,
+               e.g., the feature extractor.
+      init_args: Extra arguments of init_fn.
+      finalize_fn: Optional function finalize_fn(state) called in each worker
+                   after processing the last item, e.g., to close a writer.
+      queue_size: Max. number of items waiting in the input queue.
+      read_time: Time spent reading the items in the last call to imap.
+      compute_time: Time spent by the workers in process_fn in the
+                    last call to imap, summed over workers.
+      num_items: Number of items processed in the last call to imap.
+    """
+    def __init__(self, num_workers, process_fn, init_fn=None, init_args=(),
+                 finalize_fn=None, queue_size=16):
+        self.num_workers = num_workers
+        self.process_fn = process_fn
+        self.init_fn = init_fn
+        self.init_args = init_args
+        self.finalize_fn = finalize_fn
+        self.queue_size = queue_size
+        self.read_time = 0
+        self.compute_time = 0
+        self.num_items = 0
+
+
+
+    def _feed(self, items, in_queue, slots, errors):
+        """Reads the items and puts them into the input queue."""
+        try:
+            it = iter(items)
+            idx = 0
+            while True:
+                slots.acquire()
+                t1 = time.time()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                finally:
+                    self.read_time += time.time() - t1
+                in_queue.put((idx, item))
+                idx += 1
+        except Exception:
+            errors.append(traceback.format_exc())
+        finally:
+            for i in range(self.num_workers):
+                in_queue.put(None)
+
+
+
+    def imap(self, items):
+        """Generator that processes the items and returns
+           the results in input order.
+
+        Args:
+          items: Iterable with the items to process.
+
+        Returns:
+          Results of process_fn for each item.
+        """
+        self.read_time = 0
+        self.compute_time = 0
+        self.num_items = 0
+
+        ctx = multiprocessing.get_context()
+        in_queue = ctx.Queue(self.queue_size)
+        out_queue = ctx.Queue()
+        workers = [ctx.Process(target=_worker_loop,
+                               args=(i, self.process_fn, self.init_fn,
+                                     self.init_args, self.finalize_fn,
+                                     in_queue, out_queue),
+                               daemon=True)
+                   for i in range(self.num_workers)]
+        for w in workers:
+            w.start()
+
+        # max. number of items that have been read and not consumed
+        slots = threading.Semaphore(self.queue_size + 2*self.num_workers)
+        errors = []
+        feeder = threading.Thread(target=self._feed,
+                                  args=(items, in_queue, slots, errors),
+                                  daemon=True)
+        feeder.start()
+
+        done = {}
+        next_idx = 0
+        num_finished = 0
+        try:
+            while True:
+                if next_idx in done:
+                    result = done.pop(next_idx)
+                    next_idx += 1
+                    self.num_items = next_idx
+                    slots.release()
+                    yield result
+                    continue
+
+                if num_finished == self.num_workers:
+                    break
+
+                try:
+                    msg = out_queue.get(timeout=1)
+                except queue.Empty:
+                    if any(w.exitcode not in (None, 0) for w in workers):
+                        raise RuntimeError('worker process died')
+                    continue
+
+                if msg is None:
+                    num_finished += 1
+                    continue
+
+                idx, result, error, elapsed = msg
+                if error is not None:
+                    raise RuntimeError('worker failed:\n%s' % error)
+                self.compute_time += elapsed
+                done[idx] = result
+
+            feeder.join()
+            if len(errors) > 0:
+                raise RuntimeError('reading items failed:\n%s' % errors[0])
+        finally:
+            if num_finished < self.num_workers:
+                # the workers are not going to read the pending items,
+                # don't wait for them to be flushed at exit
+                in_queue.cancel_join_thread()
+                out_queue.cancel_join_thread()
+                for w in workers:
+                    if w.is_alive():
+                        w.terminate()
+            for w in workers:
+                w.join()
@@ -10,7 +10,6 @@
 
 import os
 import os.path as path
-from collections import OrderedDict
 from copy import deepcopy
 import logging
 
@@ -19,6 +18,99 @@ import numpy as np
 from .list_utils import *
 
 
+# characters removed by str.rstrip in the ascii range
+_rstrip_chars = np.zeros((256,), dtype=bool)
+_rstrip_chars[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = True
+
+_block_size = 2**20
+
+
+def _get_substrings(data, start, end):
+    """Returns bytes numpy array with the substrings data[start:end].
+
+    Args:
+      data: uint8 numpy array with the contents of the file.
+      start: int64 numpy array with the first byte of the substrings.
+      end: int64 numpy array with the last byte + 1 of the substrings.
+    """
+    n = len(start)
+    lens = end - start
+    width = max(int(lens.max()) if n > 0 else 0, 1)
+    s = np.empty((n,), dtype='S%d' % width)
+    cols = np.arange(width)
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.concatenate((data, np.zeros((width,), dtype=np.uint8))), width)
+    for first in range(0, n, _block_size):
+        last = min(first + _block_size, n)
+        chars = windows[start[first:last]]
+        chars[cols >= lens[first:last, None]] = 0
+        s[first:last] = chars.view('S%d' % width).ravel()
+    return s
+
+
+
+def _decode(s, is_ascii):
+    """Converts bytes numpy array to unicode numpy array."""
+    if is_ascii:
+        return s.astype('U')
+    return np.char.decode(s, 'utf-8')
+
+
+
+def _get_unique_substrings(data, start, end, is_ascii):
+    """Returns the sorted unique substrings data[start:end] and the index
+       of each substring in the unique array. The substrings are
+       processed by blocks to avoid padding all of them to the
+       length of the longest one.
+    """
+    tables = []
+    inverse = []
+    table_offset = 0
+    for first in range(0, max(len(start), 1), _block_size):
+        last = first + _block_size
+        s = _get_substrings(data, start[first:last], end[first:last])
+        table, idx = np.unique(s, return_inverse=True)
+        tables.append(table)
+        inverse.append(idx + table_offset)
+        table_offset += len(table)
+
+    table, remap = np.unique(np.concatenate(tables), return_inverse=True)
+    idx = remap[np.concatenate(inverse)]
+    return _decode(table, is_ascii), idx
+
+
+
+def _parse_uint(data, start, end):
+    """Parses the unsigned integers written in data[start:end].
+
+    Returns:
+      int64 numpy array with the integers.
+      Boolean numpy array, True where the substring is a non-empty decimal number.
+    """
+    lens = end - start
+    value = np.zeros(len(start), dtype=np.int64)
+    is_decimal = lens > 0
+    for j in range(int(lens.max()) if len(lens) > 0 else 0):
+        valid = j < lens
+        d = data[np.where(valid, start + j, 0)].astype(np.int64) - 48
+        is_decimal &= np.logical_not(valid) | ((d >= 0) & (d <= 9))
+        value = np.where(valid, value * 10 + d, value)
+    return value, is_decimal
+
+
+
+def _first_after(pos, start, end):
+    """Returns the first element of the sorted array pos in [start, end)
+       and True where that element exists.
+    """
+    k = np.searchsorted(pos, start)
+    found = k < len(pos)
+    p = np.where(found, pos[np.minimum(k, len(pos) - 1)] if len(pos) > 0 else 0, end)
+    found &= p < end
+    return np.where(found, p, end), found
+
+
+
 class SCPList(object):
     """Class to manipulate script lists.
 
@@ -36,6 +128,7 @@ class SCPList(object):
         self.offset = offset
         self.range_spec = range_spec
         self.key_to_index = None
+        self._path_table = None
         self.validate()
 
         
@@ -54,7 +147,7 @@ class SCPList(object):
                 self.range_spec = None
             else:
                 if isinstance(self.range_spec, list):
-                    self.range_spec = np.array(self.offset, dtype=np.int64)
+                    self.range_spec = np.array(self.range_spec, dtype=np.int64)
                 assert len(self.key) == self.range_spec.shape[0]
                 assert self.range_spec.shape[1] == 2
 
@@ -79,7 +172,7 @@ class SCPList(object):
         """Creates dictionary that returns the position of 
            a segment in the list.
         """
-        self.key_to_index = OrderedDict((k,i) for i, k in enumerate(self.key))
+        self.key_to_index = dict(zip(self.key.tolist(), range(len(self.key))))
 
         
 
@@ -129,9 +222,38 @@ class SCPList(object):
             return self.file_path[index], offset, range_spec
 
 
+    def get_unique_file_paths(self):
+        """Returns the sorted unique file paths in the list and the index
+           in the unique paths array for each element of the list.
+           Lists loaded from file already store the paths this way, so
+           the unique paths are only computed for lists created from arrays.
+        """
+        if self._path_table is None or self._path_table[0] is not self.file_path:
+            paths, idx = np.unique(self.file_path.astype(str), return_inverse=True)
+            self._path_table = (self.file_path, paths, idx)
+            return paths, idx
+
+        _, paths, idx = self._path_table
+        used = np.unique(idx)
+        if len(used) < len(paths):
+            paths = paths[used]
+            idx = np.searchsorted(used, idx)
+            self._path_table = (self.file_path, paths, idx)
+        return paths, idx
+
+
+
+    def _set_file_path_table(self, paths, idx):
+        """Sets file_path from the unique paths and the index of each element."""
+        self.file_path = paths.astype(object)[idx]
+        self._path_table = (self.file_path, paths, idx)
+
+
+    
     def add_prefix_to_filepath(self, prefix):
         """Adds a prefix to the file path"""
-        self.file_path = np.array([prefix + p for p in self.file_path])
+        paths, idx = self.get_unique_file_paths()
+        self._set_file_path_table(np.char.add(prefix, paths), idx)
     
 
     
@@ -222,17 +344,101 @@ class SCPList(object):
                     
 
     
-    @classmethod
-    def load(cls, file_path, sep=' ', offset_sep=':', is_wav=False):
-        """Loads script list from text file.
-
+    @staticmethod
+    def _parse_buffer(buf, sep, offset_sep, is_wav):
+        """Parses the contents of the scp text file using numpy
+           vectorized operations instead of splitting each line in python.
+        
         Args:
-          file_path: File to read the list.
+          buf: bytes with the contents of the scp file.
           sep: Separator between the key and file_path in the text file.
           offset_sep: Separator between file_path and offset.
+          is_wav: If True, the second field is kept as it is.
 
         Returns:
-          SCPList object.
+          key, unique file paths, index of the unique path of each line, 
+          offset and range_spec.
+        """
+        if len(buf) == 0:
+            buf = b'\n'
+        data = np.frombuffer(buf, dtype=np.uint8)
+        is_ascii = data.max() < 128
+        nl = np.flatnonzero(data == ord('\n'))
+        start = np.concatenate(([0], nl + 1)).astype(np.int64)
+        end = np.concatenate((nl, [len(data)])).astype(np.int64)
+        # rstrip the lines
+        while True:
+            strip = (end > start) & _rstrip_chars[data[np.maximum(end - 1, 0)]]
+            if not np.any(strip):
+                break
+            end[strip] -= 1
+
+        non_empty = end > start
+        start = start[non_empty]
+        end = end[non_empty]
+
+        sep_pos = np.flatnonzero(data == ord(sep))
+        key_end, found = _first_after(sep_pos, start, end)
+        if not np.all(found):
+            i = np.flatnonzero(np.logical_not(found))[0]
+            raise ValueError('Missing separator in line %s' % (
+                bytes(data[start[i]:end[i]]).decode('utf-8')))
+        key = _decode(_get_substrings(data, start, key_end), is_ascii)
+        start = key_end + 1
+
+        if is_wav:
+            paths, path_idx = _get_unique_substrings(data, start, end, is_ascii)
+            return key, paths, path_idx, None, None
+            
+        range_start, has_range = _first_after(
+            np.flatnonzero(data == ord('[')), start, end)
+        offset_pos, has_offset = _first_after(
+            np.flatnonzero(data == ord(offset_sep)), start, range_start)
+        paths, path_idx = _get_unique_substrings(
+            data, start, offset_pos, is_ascii)
+
+        offset = None
+        if len(has_offset) > 0 and has_offset[0]:
+            if not np.all(has_offset):
+                i = np.flatnonzero(np.logical_not(has_offset))[0]
+                raise ValueError('Missing data position for %s' % (
+                    paths[path_idx[i]]))
+            offset, is_decimal = _parse_uint(data, offset_pos + 1, range_start)
+            if not np.all(is_decimal):
+                i = np.flatnonzero(np.logical_not(is_decimal))[0]
+                raise ValueError('Wrong data position for %s' % (
+                    paths[path_idx[i]]))
+
+        range_spec = None
+        if np.any(has_range):
+            range_start = range_start[has_range] + 1
+            range_end = end[has_range]
+            while True:
+                strip = ((range_end > range_start) &
+                         (data[np.maximum(range_end - 1, 0)] == ord(']')))
+                if not np.any(strip):
+                    break
+                range_end[strip] -= 1
+
+            colon_pos, has_colon = _first_after(
+                np.flatnonzero(data == ord(':')), range_start, range_end)
+            if not np.all(has_colon):
+                raise ValueError('Wrong range specifier')
+            first, is_decimal = _parse_uint(data, range_start, colon_pos)
+            first[np.logical_not(is_decimal)] = 0
+            last, is_decimal = _parse_uint(data, colon_pos + 1, range_end)
+            range_spec = np.zeros((len(key), 2), dtype=np.int64)
+            range_spec[has_range, 0] = first
+            range_spec[has_range, 1] = np.where(is_decimal, last - first + 1, 0)
+            
+        return key, paths, path_idx, offset, range_spec
+
+
+    
+    @classmethod
+    def _load_text(cls, file_path, sep, offset_sep, is_wav):
+        """Loads script list from text file splitting the lines in python,
+           used for separators that are not a single ascii character.
         """
         with open(file_path, 'r') as f:
             fields = [line.rstrip().split(sep=sep, maxsplit=1) for line in f]
@@ -250,6 +456,147 @@ class SCPList(object):
 
 
     
+    @classmethod
+    def load(cls, file_path, sep=' ', offset_sep=':', is_wav=False,
+             use_cache=False):
+        """Loads script list from text file.
+
+        Args:
+          file_path: File to read the list.
+          sep: Separator between the key and file_path in the text file.
+          offset_sep: Separator between file_path and offset.
+          is_wav: If True, the second field is the wav file or command and 
+                  it is not parsed.
+          use_cache: If True, it loads the list from the binary cache file
+                     next to the text file if it is up to date, otherwise, 
+                     it parses the text file and tries to save the cache file.
+
+        Returns:
+          SCPList object.
+        """
+        cache_path = cls.get_cache_path(file_path)
+        params = np.array([sep, offset_sep, str(is_wav)])
+        if use_cache and os.path.isfile(cache_path):
+            try:
+                scp, cache_params, cache_stats = cls._load_binary(cache_path)
+                if (np.all(cache_params == params) and
+                    np.all(cache_stats == cls._get_file_stats(file_path))):
+                    return scp
+            except Exception as e:
+                logging.warning('cannot load cache %s: %s' % (cache_path, str(e)))
+
+        if not (len(sep) == 1 and len(offset_sep) == 1 and 
+                ord(sep) < 128 and ord(offset_sep) < 128):
+            scp = cls._load_text(file_path, sep, offset_sep, is_wav)
+        else:
+            with open(file_path, 'rb') as f:
+                buf = f.read()
+            key, paths, path_idx, offset, range_spec = cls._parse_buffer(
+                buf, sep, offset_sep, is_wav)
+            del buf
+            scp = cls(key, paths.astype(object)[path_idx], offset, range_spec)
+            scp._path_table = (scp.file_path, paths, path_idx)
+
+        if use_cache:
+            try:
+                scp._save_binary(cache_path, params, 
+                                 cls._get_file_stats(file_path))
+            except OSError as e:
+                logging.warning('cannot save cache %s: %s' % (cache_path, str(e)))
+        return scp
+
+
+    
+    @staticmethod
+    def get_cache_path(file_path):
+        """Returns the path of the binary cache file for a given scp file."""
+        return file_path + '.cache'
+
+
+    
+    @staticmethod
+    def _get_file_stats(file_path):
+        """Returns the size and modification time in ns of a file."""
+        st = os.stat(file_path)
+        return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+    
+    def _save_binary(self, file_path, params=None, stats=None):
+        """Saves script list to binary file. The list is written to a temporary
+           file that is renamed when it is complete, so other processes never
+           read a partially written cache.
+        """
+        paths, path_idx = self.get_unique_file_paths()
+        d = {'key': self.key, 'paths': paths, 'path_idx': path_idx}
+        if self.offset is not None:
+            d['offset'] = self.offset
+        if self.range_spec is not None:
+            d['range_spec'] = self.range_spec
+        if params is not None:
+            d['params'] = params
+        if stats is not None:
+            d['stats'] = stats
+        tmp_path = '%s.%d.tmp' % (file_path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **d)
+            os.replace(tmp_path, file_path)
+        except:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+
+    def save_binary(self, file_path):
+        """Saves script list to binary file, which is much faster to 
+           load than the text file.
+
+        Args:
+          file_path: File to write the list.
+        """
+        self._save_binary(file_path)
+
+
+    
+    @classmethod
+    def _load_binary(cls, file_path):
+        """Loads script list from binary file.
+
+        Returns:
+          SCPList object, parameters and stats of the text file 
+          stored with the list.
+        """
+        with open(file_path, 'rb') as f:
+            d = np.load(f, allow_pickle=False)
+            paths = d['paths']
+            path_idx = d['path_idx']
+            offset = d['offset'] if 'offset' in d else None
+            range_spec = d['range_spec'] if 'range_spec' in d else None
+            scp = cls(d['key'], paths.astype(object)[path_idx], 
+                      offset, range_spec)
+            scp._path_table = (scp.file_path, paths, path_idx)
+            params = d['params'] if 'params' in d else None
+            stats = d['stats'] if 'stats' in d else None
+        return scp, params, stats
+
+
+    
+    @classmethod
+    def load_binary(cls, file_path):
+        """Loads script list from binary file.
+
+        Args:
+          file_path: File to read the list.
+
+        Returns:
+          SCPList object.
+        """
+        return cls._load_binary(file_path)[0]
+
+
+    
     def split(self, idx, num_parts, group_by_key=True):
         """ Splits SCPList into num_parts and return part idx.
         
@@ -322,12 +669,12 @@ class SCPList(object):
         Returns:
           SCPList object.
         """
-        if not keep:
-            filter_key = np.setdiff1d(self.key, filter_key)
-
-        f, _ = ismember(filter_key, self.key)
-        assert np.all(f)
-        f, _ = ismember(self.key, filter_key)
+        filter_key = np.asarray(filter_key)
+        if keep:
+            assert np.all(np.isin(filter_key, self.key))
+            f = np.isin(self.key, filter_key)
+        else:
+            f = np.logical_not(np.isin(self.key, filter_key))
         key = self.key[f]
         file_path = self.file_path[f]
         
@@ -354,12 +701,13 @@ class SCPList(object):
           SCPList object.
         """
 
-        if not keep :
-            filter_key = np.setdiff1d(self.file_path, filter_key)
-
-        f, _ = ismember(filter_key, self.file_path)
-        assert(np.all(f))
-        f, _ = ismember(self.file_path, filter_key)
+        paths, path_idx = self.get_unique_file_paths()
+        filter_key = np.asarray(filter_key)
+        if keep:
+            assert np.all(np.isin(filter_key, paths))
+            f = np.isin(paths, filter_key)[path_idx]
+        else:
+            f = np.logical_not(np.isin(paths, filter_key))[path_idx]
         key = self.key[f]
         file_path = self.file_path[f]
         
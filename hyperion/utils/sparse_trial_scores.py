@@ -61,33 +61,32 @@ class SparseTrialScores(TrialScores):
 
 
     @classmethod
-    def load_txt(cls, file_path):
-        """Loads object from h5 file
+    def load_txt(cls, file_path, chunk_size=2**26, num_threads=1):
+        """Loads object from txt file
 
         Args:
           file_path: File to read the list.
+          chunk_size: Approximated size in bytes of the chunks parsed at once.
+          num_threads: Number of threads to parse the chunks in parallel.
 
         Returns:
           SparseTrialScores object.
         """
-        with open(file_path, 'r') as f:
-            fields = [line.split() for line in f]
-
-        models = [i[0] for i in fields]
-        segments = [i[1] for i in fields]
-        scores_v = np.array([i[2] for i in fields])
-        
-        model_set, _, model_idx = np.unique(
-            models, return_index=True, return_inverse=True)
-        seg_set, _, seg_idx = np.unique(
-            segments, return_index=True, return_inverse=True)
-
-        scores = sparse.lil_matrix((len(model_set), len(seg_set)), dtype=float_cpu())
-        score_mask = sparse.lil_matrix(scores.shape, dtype='bool')
-        for item in zip(model_idx, seg_idx, scores_v):
-            score_mask[item[0], item[1]] = True
-            scores[item[0], item[1]] = item[2]
-        return cls(model_set, seg_set, scores.tocsr(), score_mask.tocsr())
+        model_set, seg_set, model_idx, seg_idx, scores_v = cls._load_txt_trials(
+            file_path, chunk_size, num_threads)
+
+        shape = (len(model_set), len(seg_set))
+        # keep the last score of repeated trials
+        idx = np.ravel_multi_index((model_idx, seg_idx), shape)
+        _, last = np.unique(idx[::-1], return_index=True)
+        last = len(idx) - 1 - last
+        if len(last) < len(idx):
+            model_idx, seg_idx, scores_v = model_idx[last], seg_idx[last], scores_v[last]
+
+        scores = sparse.csr_matrix((scores_v, (model_idx, seg_idx)), shape=shape)
+        score_mask = sparse.csr_matrix(
+            (np.ones(len(scores_v), dtype='bool'), (model_idx, seg_idx)), shape=shape)
+        return cls(model_set, seg_set, scores, score_mask)
 
 
     @classmethod
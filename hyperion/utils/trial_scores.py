@@ -5,10 +5,14 @@
 from __future__ import absolute_import
 
 import os.path as path
+import io
+import csv
 import logging
 import copy
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
+import pandas as pd
 import h5py
 
 from ..hyp_defs import float_cpu
@@ -144,90 +148,164 @@ class TrialScores(object):
         return cls(model_set, seg_set, scores, score_mask)
 
 
+    @staticmethod
+    def _get_chunk_ranges(file_path, chunk_size):
+        """Splits a text file into byte ranges of about chunk_size bytes
+           that start and end at line boundaries.
+        """
+        file_size = path.getsize(file_path)
+        ranges = []
+        with open(file_path, 'rb') as f:
+            start = 0
+            while start < file_size:
+                end = start + chunk_size
+                if end < file_size:
+                    f.seek(end)
+                    f.readline()
+                    end = f.tell()
+                else:
+                    end = file_size
+                ranges.append((start, end))
+                start = end
+        return ranges
+
+
+
+    @staticmethod
+    def _read_txt_chunk(file_path, start, end):
+        """Parses the trials in a byte range of a text score file.
+
+        Returns:
+          Unique model names in the chunk and index of the model of each trial.
+          Unique segment names in the chunk and index of the segment of each trial.
+          Scores of the trials.
+        """
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            buf = f.read(end - start)
+
+        if len(buf.strip()) == 0:
+            empty_set = np.zeros((0,), dtype=object)
+            empty_idx = np.zeros((0,), dtype=np.int64)
+            return (empty_set, empty_idx, empty_set, empty_idx,
+                    np.zeros((0,), dtype=float_cpu()))
+
+        df = pd.read_csv(io.BytesIO(buf), sep=r'\s+', header=None,
+                         usecols=[0, 1, 2], dtype={0: str, 1: str, 2: float_cpu()},
+                         na_filter=False, quoting=csv.QUOTE_NONE, engine='c')
+        model_idx, models = pd.factorize(df[0].values)
+        seg_idx, segs = pd.factorize(df[1].values)
+        return models, model_idx, segs, seg_idx, df[2].values
+
+
+
+    @staticmethod
+    def _merge_chunk_sets(sets, idx):
+        """Merges the unique names of the chunks into a sorted global set
+           and maps the chunk indices to the global set.
+        """
+        if len(sets) == 0:
+            return np.zeros((0,), dtype=str), np.zeros((0,), dtype=np.int64)
+
+        global_set, global_idx = np.unique(
+            np.concatenate(sets).astype(str), return_inverse=True)
+        offset = 0
+        new_idx = []
+        for set_i, idx_i in zip(sets, idx):
+            new_idx.append(global_idx[offset + idx_i])
+            offset += len(set_i)
+        return global_set, np.concatenate(new_idx)
+
+
+
     @classmethod
-    def load_txt(cls, file_path):
-        """Loads object from h5 file
+    def _load_txt_trials(cls, file_path, chunk_size=2**26, num_threads=1):
+        """Reads the trials of a text score file by chunks.
+
+        Args:
+          file_path: File to read the list.
+          chunk_size: Approximated size in bytes of the chunks parsed at once.
+          num_threads: Number of threads to parse the chunks in parallel.
+
+        Returns:
+          Sorted unique model names.
+          Sorted unique test segment names.
+          Model index of each trial.
+          Segment index of each trial.
+          Score of each trial.
+        """
+        ranges = cls._get_chunk_ranges(file_path, chunk_size)
+        args = [(file_path, start, end) for start, end in ranges]
+        if num_threads > 1 and len(args) > 1:
+            with ThreadPool(num_threads) as pool:
+                chunks = pool.starmap(cls._read_txt_chunk, args)
+        else:
+            chunks = [cls._read_txt_chunk(*a) for a in args]
+
+        model_set, model_idx = cls._merge_chunk_sets(
+            [c[0] for c in chunks], [c[1] for c in chunks])
+        seg_set, seg_idx = cls._merge_chunk_sets(
+            [c[2] for c in chunks], [c[3] for c in chunks])
+        if len(chunks) > 0:
+            scores_v = np.concatenate([c[4] for c in chunks])
+        else:
+            scores_v = np.zeros((0,), dtype=float_cpu())
+        return model_set, seg_set, model_idx, seg_idx, scores_v
+
+
+
+    @classmethod
+    def load_txt(cls, file_path, chunk_size=2**26, num_threads=1):
+        """Loads object from txt file
 
         Args:
           file_path: File to read the list.
+          chunk_size: Approximated size in bytes of the chunks parsed at once.
+          num_threads: Number of threads to parse the chunks in parallel.
 
         Returns:
           TrialScores object.
         """
-        with open(file_path, 'r') as f:
-            fields = [line.split() for line in f]
-        models = [i[0] for i in fields]
-        segments = [i[1] for i in fields]
-        scores_v = np.array([i[2] for i in fields])
-        
-        model_set, _, model_idx = np.unique(
-            models, return_index=True, return_inverse=True)
-        seg_set, _, seg_idx = np.unique(
-            segments, return_index=True, return_inverse=True)
+        model_set, seg_set, model_idx, seg_idx, scores_v = cls._load_txt_trials(
+            file_path, chunk_size, num_threads)
 
-        scores = np.zeros((len(model_set), len(seg_set)))
+        scores = np.zeros((len(model_set), len(seg_set)), dtype=float_cpu())
         score_mask = np.zeros(scores.shape, dtype='bool')
-        for item in zip(model_idx, seg_idx, scores_v):
-            score_mask[item[0], item[1]] = True
-            scores[item[0], item[1]]=item[2]
+        scores[model_idx, seg_idx] = scores_v
+        score_mask[model_idx, seg_idx] = True
         return cls(model_set, seg_set, scores, score_mask)
 
     
+
     @classmethod
     def merge(cls, scr_list):
         """Merges several score objects.
+           The union of models and segments is computed once and
+           the scores of each object are added to the union matrix.
 
         Args:
-          scr_list: List of TrialNdx objects.
+          scr_list: List of TrialScores objects.
 
         Returns:
           Merged TrialScores object.
         """
-        num_scr = len(scr_list)
-        model_set = scr_list[0].model_set
-        seg_set = scr_list[0].seg_set
-        scores = scr_list[0].scores
-        score_mask = scr_list[0].score_mask
-        for i in range(1, num_scr):
-            scr_i = scr_list[i]
-            new_model_set = np.union1d(model_set, scr_i.model_set)
-            new_seg_set = np.union1d(seg_set, scr_i.seg_set)
-            shape = (len(new_model_set), len(new_seg_set))
-
-            _, mi_a, mi_b = intersect(new_model_set, model_set,
-                                      assume_unique=True, return_index=True)
-            _, si_a, si_b = intersect(new_seg_set, seg_set,
-                                      assume_unique=True, return_index=True)
-            ix_a = np.ix_(mi_a, si_a)
-            ix_b = np.ix_(mi_b, si_b)
-            scores_1 = np.zeros(shape)
-            scores_1[ix_a] = scores[ix_b]
-            score_mask_1 = np.zeros(shape, dtype='bool')
-            score_mask_1[ix_a] = score_mask[ix_b]
-            
-            trial_mask_2=np.zeros((len(new_model_set), len(new_seg_set)),
-                                  dtype='bool')
-            _, mi_a, mi_b = intersect(new_model_set, scr_i.model_set,
-                                     assume_unique=True, return_index=True)
-            _, si_a, si_b = intersect(new_seg_set, scr_i.seg_set,
-                                     assume_unique=True, return_index=True)
-            ix_a = np.ix_(mi_a, si_a)
-            ix_b = np.ix_(mi_b, si_b)
-            scores_2= np.zeros(shape)
-            scores_2[ix_a] = scr_i.scores[ix_b]
-            score_mask_2 = np.zeros(shape, dtype='bool')
-            score_mask_2[ix_a] = scr_i.score_mask[ix_b]
-
-            model_set = new_model_set
-            seg_set = new_seg_set
-            scores = scores_1 + scores_2
-            assert(not(np.any(np.logical_and(score_mask_1, score_mask_2))))
-            score_mask= np.logical_or(score_mask_1, score_mask_2)
-                            
+        model_set = np.unique(np.concatenate([s.model_set for s in scr_list]))
+        seg_set = np.unique(np.concatenate([s.seg_set for s in scr_list]))
+        shape = (len(model_set), len(seg_set))
+        scores = np.zeros(shape, dtype=float_cpu())
+        score_mask = np.zeros(shape, dtype='bool')
+        for scr_i in scr_list:
+            m_idx = np.searchsorted(model_set, scr_i.model_set)
+            s_idx = np.searchsorted(seg_set, scr_i.seg_set)
+            ix = np.ix_(m_idx, s_idx)
+            assert not np.any(np.logical_and(score_mask[ix], scr_i.score_mask))
+            scores[ix] += scr_i.scores
+            score_mask[ix] |= scr_i.score_mask
+
         return cls(model_set, seg_set, scores, score_mask)
-                                  
 
-    
+
+
     def filter(self, model_set, seg_set, keep=True, raise_missing=True):
         """Removes elements from TrialScores object.
         
@@ -74,19 +74,24 @@ class TrialStats(object):
         else:
             trial_mask = ndx.trial_mask
         stats_mat = np.zeros(trial_mask.shape, dtype=float_cpu())
-        for i in range(stats_mat.shape[0]):
-            for j in range(stats_mat.shape[1]):
-                if trial_mask[i,j]:
-                    try:
-                        stats_mat[i,j] = self.df_stats.loc[
-                            ndx.model_set[i], ndx.seg_set[j]][stat_name]
-                    except:
-                        err_str='%s not found for %s-%s' % (
-                            stat_name, ndx.model_set[i], ndx.seg_set[j])
-                        if raise_missing:
-                            raise Exception(err_str)
-                        else:
-                            logging.warning(err_str)
+        # look up all the trials at once
+        ii, jj = trial_mask.nonzero()
+        stats = self.df_stats[stat_name]
+        stats = stats[~stats.index.duplicated(keep='first')]
+        trials = pd.MultiIndex.from_arrays(
+            [np.asarray(ndx.model_set)[ii], np.asarray(ndx.seg_set)[jj]])
+        values = stats.reindex(trials).to_numpy(dtype=float_cpu())
+        missing = np.logical_not(trials.isin(stats.index))
+        for k in missing.nonzero()[0]:
+            err_str='%s not found for %s-%s' % (
+                stat_name, ndx.model_set[ii[k]], ndx.seg_set[jj[k]])
+            if raise_missing:
+                raise Exception(err_str)
+            else:
+                logging.warning(err_str)
+
+        values[missing] = 0
+        stats_mat[ii, jj] = values
         
         self._stats_mats[stat_name] = stats_mat
         return stats_mat
@@ -0,0 +1,204 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.io import AudioWriter as AW
+from hyperion.io.data_rw_factory import DataWriterFactory as DWF
+from hyperion.augment import SpeechAugment
+from hyperion.augment.audio_bank import AudioBank
+from hyperion.augment.noise_augment import SingleNoiseAugment
+from hyperion.augment.reverb_augment import SingleReverbAugment
+
+output_dir = './tests/data_out/augment/audio_bank'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+fs = 16000
+
+
+def gen_signals(num_signals=5, seed=1):
+    rng = np.random.RandomState(seed=seed)
+    keys = ['s%d' % i for i in range(num_signals)]
+    s = [np.round(1000*rng.randn(rng.randint(fs//4, fs))) for i in range(num_signals)]
+    return keys, s
+
+
+def gen_rirs(num_rirs=5, seed=2):
+    rng = np.random.RandomState(seed=seed)
+    keys = ['h%d' % i for i in range(num_rirs)]
+    h = []
+    for i in range(num_rirs):
+        h_i = rng.randn(800).astype('float32')*np.exp(-np.arange(800)/100)
+        h_i[:rng.randint(10)] = 0
+        h.append(h_i.astype('float32'))
+    return keys, h
+
+
+def test_build_save_load():
+    keys, s = gen_signals()
+    signals = dict(zip(keys, s))
+    proc_func = lambda x: (2*x, {'max': np.max(x)})
+    bank = AudioBank.build(keys, signals.get, proc_func, {'scale': 2})
+
+    file_path = output_dir + '/bank.h5'
+    if os.path.isfile(file_path):
+        os.remove(file_path)
+    AudioBank.build_file(file_path, keys, signals.get, proc_func, {'scale': 2},
+                         block_size=1000)
+    for bank_i in [bank, AudioBank.load(file_path),
+                   AudioBank.load(file_path, mmap=False)]:
+        assert len(bank_i) == len(keys)
+        assert np.all(bank_i.keys == keys)
+        for i in range(len(keys)):
+            assert_allclose(bank_i[i], 2*s[i])
+            assert bank_i.stats['max'][i] == np.max(s[i])
+
+    assert isinstance(AudioBank.load(file_path).data, np.memmap)
+
+    # loads without calling the reader
+    def create_reader():
+        raise Exception()
+    bank2 = AudioBank.create(file_path, create_reader, attrs={'scale': 2})
+    assert_allclose(bank2.data, bank.data)
+    with pytest.raises(ValueError):
+        AudioBank.create(file_path, create_reader, attrs={'scale': 3})
+
+
+def test_noise_augment_bank():
+    keys, s = gen_signals()
+    wav_scp_file = output_dir + '/noise.scp'
+    with AW(output_dir, wav_scp_file, 'wav') as w:
+        w.write(keys, s, fs)
+
+    bank_path = output_dir + '/noise_bank.h5'
+    if os.path.isfile(bank_path):
+        os.remove(bank_path)
+
+    x = 1000*np.random.RandomState(seed=3).randn(2*fs)
+    aug = SingleNoiseAugment('noise', wav_scp_file, 0, 10)
+    aug_bank = SingleNoiseAugment('noise', wav_scp_file, 0, 10, bank_path=bank_path)
+    assert os.path.isfile(bank_path)
+    for i in range(4):
+        y, info = aug(x)
+        y_bank, info_bank = aug_bank(x)
+        assert info == info_bank
+        assert_allclose(y_bank, y, rtol=1e-5, atol=1e-2)
+
+
+@pytest.mark.parametrize('rir_norm', [None, 'max', 'energy'])
+def test_reverb_augment_bank(rir_norm):
+    keys, h = gen_rirs()
+    rir_path = 'h5:' + output_dir + '/rirs.h5'
+    w = DWF.create(rir_path)
+    w.write(keys, h)
+    w.close()
+
+    bank_path = '%s/rir_bank_%s.h5' % (output_dir, rir_norm)
+    if os.path.isfile(bank_path):
+        os.remove(bank_path)
+
+    x = 1000*np.random.RandomState(seed=3).randn(fs)
+    aug = SingleReverbAugment('rir', rir_path, rir_norm, preload_rirs=False)
+    aug_mem = SingleReverbAugment('rir', rir_path, rir_norm)
+    aug_bank = SingleReverbAugment('rir', rir_path, rir_norm, bank_path=bank_path)
+    for i in range(4):
+        y, info = aug(x)
+        for aug_i in [aug_mem, aug_bank]:
+            y_i, info_i = aug_i(x)
+            assert info_i['h_delay'] == info['h_delay']
+            assert_allclose(info_i['h_max'], info['h_max'])
+            assert_allclose(y_i, y)
+
+
+
+@pytest.mark.parametrize('comp_delay', [False, True])
+@pytest.mark.parametrize('preload_rirs', [False, True])
+def test_reverb_forward_batch(comp_delay, preload_rirs):
+    keys, h = gen_rirs()
+    rir_path = 'h5:' + output_dir + '/rirs.h5'
+    w = DWF.create(rir_path)
+    w.write(keys, h)
+    w.close()
+
+    x = 1000*np.random.RandomState(seed=3).randn(8, fs//2)
+    aug = SingleReverbAugment('rir', rir_path, 'max', comp_delay=comp_delay,
+                              preload_rirs=preload_rirs)
+    aug_batch = SingleReverbAugment('rir', rir_path, 'max', comp_delay=comp_delay,
+                                    preload_rirs=preload_rirs)
+    for k in range(2):
+        y_batch, info_batch = aug_batch.forward_batch(x)
+        assert y_batch.shape == x.shape
+        for i in range(x.shape[0]):
+            y, info = aug(x[i])
+            assert_allclose(y_batch[i], y[:x.shape[1]], atol=1e-6)
+            assert info_batch[i]['h_delay'] == info['h_delay']
+            assert_allclose(info_batch[i]['h_max'], info['h_max'])
+            assert_allclose(info_batch[i]['srr'], info['srr'], rtol=1e-6)
+
+
+def test_reverb_spectra_cache():
+    keys, h = gen_rirs()
+    rir_path = 'h5:' + output_dir + '/rirs.h5'
+    w = DWF.create(rir_path)
+    w.write(keys, h)
+    w.close()
+
+    x = 1000*np.random.RandomState(seed=3).randn(8, fs//2)
+    aug = SingleReverbAugment('rir', rir_path, 'max')
+    # cache that only fits two RIR spectra
+    aug_cache = SingleReverbAugment('rir', rir_path, 'max', spectra_cache_size=0.08)
+    for k in range(3):
+        y, info = aug.forward_batch(x)
+        y_cache, info_cache = aug_cache.forward_batch(x)
+        assert_allclose(y_cache, y)
+        assert len(aug_cache._rir_spectra) == 2
+        assert aug_cache._rir_spectra_bytes == sum(
+            H.nbytes for H in aug_cache._rir_spectra.values())
+        assert aug_cache._rir_spectra_bytes <= 0.08 * 2**20
+    assert len(aug._rir_spectra) == len(keys)
+
+
+
+def test_speech_augment_forward_batch():
+    keys, h = gen_rirs()
+    rir_path = 'h5:' + output_dir + '/rirs.h5'
+    w = DWF.create(rir_path)
+    w.write(keys, h)
+    w.close()
+    keys, s = gen_signals()
+    wav_scp_file = output_dir + '/noise.scp'
+    with AW(output_dir, wav_scp_file, 'wav') as w:
+        w.write(keys, s, fs)
+
+    cfg = {'reverb_aug': {'reverb_prob': 0.7, 'max_reverb_context': 0.5,
+                          'rir_types': {'a': {'weight': 1, 'rir_path': rir_path, 'rir_norm': 'max'},
+                                        'b': {'weight': 2, 'rir_path': rir_path}}},
+           'noise_aug': {'noise_prob': 0.7,
+                         'noise_types': {'n': {'weight': 1, 'noise_path': wav_scp_file,
+                                               'min_snr': 0, 'max_snr': 10}}}}
+    aug = SpeechAugment.create(cfg)
+    x = 1000*np.random.RandomState(seed=3).randn(16, fs//2)
+    y, info = aug.forward_batch(x)
+    assert y.shape == x.shape
+    assert len(info) == x.shape[0]
+    for i in range(x.shape[0]):
+        if info[i]['reverb']['rir_type'] is None and info[i]['noise']['noise_type'] is None:
+            assert_allclose(y[i], x[i])
+        delay = info[i]['reverb']['h_delay']
+        scale = info[i]['reverb']['h_max']
+        # delay is compensated
+        assert delay == 0
+        sdr = SingleReverbAugment.sdr(x[i], y[i], scale, delay)
+        if info[i]['reverb']['rir_type'] is None and info[i]['noise']['noise_type'] is None:
+            continue
+        assert_allclose(info[i]['sdr'], sdr, rtol=1e-6)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
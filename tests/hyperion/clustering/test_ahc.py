@@ -0,0 +1,100 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from sklearn.metrics import homogeneity_score, completeness_score
+
+from hyperion.clustering import AHC
+
+num_spks = 7
+num_segs = 60
+
+
+def create_data(seed=1024, num_spks=num_spks, num_segs=num_segs):
+    rng = np.random.RandomState(seed=seed)
+    labels = rng.randint(num_spks, size=(num_segs,))
+    mu = 3*rng.randn(num_spks, 2)
+    x = mu[labels] + rng.randn(num_segs, 2)
+    # llr-like scores: higher is more similar
+    scores = -np.sum((x[:,None,:] - x[None,:,:])**2, axis=-1)
+    return scores, labels
+
+
+def flat_clusters_loop(Z, num_merges):
+    """Reference that relabels the segments after each merge."""
+    N = Z.shape[0] + 1
+    flat_clusters = np.arange(N, dtype=int)
+    for i in range(num_merges):
+        segm_idx = np.logical_or(flat_clusters==Z[i,0],
+                                 flat_clusters==Z[i,1])
+        flat_clusters[segm_idx] = N + i
+
+    _, flat_clusters = np.unique(flat_clusters, return_inverse=True)
+    return flat_clusters
+
+
+def test_flat_clusters():
+    scores, _ = create_data()
+    ahc = AHC(method='average', metric='llr')
+    ahc.fit(scores)
+    for num_clusters in [1, 2, 5, 7, 20, num_segs]:
+        labels = ahc.get_flat_clusters(num_clusters, criterion='num_clusters')
+        labels_ref = flat_clusters_loop(ahc.Z, num_segs - num_clusters)
+        assert np.all(labels == labels_ref)
+        assert len(np.unique(labels)) == num_clusters
+
+    for thr in np.percentile(ahc.Z[:,2], [10, 50, 90]):
+        labels = ahc.get_flat_clusters(thr)
+        num_merges = np.sum(ahc.Z[:,2] >= thr)
+        assert np.all(labels == flat_clusters_loop(ahc.Z, num_merges))
+
+    # table with all the cuts
+    ahc.compute_flat_clusters()
+    for num_merges in range(num_segs):
+        assert np.all(ahc.flat_clusters[num_merges] ==
+                      flat_clusters_loop(ahc.Z, num_merges))
+
+
+def test_evaluate_impurity_det():
+    scores, labels_true = create_data()
+    ahc = AHC(method='average', metric='llr')
+    ahc.fit(scores)
+    h_imp, c_imp = ahc.evaluate_impurity_det(labels_true)
+    assert len(h_imp) == num_segs
+    for num_merges in range(num_segs):
+        labels = flat_clusters_loop(ahc.Z, num_merges)
+        assert_allclose(h_imp[num_merges], 1-homogeneity_score(labels_true, labels),
+                        atol=1e-10)
+        assert_allclose(c_imp[num_merges], 1-completeness_score(labels_true, labels),
+                        atol=1e-10)
+
+
+@pytest.mark.parametrize('N, num_classes, random_labels',
+                         [(10, 3, True), (200, 7, False), (1000, 5, True),
+                          (50, 1, False)])
+def test_evaluate_impurity_det_all_levels(N, num_classes, random_labels):
+    scores, labels_true = create_data(num_spks=num_classes, num_segs=N)
+    if random_labels:
+        # labels not related to the clusters
+        labels_true = np.random.RandomState(seed=1).randint(num_classes, size=(N,))
+    ahc = AHC(method='average', metric='llr')
+    ahc.fit(scores)
+    h_imp, c_imp = ahc.evaluate_impurity_det(labels_true)
+    ahc.compute_flat_clusters()
+    # the last level has all the segments in one cluster
+    assert len(np.unique(ahc.flat_clusters[N-1])) == 1
+    for num_merges in range(N):
+        labels = ahc.flat_clusters[num_merges]
+        assert_allclose(h_imp[num_merges], 1-homogeneity_score(labels_true, labels),
+                        atol=1e-10)
+        assert_allclose(c_imp[num_merges], 1-completeness_score(labels_true, labels),
+                        atol=1e-10)
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,102 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.clustering import KMeans
+
+num_clusters = 8
+x_dim = 3
+num_samples = 4000
+
+
+def create_data(seed=1024):
+    rng = np.random.RandomState(seed=seed)
+    # well separated clusters at the corners of a cube
+    mu = 20*np.array([[i//4, (i//2)%2, i%2] for i in range(num_clusters)])
+    mu = mu + rng.randn(num_clusters, x_dim)
+    labels = rng.randint(num_clusters, size=(num_samples,))
+    x = mu[labels] + rng.randn(num_samples, x_dim)
+    return x, labels, mu
+
+
+def predict_loop(x, mu):
+    """Reference that computes the distances cluster by cluster."""
+    err2 = np.zeros((x.shape[0], mu.shape[0]))
+    for k in range(mu.shape[0]):
+        err2[:,k] = np.sum(np.square(x-mu[k]), axis=-1)
+    index = np.argmin(err2, axis=-1)
+    return index, err2[np.arange(x.shape[0]), index]
+
+
+def compute_centroids_loop(x, index, mu):
+    mu = mu.copy()
+    for k in range(mu.shape[0]):
+        r = index == k
+        if np.any(r):
+            mu[k] = np.mean(x[r], axis=0)
+    return mu
+
+
+def test_predict():
+    x, _, mu = create_data()
+    model = KMeans(num_clusters, mu=mu, chunk_size=777)
+    index, err2 = model.predict(x)
+    index_ref, err2_ref = predict_loop(x, mu)
+    assert np.all(index == index_ref)
+    assert_allclose(err2, err2_ref, atol=1e-8)
+
+    # one empty cluster keeps its centroid
+    index[index==3] = 2
+    assert_allclose(model._compute_centroids(x, index),
+                    compute_centroids_loop(x, index, mu))
+
+
+def test_fit():
+    x, labels, mu = create_data()
+    model = KMeans(num_clusters)
+    loss, index = model.fit(x)
+    assert np.all(np.diff(loss) <= 1e-10)
+    assert loss[-1] < 1.1*x_dim
+    # every true cluster maps to one estimated cluster
+    for k in range(num_clusters):
+        assert len(np.unique(index[labels==k])) == 1
+    assert len(np.unique(index)) == num_clusters
+
+    # k-means++ seeding is reproducible
+    model2 = KMeans(num_clusters)
+    loss2, index2 = model2.fit(x)
+    assert_allclose(loss2, loss)
+    assert np.all(index2 == index)
+
+
+def test_fit_generator():
+    x, labels, mu = create_data()
+    batch_size = 500
+    train_steps = num_samples//batch_size
+
+    def generator():
+        while True:
+            for first in range(0, num_samples, batch_size):
+                yield x[first:first+batch_size]
+
+    model = KMeans(num_clusters)
+    loss = model.fit_generator(generator(), train_steps, epochs=10)
+    assert loss[-1] < 1.1*x_dim
+    index, _ = model.predict(x)
+    for k in range(num_clusters):
+        assert len(np.unique(index[labels==k])) == 1
+
+
+def test_seeds_more_clusters_than_samples():
+    x, _, _ = create_data()
+    model = KMeans(num_samples+1)
+    with pytest.raises(ValueError):
+        model.fit(x)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -11,7 +11,10 @@ import pytest
 import numpy as np
 from numpy.testing import assert_allclose
 
+from scipy.signal import lfilter
+
 from hyperion.hyp_defs import float_cpu
+from hyperion.feats.stft import st_logE
 from hyperion.feats.energy_vad import EnergyVAD
 
 fs=16000
@@ -37,4 +40,68 @@ def test_vad():
     print(np.max(s[2*fs:3*fs]), np.min(s[2*fs:3*fs]))
 
     assert np.mean(vad[:len(vad_est)]==vad_est) > 0.9
-    
+
+
+
+def compute_vad_loop(e_vad, x):
+    """Reference that pads, filters and smooths with convolution."""
+    if e_vad.snip_edges:
+        num_frames = int(np.floor((len(x) - e_vad._length + e_vad._shift)/e_vad._shift))
+    else:
+        num_frames = int(np.round(len(x)/e_vad._shift))
+        len_x = (num_frames-1)*e_vad._shift + e_vad._length
+        dlen_x = len_x - len(x)
+        dlen1_x = int(np.floor((e_vad._length-e_vad._shift)/2))
+        dlen2_x = int(dlen_x - dlen1_x)
+        x = np.pad(x, (dlen1_x, dlen2_x), mode='reflect')
+
+    if e_vad.dither > 0:
+        n = e_vad.dither*np.random.RandomState(
+            seed=len(x)).randn(len(x)).astype(float_cpu(), copy=False)
+        x = x + n
+
+    x, _ = lfilter(e_vad._dc_b, e_vad._dc_a, x, zi=np.zeros((1,)))
+    logE = st_logE(x, e_vad._length, e_vad._shift)
+    e_thr = e_vad.vad_energy_threshold + e_vad.vad_energy_mean_scale * np.mean(logE)
+    vad = (logE > e_thr)
+
+    context = e_vad.vad_frames_context
+    if context == 0:
+        return vad
+
+    window = 2 * context + 1
+    h = np.ones((window,), dtype='float32')
+    num_count = np.convolve(vad.astype('float32'), h, 'same')
+    den_count_boundary = np.arange(context+1, window, dtype='float32')
+    num_count[:context] /= den_count_boundary
+    num_count[-context:] /= den_count_boundary[::-1]
+    num_count[context:-context] /= window
+    return num_count > e_vad.vad_proportion_threshold
+
+
+@pytest.mark.parametrize('snip_edges', [True, False])
+@pytest.mark.parametrize('vad_frames_context', [0, 2, 5])
+def test_vad_batch(snip_edges, vad_frames_context):
+    x = [s[:fs], s[fs:int(2.5*fs)], s[int(1.7*fs):int(3.1*fs)], s[3*fs:]]
+    e_vad = EnergyVAD(snip_edges=snip_edges, vad_frames_context=vad_frames_context)
+    vad_est = e_vad.compute_batch(x)
+    assert len(vad_est) == len(x)
+    for x_i, vad_i in zip(x, vad_est):
+        assert np.all(vad_i == compute_vad_loop(e_vad, x_i))
+        e_vad.reset()
+        assert np.all(vad_i == e_vad.compute(x_i))
+        e_vad.reset()
+
+
+def test_vad_batch_feats():
+    e_vad = EnergyVAD(vad_frames_context=3)
+    rng = np.random.RandomState(seed=1)
+    x = [rng.randn(n, 20) for n in [100, 5, 1, 300]]
+    vad_est = e_vad.compute_batch(x)
+    for x_i, vad_i in zip(x, vad_est):
+        assert len(vad_i) == len(x_i)
+        assert np.all(vad_i == e_vad.compute(x_i))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -78,3 +78,69 @@ def test_strft_povey_10hz():
 
 
     
+
+
+def strft_loop(x, frame_length, frame_shift, fft_length, window):
+    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
+    X = np.zeros((num_frames, int(fft_length/2+1)), dtype='complex64')
+    for i in xrange(num_frames):
+        j = i*frame_shift
+        X[i,:] = np.fft.rfft(x[j:j+frame_length]*window, n=fft_length)
+    return X
+
+
+def istrft_loop(X, frame_length, frame_shift, window):
+    num_samples = (X.shape[0] - 1)*frame_shift + frame_length
+    x_overlap = np.zeros((num_samples,), dtype=float_cpu())
+    w_overlap = np.zeros((num_samples,), dtype=float_cpu())
+    xx = np.fft.irfft(X, axis=-1)[:,:frame_length]
+    for i in xrange(X.shape[0]):
+        j = i*frame_shift
+        x_overlap[j:j+frame_length] += xx[i]
+        w_overlap[j:j+frame_length] += window
+    w_overlap[w_overlap==0] = 1
+    return x_overlap * (1/w_overlap)
+
+
+def st_logE_loop(x, frame_length, frame_shift):
+    num_frames = int(np.floor((len(x) - frame_length + frame_shift)/frame_shift))
+    x2 = x**2
+    e = np.zeros((num_frames,), dtype=float_cpu())
+    for i in xrange(num_frames):
+        j = i*frame_shift
+        e[i] = np.sum(x2[j:j+frame_length])
+    return np.log(e+1e-15)
+
+
+@pytest.mark.parametrize('frame_length, frame_shift', [(400, 160), (512, 100), (200, 300)])
+def test_strft_exact(frame_length, frame_shift):
+
+    w = FWF.create('povey', frame_length)
+    X_ref = strft_loop(s, frame_length, frame_shift, 512, w)
+    X = strft(s, frame_length, frame_shift, 512, w)
+    assert np.all(X == X_ref)
+
+    x_ref = istrft_loop(X, frame_length, frame_shift, w)
+    x = istrft(X, frame_length, frame_shift, w)
+    assert np.all(x == x_ref)
+
+    e_ref = st_logE_loop(s, frame_length, frame_shift)
+    e = st_logE(s, frame_length, frame_shift)
+    assert np.all(e == e_ref)
+
+
+def test_strft_batch():
+
+    w = FWF.create('povey', 400)
+    x = [s[:16000], s[1000:1399], s[2000:2400], s[5000:]]
+    X = strft_batch(x, 400, 160, 512, w)
+    e = st_logE_batch(x, 400, 160)
+    assert len(X) == len(x)
+    assert len(e) == len(x)
+    for x_i, X_i, e_i in zip(x, X, e):
+        assert np.all(X_i == strft(x_i, 400, 160, 512, w))
+        assert np.all(e_i == st_logE(x_i, 400, 160))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -980,6 +980,43 @@ def test_read_rangex2_random_feat():
 
 
 
+def test_read_random_feat_mmap():
+
+    r = RDRF.create(feat_scp_b, path_prefix=input_prefix)
+    key1 = r.keys
+    data1 = r.read(key1)
+    shapes1 = r.read_shapes(key1)
+
+    r = RDRF.create(feat_scp_b, path_prefix=input_prefix, use_mmap=True)
+    data2 = r.read(key1)
+    shapes2 = r.read_shapes(key1)
+
+    for d1,d2 in zip(data1, data2):
+        assert_allclose(d1, d2)
+    assert shapes1 == shapes2
+
+    # range in scp file and in read arguments
+    r = RDRF.create(feat_range_b, path_prefix=input_prefix)
+    row_offset = [i for i in range(len(key1))]
+    data1 = r.read(key1, row_offset=row_offset, num_rows=10)
+
+    r = RDRF.create(feat_range_b, path_prefix=input_prefix, use_mmap=True)
+    data2 = r.read(key1, row_offset=row_offset, num_rows=10)
+
+    for d1,d2 in zip(data1, data2):
+        assert_allclose(d1, d2)
+
+    # compressed matrices are read without mmap
+    r = RDRF.create(feat_scp_c[0], path_prefix=input_prefix)
+    data1 = r.read(key1)
+    r = RDRF.create(feat_scp_c[0], path_prefix=input_prefix, use_mmap=True)
+    data2 = r.read(key1)
+
+    for d1,d2 in zip(data1, data2):
+        assert_allclose(d1, d2)
+
+
+
 def test_read_squeeze_random_feat():
 
     r = SDRF.create(feat_scp_b, path_prefix=input_prefix)
@@ -1566,6 +1603,27 @@ def test_read_random_vec():
         assert_allclose(d1, d2, rtol=1e-5)
 
 
+
+def test_read_random_vec_mmap():
+
+    r = RDRF.create(vec_scp_b, path_prefix=input_prefix)
+    key1 = r.keys
+    data1 = r.read(key1)
+
+    r = RDRF.create(vec_scp_b, path_prefix=input_prefix, use_mmap=True)
+    data2 = r.read(key1)
+
+    for d1,d2 in zip(data1, data2):
+        assert_allclose(d1, d2)
+
+    # text
+    r = RDRF.create(vec_scp_t, path_prefix=input_prefix, use_mmap=True)
+    data2 = r.read(key1)
+
+    for d1,d2 in zip(data1, data2):
+        assert_allclose(d1, d2, rtol=1e-5)
+
+
         
 def test_write_vec():
 
@@ -182,6 +182,28 @@ def test_read_random_scp_feat():
 
 
         
+def test_read_random_scp_feat_shuffled():
+
+    r = SDRF.create(feat_scp_ho)
+    key1, data1 = r.read(0)
+
+    # keys interleaved between hdf5 files are returned in the requested order
+    idx = np.random.RandomState(seed=1).permutation(len(key1))
+    key1 = [key1[i] for i in idx]
+    data1 = [data1[i] for i in idx]
+
+    r = RDRF.create(feat_scp_ho)
+    data2 = r.read(key1, num_threads=2)
+
+    for d1,d2 in zip(data1, data2):
+        assert_allclose(d1, d2)
+
+    data2 = r.read(key1, squeeze=True, num_rows=10, num_threads=2)
+    for d1,d2 in zip(data1, data2):
+        assert_allclose(d1[:10], d2)
+
+
+
 def test_read_random_file_feat_permissive():
 
     r = SDRF.create(feat_h5_ho[0])
@@ -0,0 +1,88 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+
+import pytest
+import numpy as np
+
+from hyperion.io import PackedBinVADWriter as PBVW, PackedBinVADReader as PBVR
+from hyperion.io import VADReaderFactory as VRF
+from hyperion.io import DataWriterFactory as DWF
+from hyperion.utils.vad_utils import bin_vad_to_timestamps
+
+output_dir = './tests/data_out/io/packed_vad'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+packed_file = output_dir + '/vad.h5'
+
+
+def gen_vads(num_utts=10, seed=1):
+    rng = np.random.RandomState(seed=seed)
+    keys = ['u%02d' % i for i in range(num_utts)]
+    vads = [rng.rand(rng.randint(5, 20)) > 0.5 for i in range(num_utts)]
+    return keys, vads
+
+
+def test_write_read():
+    keys, vads = gen_vads()
+    with PBVW(packed_file) as w:
+        w.write(keys[:3], vads[:3])
+        w.write(keys[3:], vads[3:])
+
+    assert PBVR.is_packed_bin_vad(packed_file)
+    r = VRF.create('h5:' + packed_file)
+    assert isinstance(r, PBVR)
+    vads_r = r.read(keys[::-1])
+    for vad, vad_r in zip(vads[::-1], vads_r):
+        assert vad_r.dtype == bool
+        assert np.all(vad == vad_r)
+
+    assert np.all(r.read_num_frames(keys) == [len(v) for v in vads])
+    vad_r = r.read(keys[1], offset=2, num_frames=30)[0]
+    assert len(vad_r) == 30
+    assert np.all(vad_r[:len(vads[1])-2] == vads[1][2:])
+    assert not np.any(vad_r[len(vads[1])-2:])
+    r.close()
+
+
+def test_frame_config_from_file():
+    # file written like compute-energy-vad.py, read with factory defaults
+    keys, vads = gen_vads()
+    h5_file = output_dir + '/vad_snip_edges.h5'
+    with PBVW(h5_file, frame_length=20, frame_shift=10, snip_edges=True) as w:
+        w.write(keys, vads)
+
+    r = VRF.create('h5:' + h5_file)
+    assert r.frame_length == 20
+    assert r.frame_shift == 10
+    assert r.snip_edges
+    ts_r = r.read_timestamps(keys)
+    for vad, ts_r_i in zip(vads, ts_r):
+        ts = bin_vad_to_timestamps(vad, 0.02, 0.01, True, 0.001)
+        assert np.allclose(ts, ts_r_i)
+
+    vads_r = r.read(keys)
+    for vad, vad_r in zip(vads, vads_r):
+        assert np.all(vad == vad_r)
+
+    with pytest.raises(AssertionError):
+        r.read(keys, snip_edges=False)
+    r.close()
+
+
+def test_not_packed():
+    keys, vads = gen_vads()
+    h5_file = output_dir + '/vad_not_packed.h5'
+    w = DWF.create('h5:' + h5_file)
+    w.write(keys, [v.astype('float32') for v in vads])
+    w.close()
+    assert not PBVR.is_packed_bin_vad(h5_file)
+    r = VRF.create('h5:' + h5_file)
+    assert not isinstance(r, PBVR)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,145 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.utils.scp_list import SCPList
+from hyperion.io.rw_specifiers import ArchiveType
+from hyperion.io.script_index import ScriptIndex
+from hyperion.io.data_rw_factory import DataWriterFactory as DWF
+from hyperion.io.data_rw_factory import SequentialDataReaderFactory as SDRF
+from hyperion.io.data_rw_factory import RandomAccessDataReaderFactory as RDRF
+
+input_prefix = './tests/data_in/ark/'
+output_dir = './tests/data_out/io/script_index'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+
+def create_scp(name):
+    # copies the input scp to the output dir, so the index is written there
+    scp = SCPList.load(input_prefix + name)
+    scp.add_prefix_to_filepath(input_prefix)
+    file_path = '%s/%s' % (output_dir, name)
+    scp.save(file_path)
+    index_path = ScriptIndex.get_index_path(file_path)
+    if os.path.isfile(index_path):
+        os.remove(index_path)
+    return file_path
+
+
+
+def test_create_load_index():
+
+    for name in ['feat_b.scp', 'feat_c1.scp', 'feat_t.scp', 'vec_b.scp']:
+        file_path = create_scp(name)
+        scp = SCPList.load(file_path)
+        index1 = ScriptIndex.load_or_create(file_path, scp)
+        assert os.path.isfile(ScriptIndex.get_index_path(file_path))
+
+        index2 = ScriptIndex.load(ScriptIndex.get_index_path(file_path))
+        assert index2.is_valid(file_path, np.unique(scp.file_path))
+        assert [index1.get_shape(i) for i in range(len(scp))] == [
+            index2.get_shape(i) for i in range(len(scp))]
+
+        r = RDRF.create('scp:' + file_path)
+        shapes = r.read_shapes(scp.key)
+        assert shapes == [index2.get_shape(i) for i in range(len(scp))]
+
+        # modifying the scp invalidates the index
+        scp.save(file_path)
+        os.utime(file_path, ns=(0, 0))
+        assert not index2.is_valid(file_path, np.unique(scp.file_path))
+
+
+
+def test_read_shapes_with_index():
+
+    for name in ['feat_b.scp', 'feat_range_b.scp', 'feat_c1.scp', 'vec_b.scp']:
+        file_path = create_scp(name)
+
+        r = SDRF.create('scp:' + file_path)
+        keys1, shapes1 = r.read_shapes()
+        r = SDRF.create('scp:' + file_path, use_index=True)
+        keys2, shapes2 = r.read_shapes()
+        assert keys1 == keys2
+        assert shapes1 == shapes2
+
+        r = SDRF.create('scp:' + file_path, use_index=True, part_idx=2, num_parts=3)
+        keys3, shapes3 = r.read_shapes()
+        f = np.isin(keys1, keys3)
+        assert shapes3 == [s for s, f_i in zip(shapes1, f) if f_i]
+
+        r = RDRF.create('scp:' + file_path, use_index=True, use_mmap=True)
+        shapes2 = r.read_shapes(keys1)
+        assert shapes1 == shapes2
+        num_rows = r.read_num_rows(keys1)
+
+        r = RDRF.create('scp:' + file_path)
+        assert_allclose(num_rows, r.read_num_rows(keys1))
+        data1 = r.read(keys1)
+        r = RDRF.create('scp:' + file_path, use_index=True, use_mmap=True)
+        data2 = r.read(keys1)
+        for d1, d2 in zip(data1, data2):
+            assert_allclose(d1, d2)
+
+
+
+def test_part_index():
+
+    file_path = create_scp('feat_b.scp')
+    index_path = ScriptIndex.get_index_path(file_path)
+    r = SDRF.create('scp:' + file_path)
+    keys1, shapes1 = r.read_shapes()
+
+    # jobs reading parts of the scp only index their part and don't save it
+    for part_idx in [1, 2, 3]:
+        r = SDRF.create('scp:' + file_path, use_index=True,
+                        part_idx=part_idx, num_parts=3)
+        assert len(r.index) == len(r.scp)
+        keys2, shapes2 = r.read_shapes()
+        f = np.isin(keys1, keys2)
+        assert shapes2 == [s for s, f_i in zip(shapes1, f) if f_i]
+        assert not os.path.isfile(index_path)
+
+    # the full index is written atomically and used by the part jobs
+    r = SDRF.create('scp:' + file_path, use_index=True)
+    assert os.path.isfile(index_path)
+    assert not any(f.endswith('.tmp') for f in os.listdir(output_dir))
+    r = SDRF.create('scp:' + file_path, use_index=True, part_idx=2, num_parts=3)
+    keys2, shapes2 = r.read_shapes()
+    f = np.isin(keys1, keys2)
+    assert shapes2 == [s for s, f_i in zip(shapes1, f) if f_i]
+
+
+
+def test_read_shapes_with_index_h5():
+
+    r = SDRF.create('scp:' + input_prefix + 'feat_b.scp', path_prefix=input_prefix)
+    keys, data = r.read(0)
+    for compress in [False, True]:
+        file_path = '%s/feat_%d.scp' % (output_dir, compress)
+        index_path = ScriptIndex.get_index_path(file_path)
+        if os.path.isfile(index_path):
+            os.remove(index_path)
+        w = DWF.create('h5,scp:%s/feat_%d.h5,%s' % (output_dir, compress, file_path),
+                       compress=compress)
+        w.write(keys, data)
+        w.close()
+
+        r = RDRF.create('scp:' + file_path)
+        shapes1 = r.read_shapes(keys)
+        r = RDRF.create('scp:' + file_path, use_index=True)
+        assert shapes1 == r.read_shapes(keys)
+        r = SDRF.create('scp:' + file_path, use_index=True)
+        keys2, shapes2 = r.read_shapes()
+        assert shapes1 == shapes2
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
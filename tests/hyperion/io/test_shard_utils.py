@@ -0,0 +1,117 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+import sys
+import importlib.util
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.feats import MFCC
+from hyperion.utils.scp_list import SCPList
+from hyperion.utils.process_pool import OrderedProcessPool
+from hyperion.io.data_rw_factory import RandomAccessDataReaderFactory as RDRF
+from hyperion.io.shard_utils import (init_shard_worker, close_shard_worker,
+                                     compute_shard_feats, merge_shard_scps)
+
+output_dir = './tests/data_out/io/shard_utils'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+num_utts = 7
+
+
+def create_utts():
+    rng = np.random.RandomState(seed=1024)
+    return [('utt%d' % i, 0.1*rng.randn(4000 + 500*i).astype('float32'))
+            for i in range(num_utts)]
+
+
+def compute_mfcc(mfcc, x):
+    y = mfcc.compute(x)
+    mfcc.reset()
+    return y
+
+
+def load_torch_script():
+    # loads hyperion/bin/torch-compute-mfcc-feats.py as a module
+    file_path = os.path.join(os.path.dirname(__file__), '../../../hyperion/bin',
+                             'torch-compute-mfcc-feats.py')
+    spec = importlib.util.spec_from_file_location('torch_compute_mfcc_feats', file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[spec.name] = module
+    return module
+
+
+def create_torch_frames(frame_length=400, frame_shift=160):
+    # torch extractor returning the log energy of the frames
+    import torch
+
+    class LogEnergy(torch.nn.Module):
+        def forward(self, x):
+            x = x.unfold(-1, frame_length, frame_shift)
+            return torch.log(torch.sum(x**2, dim=-1, keepdim=True))
+
+    return LogEnergy()
+
+
+def extract(output_name, num_workers, create_fn, create_args, compute_fn):
+    output_path = 'ark,scp:%s/%s.ark,%s/%s.scp' % (
+        output_dir, output_name, output_dir, output_name)
+    pool = OrderedProcessPool(
+        num_workers, compute_shard_feats, init_fn=init_shard_worker,
+        init_args=(create_fn, create_args, compute_fn, output_path, {}),
+        finalize_fn=close_shard_worker, queue_size=2)
+    results = list(pool.imap(create_utts()))
+    keys = [r[0] for r in results]
+    merge_shard_scps(output_path, num_workers, keys)
+    return keys, [r[1] for r in results]
+
+
+
+@pytest.mark.parametrize('num_workers', [1, 3])
+def test_sharded_mfcc(num_workers):
+    utts = create_utts()
+    mfcc = MFCC(dither=0)
+    state = (mfcc, compute_mfcc, None)
+    y_ref = [compute_shard_feats(state, utt)[3] for utt in utts]
+
+    keys, num_frames = extract('mfcc_%d' % num_workers, num_workers,
+                               MFCC, {'dither': 0}, compute_mfcc)
+    assert keys == [utt[0] for utt in utts]
+    assert num_frames == [y.shape[0] for y in y_ref]
+
+    scp = SCPList.load('%s/mfcc_%d.scp' % (output_dir, num_workers))
+    assert list(scp.key) == keys
+    r = RDRF.create('scp:%s/mfcc_%d.scp' % (output_dir, num_workers))
+    for y, y_ref_i in zip(r.read(keys), y_ref):
+        assert_allclose(y, y_ref_i, rtol=1e-5, atol=1e-4)
+
+
+
+@pytest.mark.parametrize('num_workers', [1, 3])
+def test_sharded_torch(num_workers):
+    pytest.importorskip('torch')
+    script = load_torch_script()
+    utts = create_utts()
+    state = (create_torch_frames(), script.compute_mfcc, None)
+    y_ref = [compute_shard_feats(state, utt)[3] for utt in utts]
+    for (key, x), y in zip(utts, y_ref):
+        frames = np.lib.stride_tricks.sliding_window_view(x, 400)[::160]
+        assert_allclose(y[:, 0], np.log(np.sum(frames**2, axis=-1)), rtol=1e-4)
+
+    keys, num_frames = extract('torch_%d' % num_workers, num_workers,
+                               create_torch_frames, {}, script.compute_mfcc)
+    assert keys == [utt[0] for utt in utts]
+    r = RDRF.create('scp:%s/torch_%d.scp' % (output_dir, num_workers))
+    for y, y_ref_i in zip(r.read(keys), y_ref):
+        assert_allclose(y, y_ref_i, rtol=1e-5)
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+ Compares the stack-based PAV and the sorted-once ROCCH
+ against the loop implementations, e.g.:
+   python tests/hyperion/metrics/benchmark_pav.py --num-tar 10000 --num-non 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.metrics.utils import pavx, sort_trial_labels
+from hyperion.metrics.roc import compute_rocch, rocch2eer
+from hyperion.metrics.cllr import compute_min_cllr
+from hyperion.metrics.dcf import fast_eval_dcf_eer
+
+from test_utils import pavx_loop, rocch_loop, rocch2eer_loop
+
+
+def timeit(f, *args):
+    t1 = time.time()
+    r = f(*args)
+    return r, time.time() - t1
+
+
+def benchmark(num_tar, num_non, max_ref_trials):
+
+    rng = np.random.RandomState(seed=1024)
+    tar = rng.randn(num_tar) + 2
+    non = rng.randn(num_non)
+    labels, _ = sort_trial_labels(tar, non)
+    y = labels.astype(float)
+    print('num_tar=%d num_non=%d' % (num_tar, num_non))
+
+    _, dt = timeit(pavx, y)
+    print('pavx: %.3f s' % dt)
+    (p_miss, p_fa), dt = timeit(compute_rocch, tar, non)
+    print('compute_rocch: %.3f s' % dt)
+    eer, dt = timeit(rocch2eer, p_miss, p_fa)
+    print('rocch2eer: %.3f s' % dt)
+    _, dt = timeit(compute_min_cllr, tar, non)
+    print('compute_min_cllr: %.3f s' % dt)
+    _, dt = timeit(fast_eval_dcf_eer, tar, non, [0.01, 0.05])
+    print('fast_eval_dcf_eer: %.3f s' % dt)
+
+    if num_tar + num_non > max_ref_trials:
+        print('skipping loop implementations, more than %d trials' % max_ref_trials)
+        return
+
+    _, dt = timeit(pavx_loop, y)
+    print('pavx loop: %.3f s' % dt)
+    (p_miss_ref, p_fa_ref), dt = timeit(rocch_loop, tar, non)
+    print('compute_rocch loop: %.3f s' % dt)
+    eer_ref, dt = timeit(rocch2eer_loop, p_miss_ref, p_fa_ref)
+    print('rocch2eer loop: %.3f s' % dt)
+    # the loop PAV pools bins with running means, so it can leave
+    # redundant collinear vertices, compare the operating points instead
+    assert_allclose(eer, eer_ref)
+    prior = np.array([0.001, 0.01, 0.05, 0.5])[:,None]
+    assert_allclose(np.min(prior*p_miss + (1-prior)*p_fa, axis=1),
+                    np.min(prior*p_miss_ref + (1-prior)*p_fa_ref, axis=1))
+    print('same EER and min DCF')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Benchmarks PAV and ROCCH')
+
+    parser.add_argument('--num-tar', type=int, default=10000)
+    parser.add_argument('--num-non', type=int, default=1000000)
+    parser.add_argument('--max-ref-trials', type=int, default=2000000,
+                        help='max. number of trials to run the loop implementations')
+    args = parser.parse_args()
+    benchmark(args.num_tar, args.num_non, args.max_ref_trials)
@@ -0,0 +1,123 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.utils import TrialKey, TrialScores
+from hyperion.metrics.roc import compute_rocch
+from hyperion.metrics.dcf import fast_eval_dcf_eer
+from hyperion.metrics.score_histogram import ScoreHistogram
+
+output_dir = './tests/data_out/metrics/score_histogram'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+p_tar = [0.01, 0.05, 0.5]
+
+
+def create_scores(ntar=1000, nnon=20000, seed=1024):
+    rng = np.random.RandomState(seed=seed)
+    tar = 2*rng.randn(ntar) + 4
+    non = 2*rng.randn(nnon) - 2
+    return tar, non
+
+
+def assert_in_bounds(x, x_err, x_ref):
+    assert np.all(x - x_err <= x_ref + 1e-10)
+    assert np.all(x_ref <= x + x_err + 1e-10)
+
+
+@pytest.mark.parametrize('num_bins', [200, 2000, 20000])
+def test_error_bounds(num_bins):
+    tar, non = create_scores()
+    min_dcf_ref, act_dcf_ref, eer_ref, _ = fast_eval_dcf_eer(tar, non, p_tar)
+
+    hist = ScoreHistogram(-10, 10, num_bins)
+    for first in range(0, len(non), 3000):
+        hist.accumulate(tar[first//20:(first+3000)//20], non[first:first+3000])
+
+    assert hist.num_tar == len(tar)
+    assert hist.num_non == len(non)
+    min_dcf, min_dcf_err, act_dcf, act_dcf_err, eer, eer_err = hist.eval_dcf_eer(p_tar)
+    assert_in_bounds(min_dcf, min_dcf_err, min_dcf_ref)
+    assert_in_bounds(act_dcf, act_dcf_err, act_dcf_ref)
+    assert_in_bounds(eer, eer_err, eer_ref)
+    assert eer_err < 0.005*(20000/num_bins)
+
+
+def test_scores_out_of_range():
+    tar, non = create_scores()
+    _, _, eer_ref, _ = fast_eval_dcf_eer(tar, non, p_tar)
+    hist = ScoreHistogram(-1, 1, 1000)
+    hist.accumulate(tar, non)
+    eer, eer_err = hist.compute_eer()
+    assert_in_bounds(eer, eer_err, eer_ref)
+
+
+def test_exact_on_bin_edges():
+    # one score value per bin, the worst case hull is the exact ROCCH
+    tar, non = create_scores()
+    tar = np.round(tar, 1)
+    non = np.round(non, 1)
+    _, _, eer_ref, _ = fast_eval_dcf_eer(tar, non, p_tar)
+    hist = ScoreHistogram(-20.05, 19.95, 400)
+    hist.accumulate(tar, non)
+    p_miss, p_fa = hist.compute_rocch()
+    p_miss_ref, p_fa_ref = compute_rocch(tar, non)
+    assert_allclose(p_miss, p_miss_ref)
+    assert_allclose(p_fa, p_fa_ref)
+
+
+def test_merge_save_load():
+    tar, non = create_scores()
+    hist = ScoreHistogram(-10, 10, 1000)
+    hist.accumulate(tar, non)
+
+    hist1 = ScoreHistogram(-10, 10, 1000)
+    hist1.accumulate(tar[:300], non[:5000])
+    file_path = output_dir + '/hist1.h5'
+    hist1.save(file_path)
+    hist2 = ScoreHistogram(-10, 10, 1000)
+    hist2.accumulate(tar[300:], non[5000:])
+    hist2.merge(ScoreHistogram.load(file_path))
+    assert np.all(hist.tar_counts == hist2.tar_counts)
+    assert np.all(hist.non_counts == hist2.non_counts)
+
+
+def test_accumulate_txt():
+    tar, non = create_scores(ntar=100, nnon=1000)
+    model_set = np.array(['m%03d' % i for i in range(11)])
+    seg_set = np.array(['t%03d' % i for i in range(100)])
+    tar_mask = np.zeros((11, 100), dtype=bool)
+    tar_mask.ravel()[:100] = True
+    non_mask = np.zeros((11, 100), dtype=bool)
+    non_mask.ravel()[100:] = True
+    scores = np.zeros((11, 100))
+    scores[tar_mask] = tar
+    scores[non_mask] = non
+    key = TrialKey(model_set, seg_set, tar_mask, non_mask)
+    scr = TrialScores(model_set, seg_set, scores, np.logical_or(tar_mask, non_mask))
+
+    key_file = output_dir + '/key.txt'
+    score_file = output_dir + '/scores.txt'
+    with open(key_file, 'w') as fk, open(score_file, 'w') as fs:
+        for i, j in zip(*np.logical_or(tar_mask, non_mask).nonzero()):
+            fk.write('%s %s %s\n' % (model_set[i], seg_set[j],
+                                     'target' if tar_mask[i,j] else 'nontarget'))
+            fs.write('%s %s %.6f\n' % (model_set[i], seg_set[j], scores[i,j]))
+
+    hist = ScoreHistogram(-10, 10, 1000)
+    hist.accumulate_txt(score_file, key_file, chunk_size=77)
+    hist_ref = ScoreHistogram(-10, 10, 1000)
+    hist_ref.accumulate_trials(scr, key)
+    assert np.all(hist.tar_counts == hist_ref.tar_counts)
+    assert np.all(hist.non_counts == hist_ref.non_counts)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,173 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+import pandas as pd
+import matplotlib
+from numpy.testing import assert_allclose
+
+from hyperion.utils import TrialKey, TrialScores
+from hyperion.utils.trial_stats import TrialStats
+from hyperion.metrics.dcf import fast_eval_dcf_eer
+from hyperion.metrics.cllr import compute_cllr, compute_min_cllr
+from hyperion.metrics.utils import opt_loglr
+from hyperion.metrics.subset_evaluator import SubsetEvaluator
+from hyperion.metrics.verification_evaluator import VerificationAdvAttackEvaluator
+
+# don't leak the latex rendering enabled by verification_evaluator to other tests
+matplotlib.rc('text', usetex=False)
+
+p_tar = [0.05, 0.1, 0.5]
+
+
+def create_pool(num_trials=1000, seed=1024):
+    rng = np.random.RandomState(seed=seed)
+    labels = rng.rand(num_trials) < 0.2
+    scores = np.round(rng.randn(num_trials) + 2*labels, 1)
+    return scores, labels
+
+
+@pytest.mark.parametrize('num_threads', [1, 2])
+def test_eval_subsets(num_threads):
+    scores, labels = create_pool()
+    rng = np.random.RandomState(seed=1)
+    subsets = [rng.rand(len(scores)) < 0.5 for i in range(5)]
+    subsets.append(np.arange(len(scores)))
+    evaluator = SubsetEvaluator(scores, labels, p_tar, num_threads=num_threads)
+    min_dcf, act_dcf, eer, cllr, min_cllr = evaluator.eval_subsets(
+        subsets, return_cllr=True)
+    assert min_dcf.shape == (len(subsets), len(p_tar))
+    for i, subset in enumerate(subsets):
+        tar = scores[subset][labels[subset]]
+        non = scores[subset][~labels[subset]]
+        min_dcf_i, act_dcf_i, eer_i, _ = fast_eval_dcf_eer(tar, non, p_tar)
+        assert_allclose(min_dcf[i], min_dcf_i)
+        assert_allclose(act_dcf[i], act_dcf_i)
+        assert_allclose(eer[i], eer_i)
+        assert_allclose(cllr[i], compute_cllr(tar, non))
+        assert_allclose(min_cllr[i], compute_min_cllr(tar, non))
+        # llr from opt_loglr have a tiny perturbation to break ties
+        tar_llr, non_llr = opt_loglr(tar, non, 'raw')
+        assert_allclose(min_cllr[i], compute_cllr(tar_llr, non_llr), rtol=1e-4)
+
+    min_dcf_f, _, eer_f = evaluator.eval_subsets(
+        lambda i: subsets[i], num_subsets=len(subsets))
+    assert_allclose(min_dcf_f, min_dcf)
+    assert_allclose(eer_f, eer)
+
+
+def create_attack_evaluator(num_models=10, num_tests=30, num_attacks=3):
+    rng = np.random.RandomState(seed=1024)
+    model_set = np.array(['m%02d' % i for i in range(num_models)])
+    seg_set = np.array(['t%02d' % i for i in range(num_tests)])
+    tar = rng.rand(num_models, num_tests) < 0.2
+    non = np.logical_not(tar)
+    non[0, :3] = False
+    key = TrialKey(model_set, seg_set, tar, non)
+    scores = TrialScores(model_set, seg_set, rng.randn(num_models, num_tests) + 3*tar)
+    attack_scores = []
+    attack_stats = []
+    for k in range(num_attacks):
+        s = scores.scores + (1 - 2*tar)*rng.rand(num_models, num_tests)*(k+1)
+        attack_scores.append(TrialScores(model_set, seg_set, s))
+        mm, tt = np.meshgrid(model_set, seg_set, indexing='ij')
+        # rounded, so there are attacks with the same snr
+        snr = np.round(rng.rand(num_models, num_tests)*30 + 10*(num_attacks-k))
+        df = pd.DataFrame({'modelid': mm.ravel(), 'segmentid': tt.ravel(),
+                           'snr': snr.ravel()})
+        attack_stats.append(TrialStats(df))
+
+    return VerificationAdvAttackEvaluator(
+        key, scores, attack_scores, attack_stats, p_tar)
+
+
+def compute_dcf_eer_vs_stats_loop(evaluator, stats_mat, stat_bins,
+                                  attacked_trials, higher_better):
+    """Reference that rebuilds the score matrix of each bin."""
+    key = evaluator.key
+    if attacked_trials == 'all':
+        mask = np.logical_or(key.tar, key.non)
+    elif attacked_trials == 'tar':
+        mask = key.tar
+    else:
+        mask = key.non
+
+    if higher_better:
+        cmp_func = lambda x,y: np.logical_and(np.greater_equal(x,y), mask)
+        sort_func = lambda x: np.argmin(x)
+    else:
+        cmp_func = lambda x,y: np.logical_and(np.less_equal(x,y), mask)
+        sort_func = lambda x: np.argmax(x)
+
+    eer = []
+    min_dcf = []
+    act_dcf = []
+    for b in range(len(stat_bins)):
+        scores = evaluator.scores.scores.copy()
+        score_mask = cmp_func(stats_mat, stat_bins[b])
+        for i in range(scores.shape[0]):
+            for j in range(scores.shape[1]):
+                mask_ij = score_mask[:,i,j]
+                if np.any(mask_ij):
+                    k = sort_func(stats_mat[mask_ij, i, j])
+                    scores[i,j] = evaluator.attack_scores[mask_ij, i, j][k]
+
+        tar = scores[key.tar]
+        non = scores[key.non]
+        min_dcf_b, act_dcf_b, eer_b, _ = fast_eval_dcf_eer(tar, non, p_tar)
+        eer.append(eer_b)
+        min_dcf.append(min_dcf_b)
+        act_dcf.append(act_dcf_b)
+
+    return np.vstack(min_dcf), np.vstack(act_dcf), np.array(eer)
+
+
+@pytest.mark.parametrize('attacked_trials', ['all', 'tar', 'non'])
+@pytest.mark.parametrize('higher_better', [False, True])
+def test_dcf_eer_vs_stats(attacked_trials, higher_better):
+    evaluator = create_attack_evaluator()
+    stat_bins = np.arange(0, 60, 5)
+    stats_mat = evaluator._get_stats_mat('snr')
+    stat_bins, min_dcf, act_dcf, eer = evaluator.compute_dcf_eer_vs_stats(
+        'snr', stat_bins, attacked_trials, higher_better, num_threads=2)
+    min_dcf_ref, act_dcf_ref, eer_ref = compute_dcf_eer_vs_stats_loop(
+        evaluator, stats_mat, stat_bins, attacked_trials, higher_better)
+    assert_allclose(min_dcf, min_dcf_ref)
+    assert_allclose(act_dcf, act_dcf_ref)
+    assert_allclose(eer, eer_ref)
+
+
+def test_dcf_eer_vs_stats_attack_choice():
+    # only attack 2 fools the nontarget trial, attacks 1 and 2 meet
+    # the bin linf<=25 and the worst one (linf=20) must be selected
+    model_set = np.array(['m0'])
+    seg_set = np.array(['t0', 't1'])
+    tar = np.array([[True, False]])
+    key = TrialKey(model_set, seg_set, tar, np.logical_not(tar))
+    scores = TrialScores(model_set, seg_set, np.array([[2., -2.]]))
+    attack_scores = []
+    attack_stats = []
+    for s, linf in zip([-2., -2., 5.], [50., 10., 20.]):
+        attack_scores.append(TrialScores(model_set, seg_set, np.array([[2., s]])))
+        df = pd.DataFrame({'modelid': ['m0', 'm0'], 'segmentid': seg_set,
+                           'linf': [linf, linf]})
+        attack_stats.append(TrialStats(df))
+    evaluator = VerificationAdvAttackEvaluator(
+        key, scores, attack_scores, attack_stats, p_tar)
+
+    stats = evaluator._get_stats_mat('linf').reshape(3, -1)
+    get_choice = evaluator._get_attack_choice(stats, np.array([5, 15, 25, 60]), False)
+    assert np.all(get_choice(0) == -1)
+    assert np.all(get_choice(1) == 1)
+    assert np.all(get_choice(2) == 2)
+    assert np.all(get_choice(3) == 0)
+
+    stat_bins, _, _, eer = evaluator.compute_dcf_eer_vs_stats(
+        'linf', [5, 15, 25, 60], 'non', higher_better=False)
+    assert_allclose(eer, [0, 0, 0.5, 0])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,206 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+import scipy.linalg as sla
+from numpy.testing import assert_allclose
+
+from hyperion.metrics.utils import *
+from hyperion.metrics.utils import _pav_blocks
+from hyperion.metrics.roc import compute_rocch, rocch2eer
+from hyperion.metrics.dcf import compute_act_dcf, compute_min_dcf, fast_eval_dcf_eer
+
+
+def pavx_loop(y):
+    """Reference PAV with one loop step per sample (Bosaris)."""
+    n = len(y)
+    index = np.zeros(y.shape, dtype=int)
+    l = np.zeros(y.shape, dtype=int)
+    ghat = np.zeros_like(y)
+
+    ci = 0
+    index[ci] = 0
+    l[ci] = 1
+    ghat[ci] = y[0]
+    for j in range(1, n):
+        ci = ci+1
+        index[ci] = j
+        l[ci] = 1
+        ghat[ci] = y[j]
+        while ci >= 1 and ghat[ci-1] >= ghat[ci]:
+            nw = l[ci-1] + l[ci]
+            ghat[ci-1] = ghat[ci-1] + (l[ci] / nw) * (ghat[ci] - ghat[ci-1])
+            l[ci-1] = nw
+            ci = ci-1
+
+    height = np.copy(ghat[:ci+1])
+    width = l[:ci+1]
+    while n >= 1:
+        for j in range(index[ci], n):
+            ghat[j] = ghat[ci]
+        n = index[ci]
+        ci = ci-1
+
+    return ghat, width, height
+
+
+def rocch_loop(tar, non):
+    """Reference ROCCH with a loop over the PAV bins."""
+    Nt = len(tar)
+    Nn = len(non)
+    N = Nt+Nn
+    scores = np.hstack((tar, non))
+    Pideal = np.hstack((np.ones((Nt,)), np.zeros((Nn,))))
+    Pideal = Pideal[np.argsort(scores, kind='mergesort')]
+    _, width, _ = pavx_loop(Pideal)
+    nbins = len(width)
+    p_miss = np.zeros((nbins+1,))
+    p_fa = np.zeros((nbins+1,))
+    left = 0
+    fa = Nn
+    miss = 0
+    for i in range(nbins):
+        p_miss[i] = miss/Nt
+        p_fa[i] = fa/Nn
+        left = left + width[i]
+        miss = np.sum(Pideal[:left])
+        fa = N - left - np.sum(Pideal[left:])
+
+    p_miss[nbins] = miss/Nt
+    p_fa[nbins] = fa/Nn
+    return p_miss, p_fa
+
+
+def rocch2eer_loop(p_miss, p_fa):
+    """Reference EER solving a linear system per ROCCH segment."""
+    eer = 0
+    for i in range(len(p_fa)-1):
+        XY = np.vstack((p_fa[i:i+2], p_miss[i:i+2])).T
+        dd = np.dot(np.array([1, -1]), XY)
+        if np.min(np.abs(dd))==0:
+            eerseg = 0
+        else:
+            seg = sla.solve(XY, np.ones((2,1)))
+            eerseg = 1/(np.sum(seg))
+        eer = np.maximum(eer, eerseg)
+    return eer
+
+
+def create_scores(ntar=200, nnon=2000, seed=1024, rounded=False):
+    rng = np.random.RandomState(seed=seed)
+    tar = rng.randn(ntar) + 2
+    non = rng.randn(nnon)
+    if rounded:
+        # force tied scores
+        tar = np.round(tar, 1)
+        non = np.round(non, 1)
+    return tar, non
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_pavx(seed):
+    rng = np.random.RandomState(seed=seed)
+    y = np.round(rng.randn(500) + np.linspace(-2, 2, 500), 1)
+    ghat, width, height = pavx(y)
+    ghat_ref, width_ref, height_ref = pavx_loop(y)
+    assert_allclose(ghat, ghat_ref)
+    assert np.all(width == width_ref)
+    assert_allclose(height, height_ref)
+
+    # binary input
+    y = (rng.rand(500) < np.linspace(0, 1, 500)).astype(float)
+    ghat, width, height = pavx(y)
+    ghat_ref, width_ref, height_ref = pavx_loop(y)
+    assert_allclose(ghat, ghat_ref)
+    assert np.all(width == width_ref)
+    num_tar, width_l = pav_labels(y)
+    assert np.all(width_l == width_ref)
+    assert_allclose(num_tar/width_l, height_ref)
+
+
+def test_pavx_edge_cases():
+    for y in [np.array([1.]), np.ones((5,)), np.arange(5.), np.arange(5.)[::-1]]:
+        ghat, width, height = pavx(y)
+        ghat_ref, width_ref, height_ref = pavx_loop(y)
+        assert_allclose(ghat, ghat_ref)
+        assert np.all(width == width_ref)
+
+
+@pytest.mark.parametrize('min_merge_ratio', [0, 0.1, 2])
+def test_pav_blocks(min_merge_ratio):
+    # only vectorized rounds, rounds finished by the stack and only stack
+    rng = np.random.RandomState(seed=1)
+    ramp = np.append(np.arange(50.), -1)
+    for y in [rng.randn(500), np.cumsum(rng.randn(500)), ramp]:
+        w = rng.randint(1, 4, size=len(y))
+        sums, widths = _pav_blocks(y, w, min_merge_ratio)
+        _, width_ref, height_ref = pavx_loop(np.repeat(y, w))
+        assert np.all(widths == width_ref)
+        assert_allclose(sums/widths, height_ref)
+
+
+@pytest.mark.parametrize('rounded', [False, True])
+def test_rocch(rounded):
+    tar, non = create_scores(rounded=rounded)
+    p_miss, p_fa = compute_rocch(tar, non)
+    p_miss_ref, p_fa_ref = rocch_loop(tar, non)
+    assert_allclose(p_miss, p_miss_ref)
+    assert_allclose(p_fa, p_fa_ref)
+
+    eer = rocch2eer(p_miss, p_fa)
+    assert_allclose(eer, rocch2eer_loop(p_miss, p_fa))
+
+
+@pytest.mark.parametrize('rounded', [False, True])
+def test_fast_eval_sorted_once(rounded):
+    tar, non = create_scores(rounded=rounded)
+    prior = [0.01, 0.1, 0.5]
+    min_dcf, act_dcf, eer, _ = fast_eval_dcf_eer(tar, non, prior)
+    min_dcf_ref, _, _ = compute_min_dcf(tar, non, prior)
+    act_dcf_ref, _, _ = compute_act_dcf(tar, non, prior)
+    assert_allclose(min_dcf, min_dcf_ref)
+    assert_allclose(act_dcf, act_dcf_ref)
+
+    # act_dcf counting the errors directly
+    t = np.log(1-np.asarray(prior)) - np.log(prior)
+    p_miss = np.mean(tar[:,None] < t, axis=0)
+    p_fa = np.mean(non[:,None] >= t, axis=0)
+    act_dcf_ref = (prior*p_miss + (1-np.asarray(prior))*p_fa)/np.asarray(prior)
+    assert_allclose(act_dcf, act_dcf_ref)
+
+
+def opt_loglr_loop(tar, non, method):
+    """Reference optimal log-LR with the loop PAV."""
+    ntar = len(tar)
+    nnon = len(non)
+    n = ntar+nnon
+    scores = np.concatenate((tar, non))
+    p_ideal = np.zeros((n,))
+    p_ideal[:ntar] = 1
+    sort_idx = np.argsort(scores, kind='mergesort')
+    p_ideal = p_ideal[sort_idx]
+    if method == 'laplace':
+        p_ideal = np.concatenate(([1,0], p_ideal, [1,0]))
+    p_opt, _, _ = pavx_loop(p_ideal)
+    if method == 'laplace':
+        p_opt = p_opt[2:-2]
+    with np.errstate(divide='ignore'):
+        llr = np.log(p_opt) - np.log(1-p_opt) - np.log(ntar/nnon)
+    llr += 1e-6 * np.arange(n)/n
+    llr[sort_idx] = llr.copy()
+    return llr[:ntar], llr[ntar:]
+
+
+@pytest.mark.parametrize('method', ['raw', 'laplace'])
+def test_opt_loglr(method):
+    tar, non = create_scores(rounded=True)
+    tar_llr, non_llr = opt_loglr(tar, non, method)
+    tar_llr_ref, non_llr_ref = opt_loglr_loop(tar, non, method)
+    assert_allclose(tar_llr, tar_llr_ref, rtol=1e-10)
+    assert_allclose(non_llr, non_llr_ref, rtol=1e-10)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
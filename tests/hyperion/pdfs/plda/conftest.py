@@ -0,0 +1,45 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+ Fixtures shared by the PLDA scoring tests.
+"""
+import pytest
+import numpy as np
+
+from hyperion.pdfs import SPLDA, FRPLDA, PLDA
+
+x_dim = 10
+y_dim = 4
+z_dim = 3
+num_models = 23
+num_tests = 37
+
+
+@pytest.fixture
+def plda_models():
+    """SPLDA, FRPLDA and PLDA models with random parameters."""
+    rng = np.random.RandomState(seed=1024)
+    mu = rng.randn(x_dim)
+    A = rng.randn(x_dim, x_dim)
+    W = np.dot(A, A.T) + x_dim*np.eye(x_dim)
+    A = rng.randn(x_dim, x_dim)
+    B = np.dot(A, A.T) + np.eye(x_dim)
+    V = rng.randn(y_dim, x_dim)
+    U = rng.randn(z_dim, x_dim)
+    D = np.diag(W).copy()
+    return [SPLDA(mu=mu, V=V, W=W), FRPLDA(mu=mu, B=B, W=W),
+            PLDA(mu=mu, V=V, U=U, D=D)]
+
+
+@pytest.fixture
+def plda_trials():
+    """Enrollment and test vectors, their names and a random trial mask."""
+    rng = np.random.RandomState(seed=1)
+    x_e = rng.randn(num_models, x_dim)
+    x_t = rng.randn(num_tests, x_dim)
+    model_set = np.array(['m%03d' % i for i in range(num_models)])
+    seg_set = np.array(['t%03d' % i for i in range(num_tests)])
+    trial_mask = rng.rand(num_models, num_tests) < 0.3
+    trial_mask[:5, :8] = True
+    return x_e, x_t, model_set, seg_set, trial_mask
@@ -0,0 +1,66 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+
+import pytest
+import numpy as np
+import scipy.sparse as sparse
+
+from numpy.testing import assert_allclose
+
+from hyperion.utils import TrialScores
+from hyperion.pdfs import PLDABlockScorer
+
+output_dir = './tests/data_out/pdfs/plda/plda_block_scorer'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+
+@pytest.mark.parametrize('num_threads', [1, 3])
+def test_score_dense(num_threads, plda_models, plda_trials):
+    x_e, x_t, model_set, seg_set, _ = plda_trials
+    for model in plda_models:
+        scorer = PLDABlockScorer(model, enroll_block_size=5, test_block_size=8,
+                                 num_threads=num_threads)
+        scores = scorer.score(x_e, x_t, model_set, seg_set)
+        assert_allclose(scores.scores, model.llr_1vs1(x_e, x_t), rtol=1e-6)
+
+
+@pytest.mark.parametrize('is_sparse', [False, True])
+def test_score_masked(is_sparse, plda_models, plda_trials):
+    x_e, x_t, model_set, seg_set, trial_mask = plda_trials
+    mask = sparse.csc_matrix(trial_mask) if is_sparse else trial_mask
+    for model in plda_models:
+        scores_ref = model.llr_1vs1(x_e, x_t)
+        scorer = PLDABlockScorer(model, enroll_block_size=5, test_block_size=8,
+                                 num_threads=2, min_block_density=0.5)
+        scores = scorer.score(x_e, x_t, model_set, seg_set, mask)
+        assert np.all(scores.score_mask.toarray() == trial_mask)
+        assert_allclose(scores.scores.toarray()[trial_mask],
+                        scores_ref[trial_mask], rtol=1e-6)
+
+
+def test_score_to_file(plda_models, plda_trials):
+    x_e, x_t, model_set, seg_set, trial_mask = plda_trials
+    model = plda_models[0]
+    file_ref = output_dir + '/scores_ref.txt'
+    scores = TrialScores(model_set, seg_set, model.llr_1vs1(x_e, x_t), trial_mask)
+    scores.save_txt(file_ref)
+
+    file_path = output_dir + '/scores.txt'
+    scorer = PLDABlockScorer(model, enroll_block_size=5, test_block_size=8,
+                             num_threads=2)
+    num_trials = scorer.score_to_file(
+        x_e, x_t, model_set, seg_set, file_path, trial_mask)
+    assert num_trials == np.sum(trial_mask)
+
+    scores1 = TrialScores.load_txt(file_ref)
+    scores2 = TrialScores.load_txt(file_path)
+    assert np.all(scores1.score_mask == scores2.score_mask)
+    assert_allclose(scores1.scores, scores2.scores, atol=1e-5)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,112 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.pdfs import SPLDA, PLDA
+
+num_classes1 = 30
+num_classes2 = 40
+
+
+@pytest.fixture
+def book_models(plda_models):
+    # models with speaker subspace V
+    return [m for m in plda_models if isinstance(m, (SPLDA, PLDA))]
+
+
+def get_VW_VWV(model):
+    assert model.is_init
+    if isinstance(model, PLDA):
+        return model._VW, model._VWV
+    VW = np.dot(model.W, model.V.T)
+    return VW, np.dot(model.V, VW)
+
+
+def create_stats(num_classes, x_dim, int_counts, seed):
+    rng = np.random.RandomState(seed=seed)
+    if int_counts:
+        N = rng.randint(1, 4, size=(num_classes,)).astype(float)
+    else:
+        N = 0.1 + 3*rng.rand(num_classes)
+    F = N[:, None]*2*rng.randn(num_classes, x_dim)
+    return N, F, None
+
+
+def compute_py_g_x_loop(model, D):
+    # reference: one matrix inversion per class
+    N, F, _ = D
+    VW, VWV = get_VW_VWV(model)
+    gamma = np.dot(F - model.mu, VW)
+    y_dim = VWV.shape[0]
+    I = np.eye(y_dim)
+    y = np.zeros_like(gamma)
+    Sigma_y = np.zeros((len(N), y_dim, y_dim))
+    logpy = np.zeros((len(N),))
+    Ry = np.zeros((y_dim, y_dim))
+    Py = np.zeros((y_dim, y_dim))
+    for i in range(len(N)):
+        L = I + N[i]*VWV
+        iL = np.linalg.inv(L)
+        y[i] = np.dot(iL, gamma[i])
+        Sigma_y[i] = iL
+        logpy[i] = 0.5*(np.linalg.slogdet(L)[1] - np.dot(y[i], gamma[i])
+                        - y_dim*np.log(2*np.pi))
+        Ry += N[i]*iL
+        Py += iL
+    return y, Sigma_y, logpy, Ry, Py
+
+
+def llr_NvsM_book_loop(model, D1, D2):
+    # reference: three matrix inversions per pair of classes
+    N1, F1, _ = D1
+    N2, F2, _ = D2
+    VW, VWV = get_VW_VWV(model)
+    g1 = np.dot(F1 - N1[:, None]*model.mu, VW)
+    g2 = np.dot(F2 - N2[:, None]*model.mu, VW)
+    I = np.eye(VWV.shape[0])
+
+    def q(g, N):
+        L = I + N*VWV
+        return np.dot(g, np.linalg.solve(L, g)) - np.linalg.slogdet(L)[1]
+
+    scores = np.zeros((len(N1), len(N2)))
+    for i in range(len(N1)):
+        for j in range(len(N2)):
+            scores[i, j] = 0.5*(q(g1[i] + g2[j], N1[i] + N2[j])
+                                - q(g1[i], N1[i]) - q(g2[j], N2[j]))
+    return scores
+
+
+@pytest.mark.parametrize('int_counts', [True, False])
+def test_compute_py_g_x(int_counts, book_models):
+    for model in book_models:
+        D = create_stats(num_classes1, len(model.mu), int_counts, seed=1)
+        y_ref = compute_py_g_x_loop(model, D)
+        y = model.compute_py_g_x(D, return_cov=True, return_logpy_0=True,
+                                 return_acc=True)
+        for a, a_ref in zip(y, y_ref):
+            assert_allclose(a, a_ref, rtol=1e-6, atol=1e-10)
+        assert_allclose(model.compute_py_g_x(D), y_ref[0], rtol=1e-6, atol=1e-10)
+
+
+@pytest.mark.parametrize('int_counts1, int_counts2',
+                         [(True, True), (False, False), (True, False), (False, True)])
+def test_llr_NvsM_book(int_counts1, int_counts2, book_models):
+    for model in book_models:
+        D1 = create_stats(num_classes1, len(model.mu), int_counts1, seed=1)
+        D2 = create_stats(num_classes2, len(model.mu), int_counts2, seed=2)
+        F1 = D1[1].copy()
+        scores_ref = llr_NvsM_book_loop(model, D1, D2)
+        scores = model.llr_NvsM_book(D1, D2)
+        assert_allclose(scores, scores_ref, rtol=1e-6, atol=1e-8)
+        # the input stats are not modified
+        assert_allclose(D1[1], F1)
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,70 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.pdfs import PLDAScoringIndex
+
+output_dir = './tests/data_out/pdfs/plda/plda_scoring_index'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+
+def test_score(plda_models, plda_trials):
+    x_e, x_t, model_set, seg_set, _ = plda_trials
+    for model in plda_models:
+        index = PLDAScoringIndex.create(model, model_set, x_e)
+        assert len(index) == len(model_set)
+        scores_ref = model.llr_1vs1(x_e, x_t)
+        assert_allclose(index.score(x_t), scores_ref, rtol=1e-6)
+        scores = index.score_trials(x_t, seg_set, model_set[[3, 1]])
+        assert np.all(scores.model_set == model_set[[3, 1]])
+        assert_allclose(scores.scores, scores_ref[[3, 1]], rtol=1e-6)
+
+
+def test_append_remove(plda_models, plda_trials):
+    x_e, x_t, model_set, seg_set, _ = plda_trials
+    model = plda_models[0]
+    scores_ref = model.llr_1vs1(x_e, x_t)
+    index = PLDAScoringIndex.create(model)
+    for first in range(0, len(model_set), 5):
+        index.append(model_set[first:first+5], x_e[first:first+5])
+    assert np.all(index.keys == model_set)
+    assert_allclose(index.score(x_t), scores_ref, rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        index.append(model_set[:1], x_e[:1])
+
+    remove = model_set[[0, 7, 22]]
+    keep = np.ones((len(model_set),), dtype=bool)
+    keep[[0, 7, 22]] = False
+    index.remove(remove)
+    assert np.all(index.keys == model_set[keep])
+    assert_allclose(index.score(x_t), scores_ref[keep], rtol=1e-6)
+
+    index.append(['new'], x_e[:1])
+    assert index.keys[-1] == 'new'
+    assert_allclose(index.score(x_t, ['new']), scores_ref[:1], rtol=1e-6)
+
+
+def test_save_load(plda_models, plda_trials):
+    x_e, x_t, model_set, seg_set, _ = plda_trials
+    for model in plda_models:
+        index = PLDAScoringIndex.create(model, model_set, x_e)
+        file_path = output_dir + '/%s_index.h5' % model.__class__.__name__
+        index.save(file_path)
+        index2 = PLDAScoringIndex.load(file_path)
+        assert np.all(index2.keys == model_set)
+        assert_allclose(index2.score(x_t), index.score(x_t), rtol=1e-5, atol=1e-3)
+        index2.append(['new'], x_e[:1])
+        assert len(index2) == len(model_set) + 1
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,93 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+
+from numpy.testing import assert_allclose
+
+from hyperion.score_norm import AdaptSNorm
+
+
+def create_scores():
+    rng = np.random.RandomState(seed=1024)
+    scores = rng.randn(20, 30)
+    scores_coh_test = rng.randn(50, 30)
+    scores_enr_coh = rng.randn(20, 50)
+    mask_coh_test = rng.rand(50, 30) > 0.1
+    mask_enr_coh = rng.rand(20, 50) > 0.1
+    return scores, scores_coh_test, scores_enr_coh, mask_coh_test, mask_enr_coh
+
+
+def adapt_s_norm_loop(scores, scores_coh_test, scores_enr_coh, 
+                      mask_coh_test, mask_enr_coh, nbest, nbest_discard):
+    # computes adaptive s-norm one enrollment/test at a time
+    scores_coh_test = np.where(mask_coh_test, scores_coh_test, 0)
+    scores_enr_coh = np.where(mask_enr_coh, scores_enr_coh, 0)
+    first = nbest_discard
+    last = nbest_discard + nbest
+
+    scores_z = np.zeros_like(scores)
+    for i in range(scores.shape[1]):
+        idx = np.argsort(-scores_coh_test[:, i])[first:last]
+        norm = np.mean(mask_enr_coh[:, idx], axis=1)
+        mu = np.mean(scores_enr_coh[:, idx], axis=1)/norm
+        s = np.sqrt(np.mean(scores_enr_coh[:, idx]**2, axis=1)/norm - mu**2)
+        scores_z[:, i] = (scores[:, i] - mu)/s
+
+    scores_t = np.zeros_like(scores)
+    for i in range(scores.shape[0]):
+        idx = np.argsort(-scores_enr_coh[i])[first:last]
+        norm = np.mean(mask_coh_test[idx], axis=0)
+        mu = np.mean(scores_coh_test[idx], axis=0)/norm
+        s = np.sqrt(np.mean(scores_coh_test[idx]**2, axis=0)/norm - mu**2)
+        scores_t[i] = (scores[i] - mu)/s
+
+    return (scores_z + scores_t)/np.sqrt(2)
+
+
+@pytest.mark.parametrize('nbest, nbest_discard', [(10, 0), (10, 3), (100, 2)])
+def test_adapt_s_norm(nbest, nbest_discard):
+    scores, scores_coh_test, scores_enr_coh, mask_coh_test, mask_enr_coh = create_scores()
+    nbest_ref = min(nbest, scores_enr_coh.shape[1] - nbest_discard)
+    snorm = AdaptSNorm(nbest=nbest, nbest_discard=nbest_discard,
+                       block_size=7, num_threads=2)
+
+    scores_norm = snorm.predict(scores, scores_coh_test, scores_enr_coh)
+    ones_coh_test = np.ones(scores_coh_test.shape, dtype=bool)
+    ones_enr_coh = np.ones(scores_enr_coh.shape, dtype=bool)
+    scores_ref = adapt_s_norm_loop(
+        scores, scores_coh_test, scores_enr_coh, 
+        ones_coh_test, ones_enr_coh, nbest_ref, nbest_discard)
+    assert_allclose(scores_norm, scores_ref, rtol=1e-6)
+
+    scores_norm = snorm.predict(scores, scores_coh_test, scores_enr_coh,
+                                mask_coh_test, mask_enr_coh)
+    scores_ref = adapt_s_norm_loop(
+        scores, scores_coh_test, scores_enr_coh,
+        mask_coh_test, mask_enr_coh, nbest_ref, nbest_discard)
+    assert_allclose(scores_norm, scores_ref, rtol=1e-6)
+
+
+@pytest.mark.parametrize('offset, scale', [(10, 0.1), (100, 0.05)])
+def test_adapt_s_norm_float32_offset(offset, scale):
+    # scores with offset much larger than their std in single precision
+    # should give the same result as in double precision
+    scores, scores_coh_test, scores_enr_coh, mask_coh_test, mask_enr_coh = create_scores()
+    scores, scores_coh_test, scores_enr_coh = [
+        (offset + scale*s).astype('float32')
+        for s in (scores, scores_coh_test, scores_enr_coh)]
+    snorm = AdaptSNorm(nbest=10, block_size=7)
+
+    for masks in [(), (mask_coh_test, mask_enr_coh)]:
+        scores_norm = snorm.predict(scores, scores_coh_test, scores_enr_coh, *masks)
+        assert scores_norm.dtype == np.float32
+        scores_ref = snorm.predict(
+            scores.astype('float64'), scores_coh_test.astype('float64'),
+            scores_enr_coh.astype('float64'), *masks)
+        assert_allclose(scores_norm, scores_ref, rtol=1e-5, atol=1e-5)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
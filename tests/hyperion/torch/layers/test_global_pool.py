@@ -0,0 +1,73 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+torch = pytest.importorskip('torch')
+
+# helpers are imported before seq_embed, like in the x-vector scripts,
+# to avoid a circular import
+from hyperion.torch.helpers import TorchModelLoader as TML
+from hyperion.torch.layers import GlobalPool1dFactory as PF
+from hyperion.torch.narchs import TDNNV1
+from hyperion.torch.seq_embed import XVector
+
+in_feats = 16
+lengths = [50, 23, 37, 1]
+
+pool_types = [{'pool_type': 'mean+stddev'},
+              {'pool_type': 'lde', 'num_comp': 4},
+              {'pool_type': 'scaled-dot-prod-att-v1', 'num_heads': 2, 'd_k': 8, 'd_v': 8},
+              {'pool_type': 'scaled-dot-prod-att-v1', 'num_heads': 2, 'd_k': 8, 'd_v': 8,
+               'bin_attn': True},
+              {'pool_type': 'ch-wise-att-mean-stddev', 'inner_feats': 8}]
+
+
+def create_batch(seed=1024):
+    # padded batch, padded frames are filled with large values
+    # so they change the output if they are not masked
+    torch.manual_seed(seed)
+    x = 100*torch.ones(len(lengths), in_feats, max(lengths))
+    for i, l in enumerate(lengths):
+        x[i, :, :l] = torch.randn(in_feats, l)
+    return x, torch.as_tensor(lengths)
+
+
+
+@pytest.mark.parametrize('pool_net', pool_types)
+def test_pool_padded_batch(pool_net):
+    torch.manual_seed(1)
+    pool = PF.create(in_feats=in_feats, **pool_net)
+    pool.eval()
+    x, x_lengths = create_batch()
+    t = torch.arange(x.size(-1))
+    weights = (t < x_lengths[:, None]).float()
+    with torch.no_grad():
+        y = pool(x, weights=weights)
+        for i, l in enumerate(lengths):
+            y_i = pool(x[i:i+1, :, :l])
+            assert_allclose(y[i].numpy(), y_i[0].numpy(), rtol=1e-4, atol=1e-5)
+
+
+
+@pytest.mark.parametrize('pool_net', pool_types)
+def test_xvector_extract_embed_padded_batch(pool_net):
+    # frame-wise encoder, so the padded frames don't leak into the valid ones
+    torch.manual_seed(1)
+    encoder = TDNNV1(2, in_feats, 32, kernel_size=1, in_norm=False)
+    model = XVector(encoder, 10, pool_net=dict(pool_net), embed_dim=12)
+    model.eval()
+    x, x_lengths = create_batch()
+    with torch.no_grad():
+        y = model.extract_embed(x, x_lengths=x_lengths)
+        for i, l in enumerate(lengths):
+            y_i = model.extract_embed(x[i:i+1, :, :l])
+            assert_allclose(y[i].numpy(), y_i[0].numpy(), rtol=1e-4, atol=1e-5)
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,75 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.transforms import NSbSw
+
+x_dim = 5
+num_classes = 7
+num_samples = 200
+
+
+def create_data(seed=1024):
+    rng = np.random.RandomState(seed=seed)
+    class_ids = rng.randint(num_classes, size=(num_samples,))
+    # class with less samples than neighbors
+    class_ids[class_ids == 3] = 2
+    class_ids[:2] = 3
+    x = rng.randn(num_samples, x_dim) + 3*rng.randn(num_classes, x_dim)[class_ids]
+    return x, class_ids
+
+
+def compute_nsbsw_loop(x, class_ids, K, alpha):
+    # reference: brute force kNN with loops over samples and classes
+    u_ids = np.unique(class_ids)
+    d = np.zeros((num_classes, num_samples))
+    delta = np.zeros((num_classes, num_samples, x_dim))
+    mu = np.zeros((x_dim,))
+    for i in u_ids:
+        x_i = x[class_ids == i]
+        mu += np.mean(x_i, axis=0)
+        for l in range(num_samples):
+            dist = np.sqrt(np.sum((x_i - x[l])**2, axis=-1))
+            nn = np.argsort(dist)[:K]
+            d[i, l] = dist[nn[-1]]
+            delta[i, l] = x[l] - np.mean(x_i[nn], axis=0)
+
+    d = d**alpha
+    Sb = np.zeros((x_dim, x_dim))
+    Sw = np.zeros((x_dim, x_dim))
+    for i in u_ids:
+        idx_i = (class_ids == i).nonzero()[0]
+        w_i = 0
+        Sb_i = np.zeros((x_dim, x_dim))
+        for j in u_ids:
+            w_ij = np.minimum(d[i], d[j])/(d[i] + d[j])
+            for l in idx_i:
+                S = np.outer(delta[j, l], delta[j, l])
+                if i == j:
+                    Sw += S/len(idx_i)
+                else:
+                    Sb_i += w_ij[l]*S
+                    w_i += w_ij[l]
+        Sb += Sb_i/w_i
+    return mu/num_classes, Sb/num_classes, Sw/num_classes
+
+
+@pytest.mark.parametrize('K, alpha', [(3, 1), (5, 0.5)])
+@pytest.mark.parametrize('block_size', [64, 1000, 2**22])
+def test_nsbsw(K, alpha, block_size):
+    x, class_ids = create_data()
+    mu_ref, Sb_ref, Sw_ref = compute_nsbsw_loop(x, class_ids, K, alpha)
+    s = NSbSw(K=K, alpha=alpha, block_size=block_size)
+    s.fit(x, class_ids)
+    assert_allclose(s.mu, mu_ref)
+    assert_allclose(s.Sb, Sb_ref, rtol=1e-6, atol=1e-10)
+    assert_allclose(s.Sw, Sw_ref, rtol=1e-6, atol=1e-10)
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
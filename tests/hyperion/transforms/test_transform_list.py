@@ -0,0 +1,92 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import os
+
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.transforms import *
+
+output_dir = './tests/data_out/transforms'
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+x_dim = 20
+num_samples = 500
+
+
+def create_data(seed=1024):
+    rng = np.random.RandomState(seed=seed)
+    mu = 3*rng.randn(10, x_dim)
+    y = rng.randint(10, size=(2*num_samples,))
+    x = rng.randn(2*num_samples, x_dim) + 2 + mu[y]
+    # the gaussianizer is a step function, we evaluate on vectors
+    # not used for training to avoid ties with the training vectors
+    return x[:num_samples], y[:num_samples], x[num_samples:]
+
+
+def create_transforms(x, y):
+    cw = CentWhiten(name='cw')
+    cw.fit(x)
+    pca = PCA(pca_dim=15, name='pca')
+    pca.fit(cw.predict(x))
+    x_pca = pca.predict(cw.predict(x))
+    lda = LDA(lda_dim=8, name='lda')
+    lda.fit(x_pca, y)
+    x_lda = lda.predict(x_pca)
+    lnorm = LNorm(name='lnorm')
+    lnorm.fit(x_lda)
+    x_ln = lnorm.predict(x_lda)
+    gauss = Gaussianizer(max_vectors=100, name='gauss')
+    gauss.fit(x_ln)
+    mvn = MVN(name='mvn')
+    mvn.fit(gauss.predict(x_ln))
+    lnorm2 = LNorm(name='lnorm2')
+    lnorm2.fit(mvn.predict(gauss.predict(x_ln)))
+    return [cw, pca, lda, lnorm, gauss, mvn, lnorm2]
+
+
+def test_compile():
+    x_train, y, x = create_data()
+    tl = TransformList(create_transforms(x_train, y))
+    tl_c = tl.compile()
+
+    assert len(tl_c.transforms) == 3
+    assert isinstance(tl_c.transforms[0], Affine)
+    assert tl_c.transforms[0].T.shape == (x_dim, 8)
+    assert isinstance(tl_c.transforms[1], Gaussianizer)
+    assert isinstance(tl_c.transforms[2], Affine)
+    assert tl_c.transforms[2].lnorm
+
+    assert_allclose(tl_c.predict(x), tl.predict(x), rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize('block_size', [1, 64, 1000])
+def test_block_predict(block_size):
+    x_train, y, x = create_data()
+    tl = TransformList(create_transforms(x_train, y))
+    tl_b = TransformList(create_transforms(x_train, y), block_size=block_size)
+    assert_allclose(tl_b.predict(x), tl.predict(x))
+    tl_c = tl.compile(block_size=block_size)
+    assert_allclose(tl_c.predict(x), tl.predict(x), rtol=1e-5, atol=1e-5)
+
+
+def test_save_load_compiled():
+    x_train, y, x = create_data()
+    tl = TransformList(create_transforms(x_train, y), name='preproc')
+    tl_c = tl.compile(block_size=100)
+
+    file_path = output_dir + '/transform_list_compiled.h5'
+    tl_c.save(file_path)
+    tl_l = TransformList.load(file_path)
+    assert tl_l.block_size == 100
+    assert len(tl_l.transforms) == len(tl_c.transforms)
+    assert_allclose(tl_l.predict(x), tl.predict(x), rtol=1e-5, atol=1e-5)
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,101 @@
+"""
+ Copyright 2020 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import pytest
+import numpy as np
+from numpy.testing import assert_allclose
+
+from hyperion.utils.class_stats import ClassStats
+
+num_classes = 12
+x_dim = 6
+num_samples = 500
+
+
+def create_data(seed=1024):
+    rng = np.random.RandomState(seed=seed)
+    class_ids = rng.randint(num_classes, size=(num_samples,))
+    x = rng.randn(num_samples, x_dim) + 5*rng.randn(num_classes, x_dim)[class_ids] + 100
+    w = rng.rand(num_samples)
+    p_theta = rng.dirichlet(np.ones((num_classes,)), size=num_samples)
+    return x, class_ids, w, p_theta
+
+
+def compute_stats_loop(x, p_theta, class_weights):
+    # reference: loop over classes
+    N = np.zeros((num_classes,))
+    F = np.zeros((num_classes, x_dim))
+    S = np.zeros((x_dim, x_dim))
+    Sw = np.zeros((x_dim, x_dim))
+    for k in range(num_classes):
+        p_k = p_theta[:, k]
+        N[k] = np.sum(p_k)
+        F[k] = np.dot(p_k, x)
+        S += class_weights[k]*np.dot(p_k*x.T, x)
+        delta = x - F[k]/N[k]
+        Sw += class_weights[k]*np.dot(p_k*delta.T, delta)
+    return N, F, S, Sw
+
+
+@pytest.mark.parametrize('soft, use_weights',
+                         [(False, False), (False, True), (True, False), (True, True)])
+def test_compute(soft, use_weights):
+    x, class_ids, w, p_theta = create_data()
+    if not soft:
+        p_theta = np.eye(num_classes)[class_ids]
+    class_weights = 1/np.arange(1, num_classes+1)
+    sample_weight = w if use_weights else None
+    p_ref = p_theta if sample_weight is None else sample_weight[:, None]*p_theta
+    N_ref, F_ref, S_ref, Sw_ref = compute_stats_loop(x, p_ref, class_weights)
+
+    stats = ClassStats.compute(
+        x, None if soft else class_ids, p_theta if soft else None,
+        sample_weight=sample_weight, num_classes=num_classes,
+        class_weights=class_weights)
+    assert_allclose(stats.N, N_ref)
+    assert_allclose(stats.F, F_ref)
+    assert_allclose(stats.S, S_ref)
+    assert_allclose(stats.mu, F_ref/N_ref[:, None])
+    assert_allclose(stats.within_class_scatter(), Sw_ref, rtol=1e-6)
+
+
+def test_within_class_scatter_mu():
+    x, class_ids, _, _ = create_data()
+    mu = np.random.RandomState(seed=1).randn(num_classes, x_dim)
+    stats = ClassStats.compute(x, class_ids)
+    Sw_ref = np.zeros((x_dim, x_dim))
+    for k in range(num_classes):
+        delta = x[class_ids == k] - mu[k]
+        Sw_ref += np.dot(delta.T, delta)
+    assert_allclose(stats.within_class_scatter(mu), Sw_ref, rtol=1e-6)
+
+
+def test_accumulate_chunks():
+    x, class_ids, w, _ = create_data()
+    class_weights = 1/np.arange(1, num_classes+1)
+    stats = ClassStats.compute(x, class_ids, sample_weight=w,
+                               class_weights=class_weights)
+
+    chunks = [(x[i:i+64], class_ids[i:i+64], w[i:i+64])
+              for i in range(0, num_samples, 64)]
+    stats_c = ClassStats.compute_from_generator(
+        chunks, num_classes, x_dim, class_weights)
+
+    stats_m = ClassStats(num_classes, x_dim, class_weights)
+    for i in range(0, num_samples, 100):
+        stats_i = ClassStats.compute(
+            x[i:i+100], class_ids[i:i+100], sample_weight=w[i:i+100],
+            num_classes=num_classes, class_weights=class_weights)
+        stats_m.merge(stats_i)
+
+    for stats_i in [stats_c, stats_m]:
+        for a, b in zip(stats_i.get_stats(), stats.get_stats()):
+            assert_allclose(a, b)
+        assert_allclose(stats_i.within_class_scatter(),
+                        stats.within_class_scatter(), rtol=1e-6)
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -304,6 +304,17 @@ def test_kcm_read_write_fomat4():
 
 
 
+def test_kcm_to_ndarray_slice():
+
+    mat1 = create_matrix(20, 4).astype('float32')
+    for method in ['speech-feat', 'speech-feat-t', '2byte-auto', '1byte-auto']:
+        cmat = KCM.compress(mat1, method)
+        mat2 = cmat.to_ndarray()
+        assert_allclose(mat2[5:], cmat.to_ndarray(row_offset=5))
+        assert_allclose(mat2[4:8], cmat.to_ndarray(row_offset=4, num_rows=4))
+
+
+
 def test_kcm_read_shape():
     
     file_path = output_dir + '/kcm.mat'
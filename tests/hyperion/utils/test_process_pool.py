@@ -0,0 +1,51 @@
+"""
+ Copyright 2018 Johns Hopkins University  (Author: Jesus Villalba)
+ Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+"""
+import time
+
+import pytest
+import numpy as np
+
+from hyperion.utils.process_pool import OrderedProcessPool
+
+
+def init_worker(worker_id, offset):
+    return offset + worker_id
+
+
+def process_item(state, x):
+    # unbalanced items, so the results arrive out of order
+    time.sleep(0.01*(x % 3))
+    return x**2, state
+
+
+def process_item_with_error(state, x):
+    if x == 5:
+        raise ValueError('bad item')
+    return x
+
+
+@pytest.mark.parametrize('num_workers', [1, 3])
+def test_imap_order(num_workers):
+    pool = OrderedProcessPool(num_workers, process_item, init_fn=init_worker,
+                              init_args=(10,), queue_size=2)
+    results = list(pool.imap(range(20)))
+    assert [r[0] for r in results] == [x**2 for x in range(20)]
+    assert set(r[1] for r in results) <= set(range(10, 10+num_workers))
+    assert pool.num_items == 20
+
+
+def test_imap_empty():
+    pool = OrderedProcessPool(2, process_item)
+    assert list(pool.imap([])) == []
+
+
+def test_imap_error():
+    pool = OrderedProcessPool(2, process_item_with_error, queue_size=2)
+    with pytest.raises(RuntimeError):
+        list(pool.imap(range(100)))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -88,6 +88,66 @@ def test_save_load():
     assert scp1 == scp2
     
 
+def test_load_vectorized():
+    file_txt = './tests/data_out/list_parse.scp'
+    with open(file_txt, 'w') as f:
+        f.write('spk1 a.ark:10[3:40]\r\n'
+                'spk2 b.ark:200  \n'
+                'spk3 a.ark:3000[5:]\n'
+                'spk4 b.ark:1[:7]')
+
+    scp1 = SCPList.load(file_txt)
+    scp2 = SCPList._load_text(file_txt, ' ', ':', False)
+    assert scp1 == scp2
+    assert np.all(scp1.offset == [10, 200, 3000, 1])
+    assert np.all(scp1.range_spec == [[3, 38], [0, 0], [5, 0], [0, 8]])
+
+    paths, idx = scp1.get_unique_file_paths()
+    assert np.all(paths == ['a.ark', 'b.ark'])
+    assert np.all(idx == [0, 1, 0, 1])
+
+    scp1 = SCPList.load(file_txt, is_wav=True)
+    scp2 = SCPList._load_text(file_txt, ' ', ':', True)
+    assert scp1 == scp2
+    
+
+
+def test_save_load_binary():
+    file_bin = './tests/data_out/list_offsetrange.npz'
+    scp1 = create_scp_with_offset_range()
+    scp1.save_binary(file_bin)
+    scp2 = SCPList.load_binary(file_bin)
+    assert scp1 == scp2
+
+    file_txt = './tests/data_out/list_offsetrange_cache.scp'
+    scp1.save(file_txt)
+    cache_path = SCPList.get_cache_path(file_txt)
+    if os.path.isfile(cache_path):
+        os.remove(cache_path)
+    scp2 = SCPList.load(file_txt, use_cache=True)
+    assert os.path.isfile(cache_path)
+    assert not any(f.startswith(os.path.basename(cache_path)) and f.endswith('.tmp')
+                   for f in os.listdir(os.path.dirname(cache_path)))
+    scp3 = SCPList.load(file_txt, use_cache=True)
+    assert scp1 == scp2
+    assert scp1 == scp3
+
+    
+
+def test_add_prefix_to_filepath():
+    scp1 = create_scp()
+    scp1.add_prefix_to_filepath('data/')
+    assert scp1.file_path[0] == 'data/0'
+    paths, idx = scp1.get_unique_file_paths()
+    assert np.all(paths[idx] == scp1.file_path)
+
+    scp2 = scp1.filter(['spk2', 'spk3'])
+    paths, idx = scp2.get_unique_file_paths()
+    assert len(paths) == 5
+    assert np.all(paths[idx] == scp2.file_path)
+
+
+
 def test_split_merge():
     scp1 = create_scp()
 
@@ -167,6 +227,20 @@ def test_filter():
     scp3 = SCPList([],[])
     assert scp2 == scp3
 
+    scp2 = scp1.filter(['spk2', 'spk10'], keep=False)
+    f = np.ones(len(scp1.key), dtype='bool')
+    f[1:13] = False
+    scp3 = SCPList(scp1.key[f], scp1.file_path[f],
+                   scp1.offset[f], scp1.range_spec[f])
+    assert scp2 == scp3
+
+    scp2 = scp1.filter_paths(scp1.file_path[1:13])
+    f = np.zeros(len(scp1.key), dtype='bool')
+    f[1:13] = True
+    scp3 = SCPList(scp1.key[f], scp1.file_path[f],
+                   scp1.offset[f], scp1.range_spec[f])
+    assert scp2 == scp3
+
 
 
 def test_shuffle():
@@ -172,5 +172,38 @@ def test_load_save():
     assert(scr1 == scr2)
 
 
+def test_load_txt_chunks():
+
+    scr1 = create_scores()[0]
+    scr1.sort()
+    scr1.scores[scr1.score_mask==False]=0
+
+    file_txt = output_dir + '/test_chunks.txt'
+    scr1.save_txt(file_txt)
+    for num_threads in [1, 3]:
+        scr2 = TrialScores.load_txt(file_txt, chunk_size=1000,
+                                    num_threads=num_threads)
+        assert(scr1 == scr2)
+
+
+def test_merge_unsorted():
+
+    scr1 = create_scores()[0]
+    scr1.sort()
+
+    # parts with unsorted and partially overlapping model/segment sets
+    m_idx = np.random.permutation(len(scr1.model_set))
+    s_idx = np.random.permutation(len(scr1.seg_set))
+    scr_list = []
+    for i in range(0, len(m_idx), 7):
+        for j in range(0, len(s_idx), 50):
+            ix = np.ix_(m_idx[i:i+7], s_idx[j:j+50])
+            scr_list.append(TrialScores(scr1.model_set[m_idx[i:i+7]],
+                                        scr1.seg_set[s_idx[j:j+50]],
+                                        scr1.scores[ix], scr1.score_mask[ix]))
+    scr2 = TrialScores.merge(scr_list)
+    assert(scr1 == scr2)
+
+
 if __name__ == '__main__':
     pytest.main([__file__])